@@ -0,0 +1,133 @@
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable
+
+import requests
+from jwt.algorithms import RSAAlgorithm
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+
+class JWKSCache:
+    """
+    Keeps a provider's public signing keys, parsed and indexed by kid, so
+    verifying a token doesn't wait on the provider.
+
+    The keys are kept for as long as the Cache-Control max-age of the
+    response allows, default_max_age when it has none. Once refresh_after of
+    that lifetime has passed, the next lookup refreshes them on a background
+    thread and carries on with the keys it has. The keys are only fetched
+    while a token waits when they have expired, or when a token is signed
+    with a kid that isn't known yet, which is how a provider rotating its
+    keys shows up. Those fetches are at most one every min_refetch_interval
+    seconds, so tokens with made up kids can't hammer the provider.
+
+    Lookups are called from the threadpool, concurrent refreshes are
+    coalesced into one fetch.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        default_max_age: float = 3600,
+        refresh_after: float = 0.75,
+        min_refetch_interval: float = 60,
+        timeout: float = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param url: The provider's JWKS endpoint
+        :param default_max_age: Seconds to keep keys the response has no max-age for
+        :param refresh_after: Share of the lifetime after which keys are
+            refreshed in the background
+        :param min_refetch_interval: Seconds between fetches for unknown kids
+        :param timeout: Seconds to wait on the provider
+        :param clock: Monotonic time source, replaced in tests
+        """
+        self.url = url
+        self.default_max_age = default_max_age
+        self.refresh_after = refresh_after
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self.clock = clock
+        self._keys: dict[str, Any] = {}
+        self._fetched_at = float("-inf")
+        self._refresh_at = 0.0
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._background_refresh = threading.Lock()
+
+    def get_key(self, kid: str) -> Any:
+        """
+        :param kid: The kid from the token's header
+        :return: The public key the token should be verified with
+        :raises ValueError: If the provider has no key with that kid
+        :raises requests.RequestException: If the keys have to be fetched and
+            the provider can't be reached
+        """
+        now = self.clock()
+        key = self._keys.get(kid)
+        if now < self._expires_at:
+            if now >= self._refresh_at:
+                self._refresh_in_background()
+            if key is not None:
+                return key
+            if now - self._fetched_at < self.min_refetch_interval:
+                raise ValueError("Matching public key not found.")
+
+        try:
+            self._refresh(requested_at=now)
+        except requests.RequestException:
+            # Better a key past its max-age than failing every sign in while
+            # the provider is unreachable
+            if key is None:
+                raise
+            return key
+        key = self._keys.get(kid)
+        if key is None:
+            raise ValueError("Matching public key not found.")
+        return key
+
+    def _refresh(self, requested_at: float) -> None:
+        with self._lock:
+            if self._fetched_at >= requested_at:
+                # Another thread fetched the keys while this one waited
+                return
+            fetched_at = self.clock()
+            response = requests.get(self.url, timeout=self.timeout)
+            response.raise_for_status()
+            keys = {
+                jwk["kid"]: RSAAlgorithm.from_jwk(jwk)
+                for jwk in response.json()["keys"]
+            }
+
+            max_age = self._max_age(response.headers.get("Cache-Control", ""))
+            self._keys = keys
+            self._fetched_at = fetched_at
+            self._refresh_at = fetched_at + max_age * self.refresh_after
+            self._expires_at = fetched_at + max_age
+
+    def _refresh_in_background(self) -> None:
+        # Held for as long as a background refresh runs, lookups only check it
+        if not self._background_refresh.acquire(blocking=False):
+            return
+
+        def refresh() -> None:
+            try:
+                self._refresh(requested_at=self.clock())
+            except Exception:
+                logger.warning(
+                    "Refreshing keys from %s failed", self.url, exc_info=True
+                )
+            finally:
+                self._background_refresh.release()
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _max_age(self, cache_control: str) -> float:
+        match = MAX_AGE_PATTERN.search(cache_control)
+        return float(match.group(1)) if match else self.default_max_age
@@ -1,5 +1,17 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
 import bcrypt
 
+from app.exceptions import PasswordHashingBusyException
+from app.models.metrics_models import PasswordHashingStats
+
+T = TypeVar("T")
+
 
 def get_password_hash(plain_text_password: str) -> str:
     hashed_bytes = bcrypt.hashpw(plain_text_password.encode(), bcrypt.gensalt())
@@ -8,3 +20,100 @@ def get_password_hash(plain_text_password: str) -> str:
 
 def check_password(plain_text_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_text_password.encode(), hashed_password.encode())
+
+
+class PasswordHashingPool:
+    """
+    Runs bcrypt on threads of its own, so sign ins and sign ups don't take the
+    threadpool every sync dependency and route runs in. bcrypt releases the
+    GIL while it hashes, so threads are enough to keep the rest of the API
+    responsive without the overhead of a process pool.
+
+    At most max_workers hashes run at once and max_queued more wait for a
+    thread. Anything past that is turned away with
+    PasswordHashingBusyException, rather than letting a storm of logins queue
+    up for longer than any client will wait.
+    """
+
+    def __init__(self, max_workers: int, max_queued: int) -> None:
+        """
+        :param max_workers: Hashes run at the same time
+        :param max_queued: Hashes waiting for a thread before more are turned away
+        """
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Only touched on the event loop
+        self._pending = 0
+        self._peak_queued = 0
+        self._rejected = 0
+        # Touched by the worker threads
+        self._lock = threading.Lock()
+        self._completed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def run(self, function: Callable[..., T], *args) -> T:
+        """
+        Runs function(*args) on one of the pool's threads.
+
+        :raises PasswordHashingBusyException: If the queue is full
+        """
+        if self._pending >= self.max_workers + self.max_queued:
+            self._rejected += 1
+            raise PasswordHashingBusyException(
+                "Too many sign ins at once, try again shortly"
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix="password-hashing"
+            )
+        self._pending += 1
+        self._peak_queued = max(self._peak_queued, self._pending - self.max_workers)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._timed, time.perf_counter(), function, args
+            )
+        finally:
+            self._pending -= 1
+
+    def _timed(self, submitted: float, function: Callable[..., T], args: tuple) -> T:
+        wait = time.perf_counter() - submitted
+        try:
+            return function(*args)
+        finally:
+            with self._lock:
+                self._completed += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+    def stats(self) -> PasswordHashingStats:
+        with self._lock:
+            return PasswordHashingStats(
+                max_workers=self.max_workers,
+                max_queued=self.max_queued,
+                running=min(self._pending, self.max_workers),
+                queued=max(self._pending - self.max_workers, 0),
+                peak_queued=self._peak_queued,
+                completed=self._completed,
+                rejected=self._rejected,
+                mean_wait_ms=(
+                    self._total_wait / self._completed * 1000 if self._completed else 0
+                ),
+                max_wait_ms=self._max_wait * 1000,
+            )
+
+    def shutdown(self) -> None:
+        """
+        Stops the threads once the hashes already submitted are done. The next
+        run starts new ones.
+        """
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            executor.shutdown(wait=False)
+
+
+password_hashing_pool = PasswordHashingPool(
+    max_workers=int(os.environ.get("PASSWORD_HASHING_WORKERS", os.cpu_count() or 1)),
+    max_queued=int(os.environ.get("PASSWORD_HASHING_QUEUE", 16)),
+)
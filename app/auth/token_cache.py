@@ -0,0 +1,103 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from app.models.metrics_models import TokenCacheStats
+
+DEFAULT_MAX_SIZE = 10_000
+# Even tokens valid for a day are verified again this often
+DEFAULT_MAX_TTL_SECONDS = 300
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of the payloads of tokens that passed verification, so
+    a client sending the same token on every request only pays for verifying
+    it once.
+
+    Entries are keyed by a digest of the token, so the tokens themselves
+    aren't kept. They expire at the token's exp, or max_ttl_seconds after
+    they were cached if that comes first. An expired token is a miss,
+    verifying it again raises the same error it always did. Only tokens that
+    verified are cached, invalid ones are checked on every request.
+
+    Dependencies run in the threadpool, so access is behind a lock.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        max_ttl_seconds: float = DEFAULT_MAX_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """
+        :param max_size: Most payloads kept, the least recently used go first
+        :param max_ttl_seconds: Longest a payload is kept
+        :param clock: Wall clock time source, compared with exp claims
+        """
+        self.max_size = max_size
+        self.max_ttl_seconds = max_ttl_seconds
+        self.clock = clock
+        self._entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """
+        :return: A copy of the token's payload, None if it isn't cached or has expired
+        """
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() < entry[0]:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, payload: dict) -> None:
+        """
+        :param token: A token that passed verification
+        :param payload: Its decoded payload
+        """
+        expires_at = self.clock() + self.max_ttl_seconds
+        if isinstance(payload.get("exp"), (int, float)):
+            expires_at = min(expires_at, payload["exp"])
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, dict(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> TokenCacheStats:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return TokenCacheStats(
+                size=len(self._entries),
+                max_size=self.max_size,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                hit_rate=self.hits / lookups if lookups else 0.0,
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+verified_tokens = VerifiedTokenCache()
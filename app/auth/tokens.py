@@ -2,14 +2,16 @@ import datetime
 import os
 
 import jwt
-import requests
-from jwt.algorithms import RSAAlgorithm
 
+from app.auth.jwks import JWKSCache
 from app.exceptions import UnsupportedProviderException
 from app.utils.date_utils import add_days_to_date
 
 SECRET = os.environ["JWT_SECRET"]
 
+APPLE_KEYS_URL = "https://appleid.apple.com/auth/keys"
+apple_public_keys = JWKSCache(APPLE_KEYS_URL)
+
 
 def encode_jwt(payload: dict, algorithm: str = "HS256") -> str:
     today = datetime.datetime.now()
@@ -42,12 +44,6 @@ def decode_and_verify_token(token: str, provider: str) -> dict:
             raise UnsupportedProviderException(f"Unsupported provider {provider}")
 
 
-def fetch_apple_public_keys():
-    APPLE_KEYS_URL = "https://appleid.apple.com/auth/keys"
-    response = requests.get(APPLE_KEYS_URL)
-    return response.json()["keys"]
-
-
 def decode_verify_apple_identity_token(token: str) -> dict:
     """
     Decode and verify an Apple identity token
@@ -57,20 +53,14 @@ def decode_verify_apple_identity_token(token: str) -> dict:
     :raises ValueError: If the public key is not found
     :raises jwt.exceptions.InvalidTokenError: If the token is invalid
     """
-    apple_keys = fetch_apple_public_keys()
-
     try:
         headers = jwt.get_unverified_header(token)
     except jwt.exceptions.DecodeError:
         raise jwt.exceptions.InvalidTokenError()
 
-    matching_key = next(
-        (key for key in apple_keys if key["kid"] == headers["kid"]), None
-    )
-    if not matching_key:
-        raise ValueError("Matching public key not found.")
-
-    public_key = RSAAlgorithm.from_jwk(matching_key)
+    if "kid" not in headers:
+        raise jwt.exceptions.InvalidTokenError()
+    public_key = apple_public_keys.get_key(headers["kid"])
 
     return jwt.decode(
         token,
@@ -0,0 +1,88 @@
+"""
+Chooses where documents are stored. STORAGE_BACKEND selects the backend:
+
+- cosmos (default): Azure Cosmos DB, configured through DB_HOST and DB_KEY
+- sqlite: an embedded SQLite database at SQLITE_PATH, for running the whole
+  API on one box, benchmarking and self-hosted deployments
+"""
+
+import os
+from functools import cache
+
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.exercise import ExerciseDataAccess
+from app.data_access.protocols import (
+    ExerciseStore,
+    SetAggregateStore,
+    SetStore,
+    StorageBackend,
+    UserStore,
+    WorkoutFolderStore,
+)
+from app.data_access.set import SetDataAccess
+from app.data_access.set_aggregate import SetAggregateDataAccess
+from app.data_access.sqlite.base import SQLiteConnectionSingleton
+from app.data_access.sqlite.exercise import SQLiteExerciseDataAccess
+from app.data_access.sqlite.set import SQLiteSetDataAccess
+from app.data_access.sqlite.set_aggregate import SQLiteSetAggregateDataAccess
+from app.data_access.sqlite.user import SQLiteUserDataAccess
+from app.data_access.sqlite.workout_folder import SQLiteWorkoutFolderDataAccess
+from app.data_access.user import UserDataAccess
+from app.data_access.workout_folder import WorkoutFolderDataAccess
+
+
+class CosmosBackend:
+    def user_data_access(self) -> UserStore:
+        return UserDataAccess()
+
+    def set_data_access(self) -> SetStore:
+        return SetDataAccess()
+
+    def set_aggregate_data_access(self) -> SetAggregateStore:
+        return SetAggregateDataAccess()
+
+    def exercise_data_access(self) -> ExerciseStore:
+        return ExerciseDataAccess()
+
+    def workout_folder_data_access(self) -> WorkoutFolderStore:
+        return WorkoutFolderDataAccess()
+
+    async def close(self) -> None:
+        await CosmosDBClientSingleton.close()
+
+
+class SQLiteBackend:
+    def user_data_access(self) -> UserStore:
+        return SQLiteUserDataAccess()
+
+    def set_data_access(self) -> SetStore:
+        return SQLiteSetDataAccess()
+
+    def set_aggregate_data_access(self) -> SetAggregateStore:
+        return SQLiteSetAggregateDataAccess()
+
+    def exercise_data_access(self) -> ExerciseStore:
+        return SQLiteExerciseDataAccess()
+
+    def workout_folder_data_access(self) -> WorkoutFolderStore:
+        return SQLiteWorkoutFolderDataAccess()
+
+    async def close(self) -> None:
+        SQLiteConnectionSingleton.close()
+
+
+BACKENDS: dict[str, type[StorageBackend]] = {
+    "cosmos": CosmosBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+@cache
+def get_storage_backend() -> StorageBackend:
+    name = os.environ.get("STORAGE_BACKEND", "cosmos")
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown STORAGE_BACKEND {name}, expected one of {', '.join(BACKENDS)}"
+        )
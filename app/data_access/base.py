@@ -1,13 +1,64 @@
+import inspect
+from typing import Any
+
+from azure.cosmos.aio import ContainerProxy, CosmosClient
+
+from app.data_access.containers import DATABASE_ID
 from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.instrumentation import (
+    InstrumentedContainer,
+    data_access_metrics,
+    track_operation,
+)
+
+
+def set_operations(changes: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    :param changes: The values to write, keyed by their path in the document
+        e.g. /preferences/theme
+    :return: The patch operations that set them, leaving the rest as it is
+    """
+    return [
+        {"op": "set", "path": path, "value": value} for path, value in changes.items()
+    ]
 
 
 class BaseDataAccess:
+    def __init_subclass__(cls, **kwargs) -> None:
+        # Every public coroutine and async generator is tracked, so the
+        # requests it makes show up in the metrics under e.g.
+        # SetDataAccess.create_set
+        super().__init_subclass__(**kwargs)
+        for name, method in list(vars(cls).items()):
+            if not name.startswith("_") and (
+                inspect.iscoroutinefunction(method)
+                or inspect.isasyncgenfunction(method)
+            ):
+                setattr(cls, name, track_operation(f"{cls.__name__}.{name}")(method))
+
     def __init__(self, container_name: str) -> None:
         """
         :param container_name: The name of the container e.g. users
         """
-        self.db_name = "set-tracker-db"
+        self.db_name = DATABASE_ID
         self.container_name = container_name
-        self.client = CosmosDBClientSingleton().client
-        self.db = self.client.get_database_client(self.db_name)
-        self.container = self.db.get_container_client(self.container_name)
+        self._client: CosmosClient | None = None
+        self._container: InstrumentedContainer | None = None
+
+    @property
+    def container(self) -> ContainerProxy:
+        """
+        The container, wrapped so every request made through it is recorded.
+        """
+        # The shared client is replaced after it is closed on shutdown, so the
+        # container proxy is rebuilt whenever the client underneath changes.
+        client = CosmosDBClientSingleton().client
+        if client is not self._client:
+            self._client = client
+            self._container = InstrumentedContainer(
+                client.get_database_client(self.db_name).get_container_client(
+                    self.container_name
+                ),
+                data_access_metrics,
+            )
+        return self._container  # type: ignore
@@ -0,0 +1,200 @@
+"""
+Reads a container's change feed under a lease, so every instance of the app can
+run the same processor and only one of them reads the feed at a time.
+
+The lease is a document in the leases container, one per processor: who holds
+it, until when, and the continuation of the last page the handler finished
+with. Taking the lease, renewing it and checkpointing are all conditional on
+its etag, so of two instances racing for it only one wins, and an instance
+that stops renewing loses the lease to the next one once it expires.
+
+The continuation is checkpointed after the handler has finished a page, so a
+handler that fails, or an instance that dies part way, leaves the page to be
+read again from the last checkpoint. Handlers must be idempotent.
+
+The whole container is read under one lease. Splitting the feed into feed
+ranges with a lease each is what would let several instances share the work.
+"""
+
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from azure.core import MatchConditions
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+from app.data_access.base import BaseDataAccess
+from app.data_access.containers import LEASES
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 60
+PAGE_SIZE = 100
+
+ChangeHandler = Callable[[list[dict]], Awaitable[None]]
+
+
+class LeaseDataAccess(BaseDataAccess):
+    def __init__(self) -> None:
+        super().__init__(container_name=LEASES)
+
+    async def acquire(
+        self, lease_id: str, owner: str, lease_seconds: float
+    ) -> Optional[dict]:
+        """
+        Takes the lease for owner, or renews it if owner already holds it.
+
+        :param lease_id: The name of the processor the lease is for
+        :param lease_seconds: How long the lease is held without a renewal
+        :return: The lease, or None while another owner holds it
+        """
+        try:
+            lease = await self.container.read_item(
+                item=lease_id, partition_key=lease_id
+            )
+        except CosmosResourceNotFoundError:
+            lease = None
+        if lease is None:
+            try:
+                return await self.container.create_item(
+                    body={
+                        "id": lease_id,
+                        "owner": owner,
+                        "expires_at": time.time() + lease_seconds,
+                        "continuation": None,
+                    }
+                )
+            except CosmosResourceExistsError:
+                return None
+        if lease["owner"] != owner and lease["expires_at"] > time.time():
+            return None
+        try:
+            return await self._renew(lease, owner, lease_seconds)
+        except CosmosAccessConditionFailedError:
+            return None
+
+    async def checkpoint(
+        self, lease: dict, continuation: Optional[str], lease_seconds: float
+    ) -> dict:
+        """
+        Records how far the feed has been read and renews the lease.
+
+        :param lease: The lease as last returned to its owner
+        :param continuation: Where the next read of the feed starts from
+        :return: The lease, renewed
+        :raises CosmosAccessConditionFailedError: If the lease was taken by
+            another owner since
+        """
+        return await self._renew(
+            {**lease, "continuation": continuation}, lease["owner"], lease_seconds
+        )
+
+    async def release(self, lease: dict) -> None:
+        """
+        Gives the lease up, keeping its checkpoint, so the next owner doesn't
+        wait for it to expire. Does nothing if it was already lost.
+        """
+        try:
+            await self._renew(lease, lease["owner"], -1)
+        except CosmosAccessConditionFailedError:
+            pass
+
+    async def _renew(self, lease: dict, owner: str, lease_seconds: float) -> dict:
+        body = {
+            "id": lease["id"],
+            "owner": owner,
+            "expires_at": time.time() + lease_seconds,
+            "continuation": lease["continuation"],
+        }
+        return await self.container.replace_item(
+            item=lease["id"],
+            body=body,
+            etag=lease["_etag"],
+            match_condition=MatchConditions.IfNotModified,
+        )
+
+
+class ChangeFeedProcessor(BaseDataAccess):
+    """
+    Hands the changes to a container, a page at a time, to handler, then
+    checkpoints them in the processor's lease. run_once reads until the feed
+    is caught up and is meant to be called on a schedule.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        container_name: str,
+        handler: ChangeHandler,
+        owner: Optional[str] = None,
+        lease_seconds: float = LEASE_SECONDS,
+        page_size: int = PAGE_SIZE,
+        leases: Optional[LeaseDataAccess] = None,
+    ) -> None:
+        """
+        :param name: Names the processor's lease, processors with the same name
+            share it and take turns reading the feed
+        :param container_name: The container whose change feed is read
+        :param handler: Called with each page of changes, must be idempotent
+        :param owner: Identifies this instance in the lease
+        :param lease_seconds: How long the lease is held without a checkpoint
+        :param page_size: The most changes handed to handler at once
+        """
+        super().__init__(container_name=container_name)
+        self.name = name
+        self.handler = handler
+        self.owner = owner or str(uuid.uuid4())
+        self.lease_seconds = lease_seconds
+        self.page_size = page_size
+        self.leases = leases or LeaseDataAccess()
+        self._lease: Optional[dict] = None
+
+    async def run_once(self) -> int:
+        """
+        Reads the feed from the last checkpoint until it is caught up, if this
+        instance can take the lease.
+
+        :return: The number of changes handled
+        """
+        lease = await self.leases.acquire(self.name, self.owner, self.lease_seconds)
+        if lease is None:
+            return 0
+        if lease["continuation"] is None:
+            feed = self.container.query_items_change_feed(
+                start_time="Beginning", max_item_count=self.page_size
+            )
+        else:
+            feed = self.container.query_items_change_feed(
+                continuation=lease["continuation"], max_item_count=self.page_size
+            )
+        pages = feed.by_page()
+        handled = 0
+        async for page in pages:
+            changes = [change async for change in page]
+            await self.handler(changes)
+            handled += len(changes)
+            try:
+                lease = await self.leases.checkpoint(
+                    lease, pages.continuation_token, self.lease_seconds
+                )
+            except CosmosAccessConditionFailedError:
+                # The lease expired mid-read and another instance took it, it
+                # carries on from the last checkpoint
+                logger.warning("Lost the %s lease to another instance", self.name)
+                return handled
+        self._lease = lease
+        return handled
+
+    async def release(self) -> None:
+        """
+        Gives up the lease, if this instance held it after its last run, e.g.
+        on shutdown.
+        """
+        if self._lease is not None:
+            lease, self._lease = self._lease, None
+            await self.leases.release(lease)
@@ -0,0 +1,58 @@
+"""
+Names and partition key layout of the containers in the set-tracker-db database.
+
+Every container is partitioned by the user that owns its documents, so the hot
+read paths (a user's sets for an exercise, a user's folders, a user's custom
+exercises) are answered from a single logical partition. The exceptions are
+user-emails, an index from each email to the user it belongs to, partitioned
+by the email so signing in is a point read, and leases, where change feed
+processors keep their checkpoints.
+"""
+
+from azure.cosmos import PartitionKey
+
+DATABASE_ID = "set-tracker-db"
+
+SYSTEM_CREATOR = "system"
+
+USERS = "users"
+EXERCISE_SETS = "exercise-sets-by-user"
+EXERCISES = "exercises-by-creator"
+WORKOUT_FOLDERS = "workout-folders-by-user"
+USER_EMAILS = "user-emails"
+SET_AGGREGATES = "set-aggregates-by-user"
+LEASES = "leases"
+
+# Sets use a hierarchical key so a user's history for one exercise lives in one
+# logical partition, while queries scoped to only the user still target a prefix.
+PARTITION_KEY_PATHS: dict[str, list[str]] = {
+    USERS: ["/id"],
+    EXERCISE_SETS: ["/user_id", "/exercise_id"],
+    EXERCISES: ["/creator"],
+    WORKOUT_FOLDERS: ["/user_id"],
+    # id is the normalized email
+    USER_EMAILS: ["/id"],
+    # id is the exercise id, one summary per exercise a user has logged sets for
+    SET_AGGREGATES: ["/user_id"],
+    # id is the name of the processor holding the lease
+    LEASES: ["/id"],
+}
+
+# The original containers were all partitioned by /id. Maps each one to the
+# container that replaces it, used by migrate_containers.py.
+LEGACY_CONTAINERS: dict[str, str] = {
+    "exercise-sets": EXERCISE_SETS,
+    "exercises": EXERCISES,
+    "workout-folders": WORKOUT_FOLDERS,
+}
+
+
+def partition_key_for(container_id: str) -> PartitionKey:
+    """
+    :param container_id: One of the containers in PARTITION_KEY_PATHS
+    :return: The partition key definition to create the container with
+    """
+    paths = PARTITION_KEY_PATHS[container_id]
+    if len(paths) > 1:
+        return PartitionKey(path=paths, kind="MultiHash")
+    return PartitionKey(path=paths[0])
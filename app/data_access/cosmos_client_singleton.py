@@ -1,17 +1,38 @@
-from azure.cosmos import CosmosClient
 import os
+from typing import Callable
 
+from azure.cosmos.aio import CosmosClient
 
-DB_HOST = os.environ["DB_HOST"]
-DB_KEY = os.environ["DB_KEY"]
+
+def connect() -> CosmosClient:
+    return CosmosClient(url=os.environ["DB_HOST"], credential=os.environ["DB_KEY"])
 
 
 class CosmosDBClientSingleton:
+    """
+    Holds the one async client shared by every data access object, so all of
+    them share its connection pool. The client is only built on first use and
+    is closed when the app shuts down.
+
+    client_factory builds the client, the tests swap it for one returning the
+    in-memory stand-in from tests/cosmos_stand_in.py.
+    """
+
     _instance = None
     client: CosmosClient
+    client_factory: Callable[[], CosmosClient] = staticmethod(connect)
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._instance.client = CosmosClient(url=DB_HOST, credential=DB_KEY)
+            cls._instance.client = cls.client_factory()
         return cls._instance
+
+    @classmethod
+    async def close(cls) -> None:
+        """
+        Closes the shared client. The next use of the singleton builds a new one.
+        """
+        if cls._instance is not None:
+            instance, cls._instance = cls._instance, None
+            await instance.client.close()
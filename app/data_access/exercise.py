@@ -1,46 +1,67 @@
+import asyncio
 from typing import Optional
 
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
+
 from app.data_access.base import BaseDataAccess
+from app.data_access.containers import EXERCISES, SYSTEM_CREATOR
+from app.data_access.hydration import hydrate, hydrate_many
 from app.models.exercises_models import ExerciseInDB
 
 
 class ExerciseDataAccess(BaseDataAccess):
     def __init__(self):
-        super().__init__(container_name="exercises")
+        super().__init__(container_name=EXERCISES)
 
-    def get_system_and_user_exercises(self, user_id: str) -> list[ExerciseInDB]:
-        query = (
-            "SELECT * FROM exercises e "
-            "WHERE e.creator='system' OR e.creator=@user_id"
-        )
+    async def get_exercises_by_creator(self, creator: str) -> list[ExerciseInDB]:
         items = self.container.query_items(
-            query=query,
-            parameters=[{"name": "@user_id", "value": user_id}],
-            enable_cross_partition_query=True,
+            query="SELECT * FROM exercises e", partition_key=creator
         )
-        return [ExerciseInDB(**item) for item in items]
-
-    def create_custom_exercise(self, exercise: ExerciseInDB) -> ExerciseInDB:
-        created_exercise = self.container.create_item(body=exercise.model_dump())
-        return ExerciseInDB(**created_exercise)
-
-    def get_exercise_by_name(self, name: str, user_id: str) -> Optional[ExerciseInDB]:
-        query = "SELECT * FROM exercises e WHERE e.name=@name AND (e.creator='system' OR e.creator=@user_id)"
-        items = list(
-            self.container.query_items(
-                query=query,
-                parameters=[
-                    {"name": "@name", "value": name},
-                    {"name": "@user_id", "value": user_id},
-                ],
-                enable_cross_partition_query=True,
-            )
-        )
-        if not items:
-            return None
-        return ExerciseInDB(**items[0])
+        return hydrate_many(ExerciseInDB, [item async for item in items])
 
-    def get_exercise_by_id(self, exercise_id: str) -> ExerciseInDB:
-        return ExerciseInDB(
-            **self.container.read_item(item=exercise_id, partition_key=exercise_id)
+    async def get_system_and_user_exercises(self, user_id: str) -> list[ExerciseInDB]:
+        # Exercises are partitioned by creator, so this is two single-partition
+        # queries, issued together, instead of one that fans out to every partition.
+        system_exercises, user_exercises = await asyncio.gather(
+            self.get_exercises_by_creator(SYSTEM_CREATOR),
+            self.get_exercises_by_creator(user_id),
         )
+        return system_exercises + user_exercises
+
+    async def create_custom_exercise(self, exercise: ExerciseInDB) -> ExerciseInDB:
+        await self.container.create_item(body=exercise.model_dump())
+        return exercise
+
+    async def get_exercise_by_name(
+        self, name: str, user_id: str
+    ) -> Optional[ExerciseInDB]:
+        query = "SELECT * FROM exercises e WHERE e.name=@name"
+        for creator in (SYSTEM_CREATOR, user_id):
+            items = [
+                item
+                async for item in self.container.query_items(
+                    query=query,
+                    parameters=[{"name": "@name", "value": name}],
+                    partition_key=creator,
+                )
+            ]
+            if items:
+                return hydrate(ExerciseInDB, items[0])
+        return None
+
+    async def get_exercise_by_id(self, exercise_id: str, user_id: str) -> ExerciseInDB:
+        """
+        Point reads the exercise from the system catalog, then from the user's
+        own exercises.
+
+        :raises CosmosResourceNotFoundError: If the exercise is in neither
+        """
+        try:
+            item = await self.container.read_item(
+                item=exercise_id, partition_key=SYSTEM_CREATOR
+            )
+        except CosmosResourceNotFoundError:
+            item = await self.container.read_item(
+                item=exercise_id, partition_key=user_id
+            )
+        return hydrate(ExerciseInDB, item)
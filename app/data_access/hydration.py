@@ -0,0 +1,52 @@
+"""
+Builds models from the documents the data access layer reads back.
+
+Everything stored went through a validated model on the way in, and request
+bodies are still validated at the API boundary by FastAPI. Reads only need to
+turn documents back into models as cheaply as possible.
+
+model_construct looks like the cheap option but runs in Python, field by
+field, and measured slower than letting pydantic-core validate (see
+benchmarks/hydration.py). So documents go through the compiled validators
+instead: model_validate for a single document, skipping the keyword argument
+repacking of Model(**document), and one TypeAdapter per model, built once,
+for whole lists. Cosmos system properties (_rid, _etag, _ts...) are ignored
+like any other extra key.
+"""
+
+from functools import cache
+from typing import Any, Iterable, TypeVar
+
+from pydantic import BaseModel, TypeAdapter
+
+Model = TypeVar("Model", bound=BaseModel)
+
+
+@cache
+def _list_adapter(model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])  # type: ignore[valid-type]
+
+
+def hydrate(model: type[Model], document: dict[str, Any]) -> Model:
+    """
+    Builds a model from a stored document.
+
+    :param model: The model the document was written from
+    :param document: The document as read from storage
+    """
+    return model.model_validate(document)
+
+
+def hydrate_many(
+    model: type[Model], documents: Iterable[dict[str, Any]]
+) -> list[Model]:
+    """
+    Builds a list of models from stored documents in a single pass through
+    pydantic-core.
+
+    :param model: The model the documents were written from
+    :param documents: The documents as read from storage
+    """
+    if not isinstance(documents, list):
+        documents = list(documents)
+    return _list_adapter(model).validate_python(documents)
@@ -0,0 +1,413 @@
+"""
+Records what every Cosmos request made by the data access layer costs.
+
+BaseDataAccess hands out its container wrapped in an InstrumentedContainer,
+which records one OperationRecord per request: the data access method that
+made it (e.g. SetDataAccess.get_users_sets_by_exercise_id), the container, the
+request charge in RU from the x-ms-request-charge response header, the number
+of items returned, the wall time and whether it failed, or lost an etag
+precondition to a concurrent write. Queries read by page record one request
+per page, as that is what Cosmos bills.
+
+The records feed per operation histograms, which cover the life of the process,
+and a rolling window the summary is computed from. Both are served by
+app/routes/metrics.py.
+"""
+
+import bisect
+import functools
+import inspect
+import math
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Optional
+
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosHttpResponseError,
+)
+
+from app.models.metrics_models import (
+    DataAccessSummary,
+    HistogramSnapshot,
+    OperationHistograms,
+    OperationSummary,
+)
+
+REQUEST_CHARGE_HEADER = "x-ms-request-charge"
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+REQUEST_CHARGE_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+DEFAULT_WINDOW_SECONDS = 300
+MAX_WINDOW_RECORDS = 10_000
+
+# The data access method currently running, set by track_operation
+current_operation: ContextVar[Optional[str]] = ContextVar(
+    "current_operation", default=None
+)
+
+
+@dataclass(frozen=True)
+class OperationRecord:
+    timestamp: float
+    operation: str
+    container: str
+    request_charge: float
+    item_count: int
+    duration_ms: float
+    failed: bool = False
+    conflict: bool = False
+
+
+class Histogram:
+    """Counts observations into fixed buckets, the last bucket is unbounded."""
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> HistogramSnapshot:
+        return HistogramSnapshot(
+            buckets=list(self.buckets),
+            counts=list(self.counts),
+            count=self.count,
+            sum=self.sum,
+        )
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    # Nearest rank, good enough to spot the expensive access paths
+    rank = max(math.ceil(percentile / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class DataAccessMetrics:
+    def __init__(
+        self,
+        window_seconds: float = DEFAULT_WINDOW_SECONDS,
+        max_records: int = MAX_WINDOW_RECORDS,
+    ):
+        """
+        :param window_seconds: How far back the rolling summary looks
+        :param max_records: Cap on the records kept for the summary, so a burst
+            of traffic can't grow memory without bound
+        """
+        self.window_seconds = window_seconds
+        self._records: deque[OperationRecord] = deque(maxlen=max_records)
+        self._latency: dict[str, Histogram] = {}
+        self._request_charge: dict[str, Histogram] = {}
+
+    def record(self, record: OperationRecord) -> None:
+        self._records.append(record)
+        if record.operation not in self._latency:
+            self._latency[record.operation] = Histogram(LATENCY_BUCKETS_MS)
+            self._request_charge[record.operation] = Histogram(REQUEST_CHARGE_BUCKETS)
+        self._latency[record.operation].observe(record.duration_ms)
+        self._request_charge[record.operation].observe(record.request_charge)
+
+    def histograms(self) -> dict[str, OperationHistograms]:
+        return {
+            operation: OperationHistograms(
+                latency_ms=self._latency[operation].snapshot(),
+                request_charge=self._request_charge[operation].snapshot(),
+            )
+            for operation in sorted(self._latency)
+        }
+
+    def summary(self, now: Optional[float] = None) -> DataAccessSummary:
+        """
+        Summarises the requests made in the last window_seconds, the most
+        expensive operations by total request charge first.
+        """
+        cutoff = (now if now is not None else time.time()) - self.window_seconds
+        while self._records and self._records[0].timestamp < cutoff:
+            self._records.popleft()
+
+        by_operation: dict[str, list[OperationRecord]] = {}
+        for record in self._records:
+            by_operation.setdefault(record.operation, []).append(record)
+
+        operations = []
+        for operation, records in by_operation.items():
+            charges = sorted(r.request_charge for r in records)
+            durations = sorted(r.duration_ms for r in records)
+            total_charge = sum(charges)
+            operations.append(
+                OperationSummary(
+                    operation=operation,
+                    container=records[-1].container,
+                    count=len(records),
+                    failed=sum(r.failed for r in records),
+                    conflicts=sum(r.conflict for r in records),
+                    total_request_charge=round(total_charge, 2),
+                    mean_request_charge=round(total_charge / len(records), 2),
+                    p95_request_charge=_percentile(charges, 95),
+                    mean_item_count=round(
+                        sum(r.item_count for r in records) / len(records), 2
+                    ),
+                    p50_duration_ms=round(_percentile(durations, 50), 3),
+                    p95_duration_ms=round(_percentile(durations, 95), 3),
+                    max_duration_ms=round(durations[-1], 3),
+                )
+            )
+        operations.sort(key=lambda o: o.total_request_charge, reverse=True)
+        return DataAccessSummary(
+            window_seconds=self.window_seconds, operations=operations
+        )
+
+    def reset(self) -> None:
+        self._records.clear()
+        self._latency.clear()
+        self._request_charge.clear()
+
+
+data_access_metrics = DataAccessMetrics()
+
+
+def track_operation(name: str) -> Callable:
+    """
+    Decorates a data access coroutine, or async generator, so the requests it
+    makes are recorded under ``name``.
+    """
+
+    def decorator(method: Callable) -> Callable:
+        if inspect.isasyncgenfunction(method):
+            return _track_generator(name, method)
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            token = current_operation.set(name)
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                current_operation.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+def _track_generator(name: str, method: Callable) -> Callable:
+    # A generator runs a step at a time in whatever context its consumer reads
+    # it from, e.g. a StreamingResponse, so the operation is set around each
+    # step rather than once for the whole call
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        generator = method(*args, **kwargs)
+        try:
+            while True:
+                token = current_operation.set(name)
+                try:
+                    item = await anext(generator)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    current_operation.reset(token)
+                yield item
+        finally:
+            await generator.aclose()
+
+    return wrapper
+
+
+class RequestCharge:
+    """A response_hook that adds up the request charge of every response."""
+
+    def __init__(self, response_hook: Optional[Callable] = None):
+        self.total = 0.0
+        self._response_hook = response_hook
+
+    def add(self, headers: Any) -> None:
+        if headers:
+            self.total += float(headers.get(REQUEST_CHARGE_HEADER, 0) or 0)
+
+    def __call__(self, headers: Any, result: Any) -> None:
+        self.add(headers)
+        if self._response_hook is not None:
+            self._response_hook(headers, result)
+
+
+class InstrumentedContainer:
+    """
+    Wraps a ContainerProxy, recording every request made through it. Anything
+    not wrapped here is passed straight through to the proxy.
+    """
+
+    def __init__(self, container: Any, metrics: DataAccessMetrics):
+        self._container = container
+        self._metrics = metrics
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._container, name)
+
+    def _record(
+        self,
+        operation: str,
+        start: float,
+        request_charge: float,
+        item_count: int,
+        failed: bool = False,
+        conflict: bool = False,
+    ) -> None:
+        self._metrics.record(
+            OperationRecord(
+                timestamp=time.time(),
+                operation=operation,
+                container=self._container.id,
+                request_charge=request_charge,
+                item_count=item_count,
+                duration_ms=(time.perf_counter() - start) * 1000,
+                failed=failed,
+                conflict=conflict,
+            )
+        )
+
+    async def _call(self, call: str, *args, **kwargs) -> Any:
+        operation = current_operation.get() or call
+        charge = RequestCharge(kwargs.pop("response_hook", None))
+        start = time.perf_counter()
+        try:
+            result = await getattr(self._container, call)(
+                *args, response_hook=charge, **kwargs
+            )
+        except CosmosHttpResponseError as e:
+            charge.add(e.headers)
+            self._record(
+                operation,
+                start,
+                charge.total,
+                0,
+                failed=True,
+                conflict=isinstance(e, CosmosAccessConditionFailedError),
+            )
+            raise
+        if result is None:
+            item_count = 0
+        elif isinstance(result, list):
+            item_count = len(result)
+        else:
+            item_count = 1
+        self._record(operation, start, charge.total, item_count)
+        return result
+
+    async def read_item(self, *args, **kwargs) -> dict[str, Any]:
+        return await self._call("read_item", *args, **kwargs)
+
+    async def create_item(self, *args, **kwargs) -> dict[str, Any]:
+        return await self._call("create_item", *args, **kwargs)
+
+    async def upsert_item(self, *args, **kwargs) -> dict[str, Any]:
+        return await self._call("upsert_item", *args, **kwargs)
+
+    async def replace_item(self, *args, **kwargs) -> dict[str, Any]:
+        return await self._call("replace_item", *args, **kwargs)
+
+    async def patch_item(self, *args, **kwargs) -> dict[str, Any]:
+        return await self._call("patch_item", *args, **kwargs)
+
+    async def delete_item(self, *args, **kwargs) -> None:
+        return await self._call("delete_item", *args, **kwargs)
+
+    async def execute_item_batch(self, *args, **kwargs) -> list[dict[str, Any]]:
+        return await self._call("execute_item_batch", *args, **kwargs)
+
+    def query_items(self, *args, **kwargs) -> "InstrumentedQuery":
+        charge = RequestCharge(kwargs.pop("response_hook", None))
+        items = self._container.query_items(*args, response_hook=charge, **kwargs)
+        return InstrumentedQuery(self, items, charge)
+
+    def query_items_change_feed(self, *args, **kwargs) -> "InstrumentedQuery":
+        charge = RequestCharge(kwargs.pop("response_hook", None))
+        items = self._container.query_items_change_feed(
+            *args, response_hook=charge, **kwargs
+        )
+        return InstrumentedQuery(self, items, charge)
+
+
+class InstrumentedQuery:
+    """
+    Wraps the async iterable query_items, or query_items_change_feed,
+    returns. Reading it item by item records the whole query once it is
+    exhausted, reading it by page records each page.
+    """
+
+    def __init__(
+        self, container: InstrumentedContainer, items: Any, charge: RequestCharge
+    ):
+        self._container = container
+        self._items = items
+        self._charge = charge
+        # Pages are read lazily, possibly after the data access method that
+        # made the query has returned, so the operation is captured up front.
+        self._operation = current_operation.get() or "query_items"
+
+    def __aiter__(self) -> AsyncIterator[dict[str, Any]]:
+        return self._iterate(self._items, time.perf_counter(), self._charge.total)
+
+    def _record(
+        self, start: float, charge_before: float, item_count: int, failed: bool
+    ) -> None:
+        self._container._record(
+            self._operation,
+            start,
+            self._charge.total - charge_before,
+            item_count,
+            failed,
+        )
+
+    async def _iterate(
+        self, items: Any, start: float, charge_before: float
+    ) -> AsyncIterator[dict[str, Any]]:
+        item_count = 0
+        failed = False
+        try:
+            async for item in items:
+                item_count += 1
+                yield item
+        except CosmosHttpResponseError as e:
+            self._charge.add(e.headers)
+            failed = True
+            raise
+        finally:
+            self._record(start, charge_before, item_count, failed)
+
+    def by_page(self, continuation_token: Optional[str] = None) -> "InstrumentedPages":
+        return InstrumentedPages(self, self._items.by_page(continuation_token))
+
+
+class InstrumentedPages:
+    def __init__(self, query: InstrumentedQuery, pages: Any):
+        self._query = query
+        self._pages = pages
+
+    @property
+    def continuation_token(self) -> Optional[str]:
+        return self._pages.continuation_token
+
+    def __aiter__(self) -> "InstrumentedPages":
+        return self
+
+    async def __anext__(self) -> AsyncIterator[dict[str, Any]]:
+        start = time.perf_counter()
+        charge_before = self._query._charge.total
+        try:
+            page = await self._pages.__anext__()
+        except StopAsyncIteration:
+            # Finding out there is nothing left can cost a request too, like
+            # polling a change feed that is caught up
+            if self._query._charge.total > charge_before:
+                self._query._record(start, charge_before, 0, failed=False)
+            raise
+        except CosmosHttpResponseError as e:
+            self._query._charge.add(e.headers)
+            self._query._record(start, charge_before, 0, failed=True)
+            raise
+        return self._query._iterate(page, start, charge_before)
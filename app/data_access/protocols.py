@@ -0,0 +1,153 @@
+"""
+The interfaces the services depend on, one per kind of document, plus the
+storage backend that hands them out. Cosmos DB and SQLite both implement them.
+
+Backends keep Cosmos' error contract so the services don't need to know which
+one they are talking to: point reads, patches and deletes of missing
+documents raise CosmosResourceNotFoundError, creating a duplicate raises
+CosmosResourceExistsError and a write whose etag no longer matches raises
+CosmosAccessConditionFailedError.
+"""
+
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional, Protocol
+
+from app.models.exercises_models import ExerciseInDB
+from app.models.set_models import ExerciseSummary, SetInDB
+from app.models.user_models import UserInDB
+from app.models.workout_folder_models import WorkoutFolderInDB
+
+
+class UserStore(Protocol):
+    async def get_user_by_id(self, user_id: str) -> UserInDB: ...
+
+    async def get_user_by_email(self, email: str) -> Optional[UserInDB]: ...
+
+    async def create_user(self, user: UserInDB) -> UserInDB: ...
+
+    async def get_user_and_etag(self, user_id: str) -> tuple[UserInDB, str]: ...
+
+    async def update_user(self, user: UserInDB) -> UserInDB: ...
+
+    async def patch_preferences(
+        self, user_id: str, preferences: dict[str, Any], etag: Optional[str] = None
+    ) -> UserInDB: ...
+
+    async def delete_user(self, user_id: str) -> None: ...
+
+
+class SetStore(Protocol):
+    async def get_set_by_id(self, set_id: str, user_id: str) -> Optional[SetInDB]: ...
+
+    async def find_set_by_id(self, set_id: str) -> Optional[SetInDB]: ...
+
+    async def get_users_sets_by_exercise_id(
+        self,
+        exercise_id: str,
+        user_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> list[SetInDB]: ...
+
+    def stream_users_sets(
+        self, exercise_id: str, user_id: str
+    ) -> AsyncIterator[SetInDB]: ...
+
+    async def get_users_sets_page(
+        self,
+        exercise_id: str,
+        user_id: str,
+        page_size: int,
+        continuation_token: Optional[str] = None,
+        before_ms: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> tuple[list[SetInDB], Optional[str]]: ...
+
+    async def create_set(self, set_to_create: SetInDB) -> SetInDB: ...
+
+    async def create_sets(self, sets_to_create: list[SetInDB]) -> list[int]: ...
+
+    async def delete_set(self, set_id: str, user_id: str, exercise_id: str) -> None: ...
+
+
+class SetAggregateStore(Protocol):
+    async def get_summary(
+        self, user_id: str, exercise_id: str
+    ) -> Optional[ExerciseSummary]: ...
+
+    async def refresh(self, user_id: str, exercise_id: str) -> None:
+        """
+        Brings the summary up to date after sets were deleted.
+        """
+        ...
+
+
+class ExerciseStore(Protocol):
+    async def get_exercises_by_creator(self, creator: str) -> list[ExerciseInDB]: ...
+
+    async def get_system_and_user_exercises(
+        self, user_id: str
+    ) -> list[ExerciseInDB]: ...
+
+    async def create_custom_exercise(self, exercise: ExerciseInDB) -> ExerciseInDB: ...
+
+    async def get_exercise_by_name(
+        self, name: str, user_id: str
+    ) -> Optional[ExerciseInDB]: ...
+
+    async def get_exercise_by_id(
+        self, exercise_id: str, user_id: str
+    ) -> ExerciseInDB: ...
+
+
+class WorkoutFolderStore(Protocol):
+    async def get_folder_by_id(
+        self, folder_id: str, user_id: str
+    ) -> WorkoutFolderInDB: ...
+
+    async def find_folder_by_id(
+        self, folder_id: str
+    ) -> Optional[WorkoutFolderInDB]: ...
+
+    async def get_users_workout_folders(
+        self, user_id: str
+    ) -> list[WorkoutFolderInDB]: ...
+
+    async def create_workout_folder(
+        self, workout_folder: WorkoutFolderInDB
+    ) -> WorkoutFolderInDB: ...
+
+    async def get_folder_and_etag(
+        self, folder_id: str, user_id: str
+    ) -> tuple[WorkoutFolderInDB, str]: ...
+
+    async def update_workout_folder(
+        self, workout_folder: WorkoutFolderInDB
+    ) -> WorkoutFolderInDB: ...
+
+    async def patch_workout_folder(
+        self,
+        folder_id: str,
+        user_id: str,
+        changes: dict[str, Any],
+        etag: Optional[str] = None,
+    ) -> WorkoutFolderInDB: ...
+
+    async def delete_workout_folder(self, folder_id: str, user_id: str) -> None: ...
+
+
+class StorageBackend(Protocol):
+    def user_data_access(self) -> UserStore: ...
+
+    def set_data_access(self) -> SetStore: ...
+
+    def set_aggregate_data_access(self) -> SetAggregateStore: ...
+
+    def exercise_data_access(self) -> ExerciseStore: ...
+
+    def workout_folder_data_access(self) -> WorkoutFolderStore: ...
+
+    async def close(self) -> None:
+        """Releases the connections held by the backend."""
+        ...
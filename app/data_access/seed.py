@@ -0,0 +1,57 @@
+"""
+Dummy data the setup scripts load into a fresh database. When I set it up I
+scraped exercises from the web but this is more than enough to let you see the
+functionality of the app.
+"""
+
+from app.data_access.containers import SYSTEM_CREATOR
+
+SEED_USER = {
+    "email": "doestnotmatter@email.com",
+    "provider": "apple",
+    "id": "f4ed09fc-ee99-43e0-8b19-123424f988ac",
+    "preferences": {"theme": "system"},
+}
+
+SEED_EXERCISES = [
+    {
+        "name": "Bench Press",
+        "body_parts": ["Chest", "Triceps", "Shoulders"],
+        "creator": SYSTEM_CREATOR,
+    },
+    {
+        "name": "Squat",
+        "body_parts": ["Quads", "Glutes", "Hamstrings"],
+        "creator": SYSTEM_CREATOR,
+    },
+    {
+        "name": "Deadlift",
+        "body_parts": ["Back", "Glutes", "Hamstrings"],
+        "creator": SYSTEM_CREATOR,
+    },
+    {
+        "name": "Overhead Press",
+        "body_parts": ["Shoulders", "Triceps"],
+        "creator": SYSTEM_CREATOR,
+    },
+    {
+        "name": "Pull Up",
+        "body_parts": ["Back", "Biceps"],
+        "creator": SYSTEM_CREATOR,
+    },
+    {
+        "name": "Dumbbell Curl",
+        "body_parts": ["Biceps", "Forearms"],
+        "creator": SYSTEM_CREATOR,
+    },
+    {
+        "name": "Tricep Extension",
+        "body_parts": ["Triceps"],
+        "creator": SYSTEM_CREATOR,
+    },
+    {
+        "name": "Leg Press",
+        "body_parts": ["Quads", "Glutes", "Hamstrings"],
+        "creator": SYSTEM_CREATOR,
+    },
+]
@@ -1,31 +1,244 @@
+import asyncio
+from datetime import datetime
+from itertools import groupby
+from typing import AsyncIterator, Optional
+
+from azure.cosmos.exceptions import CosmosBatchOperationError, CosmosHttpResponseError
+
 from app.data_access.base import BaseDataAccess
+from app.data_access.containers import EXERCISE_SETS
+from app.data_access.hydration import hydrate, hydrate_many
 from app.models.set_models import SetInDB
+from app.utils.date_utils import iso_to_epoch_ms, to_epoch_ms
+
+# Stored next to date_created, milliseconds since the epoch. Range filters and
+# ORDER BY on a number use the range index, the ISO strings in date_created can
+# carry different offsets and don't compare reliably.
+CREATED_AT_MS = "created_at_ms"
+# The most operations Cosmos takes in one transactional batch
+MAX_BATCH_OPERATIONS = 100
+# Sets read per request when streaming a history, the most held at once
+STREAM_PAGE_SIZE = 500
+
+
+def set_document(set_: SetInDB) -> dict:
+    """
+    :return: The document stored for a set, the set plus its created_at_ms
+    """
+    document = set_.model_dump()
+    created_at_ms = iso_to_epoch_ms(set_.date_created)
+    # Without a parsable date_created the set can't be found by date range
+    if created_at_ms is not None:
+        document[CREATED_AT_MS] = created_at_ms
+    return document
 
 
 class SetDataAccess(BaseDataAccess):
     def __init__(self) -> None:
-        super().__init__(container_name="exercise-sets")
+        super().__init__(container_name=EXERCISE_SETS)
 
-    def get_set_by_id(self, set_id) -> SetInDB:
-        item = self.container.read_item(set_id, partition_key=set_id)
-        return SetInDB(**item)
+    async def get_set_by_id(self, set_id: str, user_id: str) -> Optional[SetInDB]:
+        # Only the user prefix of the hierarchical key is known here, so query
+        # the user's sub-partitions rather than fanning out to the container.
+        query = "SELECT * FROM sets s WHERE s.id = @id"
+        params = [dict(name="@id", value=set_id)]
+        items = [
+            item
+            async for item in self.container.query_items(
+                query=query, parameters=params, partition_key=[user_id]  # type: ignore
+            )
+        ]
+        if not items:
+            return None
+        return hydrate(SetInDB, items[0])
 
-    def get_users_sets_by_exercise_id(
-        self, exercise_id: str, user_id: str
+    async def find_set_by_id(self, set_id: str) -> Optional[SetInDB]:
+        """
+        Cross-partition lookup of a set regardless of its owner. Only meant for
+        the rare path of telling a missing set apart from another user's set.
+        """
+        query = "SELECT * FROM sets s WHERE s.id = @id"
+        params = [dict(name="@id", value=set_id)]
+        items = [
+            item
+            async for item in self.container.query_items(
+                query=query, parameters=params  # type: ignore
+            )
+        ]
+        if not items:
+            return None
+        return hydrate(SetInDB, items[0])
+
+    async def get_users_sets_by_exercise_id(
+        self,
+        exercise_id: str,
+        user_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
     ) -> list[SetInDB]:
+        """
+        :param since: Only sets created at or after this time
+        :param until: Only sets created before this time
+        """
         query = "SELECT * FROM sets s WHERE s.exercise_id = @exercise_id AND s.user_id = @user_id"
         params = [
             dict(name="@exercise_id", value=exercise_id),
             dict(name="@user_id", value=user_id),
         ]
+        query, params = self._date_range(query, params, since, until)
         sets = self.container.query_items(
-            query=query, parameters=params, enable_cross_partition_query=True  # type: ignore
+            query=query, parameters=params, partition_key=[user_id, exercise_id]  # type: ignore
+        )
+        return hydrate_many(SetInDB, [s async for s in sets])
+
+    async def stream_users_sets(
+        self, exercise_id: str, user_id: str
+    ) -> AsyncIterator[SetInDB]:
+        """
+        Yields the user's sets for an exercise, newest first, reading the next
+        page only once the last one has been consumed.
+        """
+        query = "SELECT * FROM sets s WHERE s.exercise_id = @exercise_id AND s.user_id = @user_id ORDER BY s.created_at_ms DESC"
+        params = [
+            dict(name="@exercise_id", value=exercise_id),
+            dict(name="@user_id", value=user_id),
+        ]
+        pages = self.container.query_items(
+            query=query,
+            parameters=params,  # type: ignore
+            partition_key=[user_id, exercise_id],
+            max_item_count=STREAM_PAGE_SIZE,
+        ).by_page()
+        # Read by page so each request is recorded as it is made, rather than
+        # once the whole history has been streamed
+        async for page in pages:
+            async for document in page:
+                yield hydrate(SetInDB, document)
+
+    async def get_set_documents(self, exercise_id: str, user_id: str) -> list[dict]:
+        """
+        The user's sets for an exercise as stored, system properties included,
+        for rebuilding the exercise's aggregate.
+        """
+        query = "SELECT * FROM sets s WHERE s.exercise_id = @exercise_id AND s.user_id = @user_id"
+        params = [
+            dict(name="@exercise_id", value=exercise_id),
+            dict(name="@user_id", value=user_id),
+        ]
+        documents = self.container.query_items(
+            query=query, parameters=params, partition_key=[user_id, exercise_id]  # type: ignore
         )
-        return [SetInDB(**s) for s in sets]
+        return [d async for d in documents]
+
+    async def get_users_sets_page(
+        self,
+        exercise_id: str,
+        user_id: str,
+        page_size: int,
+        continuation_token: Optional[str] = None,
+        before_ms: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> tuple[list[SetInDB], Optional[str]]:
+        """
+        Reads one page of the user's sets for an exercise, newest first by
+        created_at_ms.
+
+        :param page_size: The most sets to return
+        :param continuation_token: The token returned with the previous page
+        :param before_ms: Only sets created before this many milliseconds since
+            the epoch, the query must be repeated with the same value to
+            continue from a token
+        :param since: Only sets created at or after this time
+        :param until: Only sets created before this time
+        :return: The page of sets and the token for the next page, None once
+            the history has been read
+        """
+        query = "SELECT * FROM sets s WHERE s.exercise_id = @exercise_id AND s.user_id = @user_id"
+        params = [
+            dict(name="@exercise_id", value=exercise_id),
+            dict(name="@user_id", value=user_id),
+        ]
+        if before_ms is not None:
+            query += f" AND s.{CREATED_AT_MS} < @before"
+            params.append(dict(name="@before", value=before_ms))
+        query, params = self._date_range(query, params, since, until)
+        query += f" ORDER BY s.{CREATED_AT_MS} DESC"
+        pages = self.container.query_items(
+            query=query,
+            parameters=params,  # type: ignore
+            partition_key=[user_id, exercise_id],
+            max_item_count=page_size,
+        ).by_page(continuation_token)
+        page = await anext(pages, None)
+        if page is None:
+            return [], None
+        return hydrate_many(SetInDB, [s async for s in page]), pages.continuation_token
+
+    @staticmethod
+    def _date_range(
+        query: str,
+        params: list[dict],
+        since: Optional[datetime],
+        until: Optional[datetime],
+    ) -> tuple[str, list[dict]]:
+        """
+        :return: The query and its parameters, only matching sets created in
+            the range
+        """
+        if since is not None:
+            query += f" AND s.{CREATED_AT_MS} >= @since"
+            params.append(dict(name="@since", value=to_epoch_ms(since)))
+        if until is not None:
+            query += f" AND s.{CREATED_AT_MS} < @until"
+            params.append(dict(name="@until", value=to_epoch_ms(until)))
+        return query, params
+
+    async def create_set(self, set_to_create: SetInDB) -> SetInDB:
+        # The set is exactly what was validated, no need to build it again from
+        # the response
+        await self.container.create_item(body=set_document(set_to_create))
+        return set_to_create
+
+    async def create_sets(self, sets_to_create: list[SetInDB]) -> list[int]:
+        """
+        Creates the sets with transactional batches, one per logical partition
+        (user and exercise) and MAX_BATCH_OPERATIONS sets, run concurrently. A
+        batch is all or nothing, when one of its sets fails the others in it
+        fail with 424.
+
+        :return: The status of each set in the order given, 201 once created
+        """
+        statuses = [0] * len(sets_to_create)
+
+        def partition(i: int) -> tuple[str, str]:
+            return sets_to_create[i].user_id, sets_to_create[i].exercise_id
+
+        batches = []
+        for _, group in groupby(
+            sorted(range(len(sets_to_create)), key=partition), partition
+        ):
+            indexes = list(group)
+            for start in range(0, len(indexes), MAX_BATCH_OPERATIONS):
+                batches.append(indexes[start : start + MAX_BATCH_OPERATIONS])
+
+        async def run(batch: list[int]) -> None:
+            first = sets_to_create[batch[0]]
+            try:
+                await self.container.execute_item_batch(
+                    [("create", (set_document(sets_to_create[i]),)) for i in batch],
+                    partition_key=[first.user_id, first.exercise_id],
+                )
+                results = [201] * len(batch)
+            except CosmosBatchOperationError as e:
+                results = [r.get("statusCode", 424) for r in e.operation_responses]
+            except CosmosHttpResponseError as e:
+                results = [e.status_code or 500] * len(batch)
+            for i, status in zip(batch, results):
+                statuses[i] = status
 
-    def create_set(self, set_to_create: SetInDB) -> SetInDB:
-        created_set = self.container.create_item(body=set_to_create.model_dump())
-        return SetInDB(**created_set)
+        await asyncio.gather(*(run(batch) for batch in batches))
+        return statuses
 
-    def delete_set(self, set_id: str) -> None:
-        self.container.delete_item(set_id, partition_key=set_id)
+    async def delete_set(self, set_id: str, user_id: str, exercise_id: str) -> None:
+        await self.container.delete_item(set_id, partition_key=[user_id, exercise_id])
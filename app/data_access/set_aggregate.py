@@ -0,0 +1,217 @@
+"""
+A summary of each user's sets for every exercise, one document per exercise in
+the user's partition, so GET /sets/{exercise_id}/summary is a point read
+however long the history is.
+
+The summaries are kept by a change feed processor over the sets container
+(set_aggregates_processor). Each one records the _lsn of the newest set folded
+into it. The feed returns one logical partition's changes in _lsn order, and a
+user's sets for an exercise all live in one, so any change at or below that
+_lsn has been counted already. That is what makes replaying pages after a lost
+checkpoint harmless.
+
+Sets are never edited, so every change in the feed is a new set. Deletes don't
+appear in the feed at all, deleting a set rebuilds the summary instead. Query
+results carry no _lsn, so a rebuild can't tell which sets the feed has
+delivered by it. It goes by _ts instead: writes to a logical partition get
+their _lsn and _ts in the same order, so every set older than the newest
+change folded in has been delivered. The sets it counts that are as new or
+newer are kept in pending_set_ids, and the processor skips them as they come.
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import Awaitable, Callable, Optional
+
+from azure.core import MatchConditions
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+from app.data_access.base import BaseDataAccess
+from app.data_access.change_feed import ChangeFeedProcessor
+from app.data_access.containers import EXERCISE_SETS, SET_AGGREGATES
+from app.data_access.hydration import hydrate
+from app.data_access.set import SetDataAccess
+from app.models.set_models import ExerciseSummary, SetAggregateInDB
+from app.utils.set_utils import add_set_to_summary
+
+PROCESSOR_NAME = "set-aggregates"
+# Only the processor and a rebuild after a delete write a summary, so losing
+# the race more than a few times in a row means something is wrong
+MAX_WRITE_ATTEMPTS = 5
+
+
+def _fold(
+    aggregate: SetAggregateInDB, changes: list[dict]
+) -> Optional[SetAggregateInDB]:
+    """
+    Adds the sets from the change feed newer than the aggregate's last_lsn to
+    it, other than those a rebuild has counted already.
+
+    :return: The aggregate, None if there was nothing to add
+    """
+    new = [c for c in changes if c["_lsn"] > aggregate.last_lsn]
+    if not new:
+        return None
+    for change in new:
+        if aggregate.pending_set_ids.pop(change["id"], None) is not None:
+            continue
+        add_set_to_summary(
+            aggregate, change["weight"], change["reps"], change["date_created"]
+        )
+    aggregate.last_lsn = max(c["_lsn"] for c in new)
+    aggregate.last_ts = max(aggregate.last_ts, *(c["_ts"] for c in new))
+    # Any older than the newest change had been delivered before the rebuild,
+    # or were deleted since
+    aggregate.pending_set_ids = {
+        set_id: ts
+        for set_id, ts in aggregate.pending_set_ids.items()
+        if ts >= aggregate.last_ts
+    }
+    return aggregate
+
+
+class SetAggregateDataAccess(BaseDataAccess):
+    def __init__(self, set_data_access: Optional[SetDataAccess] = None) -> None:
+        super().__init__(container_name=SET_AGGREGATES)
+        self.set_data_access = set_data_access or SetDataAccess()
+
+    async def get_summary(
+        self, user_id: str, exercise_id: str
+    ) -> Optional[ExerciseSummary]:
+        """
+        One point read. Sets logged since the processor last ran aren't in it.
+
+        :return: The summary, None if the user has no sets for the exercise
+        """
+        try:
+            document = await self.container.read_item(
+                item=exercise_id, partition_key=user_id
+            )
+        except CosmosResourceNotFoundError:
+            return None
+        if not document["set_count"]:
+            return None
+        return hydrate(ExerciseSummary, document)
+
+    async def apply_changes(self, changes: list[dict]) -> None:
+        """
+        Handles a page of the sets container's change feed, folding each set
+        into its exercise's summary. Sets already folded in are skipped, so a
+        page can be applied more than once.
+        """
+        by_exercise: dict[tuple[str, str], list[dict]] = defaultdict(list)
+        for change in changes:
+            by_exercise[(change["user_id"], change["exercise_id"])].append(change)
+        await asyncio.gather(
+            *(
+                self._update(user_id, exercise_id, self._folder(documents))
+                for (user_id, exercise_id), documents in by_exercise.items()
+            )
+        )
+
+    @staticmethod
+    def _folder(
+        changes: list[dict],
+    ) -> Callable[[SetAggregateInDB], Awaitable[Optional[SetAggregateInDB]]]:
+        async def fold(aggregate: SetAggregateInDB) -> Optional[SetAggregateInDB]:
+            return _fold(aggregate, changes)
+
+        return fold
+
+    async def refresh(self, user_id: str, exercise_id: str) -> None:
+        """
+        Rebuilds the summary from the user's sets for the exercise, one query
+        of their partition. Called after sets are deleted, which the change
+        feed doesn't report.
+        """
+
+        async def rebuild(aggregate: SetAggregateInDB) -> SetAggregateInDB:
+            # Queried after the summary is read, so a set the processor folds
+            # in before the write is in the results, or the write fails
+            documents = await self.set_data_access.get_set_documents(
+                exercise_id, user_id
+            )
+            rebuilt = SetAggregateInDB(
+                id=exercise_id,
+                user_id=user_id,
+                exercise_id=exercise_id,
+                last_lsn=aggregate.last_lsn,
+                last_ts=aggregate.last_ts,
+            )
+            for document in documents:
+                add_set_to_summary(
+                    rebuilt,
+                    document["weight"],
+                    document["reps"],
+                    document["date_created"],
+                )
+            rebuilt.pending_set_ids = {
+                document["id"]: document["_ts"]
+                for document in documents
+                if document["_ts"] >= aggregate.last_ts
+            }
+            return rebuilt
+
+        await self._update(user_id, exercise_id, rebuild)
+
+    async def _update(
+        self,
+        user_id: str,
+        exercise_id: str,
+        update: Callable[[SetAggregateInDB], Awaitable[Optional[SetAggregateInDB]]],
+    ) -> None:
+        """
+        Reads the summary and writes back what update returns for it, unless
+        that is None, conditional on nothing having written it since. When
+        something has, update is applied again to the newer version.
+        """
+        for _ in range(MAX_WRITE_ATTEMPTS):
+            try:
+                document = await self.container.read_item(
+                    item=exercise_id, partition_key=user_id
+                )
+                aggregate = hydrate(SetAggregateInDB, document)
+                etag = document["_etag"]
+            except CosmosResourceNotFoundError:
+                aggregate = SetAggregateInDB(
+                    id=exercise_id, user_id=user_id, exercise_id=exercise_id
+                )
+                etag = None
+            updated = await update(aggregate)
+            if updated is None:
+                return
+            try:
+                if etag is None:
+                    await self.container.create_item(body=updated.model_dump())
+                else:
+                    await self.container.replace_item(
+                        item=exercise_id,
+                        body=updated.model_dump(),
+                        etag=etag,
+                        match_condition=MatchConditions.IfNotModified,
+                    )
+                return
+            except (CosmosAccessConditionFailedError, CosmosResourceExistsError):
+                continue
+        raise CosmosAccessConditionFailedError(
+            status_code=412,
+            message=f"Summary of {exercise_id} kept changing while being updated",
+        )
+
+
+def set_aggregates_processor(
+    aggregates: Optional[SetAggregateDataAccess] = None,
+    owner: Optional[str] = None,
+) -> ChangeFeedProcessor:
+    """
+    :return: The processor that keeps the summaries, run its run_once on a
+        schedule
+    """
+    aggregates = aggregates or SetAggregateDataAccess()
+    return ChangeFeedProcessor(
+        PROCESSOR_NAME, EXERCISE_SETS, aggregates.apply_changes, owner=owner
+    )
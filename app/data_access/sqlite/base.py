@@ -0,0 +1,192 @@
+import json
+import os
+import sqlite3
+import uuid
+from typing import Any, Optional
+
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosResourceNotFoundError,
+)
+
+from app.utils.date_utils import iso_to_epoch_ms
+
+DEFAULT_SQLITE_PATH = "set_tracker.db"
+
+# Documents are stored whole as JSON, the columns next to them are copies of
+# the fields the queries filter and sort on, so every lookup is an index seek.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users (email);
+
+CREATE TABLE IF NOT EXISTS exercises (
+    id TEXT PRIMARY KEY,
+    creator TEXT NOT NULL,
+    name TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS exercises_creator_name ON exercises (creator, name);
+
+CREATE TABLE IF NOT EXISTS exercise_sets (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    exercise_id TEXT NOT NULL,
+    date_created TEXT NOT NULL,
+    created_at_ms INTEGER,
+    doc TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS workout_folders (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS workout_folders_user ON workout_folders (user_id);
+"""
+
+# Created once exercise_sets is sure to have created_at_ms, databases made
+# before it was added get it from _add_created_at_ms first
+SET_INDEXES = """
+DROP INDEX IF EXISTS exercise_sets_user_exercise_date;
+CREATE INDEX IF NOT EXISTS exercise_sets_user_exercise_created
+    ON exercise_sets (user_id, exercise_id, created_at_ms, id);
+"""
+
+
+def _add_created_at_ms(connection: sqlite3.Connection) -> None:
+    """
+    Adds the created_at_ms column to an exercise_sets table made before it
+    existed, and fills it in from date_created.
+    """
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(exercise_sets)")}
+    if "created_at_ms" in columns:
+        return
+    connection.execute("ALTER TABLE exercise_sets ADD COLUMN created_at_ms INTEGER")
+    rows = connection.execute("SELECT id, date_created FROM exercise_sets").fetchall()
+    connection.executemany(
+        "UPDATE exercise_sets SET created_at_ms = ? WHERE id = ?",
+        [(iso_to_epoch_ms(date_created), set_id) for set_id, date_created in rows],
+    )
+
+
+class SQLiteConnectionSingleton:
+    """
+    Holds the one connection shared by every SQLite data access object. The
+    database file comes from SQLITE_PATH and the schema is created on connect.
+    """
+
+    _instance = None
+    connection: sqlite3.Connection
+
+    def __new__(cls):
+        if cls._instance is None:
+            path = os.environ.get("SQLITE_PATH", DEFAULT_SQLITE_PATH)
+            connection = sqlite3.connect(
+                path, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            _add_created_at_ms(connection)
+            connection.executescript(SET_INDEXES)
+            cls._instance = super().__new__(cls)
+            cls._instance.connection = connection
+        return cls._instance
+
+    @classmethod
+    def close(cls) -> None:
+        if cls._instance is not None:
+            instance, cls._instance = cls._instance, None
+            instance.connection.close()
+
+
+class SQLiteDataAccess:
+    """
+    Base for the SQLite data access objects. Their methods are coroutines to
+    match the Cosmos ones, but run the statement inline: an indexed lookup in
+    an embedded database is far cheaper than handing it to a thread.
+    """
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        return SQLiteConnectionSingleton().connection
+
+    @staticmethod
+    def _versioned(document: dict) -> str:
+        """
+        :return: The document as JSON with a new _etag, as every write in
+            Cosmos gives it one
+        """
+        return json.dumps({**document, "_etag": str(uuid.uuid4())})
+
+    def _write_conditionally(
+        self,
+        table: str,
+        key: dict[str, str],
+        set_doc: str,
+        params: list[Any],
+        etag: Optional[str],
+    ) -> dict:
+        """
+        Runs UPDATE table SET doc = set_doc on the document with key, only if
+        its _etag is still etag when one is given.
+
+        :return: The document as written
+        :raises CosmosResourceNotFoundError: If there is no such document
+        :raises CosmosAccessConditionFailedError: If the document changed since etag
+        """
+        key_clause = " AND ".join(f"{column} = ?" for column in key)
+        where = key_clause
+        params = [*params, *key.values()]
+        if etag is not None:
+            where += " AND json_extract(doc, '$._etag') IS ?"
+            params.append(etag)
+        row = self.connection.execute(
+            f"UPDATE {table} SET doc = {set_doc} WHERE {where} RETURNING doc", params
+        ).fetchone()
+        if row is not None:
+            return json.loads(row[0])
+        if (
+            etag is not None
+            and self.connection.execute(
+                f"SELECT 1 FROM {table} WHERE {key_clause}", tuple(key.values())
+            ).fetchone()
+        ):
+            raise CosmosAccessConditionFailedError(
+                status_code=412, message=f"{table} document changed since {etag}"
+            )
+        raise CosmosResourceNotFoundError(
+            status_code=404, message=f"{table} document {key} not found"
+        )
+
+    def _patch(
+        self,
+        table: str,
+        key: dict[str, str],
+        changes: dict[str, Any],
+        etag: Optional[str] = None,
+    ) -> dict:
+        """
+        Sets values inside a stored document with json_set, in one UPDATE,
+        like a Cosmos patch.
+
+        :param changes: The values to set, keyed by their path e.g. /name
+        :param etag: Only patch the document if it is still this version of it
+        """
+        paths = ", ".join("?, json(?)" for _ in changes)
+        params: list[Any] = [
+            param
+            for path, value in changes.items()
+            for param in ("$" + path.replace("/", "."), json.dumps(value))
+        ]
+        return self._write_conditionally(
+            table,
+            key,
+            f"json_set(doc, {paths}, '$._etag', ?)",
+            [*params, str(uuid.uuid4())],
+            etag,
+        )
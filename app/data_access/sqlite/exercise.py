@@ -0,0 +1,67 @@
+import json
+import sqlite3
+from typing import Optional
+
+from azure.cosmos.exceptions import (
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+from app.data_access.containers import SYSTEM_CREATOR
+from app.data_access.hydration import hydrate, hydrate_many
+from app.data_access.sqlite.base import SQLiteDataAccess
+from app.models.exercises_models import ExerciseInDB
+
+
+class SQLiteExerciseDataAccess(SQLiteDataAccess):
+    async def get_exercises_by_creator(self, creator: str) -> list[ExerciseInDB]:
+        rows = self.connection.execute(
+            "SELECT doc FROM exercises WHERE creator = ?", (creator,)
+        )
+        return hydrate_many(ExerciseInDB, (json.loads(doc) for (doc,) in rows))
+
+    async def get_system_and_user_exercises(self, user_id: str) -> list[ExerciseInDB]:
+        rows = self.connection.execute(
+            "SELECT doc FROM exercises WHERE creator IN (?, ?)",
+            (SYSTEM_CREATOR, user_id),
+        )
+        return hydrate_many(ExerciseInDB, (json.loads(doc) for (doc,) in rows))
+
+    async def create_custom_exercise(self, exercise: ExerciseInDB) -> ExerciseInDB:
+        try:
+            self.connection.execute(
+                "INSERT INTO exercises (id, creator, name, doc) VALUES (?, ?, ?, ?)",
+                (
+                    exercise.id,
+                    exercise.creator,
+                    exercise.name,
+                    json.dumps(exercise.model_dump()),
+                ),
+            )
+        except sqlite3.IntegrityError:
+            raise CosmosResourceExistsError(
+                status_code=409, message=f"Exercise {exercise.id} already exists"
+            )
+        return exercise
+
+    async def get_exercise_by_name(
+        self, name: str, user_id: str
+    ) -> Optional[ExerciseInDB]:
+        row = self.connection.execute(
+            "SELECT doc FROM exercises WHERE creator IN (?, ?) AND name = ?",
+            (SYSTEM_CREATOR, user_id, name),
+        ).fetchone()
+        if row is None:
+            return None
+        return hydrate(ExerciseInDB, json.loads(row[0]))
+
+    async def get_exercise_by_id(self, exercise_id: str, user_id: str) -> ExerciseInDB:
+        row = self.connection.execute(
+            "SELECT doc FROM exercises WHERE id = ? AND creator IN (?, ?)",
+            (exercise_id, SYSTEM_CREATOR, user_id),
+        ).fetchone()
+        if row is None:
+            raise CosmosResourceNotFoundError(
+                status_code=404, message=f"Exercise {exercise_id} not found"
+            )
+        return hydrate(ExerciseInDB, json.loads(row[0]))
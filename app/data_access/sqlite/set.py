@@ -0,0 +1,199 @@
+import json
+import sqlite3
+from datetime import datetime
+from itertools import groupby
+from typing import AsyncIterator, Optional
+
+from azure.cosmos.exceptions import (
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+from app.data_access.hydration import hydrate, hydrate_many
+from app.data_access.sqlite.base import SQLiteDataAccess
+from app.models.set_models import SetInDB
+from app.utils.date_utils import is_epoch_ms, iso_to_epoch_ms, to_epoch_ms
+
+# Sets read per query when streaming a history
+STREAM_PAGE_SIZE = 500
+
+
+class SQLiteSetDataAccess(SQLiteDataAccess):
+    async def get_set_by_id(self, set_id: str, user_id: str) -> Optional[SetInDB]:
+        row = self.connection.execute(
+            "SELECT doc FROM exercise_sets WHERE id = ? AND user_id = ?",
+            (set_id, user_id),
+        ).fetchone()
+        if row is None:
+            return None
+        return hydrate(SetInDB, json.loads(row[0]))
+
+    async def find_set_by_id(self, set_id: str) -> Optional[SetInDB]:
+        row = self.connection.execute(
+            "SELECT doc FROM exercise_sets WHERE id = ?", (set_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return hydrate(SetInDB, json.loads(row[0]))
+
+    async def get_users_sets_by_exercise_id(
+        self,
+        exercise_id: str,
+        user_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> list[SetInDB]:
+        query = "SELECT doc FROM exercise_sets WHERE user_id = ? AND exercise_id = ?"
+        params: list = [user_id, exercise_id]
+        query, params = self._date_range(query, params, since, until)
+        rows = self.connection.execute(query, params)
+        return hydrate_many(SetInDB, (json.loads(doc) for (doc,) in rows))
+
+    async def stream_users_sets(
+        self, exercise_id: str, user_id: str
+    ) -> AsyncIterator[SetInDB]:
+        # A page per query rather than one cursor held open across yields, the
+        # connection is shared and may be written to while the stream is read
+        continuation_token = None
+        while True:
+            sets, continuation_token = await self.get_users_sets_page(
+                exercise_id, user_id, STREAM_PAGE_SIZE, continuation_token
+            )
+            for set_ in sets:
+                yield set_
+            if continuation_token is None:
+                return
+
+    async def get_users_sets_page(
+        self,
+        exercise_id: str,
+        user_id: str,
+        page_size: int,
+        continuation_token: Optional[str] = None,
+        before_ms: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> tuple[list[SetInDB], Optional[str]]:
+        # Keyset pagination: the token is the (created_at_ms, id) of the last
+        # set returned, so each page is an index seek however deep into the
+        # history.
+        query = "SELECT doc, created_at_ms, id FROM exercise_sets WHERE user_id = ? AND exercise_id = ?"
+        params: list = [user_id, exercise_id]
+        if before_ms is not None:
+            query += " AND created_at_ms < ?"
+            params.append(before_ms)
+        query, params = self._date_range(query, params, since, until)
+        if continuation_token is not None:
+            query += " AND (created_at_ms, id) < (?, ?)"
+            params.extend(self._keyset(continuation_token))
+        query += " ORDER BY created_at_ms DESC, id DESC LIMIT ?"
+        params.append(page_size + 1)
+        rows = self.connection.execute(query, params).fetchall()
+        sets = hydrate_many(
+            SetInDB, (json.loads(doc) for doc, _, _ in rows[:page_size])
+        )
+        if len(rows) <= page_size:
+            return sets, None
+        _, created_at_ms, set_id = rows[page_size - 1]
+        return sets, json.dumps([created_at_ms, set_id])
+
+    @staticmethod
+    def _keyset(continuation_token: str) -> list:
+        """
+        :return: The (created_at_ms, id) of the last set of the previous page
+        :raises CosmosHttpResponseError: A 400 if the token isn't one
+            get_users_sets_page returns, as Cosmos answers a malformed token
+        """
+        try:
+            keyset = json.loads(continuation_token)
+        except ValueError:
+            keyset = None
+        if (
+            isinstance(keyset, list)
+            and len(keyset) == 2
+            # Sets with a date_created that can't be parsed have no created_at_ms
+            and (keyset[0] is None or is_epoch_ms(keyset[0]))
+            and isinstance(keyset[1], str)
+        ):
+            return keyset
+        raise CosmosHttpResponseError(
+            status_code=400, message="Invalid continuation token"
+        )
+
+    @staticmethod
+    def _date_range(
+        query: str,
+        params: list,
+        since: Optional[datetime],
+        until: Optional[datetime],
+    ) -> tuple[str, list]:
+        # On created_at_ms, like the Cosmos query, so the range is a seek on
+        # the same index as the rest of the query
+        if since is not None:
+            query += " AND created_at_ms >= ?"
+            params.append(to_epoch_ms(since))
+        if until is not None:
+            query += " AND created_at_ms < ?"
+            params.append(to_epoch_ms(until))
+        return query, params
+
+    def _insert(self, set_to_create: SetInDB) -> None:
+        self.connection.execute(
+            "INSERT INTO exercise_sets "
+            "(id, user_id, exercise_id, date_created, created_at_ms, doc) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                set_to_create.id,
+                set_to_create.user_id,
+                set_to_create.exercise_id,
+                set_to_create.date_created,
+                iso_to_epoch_ms(set_to_create.date_created),
+                json.dumps(set_to_create.model_dump()),
+            ),
+        )
+
+    async def create_set(self, set_to_create: SetInDB) -> SetInDB:
+        try:
+            self._insert(set_to_create)
+        except sqlite3.IntegrityError:
+            raise CosmosResourceExistsError(
+                status_code=409, message=f"Set {set_to_create.id} already exists"
+            )
+        return set_to_create
+
+    async def create_sets(self, sets_to_create: list[SetInDB]) -> list[int]:
+        # One transaction per user and exercise, all or nothing like the Cosmos
+        # batches, so a retried upload behaves the same on either backend
+        statuses = [201] * len(sets_to_create)
+
+        def partition(i: int) -> tuple[str, str]:
+            return sets_to_create[i].user_id, sets_to_create[i].exercise_id
+
+        for _, group in groupby(
+            sorted(range(len(sets_to_create)), key=partition), partition
+        ):
+            indexes = list(group)
+            self.connection.execute("BEGIN")
+            for i in indexes:
+                try:
+                    self._insert(sets_to_create[i])
+                except sqlite3.IntegrityError:
+                    self.connection.execute("ROLLBACK")
+                    for j in indexes:
+                        statuses[j] = 424
+                    statuses[i] = 409
+                    break
+            else:
+                self.connection.execute("COMMIT")
+        return statuses
+
+    async def delete_set(self, set_id: str, user_id: str, exercise_id: str) -> None:
+        cursor = self.connection.execute(
+            "DELETE FROM exercise_sets WHERE id = ? AND user_id = ? AND exercise_id = ?",
+            (set_id, user_id, exercise_id),
+        )
+        if cursor.rowcount == 0:
+            raise CosmosResourceNotFoundError(
+                status_code=404, message=f"Set {set_id} not found"
+            )
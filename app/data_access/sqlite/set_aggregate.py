@@ -0,0 +1,49 @@
+from typing import Optional
+
+from app.data_access.sqlite.base import SQLiteDataAccess
+from app.models.set_models import ExerciseSummary
+
+
+class SQLiteSetAggregateDataAccess(SQLiteDataAccess):
+    """
+    SQLite has no change feed to keep summaries from, and an exercise's sets
+    are one index seek away, so the summary is worked out when it is read,
+    with one aggregate query.
+    """
+
+    async def get_summary(
+        self, user_id: str, exercise_id: str
+    ) -> Optional[ExerciseSummary]:
+        # The one rep max estimate is Epley's, as in estimated_one_rep_max
+        row = self.connection.execute(
+            """
+            SELECT COUNT(*),
+                   MAX(weight),
+                   MAX(CASE WHEN reps = 1 THEN weight
+                            ELSE weight * (1 + reps / 30.0) END),
+                   SUM(weight * reps),
+                   MAX(substr(date_created, 1, 10))
+            FROM (
+                SELECT json_extract(doc, '$.weight') AS weight,
+                       json_extract(doc, '$.reps') AS reps,
+                       date_created
+                FROM exercise_sets WHERE user_id = ? AND exercise_id = ?
+            )
+            """,
+            (user_id, exercise_id),
+        ).fetchone()
+        set_count, max_weight, best, total_volume, last_session_date = row
+        if not set_count:
+            return None
+        return ExerciseSummary(
+            exercise_id=exercise_id,
+            set_count=set_count,
+            max_weight=max_weight,
+            best_estimated_one_rep_max=best,
+            total_volume=total_volume,
+            last_session_date=last_session_date,
+        )
+
+    async def refresh(self, user_id: str, exercise_id: str) -> None:
+        # Summaries are worked out on read, there is nothing to keep up to date
+        pass
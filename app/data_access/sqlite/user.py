@@ -0,0 +1,83 @@
+import json
+import sqlite3
+from typing import Any, Optional
+
+from azure.cosmos.exceptions import (
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+from app.data_access.hydration import hydrate
+from app.data_access.sqlite.base import SQLiteDataAccess
+from app.models.user_models import UserInDB
+
+
+class SQLiteUserDataAccess(SQLiteDataAccess):
+    async def get_user_by_id(self, user_id: str) -> UserInDB:
+        row = self.connection.execute(
+            "SELECT doc FROM users WHERE id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            raise CosmosResourceNotFoundError(
+                status_code=404, message=f"User {user_id} not found"
+            )
+        return hydrate(UserInDB, json.loads(row[0]))
+
+    async def get_user_and_etag(self, user_id: str) -> tuple[UserInDB, str]:
+        row = self.connection.execute(
+            "SELECT doc FROM users WHERE id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            raise CosmosResourceNotFoundError(
+                status_code=404, message=f"User {user_id} not found"
+            )
+        user = json.loads(row[0])
+        # Rows written before writes were versioned have no etag, so a write
+        # made conditional on it goes through regardless
+        return hydrate(UserInDB, user), user.get("_etag")
+
+    async def get_user_by_email(self, email: str) -> UserInDB | None:
+        row = self.connection.execute(
+            "SELECT doc FROM users WHERE email = ?", (email,)
+        ).fetchone()
+        if row is None:
+            return None
+        return hydrate(UserInDB, json.loads(row[0]))
+
+    async def create_user(self, user: UserInDB) -> UserInDB:
+        try:
+            self.connection.execute(
+                "INSERT INTO users (id, email, doc) VALUES (?, ?, ?)",
+                (user.id, user.email, self._versioned(user.model_dump())),
+            )
+        except sqlite3.IntegrityError:
+            raise CosmosResourceExistsError(
+                status_code=409, message=f"User {user.id} already exists"
+            )
+        return user
+
+    async def update_user(self, user: UserInDB) -> UserInDB:
+        self.connection.execute(
+            "INSERT INTO users (id, email, doc) VALUES (?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET email = excluded.email, doc = excluded.doc",
+            (user.id, user.email, self._versioned(user.model_dump())),
+        )
+        return user
+
+    async def patch_preferences(
+        self, user_id: str, preferences: dict[str, Any], etag: Optional[str] = None
+    ) -> UserInDB:
+        user = self._patch(
+            "users",
+            {"id": user_id},
+            {f"/preferences/{name}": value for name, value in preferences.items()},
+            etag,
+        )
+        return hydrate(UserInDB, user)
+
+    async def delete_user(self, user_id: str) -> None:
+        cursor = self.connection.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        if cursor.rowcount == 0:
+            raise CosmosResourceNotFoundError(
+                status_code=404, message=f"User {user_id} not found"
+            )
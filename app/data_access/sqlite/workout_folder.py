@@ -0,0 +1,109 @@
+import json
+import sqlite3
+from typing import Any, Optional
+
+from azure.cosmos.exceptions import (
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+from app.data_access.hydration import hydrate, hydrate_many
+from app.data_access.sqlite.base import SQLiteDataAccess
+from app.models.workout_folder_models import WorkoutFolderInDB
+
+
+class SQLiteWorkoutFolderDataAccess(SQLiteDataAccess):
+    async def get_folder_by_id(self, folder_id: str, user_id: str) -> WorkoutFolderInDB:
+        row = self.connection.execute(
+            "SELECT doc FROM workout_folders WHERE id = ? AND user_id = ?",
+            (folder_id, user_id),
+        ).fetchone()
+        if row is None:
+            raise CosmosResourceNotFoundError(
+                status_code=404, message=f"Folder {folder_id} not found"
+            )
+        return hydrate(WorkoutFolderInDB, json.loads(row[0]))
+
+    async def get_folder_and_etag(
+        self, folder_id: str, user_id: str
+    ) -> tuple[WorkoutFolderInDB, str]:
+        row = self.connection.execute(
+            "SELECT doc FROM workout_folders WHERE id = ? AND user_id = ?",
+            (folder_id, user_id),
+        ).fetchone()
+        if row is None:
+            raise CosmosResourceNotFoundError(
+                status_code=404, message=f"Folder {folder_id} not found"
+            )
+        folder = json.loads(row[0])
+        # Rows written before writes were versioned have no etag, so a write
+        # made conditional on it goes through regardless
+        return hydrate(WorkoutFolderInDB, folder), folder.get("_etag")
+
+    async def find_folder_by_id(self, folder_id: str) -> Optional[WorkoutFolderInDB]:
+        row = self.connection.execute(
+            "SELECT doc FROM workout_folders WHERE id = ?", (folder_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return hydrate(WorkoutFolderInDB, json.loads(row[0]))
+
+    async def get_users_workout_folders(self, user_id: str) -> list[WorkoutFolderInDB]:
+        rows = self.connection.execute(
+            "SELECT doc FROM workout_folders WHERE user_id = ?", (user_id,)
+        )
+        return hydrate_many(WorkoutFolderInDB, (json.loads(doc) for (doc,) in rows))
+
+    async def create_workout_folder(
+        self, workout_folder: WorkoutFolderInDB
+    ) -> WorkoutFolderInDB:
+        try:
+            self.connection.execute(
+                "INSERT INTO workout_folders (id, user_id, doc) VALUES (?, ?, ?)",
+                (
+                    workout_folder.id,
+                    workout_folder.user_id,
+                    self._versioned(workout_folder.model_dump()),
+                ),
+            )
+        except sqlite3.IntegrityError:
+            raise CosmosResourceExistsError(
+                status_code=409, message=f"Folder {workout_folder.id} already exists"
+            )
+        return workout_folder
+
+    async def update_workout_folder(
+        self, workout_folder: WorkoutFolderInDB
+    ) -> WorkoutFolderInDB:
+        self.connection.execute(
+            "INSERT INTO workout_folders (id, user_id, doc) VALUES (?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET user_id = excluded.user_id, doc = excluded.doc",
+            (
+                workout_folder.id,
+                workout_folder.user_id,
+                self._versioned(workout_folder.model_dump()),
+            ),
+        )
+        return workout_folder
+
+    async def patch_workout_folder(
+        self,
+        folder_id: str,
+        user_id: str,
+        changes: dict[str, Any],
+        etag: Optional[str] = None,
+    ) -> WorkoutFolderInDB:
+        folder = self._patch(
+            "workout_folders", {"id": folder_id, "user_id": user_id}, changes, etag
+        )
+        return hydrate(WorkoutFolderInDB, folder)
+
+    async def delete_workout_folder(self, folder_id: str, user_id: str) -> None:
+        cursor = self.connection.execute(
+            "DELETE FROM workout_folders WHERE id = ? AND user_id = ?",
+            (folder_id, user_id),
+        )
+        if cursor.rowcount == 0:
+            raise CosmosResourceNotFoundError(
+                status_code=404, message=f"Folder {folder_id} not found"
+            )
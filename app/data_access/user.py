@@ -1,33 +1,177 @@
-from app.data_access.base import BaseDataAccess
+from typing import Any, Optional
+
+from azure.core import MatchConditions
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+from app.data_access.base import BaseDataAccess, set_operations
+from app.data_access.containers import USER_EMAILS, USERS
+from app.data_access.hydration import hydrate
 from app.models.user_models import UserInDB
+from app.utils.string_utils import strip_and_lower
 
 
-class UserDataAccess(BaseDataAccess):
+def normalize_email(email: str) -> str:
+    """
+    :return: The email as the email index is keyed, trimmed and lowercased
+    """
+    return strip_and_lower(email)
+
+
+class UserEmailIndexDataAccess(BaseDataAccess):
+    """
+    One document per email, its id the normalized email, holding the id of
+    the user the email belongs to. The container is partitioned by id, so
+    finding the user for an email is a point read rather than a query across
+    every partition of users, and creating the document fails while the email
+    is taken.
+    """
+
     def __init__(self) -> None:
-        super().__init__(container_name="users")
+        super().__init__(container_name=USER_EMAILS)
 
-    def get_user_by_id(self, user_id: str):
-        return UserInDB(**self.container.read_item(item=user_id, partition_key=user_id))
+    async def get_entry(self, email: str) -> Optional[dict]:
+        key = normalize_email(email)
+        try:
+            return await self.container.read_item(item=key, partition_key=key)
+        except CosmosResourceNotFoundError:
+            return None
+
+    async def create_entry(self, email: str, user_id: str) -> None:
+        """
+        :raises CosmosResourceExistsError: If the email already has an entry
+        """
+        await self.container.create_item(
+            body={"id": normalize_email(email), "user_id": user_id}
+        )
 
-    def get_user_by_email(self, email: str) -> UserInDB | None:
-        query = "SELECT * FROM users u WHERE u.email = @email"
-        params = [dict(name="@email", value=email)]
-        users = list(
-            self.container.query_items(
-                query=query, parameters=params, enable_cross_partition_query=True  # type: ignore
+    async def delete_entry(self, email: str, etag: Optional[str] = None) -> None:
+        """
+        Deletes the email's entry, if it has one.
+
+        :param etag: Only delete the entry if it is still this version of it
+        :raises CosmosAccessConditionFailedError: If the entry changed since etag
+        """
+        key = normalize_email(email)
+        try:
+            await self.container.delete_item(
+                item=key,
+                partition_key=key,
+                etag=etag,
+                match_condition=MatchConditions.IfNotModified if etag else None,
             )
+        except CosmosResourceNotFoundError:
+            pass
+
+
+class UserDataAccess(BaseDataAccess):
+    def __init__(self, email_index: Optional[UserEmailIndexDataAccess] = None) -> None:
+        super().__init__(container_name=USERS)
+        self.email_index = email_index or UserEmailIndexDataAccess()
+
+    async def get_user_by_id(self, user_id: str):
+        return UserInDB(
+            **await self.container.read_item(item=user_id, partition_key=user_id)
         )
-        if not users:
+
+    async def get_user_and_etag(self, user_id: str) -> tuple[UserInDB, str]:
+        """
+        :return: The user and the etag of the version read, to make a write
+            conditional on
+        :raises CosmosResourceNotFoundError: If there is no such user
+        """
+        user = await self.container.read_item(item=user_id, partition_key=user_id)
+        return hydrate(UserInDB, user), user["_etag"]
+
+    async def get_user_by_email(self, email: str) -> UserInDB | None:
+        """
+        Two point reads, the email's index entry then the user it points to.
+        Emails are matched case insensitively.
+        """
+        entry = await self.email_index.get_entry(email)
+        if entry is None:
+            return None
+        try:
+            return await self.get_user_by_id(entry["user_id"])
+        except CosmosResourceNotFoundError:
+            # Left behind by a create or delete that failed part way
             return None
-        return UserInDB(**users[0])
 
-    def create_user(self, user: UserInDB) -> UserInDB:
-        created_user = self.container.create_item(body=user.model_dump())
-        return UserInDB(**created_user)
+    async def create_user(self, user: UserInDB) -> UserInDB:
+        """
+        Claims the user's email in the index before the user is created, and
+        gives it up again if creating the user fails. Cosmos can't write both
+        in one transaction, they live in different partitions, but this way
+        there is never a user whose email isn't indexed, and of two sign ups
+        with the same email only one gets past the claim.
 
-    def update_user(self, user: UserInDB) -> UserInDB:
-        updated_user = self.container.upsert_item(body=user.model_dump())
-        return UserInDB(**updated_user)
+        :raises CosmosResourceExistsError: If the email belongs to another user
+        """
+        await self._claim_email(user.email, user.id)
+        try:
+            created_user = await self.container.create_item(body=user.model_dump())
+        except BaseException:
+            await self.email_index.delete_entry(user.email)
+            raise
+        return hydrate(UserInDB, created_user)
+
+    async def _claim_email(self, email: str, user_id: str) -> None:
+        try:
+            await self.email_index.create_entry(email, user_id)
+            return
+        except CosmosResourceExistsError:
+            entry = await self.email_index.get_entry(email)
+        if entry is not None:
+            try:
+                await self.get_user_by_id(entry["user_id"])
+                raise CosmosResourceExistsError(
+                    status_code=409, message=f"{email} belongs to another user"
+                )
+            except CosmosResourceNotFoundError:
+                pass
+            # The entry points at a user that was never created or has since
+            # been deleted, so the email is free. Only the first claim to get
+            # here removes it, any other sees the etag change and gives up.
+            try:
+                await self.email_index.delete_entry(email, etag=entry["_etag"])
+            except CosmosAccessConditionFailedError:
+                raise CosmosResourceExistsError(
+                    status_code=409, message=f"{email} belongs to another user"
+                )
+        await self.email_index.create_entry(email, user_id)
+
+    async def update_user(self, user: UserInDB) -> UserInDB:
+        # Users can't change their email, so the index is left as it is
+        updated_user = await self.container.upsert_item(body=user.model_dump())
+        return hydrate(UserInDB, updated_user)
+
+    async def patch_preferences(
+        self, user_id: str, preferences: dict[str, Any], etag: Optional[str] = None
+    ) -> UserInDB:
+        """
+        Sets the given preferences in one request, without reading the user
+        first. Preferences that aren't given keep their stored value.
+
+        :param preferences: The preferences to set, by name
+        :param etag: Only patch the user if it is still this version of it
+        :raises CosmosResourceNotFoundError: If there is no such user
+        :raises CosmosAccessConditionFailedError: If the user changed since etag
+        """
+        patched_user = await self.container.patch_item(
+            item=user_id,
+            partition_key=user_id,
+            patch_operations=set_operations(
+                {f"/preferences/{name}": value for name, value in preferences.items()}
+            ),
+            etag=etag,
+            match_condition=MatchConditions.IfNotModified if etag else None,
+        )
+        return hydrate(UserInDB, patched_user)
 
-    def delete_user(self, user_id: str) -> None:
-        self.container.delete_item(item=user_id, partition_key=user_id)
+    async def delete_user(self, user_id: str) -> None:
+        user = await self.get_user_by_id(user_id)
+        await self.container.delete_item(item=user_id, partition_key=user_id)
+        await self.email_index.delete_entry(user.email)
@@ -1,38 +1,98 @@
-from app.data_access.base import BaseDataAccess
+from typing import Any, Optional
+
+from azure.core import MatchConditions
+
+from app.data_access.base import BaseDataAccess, set_operations
+from app.data_access.containers import WORKOUT_FOLDERS
+from app.data_access.hydration import hydrate, hydrate_many
 from app.models.workout_folder_models import WorkoutFolderInDB
 
 
 class WorkoutFolderDataAccess(BaseDataAccess):
     def __init__(self):
-        super().__init__(container_name="workout-folders")
+        super().__init__(container_name=WORKOUT_FOLDERS)
+
+    async def get_folder_by_id(self, folder_id: str, user_id: str) -> WorkoutFolderInDB:
+        folder = await self.container.read_item(item=folder_id, partition_key=user_id)
+        return hydrate(WorkoutFolderInDB, folder)
+
+    async def get_folder_and_etag(
+        self, folder_id: str, user_id: str
+    ) -> tuple[WorkoutFolderInDB, str]:
+        """
+        :return: The folder and the etag of the version read, to make a write
+            conditional on
+        :raises CosmosResourceNotFoundError: If the user has no such folder
+        """
+        folder = await self.container.read_item(item=folder_id, partition_key=user_id)
+        return hydrate(WorkoutFolderInDB, folder), folder["_etag"]
 
-    def get_folder_by_id(self, folder_id: str) -> WorkoutFolderInDB:
-        folder = self.container.read_item(item=folder_id, partition_key=folder_id)
-        return WorkoutFolderInDB(**folder)
+    async def find_folder_by_id(self, folder_id: str) -> Optional[WorkoutFolderInDB]:
+        """
+        Cross-partition lookup of a folder regardless of its owner. Only meant for
+        the rare path of telling a missing folder apart from another user's folder.
+        """
+        query = "SELECT * FROM workout_folders wf WHERE wf.id = @id"
+        params = [dict(name="@id", value=folder_id)]
+        folders = [
+            folder
+            async for folder in self.container.query_items(
+                query=query, parameters=params  # type: ignore
+            )
+        ]
+        if not folders:
+            return None
+        return hydrate(WorkoutFolderInDB, folders[0])
 
-    def get_users_workout_folders(self, user_id: str) -> list[WorkoutFolderInDB]:
+    async def get_users_workout_folders(self, user_id: str) -> list[WorkoutFolderInDB]:
         query = "SELECT * FROM workout_folders wf WHERE wf.user_id = @user_id"
         params = [dict(name="@user_id", value=user_id)]
         workout_folders = self.container.query_items(
-            query=query, parameters=params, enable_cross_partition_query=True  # type: ignore
+            query=query, parameters=params, partition_key=user_id  # type: ignore
         )
-        return [WorkoutFolderInDB(**wf) for wf in workout_folders]
+        return hydrate_many(WorkoutFolderInDB, [wf async for wf in workout_folders])
 
-    def create_workout_folder(
+    async def create_workout_folder(
         self, workout_folder: WorkoutFolderInDB
     ) -> WorkoutFolderInDB:
-        created_workout_folder = self.container.create_item(
+        created_workout_folder = await self.container.create_item(
             body=workout_folder.model_dump()
         )
-        return WorkoutFolderInDB(**created_workout_folder)
+        return hydrate(WorkoutFolderInDB, created_workout_folder)
 
-    def update_workout_folder(
+    async def update_workout_folder(
         self, workout_folder: WorkoutFolderInDB
     ) -> WorkoutFolderInDB:
-        updated_workout_folder = self.container.upsert_item(
+        updated_workout_folder = await self.container.upsert_item(
             body=workout_folder.model_dump()
         )
-        return WorkoutFolderInDB(**updated_workout_folder)
+        return hydrate(WorkoutFolderInDB, updated_workout_folder)
+
+    async def patch_workout_folder(
+        self,
+        folder_id: str,
+        user_id: str,
+        changes: dict[str, Any],
+        etag: Optional[str] = None,
+    ) -> WorkoutFolderInDB:
+        """
+        Writes only the changed fields, in one request, without reading the
+        folder first. Fields that aren't changed keep whatever is stored, so
+        concurrent updates to different fields don't undo each other.
+
+        :param changes: The values to set, keyed by their path e.g. /name
+        :param etag: Only patch the folder if it is still this version of it
+        :raises CosmosResourceNotFoundError: If the user has no such folder
+        :raises CosmosAccessConditionFailedError: If the folder changed since etag
+        """
+        patched_workout_folder = await self.container.patch_item(
+            item=folder_id,
+            partition_key=user_id,
+            patch_operations=set_operations(changes),
+            etag=etag,
+            match_condition=MatchConditions.IfNotModified if etag else None,
+        )
+        return hydrate(WorkoutFolderInDB, patched_workout_folder)
 
-    def delete_workout_folder(self, folder_id: str):
-        self.container.delete_item(folder_id, partition_key=folder_id)
+    async def delete_workout_folder(self, folder_id: str, user_id: str):
+        await self.container.delete_item(folder_id, partition_key=user_id)
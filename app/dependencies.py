@@ -1,6 +1,9 @@
+import os
+
 from fastapi import Depends, HTTPException, Request, status
 from jwt.exceptions import ExpiredSignatureError, PyJWTError
 
+from app.auth.token_cache import verified_tokens
 from app.auth.tokens import decode_jwt
 
 
@@ -46,8 +49,51 @@ def get_current_user(token: str = Depends(extract_token)) -> dict:
     Raises:
         HTTPException: If the token has expired or could not be decoded, or if the token payload is invalid.
     """
+    # Clients send the same token on every request, verify it once until it
+    # expires
+    payload = verified_tokens.get(token)
+    if payload is None:
+        payload = _verify(token)
+        if payload.get("id") is None or payload.get("email") is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid token payload",
+            )
+        verified_tokens.put(token, payload)
+    return payload
+
+
+def get_current_operator(current_user: dict = Depends(get_current_user)) -> dict:
+    """
+    Retrieves the current user, only if they are one of the operators listed by id in the
+    comma separated OPERATOR_USER_IDS environment variable. Nobody is an operator unless it
+    is set.
+
+    Args:
+        current_user (dict): The payload of the user's token.
+
+    Returns:
+        dict: The payload of the decoded JWT token, representing the current user.
+
+    Raises:
+        HTTPException: If the user is not an operator.
+    """
+    operators = {
+        user_id.strip()
+        for user_id in os.environ.get("OPERATOR_USER_IDS", "").split(",")
+        if user_id.strip()
+    }
+    if current_user["id"] not in operators:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only operators can read the metrics",
+        )
+    return current_user
+
+
+def _verify(token: str) -> dict:
     try:
-        payload = decode_jwt(token)
+        return decode_jwt(token)
     except ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired"
@@ -56,8 +102,3 @@ def get_current_user(token: str = Depends(extract_token)) -> dict:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Could not decode token"
         )
-    if payload.get("id") is None or payload.get("email") is None:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token payload"
-        )
-    return payload
@@ -18,3 +18,19 @@ class EntityNotFoundException(Exception):
 
 class EntityAlreadyExistsException(Exception):
     """The entity being created already exists"""
+
+
+class InvalidContinuationTokenException(Exception):
+    """The continuation token can't be decoded into the state this API packs into one"""
+
+
+class PasswordHashingBusyException(Exception):
+    """Too many passwords are waiting to be hashed, the request should be retried later"""
+
+
+class PreconditionFailedException(Exception):
+    """The entity has changed since the version the request's If-Match names"""
+
+
+class ConcurrentUpdateException(Exception):
+    """The entity kept changing under the update, the request should be retried later"""
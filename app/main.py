@@ -1,19 +1,34 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
+from app.auth.passwords import password_hashing_pool
+from app.data_access.backends import get_storage_backend
+from app.responses import PydanticJSONResponse
 from app.routes.authentication import auth_router
 from app.routes.exercises import exercises_router
+from app.routes.metrics import metrics_router
 from app.routes.sets import set_router
 from app.routes.users import user_router
 from app.routes.workout_folders import workout_folder_router
 
-fast_app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await get_storage_backend().close()
+    password_hashing_pool.shutdown()
+
+
+fast_app = FastAPI(lifespan=lifespan, default_response_class=PydanticJSONResponse)
 fast_app.include_router(auth_router)
 fast_app.include_router(workout_folder_router)
 fast_app.include_router(exercises_router)
 fast_app.include_router(set_router)
 fast_app.include_router(user_router)
+fast_app.include_router(metrics_router)
 
 
 @fast_app.exception_handler(RequestValidationError)
@@ -0,0 +1,63 @@
+from app.models.base_model import CustomBaseModel
+
+
+class HistogramSnapshot(CustomBaseModel):
+    # counts[i] is the number of observations <= buckets[i] and above the
+    # bucket before it, the extra last count is everything above the last bucket
+    buckets: list[float]
+    counts: list[int]
+    count: int
+    sum: float
+
+
+class OperationHistograms(CustomBaseModel):
+    latency_ms: HistogramSnapshot
+    request_charge: HistogramSnapshot
+
+
+class OperationSummary(CustomBaseModel):
+    operation: str
+    container: str
+    count: int
+    failed: int
+    # Writes turned down because the document's etag had changed
+    conflicts: int
+    total_request_charge: float
+    mean_request_charge: float
+    p95_request_charge: float
+    mean_item_count: float
+    p50_duration_ms: float
+    p95_duration_ms: float
+    max_duration_ms: float
+
+
+class DataAccessSummary(CustomBaseModel):
+    window_seconds: float
+    operations: list[OperationSummary]
+
+
+class TokenCacheStats(CustomBaseModel):
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+    hit_rate: float
+
+
+class PasswordHashingStats(CustomBaseModel):
+    max_workers: int
+    max_queued: int
+    running: int
+    queued: int
+    peak_queued: int
+    completed: int
+    rejected: int
+    mean_wait_ms: float
+    max_wait_ms: float
+
+
+class ConflictRetryStats(CustomBaseModel):
+    calls: int
+    conflicts: int
+    exhausted: int
@@ -33,3 +33,67 @@ class SetInCreate(BaseSetModel):
 class SetGroup(CustomBaseModel):
     sets: list[SetInDB]
     date_created: str
+
+
+MAX_BULK_SETS = 200
+
+
+class SetsInBulkCreate(CustomBaseModel):
+    sets: list[SetInCreate] = Field(min_length=1, max_length=MAX_BULK_SETS)
+
+
+class BulkSetResult(CustomBaseModel):
+    status: int
+    created: SetInDB | None = None
+    detail: str | None = None
+
+
+class ExerciseSummary(CustomBaseModel):
+    exercise_id: str
+    set_count: int = 0
+    max_weight: float = 0
+    best_estimated_one_rep_max: float = 0
+    total_volume: float = 0
+    last_session_date: str | None = None
+
+
+class SetAggregateInDB(ExerciseSummary):
+    # The exercise id, one aggregate per exercise in each user's partition
+    id: str
+    user_id: str
+    # _lsn of the newest change to the exercise's sets folded in
+    last_lsn: int = 0
+    # _ts of that change, in seconds
+    last_ts: int = 0
+    # Sets a rebuild counted that the feed may not have delivered yet, by
+    # their _ts, for the processor to skip
+    pending_set_ids: dict[str, int] = {}
+
+
+class SetBucket(CustomBaseModel):
+    # The first day of the bucket, Monday for weeks
+    start: str
+    set_count: int
+    max_weight: float
+    volume: float
+
+
+class DailyProgress(CustomBaseModel):
+    date: str
+    set_count: int
+    # The heaviest set of the day, the one with the most reps of those
+    top_set_weight: float
+    top_set_reps: int
+    volume: float
+    # The best estimates from any set of the day
+    estimated_one_rep_max: float
+    brzycki_one_rep_max: float | None = None
+    # Means over the training days in the four weeks up to and including this one
+    one_rep_max_trend: float
+    volume_trend: float
+
+
+class ExerciseProgress(CustomBaseModel):
+    exercise_id: str
+    # Oldest day first
+    days: list[DailyProgress]
@@ -0,0 +1,136 @@
+import hashlib
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Mapping, Optional
+
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic_core import to_json
+
+
+class PydanticJSONResponse(JSONResponse):
+    """
+    JSONResponse that renders with pydantic-core instead of the json module.
+
+    FastAPI hands the response class the output of the response model's
+    serializer, plain dicts already using the camelCase aliases. Pydantic
+    models returned as the content of the response directly are serialized
+    by alias too, so both routes end up with the same keys.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content, by_alias=True)
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_response(
+    content: AsyncIterable[Any], headers: Optional[Mapping[str, str]] = None
+) -> StreamingResponse:
+    """
+    Streams content as newline delimited JSON, rendering each item by alias
+    with pydantic-core as it is sent, so only the item being sent is held in
+    memory rather than the whole body.
+
+    :param content: The items, one per line, read as the response is sent
+    :param headers: Headers to send with the response
+    """
+
+    async def lines() -> AsyncIterator[bytes]:
+        async for item in content:
+            yield to_json(item, by_alias=True) + b"\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
+def make_etag(*parts: bytes) -> str:
+    """
+    :param parts: What the response is made of, its body and any headers that
+        go with it like a continuation token
+    :return: A strong ETag for them, quoted as the header needs it
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def json_etag(content: Any) -> str:
+    """
+    :return: The ETag conditional_json_response tags content with, when it
+        is sent without headers
+    """
+    return make_etag(to_json(content, by_alias=True))
+
+
+def concat_json_arrays(*arrays: bytes) -> bytes:
+    """
+    Joins JSON arrays that are already rendered into one, without parsing
+    them.
+    """
+    items = [array[1:-1] for array in arrays if array != b"[]"]
+    return b"[" + b",".join(items) + b"]"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match uses the weak comparison, so a W/ prefix on the client's
+    copy still matches. The ETags sent here are all strong, so it is as good
+    a check for If-Match.
+
+    :param if_none_match: The If-None-Match or If-Match request header, if sent
+    :param etag: The ETag of the current representation
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def conditional_response(
+    request: Request,
+    etag: str,
+    render: Callable[[], bytes],
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """
+    A client whose If-None-Match already holds etag gets an empty 304 and
+    render is never called, anyone else gets the JSON body it returns.
+
+    :param request: The request, for its If-None-Match header
+    :param etag: The strong ETag of what render would return
+    :param render: Returns the rendered JSON body
+    :param headers: Headers to send with both the 200 and the 304
+    """
+    response_headers = {**(headers or {}), "ETag": etag}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=response_headers
+        )
+    return Response(render(), media_type="application/json", headers=response_headers)
+
+
+def conditional_json_response(
+    request: Request, content: Any, headers: Optional[Mapping[str, str]] = None
+) -> Response:
+    """
+    Renders content once, straight to bytes with pydantic-core, and tags it
+    with a strong ETag from a hash of those bytes and headers. FastAPI doesn't
+    serialize the content again, a 200 sends the bytes already rendered.
+
+    :param request: The request, for its If-None-Match header
+    :param content: What the route would have returned
+    :param headers: Headers to send with both the 200 and the 304
+    """
+    body = to_json(content, by_alias=True)
+    etag = make_etag(
+        body,
+        *(
+            f"{name.lower()}: {value}".encode()
+            for name, value in sorted((headers or {}).items())
+        ),
+    )
+    return conditional_response(request, etag, lambda: body, headers)
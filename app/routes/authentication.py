@@ -1,7 +1,11 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.routing import APIRouter
 
-from app.exceptions import AuthenticationException, EntityAlreadyExistsException
+from app.exceptions import (
+    AuthenticationException,
+    EntityAlreadyExistsException,
+    PasswordHashingBusyException,
+)
 from app.models.auth_models import AuthRequest
 from app.models.user_models import UserEmailAuthInSignUpAndIn, UserInResponse
 from app.service.user_service import UserService, get_user_service
@@ -12,11 +16,11 @@ auth_router = APIRouter(prefix="/auth", tags=["Authentication"])
 @auth_router.post(
     "/signin/oauth", status_code=status.HTTP_200_OK, response_model=UserInResponse
 )
-def sign_in_oAuth(
+async def sign_in_oAuth(
     auth_data: AuthRequest, user_service: UserService = Depends(get_user_service)
 ) -> UserInResponse:
     try:
-        authenticated_user = user_service.authenticate_oauth(auth_data)
+        authenticated_user = await user_service.authenticate_oauth(auth_data)
     except AuthenticationException as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     else:
@@ -26,22 +30,34 @@ def sign_in_oAuth(
 @auth_router.post(
     "/signin", status_code=status.HTTP_200_OK, response_model=UserInResponse
 )
-def sign_in(
+async def sign_in(
     user_for_sign_in: UserEmailAuthInSignUpAndIn,
     user_service: UserService = Depends(get_user_service),
 ):
     try:
-        return user_service.authenticate_email_password_auth(user_for_sign_in)
+        return await user_service.authenticate_email_password_auth(user_for_sign_in)
     except AuthenticationException as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+    except PasswordHashingBusyException as e:
+        raise _retry_later(e)
 
 
 @auth_router.post("/signup")
-def sign_up(
+async def sign_up(
     user_for_sign_up: UserEmailAuthInSignUpAndIn,
     user_service: UserService = Depends(get_user_service),
 ):
     try:
-        return user_service.sign_up_user(user_for_sign_up)
+        return await user_service.sign_up_user(user_for_sign_up)
     except EntityAlreadyExistsException as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PasswordHashingBusyException as e:
+        raise _retry_later(e)
+
+
+def _retry_later(e: PasswordHashingBusyException) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": "1"},
+    )
@@ -1,30 +1,50 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic_core import to_json
 
 from app.dependencies import get_current_user
 from app.exceptions import EntityAlreadyExistsException
-from app.models.exercises_models import ExerciseInCreate
+from app.models.exercises_models import ExerciseInCreate, ExerciseInDB
+from app.responses import concat_json_arrays, conditional_response, make_etag
 from app.service.exercise_service import ExerciseService, get_exercise_service
 
 exercises_router = APIRouter(prefix="/exercises", tags=["exercises"])
 
 
-@exercises_router.get("/")
-def get_all_exercises(
+@exercises_router.get(
+    "/", response_model=list[ExerciseInDB], response_model_by_alias=True
+)
+async def get_all_exercises(
+    request: Request,
     exercise_service: Annotated[ExerciseService, Depends(get_exercise_service)],
     decoded_token: dict = Depends(get_current_user),
 ):
-    return exercise_service.get_system_and_user_exercises(decoded_token["id"])
+    """
+    Tagged with an ETag, send it back in If-None-Match to get a 304 while the
+    list hasn't changed. The system exercises are rendered once per catalog,
+    only the user's own are rendered on each request.
+    """
+    catalog, user_exercises = await exercise_service.get_catalog_and_user_exercises(
+        decoded_token["id"]
+    )
+    rendered_user_exercises = to_json(user_exercises, by_alias=True)
+    return conditional_response(
+        request,
+        make_etag(catalog.version.encode(), rendered_user_exercises),
+        lambda: concat_json_arrays(catalog.rendered, rendered_user_exercises),
+    )
 
 
 @exercises_router.post("/", status_code=status.HTTP_201_CREATED)
-def create_custom_exercise(
+async def create_custom_exercise(
     exercise: ExerciseInCreate,
     exercise_service: Annotated[ExerciseService, Depends(get_exercise_service)],
     decoded_token: dict = Depends(get_current_user),
 ):
     try:
-        return exercise_service.create_custom_exercise(exercise, decoded_token["id"])
+        return await exercise_service.create_custom_exercise(
+            exercise, decoded_token["id"]
+        )
     except EntityAlreadyExistsException as e:
         raise HTTPException(detail=str(e), status_code=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends
+
+from app.auth.passwords import password_hashing_pool
+from app.auth.token_cache import verified_tokens
+from app.data_access.instrumentation import data_access_metrics
+from app.dependencies import get_current_operator
+from app.models.metrics_models import (
+    ConflictRetryStats,
+    DataAccessSummary,
+    OperationHistograms,
+    PasswordHashingStats,
+    TokenCacheStats,
+)
+from app.service.concurrency import conflict_retries
+
+# The metrics cover every user's requests, so only operators can read them
+metrics_router = APIRouter(
+    prefix="/metrics", tags=["metrics"], dependencies=[Depends(get_current_operator)]
+)
+
+
+@metrics_router.get(
+    "/data-access",
+    response_model=DataAccessSummary,
+    response_model_by_alias=True,
+)
+async def get_data_access_summary():
+    """
+    Request charge, item count and latency of the data access operations made
+    in the rolling window, the most expensive first.
+    """
+    return data_access_metrics.summary()
+
+
+@metrics_router.get(
+    "/data-access/histograms",
+    response_model=dict[str, OperationHistograms],
+    response_model_by_alias=True,
+)
+async def get_data_access_histograms():
+    """
+    Latency and request charge histograms of every data access operation since
+    the app started.
+    """
+    return data_access_metrics.histograms()
+
+
+@metrics_router.get(
+    "/token-cache",
+    response_model=TokenCacheStats,
+    response_model_by_alias=True,
+)
+async def get_token_cache_stats():
+    """
+    Size and hit rate of the verified token cache since the app started.
+    """
+    return verified_tokens.stats()
+
+
+@metrics_router.get(
+    "/password-hashing",
+    response_model=PasswordHashingStats,
+    response_model_by_alias=True,
+)
+async def get_password_hashing_stats():
+    """
+    Load on the threads that hash and check passwords: what is running and
+    waiting now, how long hashes waited for a thread and how many were turned
+    away since the app started.
+    """
+    return password_hashing_pool.stats()
+
+
+@metrics_router.get(
+    "/conflict-retries",
+    response_model=dict[str, ConflictRetryStats],
+    response_model_by_alias=True,
+)
+async def get_conflict_retry_stats():
+    """
+    How often the read-modify-write updates lost a race to another write and
+    were retried, and how many gave up, per operation since the app started.
+    Every write turned down by its etag also counts towards the conflicts of
+    its data access operation in /metrics/data-access.
+    """
+    return conflict_retries.stats()
@@ -1,44 +1,221 @@
-from typing import Annotated
+from datetime import datetime
+from typing import Annotated, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 
 from app.dependencies import get_current_user
-from app.exceptions import EntityNotFoundException, UnauthorizedAccessException
-from app.models.set_models import SetInCreate
-from app.service.set_service import SetService, get_set_service
+from app.exceptions import (
+    EntityNotFoundException,
+    InvalidContinuationTokenException,
+    UnauthorizedAccessException,
+)
+from app.models.set_models import (
+    BulkSetResult,
+    ExerciseProgress,
+    ExerciseSummary,
+    SetBucket,
+    SetGroup,
+    SetInCreate,
+    SetsInBulkCreate,
+)
+from app.responses import (
+    NDJSON_MEDIA_TYPE,
+    conditional_json_response,
+    ndjson_response,
+)
+from app.service.set_service import (
+    DEFAULT_CHART_POINTS,
+    DEFAULT_HISTORY_PAGE_SIZE,
+    MAX_CHART_POINTS,
+    MAX_HISTORY_PAGE_SIZE,
+    SetService,
+    get_set_service,
+)
+from app.utils.date_utils import as_utc
 
 set_router = APIRouter(prefix="/sets", tags=["sets"])
 
 
-@set_router.get("/{exercise_id}", response_model_by_alias=True)
-def get_users_sets_by_exercise_id(
+CONTINUATION_TOKEN_HEADER = "X-Continuation-Token"
+
+
+@set_router.get(
+    "/{exercise_id}",
+    response_model=list[SetGroup] | list[SetBucket],
+    response_model_by_alias=True,
+)
+async def get_users_sets_by_exercise_id(
+    exercise_id: str,
+    request: Request,
+    set_service: Annotated[SetService, Depends(get_set_service)],
+    current_user: dict[str, str] = Depends(get_current_user),
+    limit: Annotated[Optional[int], Query(ge=1, le=MAX_HISTORY_PAGE_SIZE)] = None,
+    continuation_token: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bucket: Optional[Literal["day", "week", "month"]] = None,
+    points: Annotated[int, Query(ge=3, le=MAX_CHART_POINTS)] = DEFAULT_CHART_POINTS,
+):
+    """
+    Returns the set history newest day first. Without limit or
+    continuation_token it is the whole history in one response, as it was
+    before paging was added. With limit it is read at most limit sets at a
+    time, and while there is more history the X-Continuation-Token response
+    header holds the token to pass as continuation_token for the next page,
+    of 100 sets when limit isn't sent with it. Either way
+    the response is tagged with an ETag, send it back in If-None-Match to get a
+    304 while it hasn't changed. since and until limit it to the sets logged in
+    that range, a time without an offset is taken to be UTC, and have to be
+    sent again with the continuation token.
+
+    With bucket set to day, week or month it returns, in one response, the
+    set count, max weight and volume of each bucket with sets instead, oldest
+    first, downsampled to at most points buckets for charting.
+    """
+    if since is not None and until is not None and as_utc(since) >= as_utc(until):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="since must be before until",
+        )
+    if bucket is not None:
+        if continuation_token is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Buckets are returned in one page, without a continuation token",
+            )
+        buckets = await set_service.get_users_set_buckets(
+            exercise_id, current_user["id"], bucket, points, since=since, until=until
+        )
+        return conditional_json_response(request, buckets)
+    if limit is None and continuation_token is None:
+        set_history = await set_service.get_users_sets_by_exercise_id(
+            exercise_id, current_user["id"], since=since, until=until
+        )
+        return conditional_json_response(request, set_history)
+    try:
+        set_history, next_token = await set_service.get_users_set_history_page(
+            exercise_id,
+            current_user["id"],
+            page_size=limit or DEFAULT_HISTORY_PAGE_SIZE,
+            continuation_token=continuation_token,
+            since=since,
+            until=until,
+        )
+    except InvalidContinuationTokenException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    headers = {}
+    if next_token is not None:
+        headers[CONTINUATION_TOKEN_HEADER] = next_token
+    return conditional_json_response(request, set_history, headers)
+
+
+@set_router.get(
+    "/{exercise_id}/summary",
+    response_model=ExerciseSummary,
+    response_model_by_alias=True,
+)
+async def get_exercise_summary(
+    exercise_id: str,
+    set_service: Annotated[SetService, Depends(get_set_service)],
+    current_user: dict[str, str] = Depends(get_current_user),
+):
+    """
+    Returns the set count, heaviest weight, best estimated one rep max, total
+    volume and the date of the last session for the exercise, without reading
+    the history. Sets logged in the last few seconds may not be counted yet.
+    """
+    summary = await set_service.get_exercise_summary(exercise_id, current_user["id"])
+    if summary is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No sets for exercise {exercise_id}",
+        )
+    return summary
+
+
+@set_router.get(
+    "/{exercise_id}/progress",
+    response_model=ExerciseProgress,
+    response_model_by_alias=True,
+)
+async def get_exercise_progress(
+    exercise_id: str,
+    set_service: Annotated[SetService, Depends(get_set_service)],
+    current_user: dict[str, str] = Depends(get_current_user),
+):
+    """
+    Returns each day with sets for the exercise, oldest first: the top set,
+    the volume (weight × reps), the best one rep max estimates by Epley's and
+    Brzycki's formulas, and the means of the Epley estimate and the volume
+    over the training days of the four weeks up to it.
+    """
+    return await set_service.get_exercise_progress(exercise_id, current_user["id"])
+
+
+@set_router.get(
+    "/{exercise_id}/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def export_set_history(
     exercise_id: str,
     set_service: Annotated[SetService, Depends(get_set_service)],
     current_user: dict[str, str] = Depends(get_current_user),
+    lines: Literal["day", "set"] = "day",
 ):
-    return set_service.get_users_sets_by_exercise_id(exercise_id, current_user["id"])
+    """
+    Streams the whole set history in one response, as newline delimited JSON
+    newest first: a line per day shaped like the days GET /sets/{exercise_id}
+    returns, or with lines=set a line per set. The history is read and sent a
+    page at a time, so it can be as long as it likes.
+    """
+    return ndjson_response(
+        set_service.stream_users_set_history(exercise_id, current_user["id"], lines)
+    )
 
 
 @set_router.post("/", status_code=status.HTTP_201_CREATED, response_model_by_alias=True)
-def create_set(
+async def create_set(
     set_to_create: SetInCreate,
     set_service: Annotated[SetService, Depends(get_set_service)],
     current_user: dict[str, str] = Depends(get_current_user),
 ):
     try:
-        return set_service.create_set(set_to_create, current_user["id"])
+        return await set_service.create_set(
+            set_to_create, current_user["id"], user_from_token=True
+        )
     except EntityNotFoundException as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@set_router.post(
+    "/bulk", response_model=list[BulkSetResult], response_model_by_alias=True
+)
+async def create_sets(
+    sets_to_create: SetsInBulkCreate,
+    set_service: Annotated[SetService, Depends(get_set_service)],
+    current_user: dict[str, str] = Depends(get_current_user),
+):
+    """
+    Logs a batch of sets in one request, such as a workout logged offline.
+    Returns a result for each set in the order sent: status 201 and the
+    created set, or the status and detail of why it wasn't created. Only the
+    sets that weren't created need sending again.
+    """
+    return await set_service.create_sets(
+        sets_to_create.sets, current_user["id"], user_from_token=True
+    )
+
+
 @set_router.delete("/{set_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_set(
+async def delete_set(
     set_id: str,
     set_service: Annotated[SetService, Depends(get_set_service)],
     current_user: dict[str, str] = Depends(get_current_user),
 ):
     try:
-        set_service.delete_set(set_id, current_user["id"])
+        await set_service.delete_set(set_id, current_user["id"])
     except EntityNotFoundException as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except UnauthorizedAccessException as e:
@@ -1,22 +1,59 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
 
 from app.dependencies import get_current_user
-from app.exceptions import EntityNotFoundException
+from app.exceptions import (
+    ConcurrentUpdateException,
+    EntityNotFoundException,
+    PreconditionFailedException,
+)
 from app.models.user_models import Preferences
+from app.responses import conditional_json_response, json_etag
 from app.service.user_service import UserService, get_user_service
 
-
 user_router = APIRouter(prefix="/me", tags=["users"])
 
 
+@user_router.get("/preferences", response_model=Preferences)
+async def get_preferences(
+    request: Request,
+    user_service: Annotated[UserService, Depends(get_user_service)],
+    current_user: dict[str, str] = Depends(get_current_user),
+):
+    """
+    Tagged with an ETag, send it back in If-Match to only update the
+    preferences while they are still the version the edit was made to.
+    """
+    try:
+        preferences = await user_service.get_user_preferences(current_user["id"])
+    except EntityNotFoundException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return conditional_json_response(request, preferences)
+
+
 @user_router.put("/preferences", status_code=status.HTTP_204_NO_CONTENT)
-def update_preferences(
+async def update_preferences(
     preferences: Preferences,
     user_service: Annotated[UserService, Depends(get_user_service)],
+    response: Response,
     current_user: dict[str, str] = Depends(get_current_user),
+    if_match: Annotated[Optional[str], Header()] = None,
 ):
+    """
+    Send the preferences' ETag, from GET /me/preferences or an earlier
+    update, in If-Match to only update them while they are still the version
+    the edit was made to, otherwise the response is a 412.
+    """
     try:
-        user_service.update_user_preferences(preferences, current_user["id"])
+        updated_preferences = await user_service.update_user_preferences(
+            preferences, current_user["id"], if_match=if_match
+        )
     except EntityNotFoundException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except PreconditionFailedException as e:
+        raise HTTPException(
+            detail=str(e), status_code=status.HTTP_412_PRECONDITION_FAILED
+        )
+    except ConcurrentUpdateException as e:
+        raise HTTPException(detail=str(e), status_code=status.HTTP_409_CONFLICT)
+    response.headers["ETag"] = json_etag(updated_preferences)
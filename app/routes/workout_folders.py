@@ -1,13 +1,19 @@
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
 
 from app.dependencies import get_current_user
-from app.exceptions import UnauthorizedAccessException
+from app.exceptions import (
+    ConcurrentUpdateException,
+    PreconditionFailedException,
+    UnauthorizedAccessException,
+)
 from app.models.workout_folder_models import (
+    WorkoutFolderInDB,
     WorkoutFolderInRequest,
     WorkoutFolderInUpdate,
 )
+from app.responses import conditional_json_response, json_etag
 from app.service.workout_folder_service import (
     WorkoutFolderService,
     get_workout_folder_service,
@@ -16,19 +22,30 @@ from app.service.workout_folder_service import (
 workout_folder_router = APIRouter(prefix="/workout-folders", tags=["workout folders"])
 
 
-@workout_folder_router.get("/")
-def get_users_folders(
+@workout_folder_router.get(
+    "/", response_model=list[WorkoutFolderInDB], response_model_by_alias=True
+)
+async def get_users_folders(
+    request: Request,
     workout_folder_service: Annotated[
         WorkoutFolderService, Depends(get_workout_folder_service)
     ],
     decoded_token: dict[str, str] = Depends(get_current_user),
 ):
+    """
+    Tagged with an ETag, send it back in If-None-Match to get a 304 while the
+    folders haven't changed.
+    """
     user_id = decoded_token["id"]
-    return workout_folder_service.get_users_workout_folders(user_id)
+    folders = await workout_folder_service.get_users_workout_folders(user_id)
+    return conditional_json_response(request, folders)
 
 
-@workout_folder_router.get("/{folder_id}")
-def get_folder_by_id(
+@workout_folder_router.get(
+    "/{folder_id}", response_model=WorkoutFolderInDB, response_model_by_alias=True
+)
+async def get_folder_by_id(
+    request: Request,
     folder_id: str,
     workout_folder_service: Annotated[
         WorkoutFolderService, Depends(get_workout_folder_service)
@@ -36,7 +53,7 @@ def get_folder_by_id(
     decoded_token: dict = Depends(get_current_user),
 ):
     try:
-        folder = workout_folder_service.get_folder_by_id(
+        folder = await workout_folder_service.get_folder_by_id(
             folder_id, decoded_token.get("id", "")
         )
     except UnauthorizedAccessException as e:
@@ -46,49 +63,63 @@ def get_folder_by_id(
             detail="Folder with requested id does not exist",
             status_code=status.HTTP_400_BAD_REQUEST,
         )
-    return folder
+    return conditional_json_response(request, folder)
 
 
 @workout_folder_router.post("/", status_code=status.HTTP_201_CREATED)
-def create_workout_folder(
+async def create_workout_folder(
     folder_to_create: WorkoutFolderInRequest,
     workout_folder_service: Annotated[
         WorkoutFolderService, Depends(get_workout_folder_service)
     ],
     decoded_token: dict[str, str] = Depends(get_current_user),
 ):
-    return workout_folder_service.create_workout_folder(
+    return await workout_folder_service.create_workout_folder(
         folder_to_create, decoded_token["id"]
     )
 
 
 @workout_folder_router.put("/{folder_id}")
-def update_workout_folder(
+async def update_workout_folder(
     folder_id: str,
     folder_to_update: WorkoutFolderInUpdate,
     workout_folder_service: Annotated[
         WorkoutFolderService, Depends(get_workout_folder_service)
     ],
+    response: Response,
     decoded_token: dict[str, str] = Depends(get_current_user),
+    if_match: Annotated[Optional[str], Header()] = None,
 ):
+    """
+    Send the folder's ETag, from GET /workout-folders/{folder_id} or an earlier
+    update, in If-Match to only update it while it is still the version the
+    edit was made to, otherwise the response is a 412.
+    """
     try:
-        updated_folder = workout_folder_service.update_workout_folder(
-            folder_id, folder_to_update, user_id=decoded_token["id"]
+        updated_folder = await workout_folder_service.update_workout_folder(
+            folder_id, folder_to_update, user_id=decoded_token["id"], if_match=if_match
         )
     except ValueError as e:
         raise HTTPException(detail=str(e), status_code=status.HTTP_400_BAD_REQUEST)
     except UnauthorizedAccessException as e:
         raise HTTPException(detail=str(e), status_code=status.HTTP_401_UNAUTHORIZED)
+    except PreconditionFailedException as e:
+        raise HTTPException(
+            detail=str(e), status_code=status.HTTP_412_PRECONDITION_FAILED
+        )
+    except ConcurrentUpdateException as e:
+        raise HTTPException(detail=str(e), status_code=status.HTTP_409_CONFLICT)
     if updated_folder is None:
         raise HTTPException(
             detail="Folder with requested id does not exist",
             status_code=status.HTTP_400_BAD_REQUEST,
         )
+    response.headers["ETag"] = json_etag(updated_folder)
     return updated_folder
 
 
 @workout_folder_router.delete("/{folder_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_workout_folder(
+async def delete_workout_folder(
     folder_id: str,
     workout_folder_service: Annotated[
         WorkoutFolderService, Depends(get_workout_folder_service)
@@ -96,7 +127,9 @@ def delete_workout_folder(
     decoded_token: dict[str, str] = Depends(get_current_user),
 ):
     try:
-        workout_folder_service.delete_workout_folder(folder_id, decoded_token["id"])
+        await workout_folder_service.delete_workout_folder(
+            folder_id, decoded_token["id"]
+        )
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except UnauthorizedAccessException as e:
@@ -0,0 +1,81 @@
+"""
+Optimistic concurrency for the services' read-modify-write paths.
+
+A service reads the document along with its etag, works out the change and
+makes the write conditional on the etag it read. If another request wrote the
+document in between, the write fails with a 412 instead of undoing the other
+request's change, and retry_on_conflict runs the whole attempt again from the
+read. Nothing is locked, so requests that don't collide never wait.
+"""
+
+import asyncio
+import random
+from typing import Awaitable, Callable, TypeVar
+
+from azure.cosmos.exceptions import CosmosAccessConditionFailedError
+
+from app.exceptions import ConcurrentUpdateException
+from app.models.metrics_models import ConflictRetryStats
+
+T = TypeVar("T")
+
+MAX_ATTEMPTS = 4
+BASE_BACKOFF_SECONDS = 0.005
+
+
+class ConflictRetries:
+    """Counts the attempts retry_on_conflict makes, per operation."""
+
+    def __init__(self) -> None:
+        self._stats: dict[str, ConflictRetryStats] = {}
+
+    def record(self, operation: str, conflicts: int, exhausted: bool) -> None:
+        stats = self._stats.setdefault(
+            operation, ConflictRetryStats(calls=0, conflicts=0, exhausted=0)
+        )
+        stats.calls += 1
+        stats.conflicts += conflicts
+        stats.exhausted += exhausted
+
+    def stats(self) -> dict[str, ConflictRetryStats]:
+        return {
+            operation: stats.model_copy()
+            for operation, stats in sorted(self._stats.items())
+        }
+
+    def reset(self) -> None:
+        self._stats.clear()
+
+
+conflict_retries = ConflictRetries()
+
+
+async def retry_on_conflict(
+    operation: str,
+    attempt: Callable[[], Awaitable[T]],
+    max_attempts: int = MAX_ATTEMPTS,
+) -> T:
+    """
+    Runs attempt until its conditional write goes through, backing off a
+    random, growing delay between tries so the requests that collided don't
+    collide again.
+
+    :param operation: What to record the attempts under e.g.
+        WorkoutFolderService.update_workout_folder
+    :param attempt: Reads the document, then writes it conditional on its etag
+    :param max_attempts: Attempts to make before giving up
+    :raises ConcurrentUpdateException: If every attempt lost to another write
+    """
+    for conflicts in range(max_attempts):
+        if conflicts:
+            await asyncio.sleep(random.uniform(0, BASE_BACKOFF_SECONDS * 2**conflicts))
+        try:
+            result = await attempt()
+        except CosmosAccessConditionFailedError:
+            continue
+        conflict_retries.record(operation, conflicts, exhausted=False)
+        return result
+    conflict_retries.record(operation, max_attempts, exhausted=True)
+    raise ConcurrentUpdateException(
+        "The update kept conflicting with other changes, try again"
+    )
@@ -1,29 +1,142 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cache
+from typing import Optional
 from uuid import uuid4
 
 from azure.cosmos.exceptions import CosmosResourceNotFoundError
+from pydantic_core import to_json
 
-from app.data_access.exercise import ExerciseDataAccess
+from app.data_access.backends import get_storage_backend
+from app.data_access.containers import SYSTEM_CREATOR
+from app.data_access.protocols import ExerciseStore
 from app.exceptions import EntityAlreadyExistsException
 from app.models.exercises_models import ExerciseInCreate, ExerciseInDB
 
+MAX_CACHED_EXERCISES = 10_000
+EXERCISE_CACHE_TTL_SECONDS = 3600
+SYSTEM_CATALOG_TTL_SECONDS = 600
+
+
+@dataclass(frozen=True)
+class SystemExerciseCatalog:
+    """
+    The system exercises as read at one point in time. version is a hash of
+    their contents, so it only changes when the catalog does. rendered holds
+    them as the JSON array the API sends, so they're serialized once per
+    catalog rather than on every request.
+    """
+
+    exercises: tuple[ExerciseInDB, ...]
+    version: str
+    expires_at: float
+    rendered: bytes
+
+    @classmethod
+    def build(cls, exercises: list[ExerciseInDB]) -> "SystemExerciseCatalog":
+        documents = sorted((e.model_dump() for e in exercises), key=lambda e: e["id"])
+        version = hashlib.sha256(
+            json.dumps(documents, sort_keys=True).encode()
+        ).hexdigest()[:16]
+        return cls(
+            exercises=tuple(exercises),
+            version=version,
+            expires_at=time.monotonic() + SYSTEM_CATALOG_TTL_SECONDS,
+            rendered=to_json(exercises, by_alias=True),
+        )
+
 
 class ExerciseService:
-    def __init__(self, exercise_data_access: ExerciseDataAccess = ExerciseDataAccess()):
-        self.exercise_data_access = exercise_data_access
+    def __init__(
+        self,
+        exercise_data_access: Optional[ExerciseStore] = None,
+    ):
+        self.exercise_data_access = (
+            exercise_data_access or get_storage_backend().exercise_data_access()
+        )
+        # Exercises can't be changed or deleted through the API, so once read
+        # they can be served from memory. Keyed by (creator, id), so a user
+        # only ever gets system exercises and their own.
+        self._exercises: OrderedDict[tuple[str, str], tuple[float, ExerciseInDB]] = (
+            OrderedDict()
+        )
+        self._system_catalog: Optional[SystemExerciseCatalog] = None
+
+    def _remember(self, exercise: ExerciseInDB) -> None:
+        key = (exercise.creator, exercise.id)
+        self._exercises[key] = (time.monotonic() + EXERCISE_CACHE_TTL_SECONDS, exercise)
+        self._exercises.move_to_end(key)
+        if len(self._exercises) > MAX_CACHED_EXERCISES:
+            self._exercises.popitem(last=False)
+
+    def _recall(self, exercise_id: str, user_id: str) -> Optional[ExerciseInDB]:
+        now = time.monotonic()
+        for key in ((SYSTEM_CREATOR, exercise_id), (user_id, exercise_id)):
+            entry = self._exercises.get(key)
+            if entry is None:
+                continue
+            if now < entry[0]:
+                self._exercises.move_to_end(key)
+                return entry[1]
+            del self._exercises[key]
+        return None
+
+    async def get_system_catalog(self) -> SystemExerciseCatalog:
+        """
+        Retrieves the system exercises, which are only read again once the
+        catalog held in memory is SYSTEM_CATALOG_TTL_SECONDS old.
+
+        Returns:
+            SystemExerciseCatalog: The system exercises and their version.
+        """
+        catalog = self._system_catalog
+        if catalog is None or time.monotonic() >= catalog.expires_at:
+            exercises = await self.exercise_data_access.get_exercises_by_creator(
+                SYSTEM_CREATOR
+            )
+            catalog = self._system_catalog = SystemExerciseCatalog.build(exercises)
+        return catalog
+
+    async def get_catalog_and_user_exercises(
+        self, user_id: str
+    ) -> tuple[SystemExerciseCatalog, list[ExerciseInDB]]:
+        """
+        Retrieves the system catalog and the user's own exercises, kept apart
+        so callers can make use of the catalog's version and rendered JSON.
 
-    def get_system_and_user_exercises(self, user_id: str):
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            tuple: The system exercise catalog and the user's own exercises.
+        """
+        catalog, user_exercises = await asyncio.gather(
+            self.get_system_catalog(),
+            self.exercise_data_access.get_exercises_by_creator(user_id),
+        )
+        return catalog, user_exercises
+
+    async def get_system_and_user_exercises(self, user_id: str):
         """
         Retrieves the exercises for a given user from both the system and user-specific exercises.
 
+        The system exercises come from the catalog held in memory, only the
+        user's own exercises are queried for.
+
         Args:
             user_id (str): The ID of the user.
 
         Returns:
             list: A list of exercises for the user, including both system and user-specific exercises.
         """
-        return self.exercise_data_access.get_system_and_user_exercises(user_id)
+        catalog, user_exercises = await self.get_catalog_and_user_exercises(user_id)
+        return [*catalog.exercises, *user_exercises]
 
-    def create_custom_exercise(self, exercise: ExerciseInCreate, user_id: str):
+    async def create_custom_exercise(self, exercise: ExerciseInCreate, user_id: str):
         """
         Creates a custom exercise.
 
@@ -38,7 +151,7 @@ class ExerciseService:
             EntityAlreadyExistsException: If an exercise with the same name already exists.
         """
         if (
-            self.exercise_data_access.get_exercise_by_name(exercise.name, user_id)
+            await self.exercise_data_access.get_exercise_by_name(exercise.name, user_id)
             is not None
         ):
             raise EntityAlreadyExistsException(f"{exercise.name} already exists")
@@ -46,23 +159,36 @@ class ExerciseService:
         exercise_to_create = ExerciseInDB(
             id=exercise_id, name=exercise.name, body_parts=[], creator=user_id
         )
-        return self.exercise_data_access.create_custom_exercise(exercise_to_create)
+        created_exercise = await self.exercise_data_access.create_custom_exercise(
+            exercise_to_create
+        )
+        self._remember(created_exercise)
+        return created_exercise
 
-    def get_exercise_by_id(self, exercise_id: str):
+    async def get_exercise_by_id(self, exercise_id: str, user_id: str):
         """
-        Retrieves an exercise by its ID.
+        Retrieves an exercise by its ID from the system catalog or the user's own exercises.
 
         Args:
             exercise_id (str): The ID of the exercise to retrieve.
+            user_id (str): The ID of the user the exercise is being retrieved for.
 
         Returns:
             Exercise or None: The exercise object if found, None otherwise.
         """
+        exercise = self._recall(exercise_id, user_id)
+        if exercise is not None:
+            return exercise
         try:
-            return self.exercise_data_access.get_exercise_by_id(exercise_id)
+            exercise = await self.exercise_data_access.get_exercise_by_id(
+                exercise_id, user_id
+            )
         except CosmosResourceNotFoundError:
             return None
+        self._remember(exercise)
+        return exercise
 
 
-def get_exercise_service():
+@cache
+def get_exercise_service() -> ExerciseService:
     return ExerciseService()
@@ -1,66 +1,317 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from functools import cache
+from typing import AsyncIterator, Optional
 from uuid import uuid4
 
 from azure.cosmos.exceptions import CosmosHttpResponseError, CosmosResourceNotFoundError
 
-from app.data_access.set import SetDataAccess
-from app.exceptions import EntityNotFoundException, UnauthorizedAccessException
-from app.models.set_models import SetInCreate, SetInDB
-from app.service.exercise_service import ExerciseService
-from app.service.user_service import UserService
-from app.utils.date_utils import generate_utc_timestamp
-from app.utils.set_utils import group_sets_by_date, sorted_set_history
+from app.data_access.backends import get_storage_backend
+from app.data_access.protocols import SetAggregateStore, SetStore
+from app.exceptions import (
+    EntityNotFoundException,
+    InvalidContinuationTokenException,
+    UnauthorizedAccessException,
+)
+from app.models.set_models import (
+    BulkSetResult,
+    ExerciseProgress,
+    ExerciseSummary,
+    SetBucket,
+    SetGroup,
+    SetInCreate,
+    SetInDB,
+)
+from app.service.exercise_service import ExerciseService, get_exercise_service
+from app.service.user_service import UserService, get_user_service
+from app.utils.date_utils import (
+    generate_utc_timestamp,
+    is_epoch_ms,
+    iso_to_epoch_ms,
+)
+from app.utils.pagination_utils import (
+    decode_continuation_token,
+    encode_continuation_token,
+)
+from app.utils.set_utils import build_set_history, day_of, group_sets_by_date
+
+DEFAULT_HISTORY_PAGE_SIZE = 100
+MAX_HISTORY_PAGE_SIZE = 500
+DEFAULT_CHART_POINTS = 500
+MAX_CHART_POINTS = 2000
 
 
 class SetService:
     def __init__(
         self,
-        set_data_access: SetDataAccess = SetDataAccess(),
-        exercise_service: ExerciseService = ExerciseService(),
-        user_service: UserService = UserService(),
+        set_data_access: Optional[SetStore] = None,
+        exercise_service: Optional[ExerciseService] = None,
+        user_service: Optional[UserService] = None,
+        set_aggregate_data_access: Optional[SetAggregateStore] = None,
     ) -> None:
-        self.set_data_access = set_data_access
-        self.exercise_service = exercise_service
-        self.user_service = user_service
+        # Nothing is built at import time, the defaults are the shared
+        # services and the configured backend's data access
+        self.set_data_access = (
+            set_data_access or get_storage_backend().set_data_access()
+        )
+        self.set_aggregate_data_access = (
+            set_aggregate_data_access
+            or get_storage_backend().set_aggregate_data_access()
+        )
+        self.exercise_service = exercise_service or get_exercise_service()
+        self.user_service = user_service or get_user_service()
 
-    def get_set_by_id(self, set_id: str):
+    async def get_set_by_id(self, set_id: str, user_id: str):
         """
-        Retrieves a set by its ID.
+        Retrieves a set by its ID from the user's partition.
 
         Args:
             set_id (str): The ID of the set to retrieve.
+            user_id (str): The ID of the user who owns the set.
 
         Returns:
             dict or None: The set object if found, None otherwise.
         """
         try:
-            return self.set_data_access.get_set_by_id(set_id)
+            return await self.set_data_access.get_set_by_id(set_id, user_id)
         except CosmosResourceNotFoundError:
             return None
 
-    def get_users_sets_by_exercise_id(self, exercise_id: str, user_id: str):
+    async def get_users_sets_by_exercise_id(
+        self,
+        exercise_id: str,
+        user_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ):
         """
         Retrieves sets for a specific exercise and user, groups them by date, and returns the sorted set history.
 
         Args:
             exercise_id (str): The ID of the exercise.
             user_id (str): The ID of the user.
+            since (datetime, optional): Only sets logged at or after this time.
+            until (datetime, optional): Only sets logged before this time.
 
         Returns:
             list: The sorted set history, grouped by date.
         """
-        retrieved_sets = self.set_data_access.get_users_sets_by_exercise_id(
+        retrieved_sets = await self.set_data_access.get_users_sets_by_exercise_id(
+            exercise_id=exercise_id, user_id=user_id, since=since, until=until
+        )
+        return build_set_history(retrieved_sets)
+
+    async def get_users_set_history_page(
+        self,
+        exercise_id: str,
+        user_id: str,
+        page_size: int = DEFAULT_HISTORY_PAGE_SIZE,
+        continuation_token: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> tuple[list[SetGroup], Optional[str]]:
+        """
+        Retrieves one page of a user's set history for an exercise, grouped by date, newest day first.
+
+        Each page is a single read of at most page_size sets, in the order they were logged
+        (created_at_ms) rather than by their ISO timestamps. The oldest day on a page may carry
+        on into the next read, so it is held back and the next page starts with it instead,
+        keeping days whole. Only a day with more than page_size sets is split across pages.
+
+        Args:
+            exercise_id (str): The ID of the exercise.
+            user_id (str): The ID of the user.
+            page_size (int): The most sets to read for the page.
+            continuation_token (str, optional): The token returned with the previous page.
+            since (datetime, optional): Only sets logged at or after this time.
+            until (datetime, optional): Only sets logged before this time. Both
+                have to be passed again with the continuation token.
+
+        Returns:
+            tuple: The page of the set history and the token for the next page, None on the last page.
+
+        Raises:
+            InvalidContinuationTokenException: If the continuation token is not shaped like one
+                this method returns. Tokens aren't signed, one that is edited but still well formed
+                pages through the user's own sets from wherever it points.
+        """
+        state = {}
+        if continuation_token is not None:
+            state = decode_continuation_token(continuation_token)
+        before_ms, storage_token = state.get("before"), state.get("token")
+        if not (before_ms is None or is_epoch_ms(before_ms)) or not isinstance(
+            storage_token, (str, type(None))
+        ):
+            raise InvalidContinuationTokenException("Invalid continuation token")
+
+        try:
+            sets, next_storage_token = await self.set_data_access.get_users_sets_page(
+                exercise_id,
+                user_id,
+                page_size,
+                continuation_token=storage_token,
+                before_ms=before_ms,
+                since=since,
+                until=until,
+            )
+        except CosmosHttpResponseError as e:
+            if e.status_code == 400:
+                raise InvalidContinuationTokenException("Invalid continuation token")
+            raise
+
+        if next_storage_token is None:
+            return group_sets_by_date(sets), None
+        if not sets:
+            return [], encode_continuation_token(
+                {"before": before_ms, "token": next_storage_token}
+            )
+
+        oldest_day = day_of(sets[-1].date_created)
+        first_of_oldest_day = next(
+            i for i, s in enumerate(sets) if day_of(s.date_created) == oldest_day
+        )
+        held_back_ms = iso_to_epoch_ms(sets[first_of_oldest_day].date_created)
+        if first_of_oldest_day == 0 or held_back_ms is None:
+            # The whole page is one day, or the held back day can't be re-read by time,
+            # carry on reading from where this page ended
+            next_state = {"before": before_ms, "token": next_storage_token}
+        else:
+            sets = sets[:first_of_oldest_day]
+            # A fresh read of the held back day's sets and everything logged before them
+            next_state = {"before": held_back_ms + 1, "token": None}
+        return group_sets_by_date(sets), encode_continuation_token(next_state)
+
+    async def stream_users_set_history(
+        self, exercise_id: str, user_id: str, per: str = "day"
+    ) -> AsyncIterator[SetGroup | SetInDB]:
+        """
+        Streams a user's whole set history for an exercise, newest first, reading it from
+        storage a page at a time as it is consumed. However long the history, only the page
+        being read and the day being grouped are held in memory.
+
+        Args:
+            exercise_id (str): The ID of the exercise.
+            user_id (str): The ID of the user.
+            per (str): day to yield a SetGroup per day, set to yield each set on its own.
+
+        Yields:
+            SetGroup or SetInDB: The next day's sets or the next set.
+        """
+        sets = self.set_data_access.stream_users_sets(exercise_id, user_id)
+        if per == "set":
+            async for set_ in sets:
+                yield set_
+            return
+        # The sets arrive newest first, so a day is complete once a set from
+        # an earlier day turns up
+        current_day = None
+        current_sets: list[SetInDB] = []
+        async for set_ in sets:
+            day = day_of(set_.date_created)
+            if day != current_day:
+                if current_sets:
+                    yield SetGroup.model_construct(
+                        sets=current_sets, date_created=current_day
+                    )
+                current_day, current_sets = day, []
+            current_sets.append(set_)
+        if current_sets:
+            yield SetGroup.model_construct(sets=current_sets, date_created=current_day)
+
+    async def get_users_set_buckets(
+        self,
+        exercise_id: str,
+        user_id: str,
+        bucket: str,
+        points: int = DEFAULT_CHART_POINTS,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> list[SetBucket]:
+        """
+        Retrieves a user's set history for an exercise aggregated into day, week or month
+        buckets, for charting: the set count, max weight and volume of each bucket, oldest first.
+
+        However long the history, at most points buckets are returned. Past that they are
+        downsampled with Largest-Triangle-Three-Buckets on the max weight, which keeps the peaks
+        and dips of the line a chart draws through them.
+
+        Args:
+            exercise_id (str): The ID of the exercise.
+            user_id (str): The ID of the user.
+            bucket (str): day, week (starting Monday) or month, by the UTC day sets were logged.
+            points (int): The most buckets to return, at least 3.
+            since (datetime, optional): Only sets logged at or after this time.
+            until (datetime, optional): Only sets logged before this time.
+
+        Returns:
+            list[SetBucket]: The buckets with sets in them, oldest first.
+        """
+        # NumPy is imported on first use, see get_exercise_progress
+        from app.utils.chart_utils import bucket_sets, downsample_buckets
+
+        sets = await self.set_data_access.get_users_sets_by_exercise_id(
+            exercise_id=exercise_id, user_id=user_id, since=since, until=until
+        )
+        return downsample_buckets(bucket_sets(sets, bucket), points)  # type: ignore
+
+    async def get_exercise_summary(
+        self, exercise_id: str, user_id: str
+    ) -> Optional[ExerciseSummary]:
+        """
+        Retrieves the summary of a user's sets for an exercise: the heaviest
+        weight, best estimated one rep max, total volume and last session.
+
+        With Cosmos DB the summary is kept up to date from the change feed and
+        read in one request, so sets logged in the last few seconds may not
+        be in it yet.
+
+        Args:
+            exercise_id (str): The ID of the exercise.
+            user_id (str): The ID of the user.
+
+        Returns:
+            ExerciseSummary or None: The summary, None if the user has no sets
+                for the exercise.
+        """
+        return await self.set_aggregate_data_access.get_summary(user_id, exercise_id)
+
+    async def get_exercise_progress(
+        self, exercise_id: str, user_id: str
+    ) -> ExerciseProgress:
+        """
+        Retrieves a user's progress on an exercise day by day: the top set,
+        volume and estimated one rep max of each day with sets, and trends of
+        the last two over the trailing four weeks.
+
+        Args:
+            exercise_id (str): The ID of the exercise.
+            user_id (str): The ID of the user.
+
+        Returns:
+            ExerciseProgress: The progress, oldest day first, no days if the
+                user has no sets for the exercise.
+        """
+        # NumPy adds a tenth of a second to importing the app, only the
+        # analytics need it so a cold start doesn't pay for it
+        from app.utils.progress_utils import build_progress
+
+        sets = await self.set_data_access.get_users_sets_by_exercise_id(
             exercise_id=exercise_id, user_id=user_id
         )
-        grouped_sets = group_sets_by_date(retrieved_sets)
-        return sorted_set_history(grouped_sets)
+        return ExerciseProgress(exercise_id=exercise_id, days=build_progress(sets))
 
-    def create_set(self, set_in_create: SetInCreate, user_id: str):
+    async def create_set(
+        self, set_in_create: SetInCreate, user_id: str, user_from_token: bool = False
+    ):
         """
         Creates a new set for a user.
 
         Args:
             set_in_create (SetInCreate): The set details to create.
             user_id (str): The ID of the user.
+            user_from_token (bool): The user ID comes from a token this API
+                issued and verified, which is only issued to existing users,
+                so the user isn't read to check they exist.
 
         Returns:
             SetInDB: The created set.
@@ -68,11 +319,20 @@ class SetService:
         Raises:
             EntityNotFoundException: If the user or exercise does not exist.
         """
-        if self.user_service.get_user_by_id(user_id) is None:
-            raise EntityNotFoundException(f"User with ID {user_id} does not exist")
-        elif (
-            self.exercise_service.get_exercise_by_id(set_in_create.exercise_id) is None
-        ):
+        # Exercises are usually served from the exercise service's cache, when
+        # both have to be read they are read together
+        exercise_lookup = self.exercise_service.get_exercise_by_id(
+            set_in_create.exercise_id, user_id
+        )
+        if user_from_token:
+            exercise = await exercise_lookup
+        else:
+            user, exercise = await asyncio.gather(
+                self.user_service.get_user_by_id(user_id), exercise_lookup
+            )
+            if user is None:
+                raise EntityNotFoundException(f"User with ID {user_id} does not exist")
+        if exercise is None:
             raise EntityNotFoundException(
                 f"Exercise with ID {set_in_create.exercise_id} does not exist"
             )
@@ -83,9 +343,91 @@ class SetService:
             user_id=user_id,
             date_created=generate_utc_timestamp(),
         )
-        return self.set_data_access.create_set(set_to_create)
+        return await self.set_data_access.create_set(set_to_create)
+
+    async def create_sets(
+        self,
+        sets_in_create: list[SetInCreate],
+        user_id: str,
+        user_from_token: bool = False,
+    ) -> list[BulkSetResult]:
+        """
+        Creates a batch of sets for a user, such as a workout logged offline.
+
+        The user and each distinct exercise are checked once for the whole
+        batch, then the sets are written in as few requests as the storage
+        allows rather than one at a time.
+
+        Args:
+            sets_in_create (list[SetInCreate]): The sets to create, oldest first.
+            user_id (str): The ID of the user.
+            user_from_token (bool): The user ID comes from a token this API
+                issued and verified, so the user isn't read to check they exist.
+
+        Returns:
+            list[BulkSetResult]: The result for each set in the order given, the
+                created set with status 201 or the reason it wasn't created.
+
+        Raises:
+            EntityNotFoundException: If the user does not exist.
+        """
+        exercise_ids = list(dict.fromkeys(s.exercise_id for s in sets_in_create))
+        exercise_lookups = asyncio.gather(
+            *(
+                self.exercise_service.get_exercise_by_id(exercise_id, user_id)
+                for exercise_id in exercise_ids
+            )
+        )
+        if user_from_token:
+            exercises = await exercise_lookups
+        else:
+            user, exercises = await asyncio.gather(
+                self.user_service.get_user_by_id(user_id), exercise_lookups
+            )
+            if user is None:
+                raise EntityNotFoundException(f"User with ID {user_id} does not exist")
+        known = {
+            exercise_id
+            for exercise_id, exercise in zip(exercise_ids, exercises)
+            if exercise is not None
+        }
 
-    def delete_set(self, set_id: str, user_id: str):
+        results: list[BulkSetResult] = []
+        to_create: list[SetInDB] = []
+        # A millisecond apart, ending now, so the history keeps the sets in the
+        # order given in every view, created_at_ms included
+        logged_at = datetime.now(timezone.utc) - timedelta(
+            milliseconds=len(sets_in_create)
+        )
+        for set_in_create in sets_in_create:
+            if set_in_create.exercise_id not in known:
+                results.append(
+                    BulkSetResult(
+                        status=400,
+                        detail=f"Exercise with ID {set_in_create.exercise_id} does not exist",
+                    )
+                )
+                continue
+            logged_at += timedelta(milliseconds=1)
+            set_to_create = SetInDB(
+                id=str(uuid4()),
+                **set_in_create.model_dump(),
+                user_id=user_id,
+                date_created=logged_at.isoformat(),
+            )
+            to_create.append(set_to_create)
+            results.append(BulkSetResult(status=201, created=set_to_create))
+
+        statuses = iter(await self.set_data_access.create_sets(to_create))
+        for result in results:
+            if result.created is not None:
+                result.status = next(statuses)
+                if result.status != 201:
+                    result.created = None
+                    result.detail = "Not created, try again"
+        return results
+
+    async def delete_set(self, set_id: str, user_id: str):
         """
         Deletes a set with the given set_id if it exists and the user_id matches the creator's user_id.
 
@@ -100,19 +442,26 @@ class SetService:
             EntityNotFoundException: If the set with the given set_id does not exist.
             UnauthorizedAccessException: If the user attempting to delete the set is not the creator.
         """
-        set_to_delete = self.get_set_by_id(set_id)
+        set_to_delete = await self.get_set_by_id(set_id, user_id)
         if set_to_delete is None:
-            raise EntityNotFoundException(f"Set with ID {set_id} does not exist")
-        elif set_to_delete.user_id != user_id:
+            # Not in the user's partition, only now is it worth fanning out
+            # to tell a missing set apart from one owned by someone else.
+            if await self.set_data_access.find_set_by_id(set_id) is None:
+                raise EntityNotFoundException(f"Set with ID {set_id} does not exist")
             raise UnauthorizedAccessException(
                 "Only the person who created this set can delete it"
             )
         try:
-            self.set_data_access.delete_set(set_id)
-            return True
+            await self.set_data_access.delete_set(
+                set_id, user_id=user_id, exercise_id=set_to_delete.exercise_id
+            )
         except CosmosHttpResponseError:
             return False
+        # Deletes don't reach the summary through the change feed
+        await self.set_aggregate_data_access.refresh(user_id, set_to_delete.exercise_id)
+        return True
 
 
-def get_set_service():
+@cache
+def get_set_service() -> SetService:
     return SetService()
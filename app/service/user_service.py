@@ -1,15 +1,27 @@
+from functools import cache
+from typing import Optional
 from uuid import uuid4
 
-from azure.cosmos.exceptions import CosmosResourceNotFoundError
+from azure.cosmos.exceptions import (
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+from fastapi.concurrency import run_in_threadpool
 from jwt.exceptions import PyJWTError
 
-from app.auth.passwords import check_password, get_password_hash
+from app.auth.passwords import (
+    check_password,
+    get_password_hash,
+    password_hashing_pool,
+)
 from app.auth.tokens import decode_and_verify_token, encode_jwt
-from app.data_access.user import UserDataAccess
+from app.data_access.backends import get_storage_backend
+from app.data_access.protocols import UserStore
 from app.exceptions import (
     AuthenticationException,
     EntityAlreadyExistsException,
     EntityNotFoundException,
+    PreconditionFailedException,
     UnsupportedProviderException,
 )
 from app.models.auth_models import AuthRequest
@@ -21,13 +33,17 @@ from app.models.user_models import (
     UserInResponse,
     UserOAuth,
 )
+from app.responses import etag_matches, json_etag
+from app.service.concurrency import retry_on_conflict
 
 
 class UserService:
-    def __init__(self, user_data_access=UserDataAccess()) -> None:
-        self.user_data_access = user_data_access
+    def __init__(self, user_data_access: UserStore | None = None) -> None:
+        self.user_data_access = (
+            user_data_access or get_storage_backend().user_data_access()
+        )
 
-    def get_user_by_id(self, user_id: str) -> UserInDB | None:
+    async def get_user_by_id(self, user_id: str) -> UserInDB | None:
         """
         Retrieve a user from the database by their ID.
 
@@ -38,11 +54,11 @@ class UserService:
             UserInDB | None: The user object if found, None otherwise.
         """
         try:
-            return self.user_data_access.get_user_by_id(user_id)
+            return await self.user_data_access.get_user_by_id(user_id)
         except CosmosResourceNotFoundError:
             return None
 
-    def authenticate_oauth(self, auth_data: AuthRequest) -> UserInResponse:
+    async def authenticate_oauth(self, auth_data: AuthRequest) -> UserInResponse:
         """
         Authenticates a user using OAuth.
 
@@ -57,24 +73,35 @@ class UserService:
                 the token cannot be decoded, or the token data is invalid.
         """
         try:
-            decoded_provider_token = decode_and_verify_token(
-                auth_data.token, auth_data.provider
+            # Verifying provider tokens can fetch the provider's public keys
+            # over blocking HTTP when they aren't cached, so keep it off the
+            # event loop.
+            decoded_provider_token = await run_in_threadpool(
+                decode_and_verify_token, auth_data.token, auth_data.provider
             )
         except UnsupportedProviderException:
             raise AuthenticationException("oAuth provider not supported")
-        except (ValueError, PyJWTError) as e:
+        except (ValueError, PyJWTError):
             raise AuthenticationException("Unable to decode token")
 
         email_from_token = decoded_provider_token.get("email")
         if email_from_token is None:
             raise AuthenticationException("Invalid token data")
 
-        user_for_auth = self.user_data_access.get_user_by_email(email_from_token)
+        user_for_auth = await self.user_data_access.get_user_by_email(email_from_token)
         if user_for_auth is None:
             user_to_create = UserOAuth(
                 email=email_from_token, provider=auth_data.provider
             )
-            user_for_auth = self.create_user(user_to_create)
+            try:
+                user_for_auth = await self.create_user(user_to_create)
+            except EntityAlreadyExistsException:
+                # A sign in from another device created the user first
+                user_for_auth = await self.user_data_access.get_user_by_email(
+                    email_from_token
+                )
+                if user_for_auth is None:
+                    raise AuthenticationException("Unable to sign in, try again")
 
         return UserInResponse(
             id=user_for_auth.id,
@@ -82,7 +109,7 @@ class UserService:
             preferences=user_for_auth.preferences,
         )
 
-    def authenticate_email_password_auth(
+    async def authenticate_email_password_auth(
         self, user: UserEmailAuthInSignUpAndIn
     ) -> UserInResponse:
         """
@@ -96,15 +123,18 @@ class UserService:
 
         Raises:
             AuthenticationException: If the email or password is invalid, or if the user is not signed in with the correct provider.
+            PasswordHashingBusyException: If too many passwords are already waiting to be checked.
         """
-        user_in_db = self.user_data_access.get_user_by_email(user.email)
+        user_in_db = await self.user_data_access.get_user_by_email(user.email)
         if user_in_db is None:
             raise AuthenticationException("Invalid email or password")
         elif user_in_db.password_hash is None:
             raise AuthenticationException(
                 f"Please sign in with {user_in_db.provider} to continue"
             )
-        elif not check_password(user.password, user_in_db.password_hash):
+        elif not await password_hashing_pool.run(
+            check_password, user.password, user_in_db.password_hash
+        ):
             raise AuthenticationException("Invalid email or password")
 
         return UserInResponse(
@@ -113,7 +143,7 @@ class UserService:
             preferences=user_in_db.preferences,
         )
 
-    def sign_up_user(self, user: UserEmailAuthInSignUpAndIn) -> UserInResponse:
+    async def sign_up_user(self, user: UserEmailAuthInSignUpAndIn) -> UserInResponse:
         """
         Signs up a new user with the provided email and password.
 
@@ -125,21 +155,32 @@ class UserService:
 
         Raises:
             EntityAlreadyExistsException: If an account already exists with the provided email.
+            PasswordHashingBusyException: If too many passwords are already waiting to be hashed.
         """
-        if self.user_data_access.get_user_by_email(user.email) is not None:
+        if await self.user_data_access.get_user_by_email(user.email) is not None:
             raise EntityAlreadyExistsException(
                 "An account already exists with this email. Sign in to continue"
             )
-        hashed_password = get_password_hash(user.password)
+        # bcrypt is deliberately slow, keep it off the event loop and out of
+        # the threadpool the rest of the API uses
+        hashed_password = await password_hashing_pool.run(
+            get_password_hash, user.password
+        )
         user_to_create = UserEmailAuth(email=user.email, password_hash=hashed_password)
-        created_user = self.create_user(user_to_create)
+        try:
+            created_user = await self.create_user(user_to_create)
+        except EntityAlreadyExistsException:
+            # Another sign up with the same email got there while hashing
+            raise EntityAlreadyExistsException(
+                "An account already exists with this email. Sign in to continue"
+            )
         return UserInResponse(
             id=created_user.id,
             token=encode_jwt({"id": created_user.id, "email": created_user.email}),
             preferences=created_user.preferences,
         )
 
-    def create_user(self, user: UserOAuth | UserEmailAuth):
+    async def create_user(self, user: UserOAuth | UserEmailAuth):
         """
         Creates a new user.
 
@@ -149,39 +190,90 @@ class UserService:
         Returns:
             User: The created user object.
 
+        Raises:
+            EntityAlreadyExistsException: If the email already belongs to a user.
         """
         user_id = str(uuid4())
         user_for_creation = UserInDB(**user.model_dump(), id=user_id)
-        return self.user_data_access.create_user(user_for_creation)
+        try:
+            return await self.user_data_access.create_user(user_for_creation)
+        except CosmosResourceExistsError:
+            raise EntityAlreadyExistsException(f"{user.email} already has an account")
 
-    def update_user_preferences(self, preferences: Preferences, user_id: str) -> None:
+    async def get_user_preferences(self, user_id: str) -> Preferences:
         """
-        Updates the preferences of a user with the given user ID.
+        Retrieves the preferences of a user with the given user ID.
 
         Args:
-            preferences (Preferences): The new preferences to be updated.
-            user_id (str): The ID of the user to update.
+            user_id (str): The ID of the user.
+
+        Returns:
+            Preferences: The user's preferences.
 
         Raises:
             EntityNotFoundException: If no user with the given user ID is found.
+        """
+        try:
+            user = await self.user_data_access.get_user_by_id(user_id)
+        except CosmosResourceNotFoundError:
+            raise EntityNotFoundException("User not found")
+        return user.preferences
+
+    async def update_user_preferences(
+        self, preferences: Preferences, user_id: str, if_match: Optional[str] = None
+    ) -> Preferences:
+        """
+        Updates the preferences of a user with the given user ID. Only the
+        preferences provided are written, with a patch, so there's no read
+        before the write and the others keep their stored values.
+
+        With if_match the user is read first, and the preferences are only
+        updated while they are still the version the client's edit was based
+        on. The patch is conditional on the etag of the version read, and is
+        retried from the read if another write gets in between.
+
+        Args:
+            preferences (Preferences): The new preferences to be updated.
+            user_id (str): The ID of the user to update.
+            if_match (Optional[str]): The If-Match header, ETags of the
+                preferences as the client last saw them.
 
         Returns:
-            None
+            Preferences: The preferences as updated.
+
+        Raises:
+            EntityNotFoundException: If no user with the given user ID is found.
+            PreconditionFailedException: If the preferences no longer match if_match.
+            ConcurrentUpdateException: If the user kept changing under the update.
         """
-        user_to_update = self.get_user_by_id(user_id)
-        if user_to_update is None:
+        changes = preferences.model_dump(exclude_none=True)
+        try:
+            if if_match is not None:
+                user = await retry_on_conflict(
+                    "UserService.update_user_preferences",
+                    lambda: self._update_preferences_if_match(
+                        user_id, changes, if_match
+                    ),
+                )
+            else:
+                user = await self.user_data_access.patch_preferences(user_id, changes)
+        except CosmosResourceNotFoundError:
             raise EntityNotFoundException("User not found")
-        # Get the current preferences
-        # add the current preferences into the ones to be updated
-        # if its not already in there.
-        current_preferences = user_to_update.preferences.model_dump()
-        updating_preferences = preferences.model_dump()
-        for key in current_preferences:
-            if updating_preferences.get(key) is None:
-                updating_preferences[key] = current_preferences[key]
-        user_to_update.preferences = Preferences(**updating_preferences)
-        self.user_data_access.update_user(user_to_update)
+        return user.preferences
+
+    async def _update_preferences_if_match(
+        self, user_id: str, changes: dict, if_match: str
+    ) -> UserInDB:
+        user, etag = await self.user_data_access.get_user_and_etag(user_id)
+        if not etag_matches(if_match, json_etag(user.preferences)):
+            raise PreconditionFailedException(
+                "The preferences have changed since they were read, fetch them again"
+            )
+        return await self.user_data_access.patch_preferences(
+            user_id, changes, etag=etag
+        )
 
 
+@cache
 def get_user_service() -> UserService:
     return UserService()
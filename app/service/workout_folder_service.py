@@ -1,24 +1,32 @@
+from functools import cache
+from typing import Optional
 from uuid import uuid4
 
 from azure.cosmos.exceptions import CosmosHttpResponseError, CosmosResourceNotFoundError
 
-from app.data_access.workout_folder import WorkoutFolderDataAccess
-from app.exceptions import UnauthorizedAccessException
+from app.data_access.backends import get_storage_backend
+from app.data_access.protocols import WorkoutFolderStore
+from app.exceptions import PreconditionFailedException, UnauthorizedAccessException
 from app.models.workout_folder_models import (
     WorkoutFolderInDB,
     WorkoutFolderInRequest,
     WorkoutFolderInUpdate,
 )
+from app.responses import etag_matches, json_etag
+from app.service.concurrency import retry_on_conflict
 
 
 class WorkoutFolderService:
     def __init__(
         self,
-        workout_folder_data_access: WorkoutFolderDataAccess = WorkoutFolderDataAccess(),
+        workout_folder_data_access: Optional[WorkoutFolderStore] = None,
     ) -> None:
-        self.workout_folder_data_access = workout_folder_data_access
+        self.workout_folder_data_access = (
+            workout_folder_data_access
+            or get_storage_backend().workout_folder_data_access()
+        )
 
-    def get_folder_by_id(self, folder_id: str, user_requesting_folder: str):
+    async def get_folder_by_id(self, folder_id: str, user_requesting_folder: str):
         """
         Retrieves a workout folder by its ID.
 
@@ -33,16 +41,21 @@ class WorkoutFolderService:
             UnauthorizedAccessException: If the folder does not belong to the user.
         """
         try:
-            retrieved_folder = self.workout_folder_data_access.get_folder_by_id(
-                folder_id
+            return await self.workout_folder_data_access.get_folder_by_id(
+                folder_id, user_requesting_folder
             )
         except CosmosResourceNotFoundError:
-            return None
-        if retrieved_folder.user_id != user_requesting_folder:
+            pass
+        await self._raise_if_owned_by_another_user(folder_id)
+        return None
+
+    async def _raise_if_owned_by_another_user(self, folder_id: str) -> None:
+        # Not in the user's partition, only now is it worth fanning out
+        # to tell a missing folder apart from one owned by someone else.
+        if await self.workout_folder_data_access.find_folder_by_id(folder_id):
             raise UnauthorizedAccessException("You do not have access to this folder")
-        return retrieved_folder
 
-    def get_users_workout_folders(self, user_id: str) -> list[WorkoutFolderInDB]:
+    async def get_users_workout_folders(self, user_id: str) -> list[WorkoutFolderInDB]:
         """
         Retrieves the workout folders for a specific user.
 
@@ -52,9 +65,9 @@ class WorkoutFolderService:
         Returns:
             list[WorkoutFolderInDB]: A list of workout folders associated with the user.
         """
-        return self.workout_folder_data_access.get_users_workout_folders(user_id)
+        return await self.workout_folder_data_access.get_users_workout_folders(user_id)
 
-    def create_workout_folder(self, folder: WorkoutFolderInRequest, user_id: str):
+    async def create_workout_folder(self, folder: WorkoutFolderInRequest, user_id: str):
         """
         Creates a new workout folder.
 
@@ -71,20 +84,33 @@ class WorkoutFolderService:
         folder_for_creation = WorkoutFolderInDB(
             **folder.model_dump(), user_id=user_id, id=folder_id
         )
-        return self.workout_folder_data_access.create_workout_folder(
+        return await self.workout_folder_data_access.create_workout_folder(
             folder_for_creation
         )
 
-    def update_workout_folder(
-        self, folder_id: str, data_to_update: WorkoutFolderInUpdate, user_id: str
+    async def update_workout_folder(
+        self,
+        folder_id: str,
+        data_to_update: WorkoutFolderInUpdate,
+        user_id: str,
+        if_match: Optional[str] = None,
     ):
         """
-        Updates a workout folder with the provided data.
+        Updates a workout folder with the provided data. Only the fields
+        provided are written, with a patch, so there's no read before the
+        write and a concurrent update to the other field isn't lost.
+
+        With if_match the folder is read first, and only updated while it is
+        still the version the client's edit was based on. The patch is
+        conditional on the etag of the version read, and is retried from the
+        read if another write gets in between.
 
         Args:
             folder_id (str): The ID of the folder to update.
             data_to_update (WorkoutFolderInUpdate): The data to update the folder with.
             user_id (str): The ID of the user performing the update.
+            if_match (Optional[str]): The If-Match header, ETags of the folder
+                as the client last saw it.
 
         Returns:
             WorkoutFolder: The updated workout folder.
@@ -92,29 +118,55 @@ class WorkoutFolderService:
         Raises:
             ValueError: If neither the folder name nor the exercises are provided.
             UnauthorizedAccessException: If the folder does not belong to the user.
+            PreconditionFailedException: If the folder no longer matches if_match.
+            ConcurrentUpdateException: If the folder kept changing under the update.
         """
         if data_to_update.name is None and data_to_update.exercises is None:
             raise ValueError(
                 "Folder name or exercises must be provided to update folder"
             )
+        changes = {
+            f"/{field}": value
+            for field, value in data_to_update.model_dump().items()
+            if value is not None
+        }
+        if if_match is not None:
+            return await retry_on_conflict(
+                "WorkoutFolderService.update_workout_folder",
+                lambda: self._update_if_match(folder_id, changes, user_id, if_match),
+            )
         try:
-            retrieved_folder = self.workout_folder_data_access.get_folder_by_id(
-                folder_id
+            return await self.workout_folder_data_access.patch_workout_folder(
+                folder_id, user_id, changes
             )
         except CosmosResourceNotFoundError:
-            return None
-
-        if retrieved_folder.user_id != user_id:
-            raise UnauthorizedAccessException("You do not have access to this folder")
+            pass
+        await self._raise_if_owned_by_another_user(folder_id)
+        return None
 
-        if data_to_update.name is not None:
-            retrieved_folder.name = data_to_update.name
-        if data_to_update.exercises is not None:
-            retrieved_folder.exercises = data_to_update.exercises
-
-        return self.workout_folder_data_access.update_workout_folder(retrieved_folder)
+    async def _update_if_match(
+        self, folder_id: str, changes: dict, user_id: str, if_match: str
+    ) -> Optional[WorkoutFolderInDB]:
+        try:
+            folder, etag = await self.workout_folder_data_access.get_folder_and_etag(
+                folder_id, user_id
+            )
+        except CosmosResourceNotFoundError:
+            await self._raise_if_owned_by_another_user(folder_id)
+            return None
+        if not etag_matches(if_match, json_etag(folder)):
+            raise PreconditionFailedException(
+                "The folder has changed since it was read, fetch it again"
+            )
+        try:
+            return await self.workout_folder_data_access.patch_workout_folder(
+                folder_id, user_id, changes, etag=etag
+            )
+        except CosmosResourceNotFoundError:
+            # Deleted since it was read
+            return None
 
-    def delete_workout_folder(self, folder_id: str, user_id: str):
+    async def delete_workout_folder(self, folder_id: str, user_id: str):
         """
         Deletes a workout folder with the specified folder_id for the given user_id.
 
@@ -129,15 +181,18 @@ class WorkoutFolderService:
             ValueError: If the folder with the requested ID does not exist.
             UnauthorizedAccessException: If the folder does not belong to the user.
         """
-        folder_to_delete = self.get_folder_by_id(folder_id, user_id)
+        folder_to_delete = await self.get_folder_by_id(folder_id, user_id)
         if folder_to_delete is None:
             raise ValueError("Folder with requested id does not exist")
         try:
-            self.workout_folder_data_access.delete_workout_folder(folder_id)
+            await self.workout_folder_data_access.delete_workout_folder(
+                folder_id, user_id
+            )
             return True
         except CosmosHttpResponseError:
             return False
 
 
+@cache
 def get_workout_folder_service() -> WorkoutFolderService:
     return WorkoutFolderService()
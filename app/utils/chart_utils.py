@@ -0,0 +1,113 @@
+from typing import Literal
+
+import numpy as np
+
+from app.models.set_models import SetBucket, SetInDB
+from app.utils.set_utils import day_of
+
+Bucket = Literal["day", "week", "month"]
+
+
+def _bucket_starts(days: np.ndarray, bucket: Bucket) -> np.ndarray:
+    """
+    :param days: datetime64[D] days
+    :return: The first day of the bucket each day falls in, weeks start on Monday
+    """
+    if bucket == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    if bucket == "week":
+        # Day 0, 1970-01-01, was a Thursday
+        day_numbers = days.astype(np.int64)
+        return (day_numbers - (day_numbers + 3) % 7).astype("datetime64[D]")
+    return days
+
+
+def bucket_sets(sets: list[SetInDB], bucket: Bucket) -> list[SetBucket]:
+    """
+    Aggregates sets into day, week or month buckets by the UTC day they were
+    logged, with vectorised passes over arrays of the sets' fields.
+
+    :param sets: The sets of one exercise, in any order
+    :param bucket: The length of the buckets
+    :return: list of SetBucket, oldest first, only buckets with sets
+    """
+    if not sets:
+        return []
+    count = len(sets)
+    weights = np.fromiter((s.weight for s in sets), dtype=np.float64, count=count)
+    reps = np.fromiter((s.reps for s in sets), dtype=np.int64, count=count)
+    days = np.array([day_of(s.date_created) for s in sets], dtype="datetime64[D]")
+
+    starts_of = _bucket_starts(days, bucket)
+    order = np.argsort(starts_of, kind="stable")
+    weights, reps, starts_of = weights[order], reps[order], starts_of[order]
+    bucket_starts, firsts = np.unique(starts_of, return_index=True)
+    columns = zip(
+        np.datetime_as_string(bucket_starts).tolist(),
+        np.diff(np.append(firsts, count)).tolist(),
+        np.maximum.reduceat(weights, firsts).tolist(),
+        np.add.reduceat(weights * reps, firsts).tolist(),
+    )
+    return [
+        SetBucket.model_construct(
+            start=start, set_count=set_count, max_weight=max_weight, volume=volume
+        )
+        for start, set_count, max_weight, volume in columns
+    ]
+
+
+def largest_triangle_three_buckets(
+    x: np.ndarray, y: np.ndarray, points: int
+) -> np.ndarray:
+    """
+    Picks points of a series to keep with Largest-Triangle-Three-Buckets
+    (Steinarsson, 2013): the first and last points, and from each of points - 2
+    even slices of the rest the point making the largest triangle with the
+    point kept before it and the mean of the next slice. Peaks and troughs
+    survive, where keeping every nth point would step over them.
+
+    :param x: The series' x values, ascending
+    :param y: Its y values
+    :param points: The most points to keep, at least 3
+    :return: The indexes of the points kept, ascending
+    """
+    length = len(x)
+    if length <= points:
+        return np.arange(length)
+    edges = np.linspace(1, length - 1, points - 1).astype(np.int64)
+    kept = np.empty(points, dtype=np.int64)
+    kept[0], kept[-1] = 0, length - 1
+    previous = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[end : edges[i + 2]].mean()
+            next_y = y[end : edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        # Twice the area of each candidate's triangle, the constant doesn't
+        # change which is largest
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[i + 1] = previous
+    return kept
+
+
+def downsample_buckets(buckets: list[SetBucket], points: int) -> list[SetBucket]:
+    """
+    Keeps at most points of the buckets, chosen by LTTB on their max weight
+    over time, so the chart keeps its shape.
+
+    :param buckets: Buckets oldest first
+    :param points: The most buckets to return, at least 3
+    """
+    if len(buckets) <= points:
+        return buckets
+    x = np.array([b.start for b in buckets], dtype="datetime64[D]").astype(np.float64)
+    y = np.fromiter(
+        (b.max_weight for b in buckets), dtype=np.float64, count=len(buckets)
+    )
+    return [buckets[i] for i in largest_triangle_three_buckets(x, y, points).tolist()]
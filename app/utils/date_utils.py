@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
 
 
 def add_days_to_date(date: datetime, days: int) -> datetime:
@@ -7,3 +8,42 @@ def add_days_to_date(date: datetime, days: int) -> datetime:
 
 def generate_utc_timestamp() -> str:
     return datetime.now(timezone.utc).isoformat()
+
+
+def as_utc(date: datetime) -> datetime:
+    """
+    :return: The date in UTC, taking a naive date to be in UTC already
+    """
+    if date.tzinfo is None:
+        return date.replace(tzinfo=timezone.utc)
+    return date.astimezone(timezone.utc)
+
+
+def to_epoch_ms(date: datetime) -> int:
+    """
+    :return: Milliseconds since the Unix epoch, a naive date is taken to be UTC
+    """
+    return int(as_utc(date).timestamp() * 1000)
+
+
+def is_epoch_ms(value: Any) -> bool:
+    """
+    :return: Whether value can be a time in milliseconds since the Unix epoch,
+        an integer that fits the 64 bits Cosmos and SQLite store it in
+    """
+    return (
+        isinstance(value, int)
+        and not isinstance(value, bool)
+        and -(2**63) <= value < 2**63
+    )
+
+
+def iso_to_epoch_ms(timestamp: str) -> Optional[int]:
+    """
+    :return: The ISO timestamp in milliseconds since the Unix epoch, None if it
+        can't be parsed
+    """
+    try:
+        return to_epoch_ms(datetime.fromisoformat(timestamp))
+    except ValueError:
+        return None
@@ -0,0 +1,30 @@
+import base64
+import binascii
+import json
+
+from app.exceptions import InvalidContinuationTokenException
+
+
+def encode_continuation_token(state: dict) -> str:
+    """
+    Packs the state needed to resume a paged read into an opaque, URL safe token
+    :param state: JSON serialisable state, e.g. the storage's own continuation
+    :return: The token to hand to the client
+    """
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def decode_continuation_token(token: str) -> dict:
+    """
+    Reverses encode_continuation_token
+    :param token: A token from encode_continuation_token
+    :return: The state packed into the token
+    :raises InvalidContinuationTokenException: If the token can't be decoded
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidContinuationTokenException("Invalid continuation token")
+    if not isinstance(state, dict):
+        raise InvalidContinuationTokenException("Invalid continuation token")
+    return state
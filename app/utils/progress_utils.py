@@ -0,0 +1,94 @@
+import numpy as np
+
+from app.models.set_models import DailyProgress, SetInDB
+from app.utils.set_utils import day_of
+
+TREND_WINDOW_DAYS = 28
+# Brzycki's formula divides by 37 - reps, past 36 reps it has no answer
+BRZYCKI_MAX_REPS = 36
+
+
+def build_progress(sets: list[SetInDB]) -> list[DailyProgress]:
+    """
+    Works out, for each UTC day with sets, the top set, the volume, the best
+    one rep max estimates and their trends over the trailing four weeks.
+
+    The sets are copied into arrays once, everything after that is a handful
+    of vectorised passes, so the cost grows with the number of sets at NumPy
+    rather than Python speed. Only the days are turned back into models.
+
+    :param sets: The sets of one exercise, in any order
+    :return: list of DailyProgress, oldest day first
+    """
+    if not sets:
+        return []
+    count = len(sets)
+    weights = np.fromiter((s.weight for s in sets), dtype=np.float64, count=count)
+    reps = np.fromiter((s.reps for s in sets), dtype=np.int64, count=count)
+    days = np.array([day_of(s.date_created) for s in sets], dtype="datetime64[D]")
+
+    # By day, then weight, then reps, so each day's top set is its last
+    order = np.lexsort((reps, weights, days))
+    weights, reps, days = weights[order], reps[order], days[order]
+    unique_days, starts = np.unique(days, return_index=True)
+    ends = np.append(starts[1:], count)
+
+    volume = np.add.reduceat(weights * reps, starts)
+    # The same estimate as estimated_one_rep_max, a set at a time
+    epley = np.where(reps == 1, weights, weights * (1 + reps / 30))
+    brzycki = np.divide(
+        weights * 36,
+        37 - reps,
+        out=np.full(count, np.nan),
+        where=reps <= BRZYCKI_MAX_REPS,
+    )
+    best_epley = np.maximum.reduceat(epley, starts)
+    # fmax skips the sets Brzycki has no estimate for, a day of only those is NaN
+    best_brzycki = np.fmax.reduceat(brzycki, starts)
+
+    # The window for each day starts at the first training day less than
+    # TREND_WINDOW_DAYS before it, its means come from running totals
+    day_numbers = unique_days.astype(np.int64)
+    window_starts = np.searchsorted(day_numbers, day_numbers - TREND_WINDOW_DAYS + 1)
+    window_sizes = np.arange(1, len(day_numbers) + 1) - window_starts
+
+    def trailing_mean(values: np.ndarray) -> np.ndarray:
+        totals = np.concatenate(([0.0], np.cumsum(values)))
+        return (totals[1:] - totals[window_starts]) / window_sizes
+
+    columns = zip(
+        np.datetime_as_string(unique_days).tolist(),
+        (ends - starts).tolist(),
+        weights[ends - 1].tolist(),
+        reps[ends - 1].tolist(),
+        volume.tolist(),
+        best_epley.tolist(),
+        np.where(np.isnan(best_brzycki), None, best_brzycki).tolist(),
+        trailing_mean(best_epley).tolist(),
+        trailing_mean(volume).tolist(),
+    )
+    # Built from plain Python numbers that are already the right types
+    return [
+        DailyProgress.model_construct(
+            date=date,
+            set_count=set_count,
+            top_set_weight=top_set_weight,
+            top_set_reps=top_set_reps,
+            volume=day_volume,
+            estimated_one_rep_max=epley_max,
+            brzycki_one_rep_max=brzycki_max,
+            one_rep_max_trend=one_rep_max_trend,
+            volume_trend=volume_trend,
+        )
+        for (
+            date,
+            set_count,
+            top_set_weight,
+            top_set_reps,
+            day_volume,
+            epley_max,
+            brzycki_max,
+            one_rep_max_trend,
+            volume_trend,
+        ) in columns
+    ]
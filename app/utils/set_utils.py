@@ -1,27 +1,60 @@
-import functools
-from copy import deepcopy
 from datetime import datetime
 
-from app.models.set_models import SetGroup, SetInDB
+from app.models.set_models import ExerciseSummary, SetGroup, SetInDB
+
+
+def day_of(date_created: str) -> str:
+    """
+    :return: The date part of an ISO timestamp, the day a set is grouped under
+    """
+    return date_created.split("T")[0]
+
+
+def estimated_one_rep_max(weight: float, reps: int) -> float:
+    """
+    Epley's estimate, weight * (1 + reps / 30). A single is its own one rep max.
+    """
+    if reps == 1:
+        return weight
+    return weight * (1 + reps / 30)
+
+
+def add_set_to_summary(
+    summary: ExerciseSummary, weight: float, reps: int, date_created: str
+) -> None:
+    """
+    Folds one set into the summary in place. Every figure is a count, sum or
+    maximum, so sets can be added in any order.
+    """
+    summary.set_count += 1
+    summary.max_weight = max(summary.max_weight, weight)
+    summary.best_estimated_one_rep_max = max(
+        summary.best_estimated_one_rep_max, estimated_one_rep_max(weight, reps)
+    )
+    summary.total_volume += weight * reps
+    day = day_of(date_created)
+    if summary.last_session_date is None or day > summary.last_session_date:
+        summary.last_session_date = day
 
 
 def group_sets_by_date(sets: list[SetInDB]) -> list[SetGroup]:
     """
-    Group sets by date_created attribute
+    Group sets by date_created attribute, in the order each date is first seen
     :param sets: list of SetInDB
     :return: list of SetGroup
     """
-
-    def __grouping_func(acc, set_):
-        dict_key = set_.date_created.split("T")[0]
-        if dict_key not in acc:
-            acc[dict_key] = []
-        acc[dict_key].append(set_)
-        return acc
-
-    grouped_dict: dict = functools.reduce(__grouping_func, sets, {})
+    grouped: dict[str, list[SetInDB]] = {}
+    for set_ in sets:
+        day = day_of(set_.date_created)
+        group = grouped.get(day)
+        if group is None:
+            grouped[day] = group = []
+        group.append(set_)
+    # The sets were validated when they were read, so there is nothing left to
+    # check and model_construct skips validating (and copying) them again
     return [
-        SetGroup(sets=value, date_created=key) for key, value in grouped_dict.items()
+        SetGroup.model_construct(sets=value, date_created=key)
+        for key, value in grouped.items()
     ]
 
 
@@ -32,15 +65,57 @@ def sorted_set_history(set_history: list[SetGroup]) -> list[SetGroup]:
     Firstly this function sorts the top level history by date in reverse
     chronological order. Then for each dictionary sorts the sets in the same way.
 
+    The groups passed in are left untouched, the sorted history is made of new
+    groups holding the same sets.
+
     :param set_history: The data to be sorted
     :returns SetGroup: In sorted order.
     """
+    sorted_groups = []
+    for set_group in set_history:
+        # Parse each timestamp once rather than on every comparison
+        timestamps = [datetime.fromisoformat(s.date_created) for s in set_group.sets]
+        order = sorted(range(len(timestamps)), key=timestamps.__getitem__, reverse=True)
+        sorted_groups.append(
+            (
+                datetime.fromisoformat(set_group.date_created),
+                SetGroup.model_construct(
+                    sets=[set_group.sets[i] for i in order],
+                    date_created=set_group.date_created,
+                ),
+            )
+        )
+    sorted_groups.sort(key=lambda item: item[0], reverse=True)
+    return [set_group for _, set_group in sorted_groups]
 
-    def sort_key(item: SetGroup | SetInDB):
-        return datetime.fromisoformat(item.date_created)
 
-    data_for_sort = deepcopy(set_history)
-    for set_group in data_for_sort:
-        set_group.sets.sort(key=sort_key, reverse=True)
-    data_for_sort.sort(key=sort_key, reverse=True)
-    return data_for_sort
+def build_set_history(sets: list[SetInDB]) -> list[SetGroup]:
+    """
+    Groups sets by date and sorts the groups, and the sets in each, newest
+    first. Equivalent to sorted_set_history(group_sets_by_date(sets)) but
+    parses each timestamp once, sorts once and builds the groups in a single
+    pass over the sorted sets, without copying them.
+
+    :param sets: list of SetInDB in any order
+    :return: list of SetGroup, newest day first
+    """
+    # ISO dates sort the same as strings and as dates, so only the full
+    # timestamps need parsing for the order within a day
+    keys = [
+        (day_of(s.date_created), datetime.fromisoformat(s.date_created)) for s in sets
+    ]
+    order = sorted(range(len(sets)), key=keys.__getitem__, reverse=True)
+
+    history: list[SetGroup] = []
+    current_day = None
+    current_sets: list[SetInDB] = []
+    for i in order:
+        day = keys[i][0]
+        if day != current_day:
+            current_sets = []
+            history.append(
+                SetGroup.model_construct(sets=current_sets, date_created=day)
+            )
+            current_day = day
+        current_sets.append(sets[i])
+    return history
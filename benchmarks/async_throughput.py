@@ -0,0 +1,92 @@
+"""
+Compares how many point reads a second one worker sustains when each Cosmos
+call blocks a threadpool thread, which is how the old `def` handlers ran,
+against awaiting the same call on the event loop through the async data
+access layer.
+
+Both sides read from a stand-in container that answers after a fixed delay
+in place of the network round-trip to Cosmos, so no account is needed.
+
+    python -m benchmarks.async_throughput --requests 2000 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import time
+
+import anyio.to_thread
+
+from app.data_access.user import UserDataAccess
+from app.models.user_models import UserInDB
+
+USER = {
+    "id": "1",
+    "email": "bench@email.com",
+    "preferences": {"theme": "system"},
+    "provider": "apple",
+}
+
+
+class StandInContainer:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+
+    def read_item_blocking(self, item: str, partition_key: str) -> dict:
+        time.sleep(self.latency)
+        return {**USER, "id": item}
+
+    async def read_item(self, item: str, partition_key: str) -> dict:
+        await asyncio.sleep(self.latency)
+        return {**USER, "id": item}
+
+
+class StandInUserDataAccess(UserDataAccess):
+    def __init__(self, container: StandInContainer) -> None:
+        super().__init__()
+        self.stand_in = container
+
+    @property
+    def container(self):  # type: ignore[override]
+        return self.stand_in
+
+
+def sync_handler(container: StandInContainer, user_id: str) -> UserInDB:
+    return UserInDB(**container.read_item_blocking(user_id, partition_key=user_id))
+
+
+async def run_sync(container: StandInContainer, requests: int) -> float:
+    # FastAPI runs `def` handlers through anyio's default thread limiter,
+    # so this is the ceiling the old handlers had.
+    start = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        for i in range(requests):
+            tg.start_soon(anyio.to_thread.run_sync, sync_handler, container, str(i))
+    return time.perf_counter() - start
+
+
+async def run_async(container: StandInContainer, requests: int) -> float:
+    data_access = StandInUserDataAccess(container)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(data_access.get_user_by_id(str(i)) for i in range(requests)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    container = StandInContainer(args.latency_ms / 1000)
+    sync_seconds = asyncio.run(run_sync(container, args.requests))
+    async_seconds = asyncio.run(run_async(container, args.requests))
+
+    print(f"{args.requests} point reads, {args.latency_ms}ms simulated latency")
+    print(f"sync (threadpool): {args.requests / sync_seconds:10.0f} req/s")
+    print(f"async (event loop): {args.requests / async_seconds:9.0f} req/s")
+    print(f"speedup: {sync_seconds / async_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
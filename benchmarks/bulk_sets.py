@@ -0,0 +1,94 @@
+"""
+Compares uploading a workout logged offline the way the app replays it,
+one POST /sets/ per set, against sending it to POST /sets/bulk in one go.
+
+Runs the service against the in-memory Cosmos stand-in with a fixed delay
+on every request in place of the network round-trip. The replay's HTTP
+round-trips, one per set, aren't counted, so the real gap is wider.
+
+    python -m benchmarks.bulk_sets --sets 40 --exercises 5 --latency-ms 10
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.data_access.containers import SYSTEM_CREATOR
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.exercise import ExerciseDataAccess
+from app.data_access.instrumentation import data_access_metrics
+from app.data_access.set import SetDataAccess
+from app.models.exercises_models import ExerciseInDB
+from app.models.set_models import SetInCreate
+from app.service.exercise_service import ExerciseService
+from app.service.set_service import SetService
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+USER_ID = "bench-user"
+
+
+async def timed(upload) -> tuple[float, int]:
+    data_access_metrics.reset()
+    start = time.perf_counter()
+    await upload()
+    elapsed = time.perf_counter() - start
+    requests = sum(o.count for o in data_access_metrics.summary().operations)
+    return elapsed, requests
+
+
+async def run(sets: int, exercises: int) -> None:
+    exercise_data_access = ExerciseDataAccess()
+    for i in range(exercises):
+        await exercise_data_access.create_custom_exercise(
+            ExerciseInDB(
+                id=f"exercise-{i}",
+                name=f"Exercise {i}",
+                body_parts=[],
+                creator=SYSTEM_CREATOR,
+            )
+        )
+    workout = [
+        SetInCreate(exercise_id=f"exercise-{i * exercises // sets}", weight=100, reps=5)
+        for i in range(sets)
+    ]
+
+    def service() -> SetService:
+        # A fresh exercise cache each time, as after a cold start
+        return SetService(
+            SetDataAccess(), exercise_service=ExerciseService(exercise_data_access)
+        )
+
+    async def one_by_one() -> None:
+        set_service = service()
+        for set_in_create in workout:
+            await set_service.create_set(set_in_create, USER_ID, user_from_token=True)
+
+    async def bulk() -> None:
+        await service().create_sets(workout, USER_ID, user_from_token=True)
+
+    results = {
+        "one POST per set": await timed(one_by_one),
+        "POST /sets/bulk": await timed(bulk),
+    }
+    baseline = results["one POST per set"][0]
+    for name, (elapsed, requests) in results.items():
+        print(
+            f"{name:<18} {elapsed * 1000:>8.1f} ms {requests:>5} requests"
+            f" {baseline / elapsed:>6.1f}x"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, default=40)
+    parser.add_argument("--exercises", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    stand_in = InMemoryCosmosClient(latency=args.latency_ms / 1000)
+    CosmosDBClientSingleton.client_factory = staticmethod(lambda: stand_in)
+    asyncio.run(run(args.sets, args.exercises))
+
+
+if __name__ == "__main__":
+    main()
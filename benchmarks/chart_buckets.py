@@ -0,0 +1,98 @@
+"""
+Compares what a chart of an exercise's whole history costs the client as the
+history grows: every set, grouped by day, paged through GET /sets/{exercise_id}
+as charts had to, against bucket=day with the default point budget.
+
+Payload is the JSON the client downloads and parses, points what it draws.
+Server time covers reading from the in-memory Cosmos stand-in too.
+
+    python -m benchmarks.chart_buckets --years 1 5 10 --sets-per-day 5
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from random import Random
+
+from pydantic_core import to_json
+
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.set import SetDataAccess
+from app.models.set_models import SetInDB
+from app.service.set_service import MAX_HISTORY_PAGE_SIZE, SetService
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+# The service imports NumPy on first use, import it up front so it isn't timed
+import app.utils.chart_utils  # noqa: F401 isort: skip
+
+USER_ID = "bench-user"
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+async def every_set(service: SetService, exercise_id: str) -> tuple[int, int]:
+    payload, points, token = 0, 0, None
+    while True:
+        page, token = await service.get_users_set_history_page(
+            exercise_id,
+            USER_ID,
+            page_size=MAX_HISTORY_PAGE_SIZE,
+            continuation_token=token,
+        )
+        payload += len(to_json(page, by_alias=True))
+        points += sum(len(group.sets) for group in page)
+        if token is None:
+            return payload, points
+
+
+async def buckets(service: SetService, exercise_id: str) -> tuple[int, int]:
+    page = await service.get_users_set_buckets(exercise_id, USER_ID, "day")
+    return len(to_json(page, by_alias=True)), len(page)
+
+
+async def run(years: list[int], sets_per_day: int) -> None:
+    data_access = SetDataAccess()
+    service = SetService(data_access)
+    random = Random(1)
+    print(
+        f"{'years':>5} {'sets':>7}  {'chart from':<12} {'payload KB':>10}"
+        f" {'points':>7} {'server ms':>10}"
+    )
+    for length in years:
+        exercise_id = f"{length}-years"
+        sets = [
+            SetInDB(
+                id=f"{exercise_id}-{day}-{i}",
+                exercise_id=exercise_id,
+                user_id=USER_ID,
+                weight=random.randint(60, 140),
+                reps=random.randint(1, 12),
+                date_created=(NOW - timedelta(days=day, minutes=i)).isoformat(),
+            )
+            for day in range(length * 365)
+            for i in range(sets_per_day)
+        ]
+        await data_access.create_sets(sets)
+        for name, chart in (("every set", every_set), ("bucket=day", buckets)):
+            start = time.perf_counter()
+            payload, points = await chart(service, exercise_id)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{length:>5} {len(sets):>7}  {name:<12} {payload / 1024:>10.1f}"
+                f" {points:>7} {elapsed * 1000:>10.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--sets-per-day", type=int, default=5)
+    args = parser.parse_args()
+
+    stand_in = InMemoryCosmosClient()
+    CosmosDBClientSingleton.client_factory = staticmethod(lambda: stand_in)
+    asyncio.run(run(args.years, args.sets_per_day))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Measures what a cold Azure Functions worker pays before it answers: importing
+app.main, then serving the first request, each in a fresh interpreter, plus
+what resolving the service dependencies costs on every request after that.
+
+The first request is GET /exercises/ through the app's lifespan, answered by
+the in-memory Cosmos stand-in so no account is needed.
+
+    python -m benchmarks.cold_start --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CHILD = """
+import time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+from app.auth.tokens import encode_jwt
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+CosmosDBClientSingleton.client_factory = staticmethod(InMemoryCosmosClient)
+token = encode_jwt({"id": "1", "email": "bench@email.com"})
+served = time.perf_counter()
+with TestClient(app.main.fast_app) as client:
+    response = client.get(
+        "/exercises/", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200, response.text
+    served = time.perf_counter() - served
+print(imported - start, served)
+"""
+
+
+def cold_starts(runs: int) -> tuple[list[float], list[float]]:
+    env = {**os.environ, "JWT_SECRET": os.environ.get("JWT_SECRET", "bench")}
+    imports, first_requests = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        imported, served = map(float, output.split())
+        imports.append(imported)
+        first_requests.append(served)
+    return imports, first_requests
+
+
+def dependency_cost(requests: int) -> float:
+    from app.service.exercise_service import get_exercise_service
+    from app.service.set_service import get_set_service
+    from app.service.user_service import get_user_service
+    from app.service.workout_folder_service import get_workout_folder_service
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        get_set_service()
+        get_exercise_service()
+        get_user_service()
+        get_workout_folder_service()
+    return (time.perf_counter() - start) / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=100_000)
+    args = parser.parse_args()
+
+    imports, first_requests = cold_starts(args.runs)
+    print(f"import app.main      {statistics.median(imports) * 1000:>8.1f} ms (median)")
+    print(
+        f"first request        {statistics.median(first_requests) * 1000:>8.1f} ms"
+        " (median)"
+    )
+    print(
+        f"service dependencies {dependency_cost(args.requests) * 1e6:>8.2f} µs"
+        " per request"
+    )
+
+
+if __name__ == "__main__":
+    main()
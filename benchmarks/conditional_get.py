@@ -0,0 +1,82 @@
+"""
+Compares polling GET /exercises/ for a list that hasn't changed, taking the
+full body every time as clients had to, against sending back the ETag of
+the last response in If-None-Match and getting a 304.
+
+Runs the whole app in process against the in-memory Cosmos stand-in, so
+the times include routing, the token check and reading the exercises as
+well as rendering the body, though not sending it over a network.
+
+    python -m benchmarks.conditional_get --polls 500 --system 500
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from app.auth.tokens import encode_jwt
+from app.data_access.containers import DATABASE_ID, EXERCISES, SYSTEM_CREATOR
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.main import fast_app
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+
+async def poll(
+    client: httpx.AsyncClient, polls: int, headers: dict
+) -> tuple[float, float]:
+    start = time.perf_counter()
+    sent = 0
+    for _ in range(polls):
+        response = await client.get("/exercises/", headers=headers)
+        assert response.status_code in (200, 304), response.text
+        sent += len(response.content)
+    return (time.perf_counter() - start) / polls, sent / polls
+
+
+async def run(polls: int) -> None:
+    token = encode_jwt({"id": "bench-user", "email": "bench@email.com"})
+    auth = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=fast_app)
+    async with fast_app.router.lifespan_context(fast_app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        etag = (await client.get("/exercises/", headers=auth)).headers["ETag"]
+        full = await poll(client, polls, auth)
+        revalidated = await poll(client, polls, {**auth, "If-None-Match": etag})
+
+    for name, (latency, sent) in (
+        ("full body every poll", full),
+        ("If-None-Match, 304", revalidated),
+    ):
+        print(f"{name:<22} {latency * 1000:>8.2f} ms {sent:>10.0f} bytes per poll")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--polls", type=int, default=500)
+    parser.add_argument("--system", type=int, default=500)
+    args = parser.parse_args()
+
+    stand_in = InMemoryCosmosClient()
+    container = stand_in.get_database_client(DATABASE_ID).get_container_client(
+        EXERCISES
+    )
+    for i in range(args.system):
+        container._put(
+            {
+                "id": str(uuid.uuid4()),
+                "name": f"Exercise {i}",
+                "body_parts": ["Chest", "Triceps"],
+                "creator": SYSTEM_CREATOR,
+            }
+        )
+    CosmosDBClientSingleton.client_factory = staticmethod(lambda: stand_in)
+
+    asyncio.run(run(args.polls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compares the latency of logging a set, POST /sets/, the way create_set used
+to check the user and exercise exist, a point read each one after the other
+before the write, against how it checks them now.
+
+Runs against the in-memory Cosmos stand-in with a fixed delay on every
+request in place of the network round-trip.
+
+    python -m benchmarks.create_set --sets 200 --latency-ms 10
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.data_access.containers import SYSTEM_CREATOR
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.exercise import ExerciseDataAccess
+from app.data_access.set import SetDataAccess
+from app.data_access.user import UserDataAccess
+from app.exceptions import EntityNotFoundException
+from app.models.exercises_models import ExerciseInDB
+from app.models.set_models import SetInCreate
+from app.models.user_models import UserInDB
+from app.service.exercise_service import ExerciseService
+from app.service.set_service import SetService
+from app.service.user_service import UserService
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+USER = UserInDB(id="bench-user", email="bench@email.com")
+EXERCISE = ExerciseInDB(
+    id="bench-exercise", name="Bench Press", body_parts=[], creator=SYSTEM_CREATOR
+)
+SET = SetInCreate(exercise_id=EXERCISE.id, weight=100, reps=5)
+
+
+async def legacy(service: SetService):
+    # create_set as it was: user read, then exercise read, then the write
+    if await service.user_service.get_user_by_id(USER.id) is None:
+        raise EntityNotFoundException()
+    if (
+        await service.exercise_service.get_exercise_by_id(SET.exercise_id, USER.id)
+        is None
+    ):
+        raise EntityNotFoundException()
+    return await service.create_set(SET, USER.id, user_from_token=True)
+
+
+async def mean_latency(create, sets: int) -> float:
+    start = time.perf_counter()
+    for _ in range(sets):
+        await create()
+    return (time.perf_counter() - start) / sets
+
+
+async def run(sets: int) -> None:
+    await UserDataAccess().create_user(USER)
+    await ExerciseDataAccess().create_custom_exercise(EXERCISE)
+    set_data_access = SetDataAccess()
+
+    def service(exercise_service: ExerciseService) -> SetService:
+        return SetService(
+            set_data_access,
+            exercise_service=exercise_service,
+            user_service=UserService(UserDataAccess()),
+        )
+
+    cached = service(ExerciseService(ExerciseDataAccess()))
+    timings = {
+        "reads one after the other": await mean_latency(
+            lambda: legacy(service(ExerciseService(ExerciseDataAccess()))), sets
+        ),
+        "reads together (cold cache)": await mean_latency(
+            lambda: service(ExerciseService(ExerciseDataAccess())).create_set(
+                SET, USER.id
+            ),
+            sets,
+        ),
+        "token + exercise cache": await mean_latency(
+            lambda: cached.create_set(SET, USER.id, user_from_token=True), sets
+        ),
+    }
+    baseline = timings["reads one after the other"]
+    for name, latency in timings.items():
+        print(f"{name:<28} {latency * 1000:>8.1f} ms {baseline / latency:>6.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    stand_in = InMemoryCosmosClient(latency=args.latency_ms / 1000)
+    CosmosDBClientSingleton.client_factory = staticmethod(lambda: stand_in)
+    asyncio.run(run(args.sets))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Compares the request charge of GET /exercises/ reading the system catalog
+on every request, as it used to, against serving it from the catalog held
+in memory and only querying for the user's own exercises.
+
+Request charges are the stand-in's model of Cosmos RU, which charges for
+every document a query loads, so they show the shape of the saving rather
+than exact account figures.
+
+    python -m benchmarks.exercise_catalog --requests 100 --system 500
+"""
+
+import argparse
+import asyncio
+import uuid
+
+from app.data_access.containers import DATABASE_ID, EXERCISES, SYSTEM_CREATOR
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.exercise import ExerciseDataAccess
+from app.data_access.instrumentation import data_access_metrics
+from app.service.exercise_service import ExerciseService
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+USERS = 20
+CUSTOM_PER_USER = 5
+
+
+def request_charge() -> float:
+    return sum(o.total_request_charge for o in data_access_metrics.summary().operations)
+
+
+async def charge_per_request(list_exercises, requests: int) -> float:
+    data_access_metrics.reset()
+    for i in range(requests):
+        await list_exercises(f"user-{i % USERS}")
+    return request_charge() / requests
+
+
+async def run(requests: int) -> None:
+    data_access = ExerciseDataAccess()
+    service = ExerciseService(data_access)
+    before = await charge_per_request(
+        data_access.get_system_and_user_exercises, requests
+    )
+    now = await charge_per_request(service.get_system_and_user_exercises, requests)
+    print(f"{'catalog read every request':<28} {before:>8.1f} RU per request")
+    print(f"{'catalog held in memory':<28} {now:>8.1f} RU per request")
+    print(f"{'saving':<28} {1 - now / before:>8.0%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--system", type=int, default=500)
+    args = parser.parse_args()
+
+    stand_in = InMemoryCosmosClient()
+    container = stand_in.get_database_client(DATABASE_ID).get_container_client(
+        EXERCISES
+    )
+    for i in range(args.system):
+        container._put(
+            {
+                "id": str(uuid.uuid4()),
+                "name": f"Exercise {i}",
+                "body_parts": ["Chest"],
+                "creator": SYSTEM_CREATOR,
+            }
+        )
+    for user in range(USERS):
+        for i in range(CUSTOM_PER_USER):
+            container._put(
+                {
+                    "id": str(uuid.uuid4()),
+                    "name": f"Custom {i}",
+                    "body_parts": [],
+                    "creator": f"user-{user}",
+                }
+            )
+    CosmosDBClientSingleton.client_factory = staticmethod(lambda: stand_in)
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Compares the cost of summarising a user's sets for an exercise by reading the
+whole history and folding it on every request, against the point read of the
+summary the change feed processor keeps, and how long the processor takes to
+catch up on the sets logged.
+
+Request charges are the stand-in's model of Cosmos RU, which charges for
+every document a query loads, so they show the shape of the saving rather
+than exact account figures.
+
+    python -m benchmarks.exercise_summary --sets 2000 --requests 100
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.instrumentation import data_access_metrics
+from app.data_access.set import SetDataAccess
+from app.data_access.set_aggregate import (
+    SetAggregateDataAccess,
+    set_aggregates_processor,
+)
+from app.models.set_models import ExerciseSummary, SetInDB
+from app.utils.set_utils import add_set_to_summary
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+USER = "bench-user"
+EXERCISE = "bench-exercise"
+
+
+def request_charge() -> float:
+    return sum(o.total_request_charge for o in data_access_metrics.summary().operations)
+
+
+async def summary_from_history(set_data_access: SetDataAccess) -> ExerciseSummary:
+    summary = ExerciseSummary(exercise_id=EXERCISE)
+    for set_ in await set_data_access.get_users_sets_by_exercise_id(EXERCISE, USER):
+        add_set_to_summary(summary, set_.weight, set_.reps, set_.date_created)
+    return summary
+
+
+async def measure(summarise, requests: int) -> tuple[float, float]:
+    data_access_metrics.reset()
+    start = time.perf_counter()
+    for _ in range(requests):
+        await summarise()
+    return (time.perf_counter() - start) / requests, request_charge() / requests
+
+
+async def run(sets: int, requests: int) -> None:
+    set_data_access = SetDataAccess()
+    aggregates = SetAggregateDataAccess(set_data_access)
+    first = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    await set_data_access.create_sets(
+        [
+            SetInDB(
+                id=str(i),
+                exercise_id=EXERCISE,
+                user_id=USER,
+                weight=60 + i % 40,
+                reps=1 + i % 12,
+                date_created=(first + timedelta(hours=8 * i)).isoformat(),
+            )
+            for i in range(sets)
+        ]
+    )
+
+    start = time.perf_counter()
+    handled = await set_aggregates_processor(aggregates).run_once()
+    catch_up = time.perf_counter() - start
+    print(f"processor caught up on {handled} sets in {catch_up * 1000:.1f} ms\n")
+
+    results = {
+        "history read and folded": await measure(
+            lambda: summary_from_history(set_data_access), requests
+        ),
+        "summary point read": await measure(
+            lambda: aggregates.get_summary(USER, EXERCISE), requests
+        ),
+    }
+    print(f"{'summary from':<24} {'ms':>8} {'RU':>8}")
+    for name, (latency, charge) in results.items():
+        print(f"{name:<24} {latency * 1000:>8.2f} {charge:>8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    stand_in = InMemoryCosmosClient(latency=args.latency_ms / 1000)
+    CosmosDBClientSingleton.client_factory = staticmethod(lambda: stand_in)
+    asyncio.run(run(args.sets, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Compares the ways of turning the documents behind the list endpoints into
+models: Model(**doc) per document as the data access layer used to,
+model_construct per document, and hydrate_many, which validates the whole
+list through one precompiled TypeAdapter and is what list reads use now.
+model_construct only looks quick on folders because it leaves the nested
+exercises as plain dicts.
+
+    python -m benchmarks.hydration --repeat 5
+"""
+
+import argparse
+import time
+from typing import Callable
+
+from app.data_access.hydration import hydrate_many
+from app.models.set_models import SetInDB
+from app.models.workout_folder_models import WorkoutFolderInDB
+
+SYSTEM_PROPERTIES = {
+    "_rid": "AAAAAA==",
+    "_self": "dbs/AAAAAA==/colls/AAAAAA==/docs/AAAAAA==/",
+    "_etag": '"00000000-0000-0000-0000-000000000000"',
+    "_attachments": "attachments/",
+    "_ts": 1714560000,
+}
+
+
+def set_documents(count: int) -> list[dict]:
+    return [
+        {
+            "id": str(i),
+            "exercise_id": "bench",
+            "weight": 100.0,
+            "reps": 5,
+            "notes": "",
+            "tempo": {"eccentric": 3, "concentric": 1, "pause": 0} if i % 2 else None,
+            "date_created": "2024-05-01T10:00:00+00:00",
+            "user_id": "1",
+            **SYSTEM_PROPERTIES,
+        }
+        for i in range(count)
+    ]
+
+
+def folder_documents(count: int, exercises_per_folder: int = 10) -> list[dict]:
+    return [
+        {
+            "id": str(i),
+            "name": f"Folder {i}",
+            "user_id": "1",
+            "exercises": [
+                {
+                    "id": str(j),
+                    "name": f"Exercise {j}",
+                    "body_parts": ["Chest", "Triceps"],
+                    "creator": "system",
+                }
+                for j in range(exercises_per_folder)
+            ],
+            **SYSTEM_PROPERTIES,
+        }
+        for i in range(count)
+    ]
+
+
+def best_of(repeat: int, build: Callable[[], list]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def compare(name: str, model: type, documents: list[dict], repeat: int) -> None:
+    validate = best_of(repeat, lambda: [model(**d) for d in documents])
+    construct = best_of(repeat, lambda: [model.model_construct(**d) for d in documents])
+    adapter = best_of(repeat, lambda: hydrate_many(model, documents))
+    print(
+        f"{name:<22} {validate * 1000:>10.1f} {construct * 1000:>15.1f}"
+        f" {adapter * 1000:>13.1f} {validate / adapter:>8.1f}x"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'documents':<22} {'Model(**d)':>10} {'model_construct':>15}"
+        f" {'hydrate_many':>13} {'speedup':>9}"
+    )
+    for count in (1_000, 10_000, 100_000):
+        compare(f"{count} sets", SetInDB, set_documents(count), args.repeat)
+    for count in (100, 1_000):
+        compare(
+            f"{count} folders x 10",
+            WorkoutFolderInDB,
+            folder_documents(count),
+            args.repeat,
+        )
+    print("times in ms, best of", args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Compares how many response bytes a second the list endpoints render, from
+the value a handler returns to the body sent, before and after the switch
+to PydanticJSONResponse.
+
+Before, GET /exercises/ and GET /workout-folders/ had no response model, so
+FastAPI ran their models through jsonable_encoder, and every body went
+through JSONResponse and the json module. Now each endpoint has a response
+model and bodies are rendered by pydantic-core.
+
+    python -m benchmarks.json_responses --repeat 5
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models.exercises_models import ExerciseInDB
+from app.models.set_models import SetGroup, SetInDB, Tempo
+from app.models.workout_folder_models import WorkoutFolderInDB
+from app.responses import PydanticJSONResponse
+from app.utils.set_utils import build_set_history
+
+SETS_PER_DAY = 20
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def set_history(count: int) -> list[SetGroup]:
+    return build_set_history(
+        [
+            SetInDB(
+                id=str(i),
+                exercise_id="bench",
+                weight=100,
+                reps=5,
+                notes="Paused reps",
+                tempo=Tempo(eccentric=3, concentric=1, pause=1) if i % 2 else None,
+                date_created=(
+                    START + timedelta(days=i // SETS_PER_DAY, minutes=i)
+                ).isoformat(),
+                user_id="1",
+            )
+            for i in range(count)
+        ]
+    )
+
+
+def exercises(count: int) -> list[ExerciseInDB]:
+    return [
+        ExerciseInDB(
+            id=str(i), name=f"Exercise {i}", body_parts=["Chest"], creator="system"
+        )
+        for i in range(count)
+    ]
+
+
+def folders(count: int) -> list[WorkoutFolderInDB]:
+    return [
+        WorkoutFolderInDB(
+            id=str(i), name=f"Folder {i}", user_id="1", exercises=exercises(10)
+        )
+        for i in range(count)
+    ]
+
+
+async def render(
+    content: Any, response_model: Optional[type], response_class: type
+) -> bytes:
+    # What FastAPI's request handler does with the value a handler returns
+    field = (
+        create_response_field(name="Response", type_=response_model)
+        if response_model is not None
+        else None
+    )
+    serialized = await serialize_response(field=field, response_content=content)
+    return response_class(serialized).body
+
+
+def megabytes_per_second(repeat: int, *args) -> tuple[float, int]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = asyncio.run(render(*args))
+        timings.append(time.perf_counter() - start)
+    return len(body) / min(timings) / 1_000_000, len(body)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    endpoints = [
+        # name, content, response model before, response model now
+        ("/sets 10k sets", set_history(10_000), list[SetGroup], list[SetGroup]),
+        ("/exercises 1k", exercises(1_000), None, list[ExerciseInDB]),
+        ("/workout-folders 100", folders(100), None, list[WorkoutFolderInDB]),
+    ]
+    print(
+        f"{'endpoint':<22} {'KB':>7} {'before MB/s':>12} {'now MB/s':>10} {'speedup':>8}"
+    )
+    for name, content, before_model, now_model in endpoints:
+        before, size = megabytes_per_second(
+            args.repeat, content, before_model, JSONResponse
+        )
+        now, _ = megabytes_per_second(
+            args.repeat, content, now_model, PydanticJSONResponse
+        )
+        print(
+            f"{name:<22} {size / 1000:>7.0f} {before:>12.1f} {now:>10.1f}"
+            f" {now / before:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
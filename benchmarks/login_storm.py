@@ -0,0 +1,91 @@
+"""
+Measures how long cheap requests wait during a storm of sign ins, with the
+password checks on the threadpool everything else shares, as they used to
+be, against the dedicated PasswordHashingPool.
+
+The cheap requests stand in for reads, which run get_current_user, a sync
+dependency, on the shared threadpool. Hashes use fewer bcrypt rounds than
+the app so the run stays short, the shape is the same.
+
+    python -m benchmarks.login_storm --logins 60 --rounds 10
+"""
+
+import argparse
+import statistics
+import time
+
+import anyio
+import anyio.to_thread
+import bcrypt
+
+from app.auth.passwords import PasswordHashingPool, check_password
+from app.exceptions import PasswordHashingBusyException
+
+
+async def storm(check, hashed: str, logins: int, read_interval: float) -> dict:
+    read_latencies: list[float] = []
+    rejected = 0
+    done = anyio.Event()
+
+    async def login() -> None:
+        nonlocal rejected
+        try:
+            await check(check_password, "password", hashed)
+        except PasswordHashingBusyException:
+            rejected += 1
+
+    async def reads() -> None:
+        while not done.is_set():
+            start = time.perf_counter()
+            await anyio.to_thread.run_sync(dict)
+            read_latencies.append(time.perf_counter() - start)
+            await anyio.sleep(read_interval)
+
+    start = time.perf_counter()
+    async with anyio.create_task_group() as readers:
+        readers.start_soon(reads)
+        async with anyio.create_task_group() as tg:
+            for _ in range(logins):
+                tg.start_soon(login)
+        done.set()
+    read_latencies.sort()
+    return {
+        "seconds": time.perf_counter() - start,
+        "rejected": rejected,
+        "p50": statistics.median(read_latencies),
+        "p95": read_latencies[int(len(read_latencies) * 0.95)],
+        "max": read_latencies[-1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=60)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--read-interval-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    hashed = bcrypt.hashpw(b"password", bcrypt.gensalt(args.rounds)).decode()
+    pool = PasswordHashingPool(max_workers=1, max_queued=args.logins)
+
+    print(
+        f"{'checks run on':<16} {'storm s':>8} {'rejected':>9}"
+        f" {'read p50 ms':>12} {'p95 ms':>8} {'max ms':>8}"
+    )
+    for name, check in (
+        ("shared threads", anyio.to_thread.run_sync),
+        ("password pool", pool.run),
+    ):
+        result = anyio.run(
+            storm, check, hashed, args.logins, args.read_interval_ms / 1000
+        )
+        print(
+            f"{name:<16} {result['seconds']:>8.2f} {result['rejected']:>9}"
+            f" {result['p50'] * 1000:>12.2f} {result['p95'] * 1000:>8.2f}"
+            f" {result['max'] * 1000:>8.2f}"
+        )
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Compares updating workout folders the way update_workout_folder used to,
+reading the folder and upserting the whole document back, against the
+single patch it sends now.
+
+Runs against the in-memory Cosmos stand-in with a fixed delay on every
+request in place of the network round-trip. Each folder is renamed and has
+its exercises replaced at the same time, as two devices might, and the
+folders that end up missing either change are counted as lost updates.
+Latency is the mean time an update takes with all of them running at once.
+
+    python -m benchmarks.patch_updates --folders 200 --latency-ms 10
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.instrumentation import data_access_metrics
+from app.data_access.workout_folder import WorkoutFolderDataAccess
+from app.models.exercises_models import ExerciseInDB
+from app.models.workout_folder_models import WorkoutFolderInDB, WorkoutFolderInUpdate
+from app.service.workout_folder_service import WorkoutFolderService
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+USER_ID = "bench-user"
+RENAME = WorkoutFolderInUpdate(name="Push Day")
+EXERCISES = WorkoutFolderInUpdate(
+    exercises=[
+        ExerciseInDB(id="1", name="Bench Press", body_parts=[], creator="system")
+    ]
+)
+
+
+async def read_and_upsert(
+    data_access: WorkoutFolderDataAccess, folder_id: str, update: WorkoutFolderInUpdate
+) -> None:
+    # update_workout_folder as it was
+    folder = await data_access.get_folder_by_id(folder_id, USER_ID)
+    if update.name is not None:
+        folder.name = update.name
+    if update.exercises is not None:
+        folder.exercises = update.exercises
+    await data_access.update_workout_folder(folder)
+
+
+async def run(folders: int) -> None:
+    data_access = WorkoutFolderDataAccess()
+    service = WorkoutFolderService(data_access)
+
+    async def timed(name: str, update) -> None:
+        for i in range(folders):
+            await data_access.create_workout_folder(
+                WorkoutFolderInDB(id=f"{name}-{i}", name="Push", user_id=USER_ID)
+            )
+        latencies: list[float] = []
+
+        async def timed_update(folder_id: str, change: WorkoutFolderInUpdate):
+            start = time.perf_counter()
+            await update(folder_id, change)
+            latencies.append(time.perf_counter() - start)
+
+        data_access_metrics.reset()
+        await asyncio.gather(
+            *(
+                timed_update(f"{name}-{i}", change)
+                for i in range(folders)
+                for change in (RENAME, EXERCISES)
+            )
+        )
+        charge = sum(
+            o.total_request_charge for o in data_access_metrics.summary().operations
+        )
+        lost = 0
+        for i in range(folders):
+            folder = await data_access.get_folder_by_id(f"{name}-{i}", USER_ID)
+            lost += (
+                folder.name != RENAME.name or folder.exercises != EXERCISES.exercises
+            )
+        updates = folders * 2
+        print(
+            f"{name:<16} {sum(latencies) / updates * 1000:>8.1f} ms"
+            f" {charge / updates:>6.1f} RU per update {lost:>5} lost"
+        )
+
+    await timed(
+        "read + upsert",
+        lambda folder_id, change: read_and_upsert(data_access, folder_id, change),
+    )
+    await timed(
+        "patch",
+        lambda folder_id, change: service.update_workout_folder(
+            folder_id, change, USER_ID
+        ),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folders", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    stand_in = InMemoryCosmosClient(latency=args.latency_ms / 1000)
+    CosmosDBClientSingleton.client_factory = staticmethod(lambda: stand_in)
+    asyncio.run(run(args.folders))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compares what a chart of the last 12 weeks of an exercise costs: paging
+through the whole set history with GET /sets/{exercise_id} and dropping the
+older days on the client, as charts had to, against passing since so the
+query only reads the sets the chart shows.
+
+Request charges are the stand-in's model of Cosmos RU, which charges for
+every document a query loads, so they show the shape of the saving rather
+than exact account figures.
+
+    python -m benchmarks.set_date_range --years 3 --sets-per-day 10
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.instrumentation import data_access_metrics
+from app.data_access.set import SetDataAccess
+from app.models.set_models import SetInDB
+from app.service.set_service import SetService
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+USER_ID = "bench-user"
+EXERCISE_ID = "bench"
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+WEEKS = 12
+
+
+async def read_history(service: SetService, since=None) -> tuple[int, float]:
+    data_access_metrics.reset()
+    days, token = 0, None
+    while True:
+        page, token = await service.get_users_set_history_page(
+            EXERCISE_ID, USER_ID, continuation_token=token, since=since
+        )
+        days += len(page)
+        if token is None:
+            break
+    charge = sum(
+        o.total_request_charge for o in data_access_metrics.summary().operations
+    )
+    return days, charge
+
+
+async def run(years: int, sets_per_day: int) -> None:
+    data_access = SetDataAccess()
+    for day in range(years * 365):
+        for i in range(sets_per_day):
+            await data_access.create_set(
+                SetInDB(
+                    id=f"{day}-{i}",
+                    exercise_id=EXERCISE_ID,
+                    user_id=USER_ID,
+                    weight=100,
+                    reps=5,
+                    date_created=(NOW - timedelta(days=day, minutes=i)).isoformat(),
+                )
+            )
+    service = SetService(data_access)
+    since = NOW - timedelta(weeks=WEEKS)
+
+    read_days, full = await read_history(service)
+    chart_days = sum(
+        1 for day in range(read_days) if NOW - timedelta(days=day) >= since
+    )
+    range_days, ranged = await read_history(service, since=since)
+    print(f"{'whole history':<16} {read_days:>6} days {full:>10.1f} RU")
+    print(f"{'since':<16} {range_days:>6} days {ranged:>10.1f} RU")
+    print(f"last {WEEKS} weeks with since: {full / ranged:.0f}x fewer RU")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--sets-per-day", type=int, default=10)
+    args = parser.parse_args()
+
+    stand_in = InMemoryCosmosClient()
+    CosmosDBClientSingleton.client_factory = staticmethod(lambda: stand_in)
+    asyncio.run(run(args.years, args.sets_per_day))
+
+
+if __name__ == "__main__":
+    main()
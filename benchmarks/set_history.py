@@ -0,0 +1,103 @@
+"""
+Compares building the whole set history GET /sets/{exercise_id} returns when
+no limit is sent, with the original reduce + deepcopy implementation against
+build_set_history, at 1k, 10k and 100k sets.
+
+    python -m benchmarks.set_history --repeat 5
+"""
+
+import argparse
+import functools
+import random
+import time
+from copy import deepcopy
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from app.models.set_models import SetGroup, SetInDB
+from app.utils.set_utils import build_set_history
+
+SIZES = (1_000, 10_000, 100_000)
+SETS_PER_DAY = 20
+
+
+def legacy_group_sets_by_date(sets: list[SetInDB]) -> list[SetGroup]:
+    def __grouping_func(acc, set_):
+        dict_key = set_.date_created.split("T")[0]
+        if dict_key not in acc:
+            acc[dict_key] = []
+        acc[dict_key].append(set_)
+        return acc
+
+    grouped_dict: dict = functools.reduce(__grouping_func, sets, {})
+    return [
+        SetGroup(sets=value, date_created=key) for key, value in grouped_dict.items()
+    ]
+
+
+def legacy_sorted_set_history(set_history: list[SetGroup]) -> list[SetGroup]:
+    def sort_key(item: SetGroup | SetInDB):
+        return datetime.fromisoformat(item.date_created)
+
+    data_for_sort = deepcopy(set_history)
+    for set_group in data_for_sort:
+        set_group.sets.sort(key=sort_key, reverse=True)
+    data_for_sort.sort(key=sort_key, reverse=True)
+    return data_for_sort
+
+
+def legacy_build_set_history(sets: list[SetInDB]) -> list[SetGroup]:
+    return legacy_sorted_set_history(legacy_group_sets_by_date(sets))
+
+
+def make_sets(count: int, seed: int = 0) -> list[SetInDB]:
+    # Roughly what Cosmos hands back: a few sets a day, in no particular order
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    days = max(count // SETS_PER_DAY, 1)
+    sets = [
+        SetInDB(
+            id=str(i),
+            exercise_id="bench",
+            user_id="1",
+            weight=rng.choice((60, 80, 100, 120)),
+            reps=rng.randint(1, 12),
+            date_created=(
+                start
+                + timedelta(days=rng.randrange(days), seconds=rng.randrange(86_400))
+            ).isoformat(),
+        )
+        for i in range(count)
+    ]
+    rng.shuffle(sets)
+    return sets
+
+
+def best_of(repeat: int, build: Callable, sets: list[SetInDB]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build(sets)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'sets':>8} {'legacy ms':>11} {'engine ms':>11} {'speedup':>8}")
+    for size in SIZES:
+        sets = make_sets(size)
+        assert build_set_history(sets) == legacy_build_set_history(sets)
+        legacy = best_of(args.repeat, legacy_build_set_history, sets)
+        engine = best_of(args.repeat, build_set_history, sets)
+        print(
+            f"{size:>8} {legacy * 1000:>11.1f} {engine * 1000:>11.1f}"
+            f" {legacy / engine:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compares building GET /sets/{exercise_id}/progress from a user's sets with
+NumPy, build_progress, against working it out set by set in plain Python, at
+growing history sizes.
+
+Both start from the hydrated SetInDB list SetDataAccess returns, so only the
+analytics are timed, not reading the sets.
+
+    python -m benchmarks.set_progress --sizes 1000 10000 100000
+"""
+
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+from random import Random
+
+from app.models.set_models import DailyProgress, SetInDB
+from app.utils.progress_utils import TREND_WINDOW_DAYS, build_progress
+
+
+def naive_progress(sets: list[SetInDB]) -> list[DailyProgress]:
+    by_day: dict[str, list[SetInDB]] = {}
+    for set_ in sets:
+        by_day.setdefault(set_.date_created.split("T")[0], []).append(set_)
+    days = []
+    for day in sorted(by_day):
+        day_sets = by_day[day]
+        top = max(day_sets, key=lambda s: (s.weight, s.reps))
+        brzycki = [s.weight * 36 / (37 - s.reps) for s in day_sets if s.reps < 37]
+        days.append(
+            {
+                "date": day,
+                "set_count": len(day_sets),
+                "top_set_weight": top.weight,
+                "top_set_reps": top.reps,
+                "volume": sum(s.weight * s.reps for s in day_sets),
+                "estimated_one_rep_max": max(
+                    s.weight if s.reps == 1 else s.weight * (1 + s.reps / 30)
+                    for s in day_sets
+                ),
+                "brzycki_one_rep_max": max(brzycki) if brzycki else None,
+            }
+        )
+    progress = []
+    for day in days:
+        current = date.fromisoformat(day["date"])
+        window = [
+            d
+            for d in days
+            if 0 <= (current - date.fromisoformat(d["date"])).days < TREND_WINDOW_DAYS
+        ]
+        progress.append(
+            DailyProgress(
+                **day,
+                one_rep_max_trend=statistics.fmean(
+                    d["estimated_one_rep_max"] for d in window
+                ),
+                volume_trend=statistics.fmean(d["volume"] for d in window),
+            )
+        )
+    return progress
+
+
+def make_sets(count: int) -> list[SetInDB]:
+    # Five years of training, however many sets that comes to a day
+    random = Random(count)
+    first = date(2020, 1, 1)
+    return [
+        SetInDB(
+            id=str(i),
+            exercise_id="bench",
+            user_id="bench-user",
+            weight=random.randint(40, 160),
+            reps=random.randint(1, 12),
+            date_created=f"{first + timedelta(days=i * 1826 // count)}T10:00:00+00:00",
+        )
+        for i in range(count)
+    ]
+
+
+def best_of(build, sets: list[SetInDB], runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        build(sets)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'sets':>8} {'python ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for size in args.sizes:
+        sets = make_sets(size)
+        naive = best_of(naive_progress, sets, args.runs)
+        vectorised = best_of(build_progress, sets, args.runs)
+        print(
+            f"{size:>8} {naive * 1000:>10.1f} {vectorised * 1000:>10.1f}"
+            f" {naive / vectorised:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Compares the peak memory of sending an exercise's whole set history as one
+JSON body, every set read into a list, grouped by day and rendered at once,
+against streaming it as NDJSON from GET /sets/{exercise_id}/export, a page
+of sets read and a day rendered at a time.
+
+Memory is what tracemalloc sees allocated while the response is produced,
+the stand-in's own copy of the sets is made before it starts. What the NDJSON
+peak still grows by with the history is the stand-in sorting the partition to
+answer the query, which Cosmos does on its side. tracemalloc slows everything
+down, so server times are only good for comparing the two.
+
+    python -m benchmarks.stream_history --sets 10000 50000 100000
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from random import Random
+
+from pydantic_core import to_json
+
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.set import SetDataAccess
+from app.models.set_models import SetInDB
+from app.responses import ndjson_response
+from app.service.set_service import SetService
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+USER_ID = "bench-user"
+SETS_PER_DAY = 5
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+async def whole_body(service: SetService, exercise_id: str) -> int:
+    history = await service.get_users_sets_by_exercise_id(exercise_id, USER_ID)
+    return len(to_json(history, by_alias=True))
+
+
+async def ndjson(service: SetService, exercise_id: str) -> int:
+    response = ndjson_response(service.stream_users_set_history(exercise_id, USER_ID))
+    return sum([len(line) async for line in response.body_iterator])
+
+
+async def measure(send, service: SetService, exercise_id: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = await send(service, exercise_id)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak, elapsed
+
+
+async def run(counts: list[int]) -> None:
+    data_access = SetDataAccess()
+    service = SetService(data_access)
+    random = Random(1)
+    print(
+        f"{'sets':>7}  {'sent as':<11} {'body MB':>8} {'peak MB':>8}"
+        f" {'server ms':>10}"
+    )
+    for count in counts:
+        exercise_id = f"{count}-sets"
+        await data_access.create_sets(
+            [
+                SetInDB(
+                    id=f"{exercise_id}-{i}",
+                    exercise_id=exercise_id,
+                    user_id=USER_ID,
+                    weight=random.randint(60, 140),
+                    reps=random.randint(1, 12),
+                    date_created=(
+                        NOW - timedelta(days=i // SETS_PER_DAY, minutes=i)
+                    ).isoformat(),
+                )
+                for i in range(count)
+            ]
+        )
+        for name, send in (("one body", whole_body), ("ndjson", ndjson)):
+            size, peak, elapsed = await measure(send, service, exercise_id)
+            print(
+                f"{count:>7}  {name:<11} {size / 2**20:>8.1f} {peak / 2**20:>8.1f}"
+                f" {elapsed * 1000:>10.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, nargs="+", default=[10000, 50000, 100000])
+    args = parser.parse_args()
+
+    stand_in = InMemoryCosmosClient()
+    CosmosDBClientSingleton.client_factory = staticmethod(lambda: stand_in)
+    asyncio.run(run(args.sets))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,19 @@
 import azure.functions as func
 
+from app.data_access.backends import CosmosBackend, get_storage_backend
+from app.data_access.set_aggregate import set_aggregates_processor
 from app.main import fast_app
 
 app = func.AsgiFunctionApp(app=fast_app, http_auth_level=func.AuthLevel.ANONYMOUS)
+
+set_aggregates = set_aggregates_processor()
+
+
+@app.timer_trigger(schedule="*/10 * * * * *", arg_name="timer")
+async def update_set_aggregates(timer: func.TimerRequest) -> None:
+    """
+    Folds the sets logged since the last run into the per-exercise summaries.
+    SQLite works the summaries out on read, there is no feed to follow.
+    """
+    if isinstance(get_storage_backend(), CosmosBackend):
+        await set_aggregates.run_once()
@@ -0,0 +1,284 @@
+"""
+Copies documents from the original /id partitioned containers into the user
+partitioned containers defined in app/data_access/containers.py.
+
+The copy reads each legacy container's change feed and upserts every document
+into its replacement, saving the change feed continuation to a checkpoint file
+after each page. Re-running the copy resumes from the checkpoint and picks up
+anything written to the legacy containers since the last run, which is what
+makes the cutover safe:
+
+1. python3 migrate_containers.py copy      (repeat until it copies nothing new)
+2. Deploy the version of the app that reads the new containers
+3. python3 migrate_containers.py cutover   (drains the stragglers and verifies counts)
+4. python3 migrate_containers.py cutover --drop-legacy   (once you are happy)
+
+The change feed does not contain deletes, so anything deleted from a legacy
+container mid-migration shows up as a count mismatch in verify/cutover.
+
+Containers added since the database was set up, like set-aggregates-by-user
+and leases for the set summaries, are created by create-containers. It skips
+the ones that exist, so run it before deploying any version of the app:
+
+    python3 migrate_containers.py create-containers
+
+Users created before the user-emails index existed need an entry in it to
+sign in. Run this before deploying the version of the app that reads the
+index, and once more after, for anyone who signed up in between:
+
+    python3 migrate_containers.py index-emails
+
+Sets are filtered by date and paged in order of created_at_ms. The copy adds
+it to the sets it copies, sets already in the new container from before it was
+added don't have it. backfill-created-at adds it to them, it only touches sets
+without one so it can be re-run:
+
+    python3 migrate_containers.py backfill-created-at
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import azure.cosmos.cosmos_client as cosmos_client
+import azure.cosmos.exceptions as exceptions
+
+from app.data_access.containers import (
+    DATABASE_ID,
+    EXERCISE_SETS,
+    LEGACY_CONTAINERS,
+    PARTITION_KEY_PATHS,
+    USER_EMAILS,
+    USERS,
+    partition_key_for,
+)
+from app.data_access.set import CREATED_AT_MS, set_document
+from app.data_access.user import normalize_email
+from app.models.set_models import SetInDB
+
+DEFAULT_CHECKPOINT_FILE = "migration_checkpoint.json"
+SYSTEM_PROPERTIES = ("_rid", "_self", "_etag", "_attachments", "_ts", "_lsn")
+
+
+def load_checkpoint(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    # Write then rename so a crash mid-write never leaves a corrupt checkpoint
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def strip_system_properties(item: dict) -> dict:
+    return {k: v for k, v in item.items() if k not in SYSTEM_PROPERTIES}
+
+
+def with_created_at_ms(document: dict) -> dict:
+    """
+    :return: The set document with the created_at_ms the app stores next to
+        date_created, which the history is paged and filtered on
+    """
+    created_at_ms = set_document(SetInDB(**document)).get(CREATED_AT_MS)
+    if created_at_ms is None:
+        print(
+            f"{document['id']}: can't parse date_created {document['date_created']!r}"
+        )
+        return document
+    return {**document, CREATED_AT_MS: created_at_ms}
+
+
+def copy_container(db, source_id: str, target_id: str, checkpoint: dict, path: str):
+    """
+    Drains the source container's change feed into the target container.
+
+    :return: The number of documents copied by this run
+    """
+    state = checkpoint.setdefault(source_id, {"continuation": None, "copied": 0})
+    source = db.get_container_client(source_id)
+    target = db.create_container_if_not_exists(
+        id=target_id, partition_key=partition_key_for(target_id)
+    )
+
+    if state["continuation"] is None:
+        feed = source.query_items_change_feed(start_time="Beginning")
+    else:
+        feed = source.query_items_change_feed(continuation=state["continuation"])
+
+    copied = 0
+    pages = feed.by_page()
+    for page in pages:
+        page_count = 0
+        for item in page:
+            document = strip_system_properties(item)
+            if target_id == EXERCISE_SETS:
+                document = with_created_at_ms(document)
+            # Upserts make replaying a page after a crash harmless
+            target.upsert_item(body=document)
+            page_count += 1
+        copied += page_count
+        state["continuation"] = pages.continuation_token
+        state["copied"] += page_count
+        save_checkpoint(path, checkpoint)
+    return copied
+
+
+def count_items(container) -> int:
+    return next(
+        iter(
+            container.query_items(
+                query="SELECT VALUE COUNT(1) FROM c", enable_cross_partition_query=True
+            )
+        )
+    )
+
+
+def verify(db) -> bool:
+    ok = True
+    for source_id, target_id in LEGACY_CONTAINERS.items():
+        source_count = count_items(db.get_container_client(source_id))
+        target_count = count_items(db.get_container_client(target_id))
+        status = "ok" if source_count == target_count else "MISMATCH"
+        print(f"{source_id} ({source_count}) -> {target_id} ({target_count}): {status}")
+        ok = ok and source_count == target_count
+    return ok
+
+
+def copy_all(db, checkpoint_path: str) -> None:
+    checkpoint = load_checkpoint(checkpoint_path)
+    for source_id, target_id in LEGACY_CONTAINERS.items():
+        copied = copy_container(db, source_id, target_id, checkpoint, checkpoint_path)
+        print(f"{source_id} -> {target_id}: copied {copied} documents")
+
+
+def create_containers(db) -> None:
+    """
+    Creates the containers in PARTITION_KEY_PATHS that don't exist yet.
+    """
+    existing = {container["id"] for container in db.list_containers()}
+    for container_id in PARTITION_KEY_PATHS:
+        if container_id in existing:
+            continue
+        db.create_container_if_not_exists(
+            id=container_id, partition_key=partition_key_for(container_id)
+        )
+        print(f"Created {container_id}")
+
+
+def index_emails(db) -> None:
+    """
+    Adds the users that have no entry in the user-emails index. Emails that
+    only differ by case belong to whichever user was indexed first, the rest
+    are reported and left for someone to sort out.
+    """
+    index = db.create_container_if_not_exists(
+        id=USER_EMAILS, partition_key=partition_key_for(USER_EMAILS)
+    )
+    indexed = conflicts = 0
+    for user in db.get_container_client(USERS).read_all_items():
+        entry = {"id": normalize_email(user["email"]), "user_id": user["id"]}
+        try:
+            index.create_item(body=entry)
+            indexed += 1
+        except exceptions.CosmosResourceExistsError:
+            existing = index.read_item(item=entry["id"], partition_key=entry["id"])
+            if existing["user_id"] != user["id"]:
+                conflicts += 1
+                print(f"{user['id']}: {entry['id']} already belongs to another user")
+    print(f"{USER_EMAILS}: indexed {indexed} users, {conflicts} conflicts")
+
+
+def backfill_created_at(db) -> None:
+    """
+    Patches created_at_ms onto the sets that don't have it, so date range
+    filters find them.
+    """
+    sets = db.get_container_client(EXERCISE_SETS)
+    patched = skipped = 0
+    for item in sets.query_items(
+        query=f"SELECT * FROM c WHERE NOT IS_DEFINED(c.{CREATED_AT_MS})",
+        enable_cross_partition_query=True,
+    ):
+        created_at_ms = set_document(SetInDB(**item)).get(CREATED_AT_MS)
+        if created_at_ms is None:
+            skipped += 1
+            print(f"{item['id']}: can't parse date_created {item['date_created']!r}")
+            continue
+        sets.patch_item(
+            item=item["id"],
+            partition_key=[item["user_id"], item["exercise_id"]],
+            patch_operations=[
+                {"op": "add", "path": f"/{CREATED_AT_MS}", "value": created_at_ms}
+            ],
+        )
+        patched += 1
+    print(
+        f"{EXERCISE_SETS}: added {CREATED_AT_MS} to {patched} sets, {skipped} skipped"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "command",
+        choices=[
+            "create-containers",
+            "copy",
+            "verify",
+            "cutover",
+            "index-emails",
+            "backfill-created-at",
+        ],
+    )
+    parser.add_argument("--checkpoint-file", default=DEFAULT_CHECKPOINT_FILE)
+    parser.add_argument(
+        "--drop-legacy",
+        action="store_true",
+        help="Delete the legacy containers after a successful cutover",
+    )
+    args = parser.parse_args()
+
+    try:
+        DB_HOST = os.environ["DB_HOST"]
+        DB_KEY = os.environ["DB_KEY"]
+    except KeyError:
+        sys.exit("Cosmos DB credentials not set")
+
+    try:
+        client = cosmos_client.CosmosClient(DB_HOST, credential=DB_KEY)
+        db = client.get_database_client(DATABASE_ID)
+
+        if args.command == "create-containers":
+            create_containers(db)
+        elif args.command == "copy":
+            copy_all(db, args.checkpoint_file)
+        elif args.command == "index-emails":
+            index_emails(db)
+        elif args.command == "backfill-created-at":
+            backfill_created_at(db)
+        elif args.command == "verify":
+            if not verify(db):
+                sys.exit(1)
+        elif args.command == "cutover":
+            copy_all(db, args.checkpoint_file)
+            if not verify(db):
+                sys.exit("Counts do not match, legacy containers left in place")
+            checkpoint = load_checkpoint(args.checkpoint_file)
+            checkpoint["cutover_complete"] = True
+            save_checkpoint(args.checkpoint_file, checkpoint)
+            if args.drop_legacy:
+                for source_id in LEGACY_CONTAINERS:
+                    db.delete_container(source_id)
+                    print(f"Deleted {source_id}")
+    except exceptions.CosmosHttpResponseError as e:
+        sys.exit(f"Migration failed\n{str(e.message)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,17 @@ import uuid
 
 import azure.cosmos.cosmos_client as cosmos_client
 import azure.cosmos.exceptions as exceptions
-from azure.cosmos import PartitionKey
+
+from app.data_access.containers import (
+    DATABASE_ID,
+    EXERCISES,
+    PARTITION_KEY_PATHS,
+    USER_EMAILS,
+    USERS,
+    partition_key_for,
+)
+from app.data_access.seed import SEED_EXERCISES, SEED_USER
+from app.data_access.user import normalize_email
 
 # ----------------------------------------------------------------------------------------------------------
 # Prerequisites -
@@ -22,80 +32,26 @@ try:
 except KeyError:
     sys.exit("Cosmos DB credentials not set")
 
-DATABASE_ID = "set-tracker-db"
-
 try:
     client = cosmos_client.CosmosClient(DB_HOST, credential=DB_KEY)
 
     db = client.get_database_client(DATABASE_ID)
 
-    containers_to_create = [
-        "users",
-        "exercise-sets",
-        "exercises",
-        "workout-folders",
-    ]
-
-    for container_id in containers_to_create:
-        db.create_container(id=container_id, partition_key=PartitionKey(path="/id"))
+    for container_id in PARTITION_KEY_PATHS:
+        db.create_container(
+            id=container_id, partition_key=partition_key_for(container_id)
+        )
 
     # Seed the database with a user
-    user = {
-        "email": "doestnotmatter@email.com",
-        "provider": "apple",
-        "id": "f4ed09fc-ee99-43e0-8b19-123424f988ac",
-        "preferences": {"theme": "system"},
-    }
-    container_client = db.get_container_client("users")
-    container_client.create_item(body=user)
-
-    # Seed the database with some exercises, When I set it up I scrope exercises from the web
-    # but this is more than enough to let you see the funcitonality of the app
-    exercises = [
-        {
-            "name": "Bench Press",
-            "body_parts": ["Chest", "Triceps", "Shoulders"],
-            "creator": "system",
-        },
-        {
-            "name": "Squat",
-            "body_parts": ["Quads", "Glutes", "Hamstrings"],
-            "creator": "system",
-        },
-        {
-            "name": "Deadlift",
-            "body_parts": ["Back", "Glutes", "Hamstrings"],
-            "creator": "system",
-        },
-        {
-            "name": "Overhead Press",
-            "body_parts": ["Shoulders", "Triceps"],
-            "creator": "system",
-        },
-        {
-            "name": "Pull Up",
-            "body_parts": ["Back", "Biceps"],
-            "creator": "system",
-        },
-        {
-            "name": "Dumbbell Curl",
-            "body_parts": ["Biceps", "Forearms"],
-            "creator": "system",
-        },
-        {
-            "name": "Tricep Extension",
-            "body_parts": ["Triceps"],
-            "creator": "system",
-        },
-        {
-            "name": "Leg Press",
-            "body_parts": ["Quads", "Glutes", "Hamstrings"],
-            "creator": "system",
-        },
-    ]
-    container_client = db.get_container_client("exercises")
-    for exercise in exercises:
-        exercise["id"] = str(uuid.uuid4())
-        container_client.create_item(body=exercise)
+    container_client = db.get_container_client(USERS)
+    container_client.create_item(body=SEED_USER)
+    db.get_container_client(USER_EMAILS).create_item(
+        body={"id": normalize_email(SEED_USER["email"]), "user_id": SEED_USER["id"]}
+    )
+
+    # Seed the database with some exercises
+    container_client = db.get_container_client(EXERCISES)
+    for exercise in SEED_EXERCISES:
+        container_client.create_item(body={**exercise, "id": str(uuid.uuid4())})
 except exceptions.CosmosHttpResponseError as e:
     sys.exit(f"Setting up database failed\n{str(e.message)}")
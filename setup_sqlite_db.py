@@ -0,0 +1,33 @@
+"""
+Creates the SQLite database at SQLITE_PATH (set_tracker.db by default) and
+seeds it with the same dummy data as setup_cosmos_db.py. Run the app against
+it with STORAGE_BACKEND=sqlite.
+"""
+
+import asyncio
+import uuid
+
+from app.data_access.seed import SEED_EXERCISES, SEED_USER
+from app.data_access.sqlite.base import SQLiteConnectionSingleton
+from app.data_access.sqlite.exercise import SQLiteExerciseDataAccess
+from app.data_access.sqlite.user import SQLiteUserDataAccess
+from app.models.exercises_models import ExerciseInDB
+from app.models.user_models import UserInDB
+
+
+async def seed() -> None:
+    await SQLiteUserDataAccess().update_user(UserInDB(**SEED_USER))
+    exercise_data_access = SQLiteExerciseDataAccess()
+    for exercise in SEED_EXERCISES:
+        if await exercise_data_access.get_exercise_by_name(
+            exercise["name"], SEED_USER["id"]
+        ):
+            continue
+        await exercise_data_access.create_custom_exercise(
+            ExerciseInDB(**exercise, id=str(uuid.uuid4()))
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(seed())
+    SQLiteConnectionSingleton.close()
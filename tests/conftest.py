@@ -1,18 +1,72 @@
+import os
+import uuid
+
 import pytest
 from azure.cosmos.exceptions import CosmosResourceNotFoundError
 from fastapi.testclient import TestClient
 
 from app.auth.passwords import get_password_hash
 from app.data_access.base import BaseDataAccess
+from app.data_access.containers import DATABASE_ID, EXERCISES
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.seed import SEED_EXERCISES
 from app.data_access.user import UserDataAccess
 from app.data_access.workout_folder import WorkoutFolderDataAccess
 from app.main import fast_app
 from app.models.user_models import UserInDB
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def cosmos_stand_in():
+    """
+    Points the data access layer at the in-memory Cosmos stand-in, seeded like
+    setup_cosmos_db.py seeds a real account. Set INTEGRATION_DB=cosmos to run
+    against the account in DB_HOST instead.
+    """
+    if os.environ.get("INTEGRATION_DB") == "cosmos":
+        yield None
+        return
+
+    stand_in = InMemoryCosmosClient()
+    exercises = stand_in.get_database_client(DATABASE_ID).get_container_client(
+        EXERCISES
+    )
+    for exercise in SEED_EXERCISES:
+        exercises._put({**exercise, "id": str(uuid.uuid4())})
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(CosmosDBClientSingleton, "client_factory", lambda: stand_in)
+        yield stand_in
 
 
 @pytest.fixture
 def client():
-    yield TestClient(fast_app)
+    # Entering the client runs the app's lifespan, so the shared async Cosmos
+    # client lives on one event loop for the whole test and is closed after it.
+    with TestClient(fast_app) as client:
+        yield client
+
+
+@pytest.fixture
+def run_async(client: TestClient):
+    """
+    Runs a coroutine on the app's event loop. Data access objects share the
+    app's async Cosmos client, so they have to be awaited on the same loop.
+    """
+
+    def _run_async(coroutine):
+        async def _await():
+            return await coroutine
+
+        return client.portal.call(_await)
+
+    return _run_async
 
 
 @pytest.fixture
@@ -27,7 +81,7 @@ def workout_folder_data_access():
 
 @pytest.fixture
 def exercises_cosmos_client():
-    return BaseDataAccess("exercises").container
+    return BaseDataAccess(EXERCISES).container
 
 
 @pytest.fixture
@@ -41,9 +95,9 @@ def user():
 
 @pytest.fixture
 def logged_in_client(
-    client: TestClient, user_data_access: UserDataAccess, user: UserInDB
+    client: TestClient, run_async, user_data_access: UserDataAccess, user: UserInDB
 ):
-    user_data_access.create_user(user)
+    run_async(user_data_access.create_user(user))
     response = client.post(
         "/auth/signin",
         json={"email": user.email, "password": "password"},
@@ -53,7 +107,7 @@ def logged_in_client(
     client.headers = {"Authorization": f"Bearer {token}"}
     yield client
     try:
-        user_data_access.delete_user(user.id)
+        run_async(user_data_access.delete_user(user.id))
     except CosmosResourceNotFoundError:
         # Another test has already deleted the user
         pass
@@ -0,0 +1,832 @@
+"""
+An in-process stand-in for the azure.cosmos.aio client, so the integration
+tests and benchmarks run offline and in seconds.
+
+It implements the parts of the client the data access layer uses: point reads
+and writes, patch, transactional batches, the change feed and the
+parameterized SELECT ... WHERE ... [ORDER BY ...] queries found in
+app/data_access. Documents are grouped by their partition key like they are in
+Cosmos, and every field a query filters on for equality gets a hash index the
+first time it is queried, so lookups stay cheap as the containers grow. Every
+write gets the next _lsn of its container, which like in Cosmos only the
+change feed's items carry.
+
+Latency and throttling are configurable on the client: every request sleeps for
+``latency`` seconds and fails with a 429 with probability ``throttle_rate``.
+
+Request charges are reported to ``response_hook`` callbacks in the
+x-ms-request-charge header, from a rough model of Cosmos' pricing.
+
+Errors match the real client's: CosmosResourceNotFoundError (404),
+CosmosResourceExistsError (409), CosmosAccessConditionFailedError (412) and
+CosmosBatchOperationError for a failed batch.
+"""
+
+import asyncio
+import copy
+import itertools
+import json
+import operator
+import random
+import re
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional
+
+from azure.core import MatchConditions
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosBatchOperationError,
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+from app.data_access.containers import PARTITION_KEY_PATHS
+
+PartitionKeyValue = tuple[Any, ...]
+ItemKey = tuple[PartitionKeyValue, str]
+
+QUERY_PATTERN = re.compile(
+    r"^\s*SELECT\s+(?P<select>\*|VALUE\s+COUNT\(1\))"
+    r"\s+FROM\s+(?P<source>\w+)(?:\s+(?!WHERE\b|ORDER\b)(?P<alias>\w+))?"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+ORDER\s+BY\s+(?P<order_by>.+?))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+CONDITION_PATTERN = re.compile(
+    r"^\s*(?P<alias>\w+)\.(?P<field>[\w.]+)\s*(?P<op>=|!=|<>|<=|>=|<|>)\s*"
+    r"(?P<value>@\w+|'[^']*'|\"[^\"]*\"|-?\d+(?:\.\d+)?|true|false|null)\s*$",
+    re.IGNORECASE,
+)
+ORDER_BY_PATTERN = re.compile(
+    r"^\s*(?P<alias>\w+)\.(?P<field>[\w.]+)(?:\s+(?P<direction>ASC|DESC))?\s*$",
+    re.IGNORECASE,
+)
+OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<>": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+MISSING = object()
+
+# A rough model of what requests cost in request units (RU), reported through
+# response_hook like the real client: point reads are cheapest, and a query
+# pays for every document it loads, so an index lookup is cheaper than a scan.
+REQUEST_CHARGE_HEADER = "x-ms-request-charge"
+READ_CHARGE = 1.0
+WRITE_CHARGE = 5.5
+QUERY_CHARGE = 2.3
+LOADED_DOCUMENT_CHARGE = 0.1
+
+
+def _get_path(document: dict, field: str) -> Any:
+    value: Any = document
+    for part in field.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return MISSING
+        value = value[part]
+    return value
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return value
+
+
+def _normalize_partition_key(partition_key: Any) -> PartitionKeyValue:
+    if isinstance(partition_key, (list, tuple)):
+        return tuple(partition_key)
+    return (partition_key,)
+
+
+class Query:
+    """A parsed query, matched against documents in Python."""
+
+    def __init__(self, query: str, parameters: Optional[list[dict[str, Any]]]):
+        match = QUERY_PATTERN.match(query)
+        if match is None:
+            raise ValueError(f"Unsupported query: {query}")
+        alias = match["alias"] or match["source"]
+        params = {p["name"]: p["value"] for p in parameters or []}
+
+        self.count = match["select"] != "*"
+        self.conditions: list[tuple[str, Callable[[Any, Any], bool], Any]] = []
+        if match["where"]:
+            for condition in re.split(r"\s+AND\s+", match["where"], flags=re.I):
+                parsed = CONDITION_PATTERN.match(condition)
+                if parsed is None or parsed["alias"] != alias:
+                    raise ValueError(f"Unsupported condition: {condition}")
+                value = self._parse_value(parsed["value"], params)
+                self.conditions.append(
+                    (parsed["field"], OPERATORS[parsed["op"]], value)
+                )
+
+        self.order_by: list[tuple[str, bool]] = []
+        if match["order_by"]:
+            for term in match["order_by"].split(","):
+                parsed = ORDER_BY_PATTERN.match(term)
+                if parsed is None or parsed["alias"] != alias:
+                    raise ValueError(f"Unsupported ORDER BY: {term}")
+                descending = (parsed["direction"] or "ASC").upper() == "DESC"
+                self.order_by.append((parsed["field"], descending))
+
+    @staticmethod
+    def _parse_value(token: str, params: dict[str, Any]) -> Any:
+        if token.startswith("@"):
+            if token not in params:
+                raise ValueError(f"Missing query parameter {token}")
+            return params[token]
+        if token[0] in "'\"":
+            return token[1:-1]
+        lowered = token.lower()
+        if lowered in ("true", "false"):
+            return lowered == "true"
+        if lowered == "null":
+            return None
+        return float(token) if "." in token else int(token)
+
+    @property
+    def equalities(self) -> list[tuple[str, Any]]:
+        return [(f, v) for f, op, v in self.conditions if op is operator.eq]
+
+    def matches(self, document: dict) -> bool:
+        for field, op, value in self.conditions:
+            actual = _get_path(document, field)
+            if actual is MISSING:
+                return False
+            try:
+                if not op(actual, value):
+                    return False
+            except TypeError:
+                # Cosmos doesn't compare values of different types either
+                return False
+        return True
+
+    def sort(self, documents: list[dict]) -> list[dict]:
+        # Stable sorts applied from the last term to the first give a
+        # multi-key ORDER BY with mixed directions. Documents without the
+        # field sort lowest, first ascending and last descending, as in Cosmos.
+        for field, descending in reversed(self.order_by):
+            documents.sort(
+                key=lambda d: (
+                    _get_path(d, field) is not MISSING,
+                    _get_path(d, field),
+                ),
+                reverse=descending,
+            )
+        return documents
+
+
+class InMemoryPage:
+    def __init__(self, items: list[dict]):
+        self._items = iter(items)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        try:
+            return next(self._items)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class InMemoryPageIterator:
+    """Mirrors AsyncItemPaged.by_page(), continuation tokens are offsets."""
+
+    def __init__(
+        self,
+        run: Callable[[], Awaitable[list[dict]]],
+        page_size: Optional[int],
+        continuation_token: Optional[str],
+    ):
+        self._run = run
+        self._page_size = page_size
+        self._results: Optional[list[dict]] = None
+        self._offset = int(continuation_token) if continuation_token else 0
+        self.continuation_token: Optional[str] = continuation_token
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> InMemoryPage:
+        if self._results is None:
+            self._results = await self._run()
+        elif self.continuation_token is None:
+            raise StopAsyncIteration
+        if self._offset >= len(self._results) and self._offset > 0:
+            raise StopAsyncIteration
+        end = len(self._results)
+        if self._page_size:
+            end = min(end, self._offset + self._page_size)
+        # Copied a page at a time as it is read, like a server-side cursor,
+        # so reading a large result lazily holds one page of it
+        page = copy.deepcopy(self._results[self._offset : end])
+        self._offset = end
+        self.continuation_token = str(end) if end < len(self._results) else None
+        return InMemoryPage(page)
+
+
+class InMemoryQueryIterable:
+    """The async iterable query_items returns, items can be read by page too."""
+
+    def __init__(
+        self, run: Callable[[], Awaitable[list[dict]]], page_size: Optional[int]
+    ):
+        self._run = run
+        self._page_size = page_size
+
+    def by_page(self, continuation_token: Optional[str] = None):
+        return InMemoryPageIterator(self._run, self._page_size, continuation_token)
+
+    async def _items(self) -> AsyncIterator[dict]:
+        async for page in self.by_page():
+            async for item in page:
+                yield item
+
+    def __aiter__(self):
+        return self._items()
+
+
+class InMemoryChangeFeedPages:
+    """
+    Mirrors by_page() on the change feed. Continuation tokens are the _lsn of
+    the last change read, and stay set once the feed is caught up, so reading
+    can resume from them later.
+    """
+
+    def __init__(
+        self,
+        container: "InMemoryContainer",
+        continuation_token: str,
+        page_size: Optional[int],
+        kwargs: dict,
+    ):
+        self._container = container
+        self._page_size = page_size
+        self._kwargs = kwargs
+        self.continuation_token: str = continuation_token
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> InMemoryPage:
+        await self._container.client._request()
+        changes = self._container._changes_after(
+            int(self.continuation_token), self._page_size
+        )
+        self._container._respond(
+            self._kwargs, QUERY_CHARGE + LOADED_DOCUMENT_CHARGE * len(changes), changes
+        )
+        if not changes:
+            raise StopAsyncIteration
+        self.continuation_token = str(changes[-1]["_lsn"])
+        return InMemoryPage(changes)
+
+
+class InMemoryChangeFeed:
+    """What query_items_change_feed returns, read by page or item by item."""
+
+    def __init__(
+        self,
+        container: "InMemoryContainer",
+        continuation_token: str,
+        page_size: Optional[int],
+        kwargs: dict,
+    ):
+        self._container = container
+        self._continuation_token = continuation_token
+        self._page_size = page_size
+        self._kwargs = kwargs
+
+    def by_page(self, continuation_token: Optional[str] = None):
+        return InMemoryChangeFeedPages(
+            self._container,
+            continuation_token or self._continuation_token,
+            self._page_size,
+            self._kwargs,
+        )
+
+    async def _items(self) -> AsyncIterator[dict]:
+        async for page in self.by_page():
+            async for item in page:
+                yield item
+
+    def __aiter__(self):
+        return self._items()
+
+
+class InMemoryContainer:
+    def __init__(
+        self,
+        client: "InMemoryCosmosClient",
+        container_id: str,
+        partition_key_paths: list[str],
+    ):
+        self.client = client
+        self.id = container_id
+        self.partition_key_fields = [path.lstrip("/") for path in partition_key_paths]
+        self._partitions: dict[PartitionKeyValue, dict[str, dict]] = defaultdict(dict)
+        # field -> value -> keys of the documents holding that value
+        self._indexes: dict[str, dict[Any, set[ItemKey]]] = {}
+        # Insertion order, so index lookups return documents in the order a
+        # scan of the partitions would, like Cosmos does without ORDER BY
+        self._sequence: dict[ItemKey, int] = {}
+        self._next_sequence = itertools.count()
+        # The change feed, each document's key by the _lsn of its last write
+        self._changes: OrderedDict[ItemKey, int] = OrderedDict()
+        self._next_lsn = itertools.count(1)
+
+    def __repr__(self) -> str:
+        return f"<InMemoryContainer [{self.id}]>"
+
+    # Storage and indexes
+
+    def _partition_key_of(self, document: dict) -> PartitionKeyValue:
+        return tuple(document.get(field) for field in self.partition_key_fields)
+
+    def _index_add(self, key: ItemKey, document: dict) -> None:
+        for field, index in self._indexes.items():
+            value = _get_path(document, field)
+            if value is not MISSING:
+                index.setdefault(_hashable(value), set()).add(key)
+
+    def _index_remove(self, key: ItemKey, document: dict) -> None:
+        for field, index in self._indexes.items():
+            value = _get_path(document, field)
+            if value is MISSING:
+                continue
+            keys = index.get(_hashable(value))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[_hashable(value)]
+
+    def _index_for(self, field: str) -> dict[Any, set[ItemKey]]:
+        if field not in self._indexes:
+            index: dict[Any, set[ItemKey]] = {}
+            for partition_key, documents in self._partitions.items():
+                for item_id, document in documents.items():
+                    value = _get_path(document, field)
+                    if value is not MISSING:
+                        index.setdefault(_hashable(value), set()).add(
+                            (partition_key, item_id)
+                        )
+            self._indexes[field] = index
+        return self._indexes[field]
+
+    def _put(self, document: dict) -> dict:
+        document = copy.deepcopy(document)
+        if not isinstance(document.get("id"), str):
+            raise CosmosHttpResponseError(
+                status_code=400, message="The input content is invalid, id missing"
+            )
+        document["_etag"] = f'"{uuid.uuid4()}"'
+        document["_ts"] = int(time.time())
+        partition_key = self._partition_key_of(document)
+        key = (partition_key, document["id"])
+        previous = self._partitions[partition_key].get(document["id"])
+        if previous is not None:
+            self._index_remove(key, previous)
+        self._partitions[partition_key][document["id"]] = document
+        self._sequence.setdefault(key, next(self._next_sequence))
+        self._index_add(key, document)
+        self._changes[key] = next(self._next_lsn)
+        self._changes.move_to_end(key)
+        return copy.deepcopy(document)
+
+    def _restore(
+        self,
+        partition_key: PartitionKeyValue,
+        item_id: str,
+        previous: Optional[dict],
+        previous_lsn: Optional[int],
+    ) -> None:
+        key = (partition_key, item_id)
+        current = self._partitions.get(partition_key, {}).get(item_id)
+        if current is not None:
+            self._index_remove(key, current)
+            del self._partitions[partition_key][item_id]
+            del self._sequence[key]
+            self._changes.pop(key, None)
+        if previous is not None:
+            self._partitions[partition_key][item_id] = previous
+            self._sequence[key] = next(self._next_sequence)
+            self._index_add(key, previous)
+            self._changes[key] = previous_lsn
+
+    def _get(self, item_id: str, partition_key: Any) -> dict:
+        partition_key = _normalize_partition_key(partition_key)
+        document = self._partitions.get(partition_key, {}).get(item_id)
+        if document is None:
+            raise CosmosResourceNotFoundError(
+                status_code=404,
+                message=f"Entity with the specified id {item_id} does not exist",
+            )
+        return document
+
+    def _check_etag(
+        self,
+        document: Optional[dict],
+        etag: Optional[str],
+        match_condition: Optional[MatchConditions],
+    ) -> None:
+        if match_condition == MatchConditions.IfNotModified and (
+            document is None or document["_etag"] != etag
+        ):
+            raise CosmosAccessConditionFailedError(
+                status_code=412,
+                message="Operation cannot be performed because one of the "
+                "specified precondition is not met",
+            )
+        if match_condition == MatchConditions.IfModified and (
+            document is not None and document["_etag"] == etag
+        ):
+            raise CosmosHttpResponseError(status_code=304, message="Not modified")
+
+    def _create(self, body: dict) -> dict:
+        partition_key = self._partition_key_of(body)
+        if body.get("id") in self._partitions.get(partition_key, {}):
+            raise CosmosResourceExistsError(
+                status_code=409,
+                message="Entity with the specified id already exists in the system.",
+            )
+        return self._put(body)
+
+    def _upsert(self, body, etag=None, match_condition=None) -> dict:
+        existing = self._partitions.get(self._partition_key_of(body), {}).get(
+            body.get("id")
+        )
+        self._check_etag(existing, etag, match_condition)
+        return self._put(body)
+
+    def _replace(self, item, body, etag=None, match_condition=None) -> dict:
+        item_id = item["id"] if isinstance(item, dict) else item
+        existing = self._get(item_id, self._partition_key_of(body))
+        self._check_etag(existing, etag, match_condition)
+        return self._put(body)
+
+    def _delete(self, item, partition_key, etag=None, match_condition=None) -> None:
+        item_id = item["id"] if isinstance(item, dict) else item
+        document = self._get(item_id, partition_key)
+        self._check_etag(document, etag, match_condition)
+        key = (self._partition_key_of(document), item_id)
+        self._index_remove(key, document)
+        del self._partitions[key[0]][item_id]
+        del self._sequence[key]
+        # Like the change feed in LatestVersion mode, deletes aren't in it
+        self._changes.pop(key, None)
+        if not self._partitions[key[0]]:
+            del self._partitions[key[0]]
+
+    def _patch(
+        self, item, partition_key, patch_operations, etag=None, match_condition=None
+    ) -> dict:
+        item_id = item["id"] if isinstance(item, dict) else item
+        document = copy.deepcopy(self._get(item_id, partition_key))
+        self._check_etag(document, etag, match_condition)
+        for patch in patch_operations:
+            self._apply_patch(document, patch)
+        if self._partition_key_of(document) != _normalize_partition_key(partition_key):
+            raise CosmosHttpResponseError(
+                status_code=400, message="Partition key paths cannot be patched"
+            )
+        return self._put(document)
+
+    @staticmethod
+    def _apply_patch(document: dict, patch: dict) -> None:
+        *parents, last = patch["path"].strip("/").split("/")
+        target: Any = document
+        for part in parents:
+            target = target[int(part)] if isinstance(target, list) else target[part]
+        op = patch["op"]
+        if isinstance(target, list):
+            index = len(target) if last == "-" else int(last)
+            if op == "add":
+                target.insert(index, patch["value"])
+            elif op in ("set", "replace"):
+                target[index] = patch["value"]
+            elif op == "remove":
+                del target[index]
+            elif op == "incr":
+                target[index] += patch["value"]
+            else:
+                raise ValueError(f"Unsupported patch operation {op}")
+            return
+        if op in ("add", "set"):
+            target[last] = patch["value"]
+        elif op == "replace":
+            if last not in target:
+                raise CosmosHttpResponseError(
+                    status_code=400, message=f"Path {patch['path']} does not exist"
+                )
+            target[last] = patch["value"]
+        elif op == "remove":
+            if last not in target:
+                raise CosmosHttpResponseError(
+                    status_code=400, message=f"Path {patch['path']} does not exist"
+                )
+            del target[last]
+        elif op == "incr":
+            target[last] = target.get(last, 0) + patch["value"]
+        else:
+            raise ValueError(f"Unsupported patch operation {op}")
+
+    def _candidates(
+        self, query: Query, partition_key: Optional[PartitionKeyValue]
+    ) -> Iterable[dict]:
+        keys: Optional[set[ItemKey]] = None
+        for field, value in query.equalities:
+            matching = self._index_for(field).get(_hashable(value), set())
+            if keys is None or len(matching) < len(keys):
+                keys = matching
+        if keys is not None:
+            documents = (
+                self._partitions[pk][item_id]
+                for pk, item_id in sorted(keys, key=self._sequence.__getitem__)
+            )
+        else:
+            documents = (
+                document
+                for partition in self._partitions.values()
+                for document in partition.values()
+            )
+        if partition_key is None:
+            return documents
+        # A shorter key than the container's is a prefix of a hierarchical key
+        prefix = len(partition_key)
+        return (
+            d for d in documents if self._partition_key_of(d)[:prefix] == partition_key
+        )
+
+    def _changes_after(self, lsn: int, limit: Optional[int]) -> list[dict]:
+        """The latest version of every document written after lsn, oldest first."""
+        keys = []
+        for key in reversed(self._changes):
+            if self._changes[key] <= lsn:
+                break
+            keys.append(key)
+        keys.reverse()
+        if limit:
+            keys = keys[:limit]
+        return [
+            {
+                **copy.deepcopy(self._partitions[partition_key][item_id]),
+                "_lsn": self._changes[(partition_key, item_id)],
+            }
+            for partition_key, item_id in keys
+        ]
+
+    def _query(self, query: Query, partition_key: Any) -> tuple[list[dict], float]:
+        if partition_key is not None:
+            partition_key = _normalize_partition_key(partition_key)
+        loaded = 0
+        results = []
+        for document in self._candidates(query, partition_key):
+            loaded += 1
+            if query.matches(document):
+                results.append(document)
+        charge = QUERY_CHARGE + LOADED_DOCUMENT_CHARGE * loaded
+        if query.count:
+            return [len(results)], charge  # type: ignore
+        return query.sort(results), charge
+
+    @staticmethod
+    def _respond(kwargs: dict, charge: float, result: Any) -> Any:
+        response_hook = kwargs.get("response_hook")
+        if response_hook is not None:
+            response_hook({REQUEST_CHARGE_HEADER: str(charge)}, result)
+        return result
+
+    # The client surface
+
+    async def read(self, **kwargs) -> dict:
+        await self.client._request()
+        return {"id": self.id, "partitionKey": {"paths": self.partition_key_fields}}
+
+    async def read_item(self, item, partition_key, **kwargs) -> dict:
+        await self.client._request()
+        item_id = item["id"] if isinstance(item, dict) else item
+        result = copy.deepcopy(self._get(item_id, partition_key))
+        return self._respond(kwargs, READ_CHARGE, result)
+
+    async def create_item(self, body: dict, **kwargs) -> dict:
+        await self.client._request()
+        return self._respond(kwargs, WRITE_CHARGE, self._create(body))
+
+    async def upsert_item(
+        self, body: dict, *, etag=None, match_condition=None, **kwargs
+    ) -> dict:
+        await self.client._request()
+        result = self._upsert(body, etag, match_condition)
+        return self._respond(kwargs, WRITE_CHARGE, result)
+
+    async def replace_item(
+        self, item, body: dict, *, etag=None, match_condition=None, **kwargs
+    ) -> dict:
+        await self.client._request()
+        result = self._replace(item, body, etag, match_condition)
+        return self._respond(kwargs, WRITE_CHARGE, result)
+
+    async def delete_item(
+        self, item, partition_key, *, etag=None, match_condition=None, **kwargs
+    ) -> None:
+        await self.client._request()
+        self._delete(item, partition_key, etag, match_condition)
+        self._respond(kwargs, WRITE_CHARGE, None)
+
+    async def patch_item(
+        self,
+        item,
+        partition_key,
+        patch_operations: list[dict[str, Any]],
+        *,
+        etag=None,
+        match_condition=None,
+        **kwargs,
+    ) -> dict:
+        await self.client._request()
+        result = self._patch(
+            item, partition_key, patch_operations, etag, match_condition
+        )
+        return self._respond(kwargs, WRITE_CHARGE, result)
+
+    async def execute_item_batch(
+        self, batch_operations, partition_key, **kwargs
+    ) -> list[dict]:
+        """
+        Runs the operations atomically against one logical partition: if any
+        of them fails none of them are applied and CosmosBatchOperationError
+        is raised with the index of the failing operation.
+        """
+        await self.client._request()
+        partition_key = _normalize_partition_key(partition_key)
+        # The documents each operation replaced, restored if a later one fails
+        undo: list[tuple[str, Optional[dict], Optional[int]]] = []
+        responses: list[dict] = []
+        for index, operation in enumerate(batch_operations):
+            name, args = operation[0].lower(), operation[1]
+            options = operation[2] if len(operation) > 2 else {}
+            etag = options.get("if_match_etag")
+            match_condition = MatchConditions.IfNotModified if etag else None
+            body = args[-1] if name in ("create", "upsert", "replace") else None
+            item_id = body.get("id") if body is not None else args[0]
+            undo.append(
+                (
+                    item_id,
+                    self._partitions.get(partition_key, {}).get(item_id),
+                    self._changes.get((partition_key, item_id)),
+                )
+            )
+            try:
+                if body is not None and self._partition_key_of(body) != partition_key:
+                    raise CosmosHttpResponseError(
+                        status_code=400,
+                        message="Batch operations must target the batch's partition",
+                    )
+                if name == "create":
+                    result, status = self._create(body), 201
+                elif name == "upsert":
+                    result, status = self._upsert(body, etag, match_condition), 200
+                elif name == "replace":
+                    result = self._replace(args[0], body, etag, match_condition)
+                    status = 200
+                elif name == "read":
+                    result = copy.deepcopy(self._get(item_id, partition_key))
+                    status = 200
+                elif name == "delete":
+                    self._delete(item_id, partition_key, etag, match_condition)
+                    result, status = None, 204
+                elif name == "patch":
+                    result = self._patch(
+                        item_id, partition_key, args[1], etag, match_condition
+                    )
+                    status = 200
+                else:
+                    raise ValueError(f"Unsupported batch operation {name}")
+            except CosmosHttpResponseError as e:
+                for undo_id, previous, previous_lsn in reversed(undo):
+                    self._restore(partition_key, undo_id, previous, previous_lsn)
+                failed = [{"statusCode": 424} for _ in batch_operations]
+                failed[index] = {"statusCode": e.status_code}
+                raise CosmosBatchOperationError(
+                    error_index=index,
+                    headers={},
+                    status_code=e.status_code,
+                    message=f"There was an error in the transactional batch on "
+                    f"operation {index}: {e.message}",
+                    operation_responses=failed,
+                )
+            response = {"statusCode": status}
+            if result is not None:
+                response["resourceBody"] = result
+                response["eTag"] = result["_etag"]
+            responses.append(response)
+        return self._respond(kwargs, WRITE_CHARGE * len(responses), responses)
+
+    def query_items(
+        self,
+        query: str,
+        parameters: Optional[list[dict[str, Any]]] = None,
+        partition_key: Any = None,
+        max_item_count: Optional[int] = None,
+        **kwargs,
+    ) -> InMemoryQueryIterable:
+        parsed = Query(query, parameters)
+
+        async def run() -> list[dict]:
+            await self.client._request()
+            results, charge = self._query(parsed, partition_key)
+            return self._respond(kwargs, charge, results)
+
+        return InMemoryQueryIterable(run, max_item_count)
+
+    def query_items_change_feed(
+        self,
+        start_time: Optional[str] = None,
+        continuation: Optional[str] = None,
+        max_item_count: Optional[int] = None,
+        **kwargs,
+    ) -> InMemoryChangeFeed:
+        """
+        The latest version of each document changed since continuation, in the
+        order they were written. Like the real feed in LatestVersion mode,
+        deletes don't appear in it. Without a continuation it starts from now,
+        or from the first write with start_time="Beginning".
+        """
+        if continuation is None:
+            last_lsn = next(reversed(self._changes.values()), 0)
+            continuation = "0" if start_time == "Beginning" else str(last_lsn)
+        return InMemoryChangeFeed(self, continuation, max_item_count, kwargs)
+
+    def read_all_items(self, max_item_count: Optional[int] = None, **kwargs):
+        return self.query_items("SELECT * FROM c", max_item_count=max_item_count)
+
+
+class InMemoryDatabase:
+    def __init__(self, client: "InMemoryCosmosClient", database_id: str):
+        self.client = client
+        self.id = database_id
+        self._containers: dict[str, InMemoryContainer] = {}
+
+    def get_container_client(self, container_id: str) -> InMemoryContainer:
+        if container_id not in self._containers:
+            self._containers[container_id] = InMemoryContainer(
+                self.client,
+                container_id,
+                PARTITION_KEY_PATHS.get(container_id, ["/id"]),
+            )
+        return self._containers[container_id]
+
+
+class InMemoryCosmosClient:
+    """
+    Drop in for azure.cosmos.aio.CosmosClient. Databases and containers are
+    created on first use with the partition keys in containers.py, and the
+    data outlives close() so the client can be reused across app lifespans.
+
+    :param latency: Seconds every request waits before it is served
+    :param throttle_rate: Probability between 0 and 1 that a request fails with a 429
+    :param seed: Seeds the throttling so runs are repeatable
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self._databases: dict[str, InMemoryDatabase] = {}
+        self.request_count = 0
+        self.throttled_count = 0
+
+    def get_database_client(self, database_id: str) -> InMemoryDatabase:
+        if database_id not in self._databases:
+            self._databases[database_id] = InMemoryDatabase(self, database_id)
+        return self._databases[database_id]
+
+    async def _request(self) -> None:
+        self.request_count += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.throttle_rate and self._random.random() < self.throttle_rate:
+            self.throttled_count += 1
+            error = CosmosHttpResponseError(
+                status_code=429,
+                message="Request rate is large. More Request Units may be needed",
+            )
+            error.headers = {"x-ms-retry-after-ms": "10"}
+            raise error
+
+    async def close(self) -> None:
+        pass
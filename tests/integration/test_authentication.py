@@ -1,9 +1,11 @@
+import asyncio
 import uuid
 
 import pytest
 from fastapi.testclient import TestClient
 
-from app.auth.passwords import get_password_hash
+from app.auth.passwords import get_password_hash, password_hashing_pool
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
 from app.data_access.user import UserDataAccess
 from app.models.user_models import UserInDB
 
@@ -11,9 +13,13 @@ CLEAN_UP_IDS = []
 
 
 def teardown_module():
-    user_data_access = UserDataAccess()
-    for user_id in CLEAN_UP_IDS:
-        user_data_access.delete_user(user_id)
+    async def clean_up():
+        user_data_access = UserDataAccess()
+        for user_id in CLEAN_UP_IDS:
+            await user_data_access.delete_user(user_id)
+        await CosmosDBClientSingleton.close()
+
+    asyncio.run(clean_up())
 
 
 @pytest.fixture
@@ -22,15 +28,15 @@ def user_data_access():
 
 
 @pytest.fixture
-def created_user(user_data_access: UserDataAccess):
+def created_user(user_data_access: UserDataAccess, run_async):
     user = UserInDB(
         id=str(uuid.uuid4()),
         email="someone@email.com",
         password_hash=get_password_hash("valid_password"),
     )
-    created = user_data_access.create_user(user)
+    created = run_async(user_data_access.create_user(user))
     yield created
-    user_data_access.delete_user(created.id)
+    run_async(user_data_access.delete_user(created.id))
 
 
 def test_sign_up_with_invalid_credentials(client: TestClient):
@@ -45,7 +51,7 @@ def test_sign_up_with_invalid_credentials(client: TestClient):
 
 
 def test_sign_up_with_valid_credentials(
-    client: TestClient, user_data_access: UserDataAccess
+    client: TestClient, user_data_access: UserDataAccess, run_async
 ):
     response = client.post(
         "/auth/signup",
@@ -59,11 +65,31 @@ def test_sign_up_with_valid_credentials(
     CLEAN_UP_IDS.append(json_response["id"])
 
     # User was actually created
-    user = user_data_access.get_user_by_id(json_response["id"])
+    user = run_async(user_data_access.get_user_by_id(json_response["id"]))
     assert user.id == json_response["id"]
     assert user.password_hash != "valid_password"
 
 
+def test_sign_up_with_email_of_existing_user_in_other_case(
+    client: TestClient, created_user: UserInDB
+):
+    response = client.post(
+        "/auth/signup",
+        json={"email": "Someone@Email.com", "password": "valid_password"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("An account already exists")
+
+
+def test_sign_in_with_email_in_other_case(client: TestClient, created_user: UserInDB):
+    response = client.post(
+        "/auth/signin",
+        json={"email": "SOMEONE@email.com", "password": "valid_password"},
+    )
+    assert response.status_code == 200
+    assert response.json()["id"] == created_user.id
+
+
 def test_sign_in_with_invalid_credentials(client: TestClient):
     response = client.post(
         "/auth/signin",
@@ -104,3 +130,18 @@ def test_sign_in_with_invalid_email(client: TestClient):
     assert response.status_code == 401
     json_response = response.json()
     assert json_response["detail"] == "Invalid email or password"
+
+
+def test_sign_in_is_turned_away_while_password_hashing_is_saturated(
+    client: TestClient, created_user: UserInDB, monkeypatch
+):
+    monkeypatch.setattr(password_hashing_pool, "max_workers", 0)
+    monkeypatch.setattr(password_hashing_pool, "max_queued", 0)
+
+    response = client.post(
+        "/auth/signin",
+        json={"email": created_user.email, "password": "valid_password"},
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
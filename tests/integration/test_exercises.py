@@ -2,11 +2,13 @@ import pytest
 
 
 @pytest.fixture
-def created_exercise(logged_in_client, exercises_cosmos_client):
+def created_exercise(logged_in_client, exercises_cosmos_client, run_async):
     response = logged_in_client.post("/exercises/", json={"name": "Exercise"})
     json = response.json()
     yield json
-    exercises_cosmos_client.delete_item(json["id"], partition_key=json["id"])
+    run_async(
+        exercises_cosmos_client.delete_item(json["id"], partition_key=json["creator"])
+    )
 
 
 def test_get_all_exercises_returns_status_200_and_list_of_exercises(
@@ -25,6 +27,27 @@ def test_get_all_exercises_returns_status_200_and_list_of_exercises(
     assert len(custom_exercises) == 1
 
 
+def test_get_all_exercises_is_304_until_an_exercise_is_added(
+    logged_in_client, exercises_cosmos_client, run_async
+):
+    etag = logged_in_client.get("/exercises/").headers["ETag"]
+
+    response = logged_in_client.get("/exercises/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    created = logged_in_client.post("/exercises/", json={"name": "Exercise"}).json()
+    response = logged_in_client.get("/exercises/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    run_async(
+        exercises_cosmos_client.delete_item(
+            created["id"], partition_key=created["creator"]
+        )
+    )
+
+
 @pytest.mark.parametrize("name", ["" "aaaa" "a" * 31])
 def test_create_custom_exercise_with_invalid_names(logged_in_client, name):
     """
@@ -34,7 +57,9 @@ def test_create_custom_exercise_with_invalid_names(logged_in_client, name):
     assert response.status_code == 422
 
 
-def test_create_custom_with_valid_name(logged_in_client, exercises_cosmos_client):
+def test_create_custom_with_valid_name(
+    logged_in_client, exercises_cosmos_client, run_async
+):
     """
     Test that creating a custom exercise with a valid name returns a 201 status code and the
     created exercise.
@@ -47,7 +72,11 @@ def test_create_custom_with_valid_name(logged_in_client, exercises_cosmos_client
 
     # Clean up
     exercise_id = json_resp["id"]
-    exercises_cosmos_client.delete_item(exercise_id, partition_key=exercise_id)
+    run_async(
+        exercises_cosmos_client.delete_item(
+            exercise_id, partition_key=json_resp["creator"]
+        )
+    )
 
 
 def test_create_custom_exercise_already_exists(logged_in_client, created_exercise):
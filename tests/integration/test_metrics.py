@@ -0,0 +1,75 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models.user_models import UserInDB
+
+
+@pytest.fixture
+def logged_in_client(logged_in_client: TestClient, user: UserInDB, monkeypatch):
+    monkeypatch.setenv("OPERATOR_USER_IDS", f"someone-else, {user.id}")
+    return logged_in_client
+
+
+def test_data_access_summary_requires_a_token(client: TestClient):
+    response = client.get("/metrics/data-access")
+    assert response.status_code == 401
+
+
+def test_metrics_are_only_for_operators(logged_in_client: TestClient, monkeypatch):
+    monkeypatch.delenv("OPERATOR_USER_IDS")
+    assert logged_in_client.get("/metrics/data-access").status_code == 403
+
+    monkeypatch.setenv("OPERATOR_USER_IDS", "someone-else")
+    assert logged_in_client.get("/metrics/token-cache").status_code == 403
+
+
+def test_data_access_summary_lists_operations(logged_in_client: TestClient):
+    logged_in_client.get("/workout-folders/")
+
+    response = logged_in_client.get("/metrics/data-access")
+
+    assert response.status_code == 200
+    operations = {o["operation"]: o for o in response.json()["operations"]}
+    folders = operations["WorkoutFolderDataAccess.get_users_workout_folders"]
+    assert folders["container"] == "workout-folders-by-user"
+    assert folders["count"] >= 1
+    assert folders["totalRequestCharge"] > 0
+
+
+def test_data_access_histograms(logged_in_client: TestClient):
+    logged_in_client.get("/workout-folders/")
+
+    response = logged_in_client.get("/metrics/data-access/histograms")
+
+    assert response.status_code == 200
+    histograms = response.json()["WorkoutFolderDataAccess.get_users_workout_folders"]
+    assert histograms["latencyMs"]["count"] >= 1
+    assert len(histograms["requestCharge"]["counts"]) == (
+        len(histograms["requestCharge"]["buckets"]) + 1
+    )
+
+
+def test_token_cache_stats(logged_in_client: TestClient):
+    logged_in_client.get("/workout-folders/")
+
+    response = logged_in_client.get("/metrics/token-cache")
+
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["hits"] >= 1
+    assert 0 < stats["hitRate"] <= 1
+
+
+def test_conflict_retry_stats(logged_in_client: TestClient):
+    folder = logged_in_client.post("/workout-folders/", json={"name": "Push"}).json()
+    path = f"/workout-folders/{folder['id']}"
+    etag = logged_in_client.get(path).headers["ETag"]
+    logged_in_client.put(path, json={"name": "Pull"}, headers={"If-Match": etag})
+    logged_in_client.delete(path)
+
+    response = logged_in_client.get("/metrics/conflict-retries")
+
+    assert response.status_code == 200
+    stats = response.json()["WorkoutFolderService.update_workout_folder"]
+    assert stats["calls"] >= 1
+    assert stats["exhausted"] == 0
@@ -11,6 +11,7 @@ GET_ENDPOINTS = [
     "/workout-folders/123",
     "/sets/123",
     "/exercises/",
+    "/me/preferences",
 ]
 
 POST_ENDPOINTS = [
@@ -1,7 +1,12 @@
+import json
+import uuid
+
 import pytest
 
 from app.data_access.exercise import ExerciseDataAccess
 from app.data_access.set import SetDataAccess
+from app.data_access.set_aggregate import set_aggregates_processor
+from app.models.exercises_models import ExerciseInDB
 from app.models.set_models import SetInDB
 
 
@@ -16,7 +21,7 @@ def set_data_access():
 
 
 @pytest.fixture
-def set_with_different_user_id(set_data_access, single_exercise):
+def set_with_different_user_id(set_data_access, single_exercise, run_async):
     set_ = SetInDB(
         exercise_id=single_exercise.id,
         reps=10,
@@ -25,13 +30,15 @@ def set_with_different_user_id(set_data_access, single_exercise):
         id="1",
         date_created="i know its wrong but i dont care",
     )
-    yield set_data_access.create_set(set_)
-    set_data_access.delete_set(set_.id)
+    yield run_async(set_data_access.create_set(set_))
+    run_async(set_data_access.delete_set(set_.id, set_.user_id, set_.exercise_id))
 
 
 @pytest.fixture
-def single_exercise(exercise_data_access, user):
-    exercise = exercise_data_access.get_exercise_by_name("Bench Press", user.id)
+def single_exercise(exercise_data_access, user, run_async):
+    exercise = run_async(
+        exercise_data_access.get_exercise_by_name("Bench Press", user.id)
+    )
     assert exercise is not None
     return exercise
 
@@ -70,6 +77,91 @@ def test_create_set_when_exercise_does_not_exist_returns_status_400_and_error_me
     assert "Exercise with ID non_existent_id does not exist" in response.text
 
 
+def test_create_sets_in_bulk_returns_a_result_per_set(
+    logged_in_client, single_exercise, set_data_access, user, run_async
+):
+    response = logged_in_client.post(
+        "/sets/bulk",
+        json={
+            "sets": [
+                {"exerciseId": single_exercise.id, "weight": 100, "reps": 5},
+                {"exerciseId": "does-not-exist", "weight": 100, "reps": 5},
+                {"exerciseId": single_exercise.id, "weight": 105, "reps": 3},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["status"] for r in results] == [201, 400, 201]
+    assert results[0]["created"]["weight"] == 100
+    assert results[2]["created"]["weight"] == 105
+    assert results[1]["created"] is None
+    history = logged_in_client.get(f"/sets/{single_exercise.id}").json()
+    logged = [s["id"] for day in history for s in day["sets"]]
+    # Newest first
+    assert logged[:2] == [results[2]["created"]["id"], results[0]["created"]["id"]]
+    for result in (results[0], results[2]):
+        run_async(
+            set_data_access.delete_set(
+                result["created"]["id"], user.id, single_exercise.id
+            )
+        )
+
+
+def test_sets_created_in_bulk_keep_their_order_in_every_view(
+    logged_in_client, single_exercise, set_data_access, user, run_async
+):
+    response = logged_in_client.post(
+        "/sets/bulk",
+        json={
+            "sets": [
+                {"exerciseId": single_exercise.id, "weight": 100 + i, "reps": 5}
+                for i in range(5)
+            ]
+        },
+    )
+    created = [r["created"]["id"] for r in response.json()]
+    newest_first = created[::-1]
+
+    paged, token = [], None
+    while True:
+        params = {"limit": 2}
+        if token is not None:
+            params["continuation_token"] = token
+        page = logged_in_client.get(f"/sets/{single_exercise.id}", params=params)
+        paged += [s["id"] for day in page.json() for s in day["sets"]]
+        token = page.headers.get("x-continuation-token")
+        if token is None:
+            break
+    exported = [
+        json.loads(line)["id"]
+        for line in logged_in_client.get(
+            f"/sets/{single_exercise.id}/export", params={"lines": "set"}
+        ).text.splitlines()
+    ]
+    whole = logged_in_client.get(f"/sets/{single_exercise.id}").json()
+
+    assert [i for i in paged if i in created] == newest_first
+    assert [i for i in exported if i in created] == newest_first
+    assert [s["id"] for day in whole for s in day["sets"] if s["id"] in created] == (
+        newest_first
+    )
+    for set_id in created:
+        run_async(set_data_access.delete_set(set_id, user.id, single_exercise.id))
+
+
+@pytest.mark.parametrize("count", [0, 201])
+def test_create_sets_in_bulk_with_too_few_or_many_sets_returns_422(
+    logged_in_client, count
+):
+    response = logged_in_client.post(
+        "/sets/bulk",
+        json={"sets": [{"exerciseId": "1", "weight": 100, "reps": 5}] * count},
+    )
+    assert response.status_code == 422
+
+
 def test_delete_set_returns_status_204(logged_in_client, single_exercise):
     response = logged_in_client.post(
         "/sets/",
@@ -101,3 +193,331 @@ def test_delete_set_when_set_belongs_to_different_user_returns_status_401_and_er
         response.json()["detail"]
         == "Only the person who created this set can delete it"
     )
+
+
+def test_get_sets_pages_through_history_newest_day_first(
+    logged_in_client, set_data_access, user, run_async
+):
+    # An exercise of its own, so sets logged by other tests don't show up
+    exercise_id = "history-exercise"
+    # Two sets on each of five days
+    for day in range(1, 6):
+        for hour in (9, 10):
+            run_async(
+                set_data_access.create_set(
+                    SetInDB(
+                        id=f"history-{day}-{hour}",
+                        exercise_id=exercise_id,
+                        reps=5,
+                        weight=100,
+                        user_id=user.id,
+                        date_created=f"2024-05-0{day}T{hour:02d}:00:00+00:00",
+                    )
+                )
+            )
+
+    days = []
+    token = None
+    while True:
+        params = {"limit": 3}
+        if token is not None:
+            params["continuation_token"] = token
+        response = logged_in_client.get(f"/sets/{exercise_id}", params=params)
+        assert response.status_code == 200
+        days.extend(response.json())
+        token = response.headers.get("X-Continuation-Token")
+        if token is None:
+            break
+
+    assert [day["dateCreated"] for day in days] == [
+        "2024-05-05",
+        "2024-05-04",
+        "2024-05-03",
+        "2024-05-02",
+        "2024-05-01",
+    ]
+    assert all(len(day["sets"]) == 2 for day in days)
+    for day in range(1, 6):
+        for hour in (9, 10):
+            run_async(
+                set_data_access.delete_set(
+                    f"history-{day}-{hour}", user.id, exercise_id
+                )
+            )
+
+
+def test_get_sets_without_limit_returns_the_whole_history(
+    logged_in_client, set_data_access, user, run_async
+):
+    exercise_id = "whole-history-exercise"
+    # Logged out of order, the day's sets come back newest first too
+    run_async(
+        set_data_access.create_set(
+            SetInDB(
+                id="whole-3-early",
+                exercise_id=exercise_id,
+                reps=5,
+                weight=100,
+                user_id=user.id,
+                date_created="2024-05-03T08:00:00+00:00",
+            )
+        )
+    )
+    for day in range(1, 4):
+        run_async(
+            set_data_access.create_set(
+                SetInDB(
+                    id=f"whole-{day}",
+                    exercise_id=exercise_id,
+                    reps=5,
+                    weight=100,
+                    user_id=user.id,
+                    date_created=f"2024-05-0{day}T10:00:00+00:00",
+                )
+            )
+        )
+
+    response = logged_in_client.get(f"/sets/{exercise_id}")
+
+    assert response.status_code == 200
+    assert "X-Continuation-Token" not in response.headers
+    assert [day["dateCreated"] for day in response.json()] == [
+        "2024-05-03",
+        "2024-05-02",
+        "2024-05-01",
+    ]
+    assert [s["id"] for s in response.json()[0]["sets"]] == ["whole-3", "whole-3-early"]
+    run_async(set_data_access.delete_set("whole-3-early", user.id, exercise_id))
+    for day in range(1, 4):
+        run_async(set_data_access.delete_set(f"whole-{day}", user.id, exercise_id))
+
+
+def test_get_sets_is_304_until_a_set_is_logged(logged_in_client, single_exercise):
+    url = f"/sets/{single_exercise.id}"
+    etag = logged_in_client.get(url).headers["ETag"]
+
+    response = logged_in_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    created = logged_in_client.post(
+        "/sets/", json={"exerciseId": single_exercise.id, "weight": 100, "reps": 5}
+    ).json()
+    response = logged_in_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    logged_in_client.delete(f"/sets/{created['id']}")
+
+
+def test_get_sets_between_since_and_until(
+    logged_in_client, set_data_access, user, run_async
+):
+    exercise_id = "range-exercise"
+    for day in range(1, 6):
+        run_async(
+            set_data_access.create_set(
+                SetInDB(
+                    id=f"range-{day}",
+                    exercise_id=exercise_id,
+                    reps=5,
+                    weight=100,
+                    user_id=user.id,
+                    date_created=f"2024-05-0{day}T10:00:00+00:00",
+                )
+            )
+        )
+
+    response = logged_in_client.get(
+        f"/sets/{exercise_id}",
+        params={"since": "2024-05-02T00:00:00Z", "until": "2024-05-04T00:00:00Z"},
+    )
+
+    assert response.status_code == 200
+    assert [day["dateCreated"] for day in response.json()] == [
+        "2024-05-03",
+        "2024-05-02",
+    ]
+    stored = run_async(
+        set_data_access.container.read_item(
+            "range-1", partition_key=[user.id, exercise_id]
+        )
+    )
+    assert stored["created_at_ms"] == 1714557600000
+    for day in range(1, 6):
+        run_async(set_data_access.delete_set(f"range-{day}", user.id, exercise_id))
+
+
+def test_get_sets_with_since_after_until_returns_400(logged_in_client):
+    response = logged_in_client.get(
+        "/sets/range-exercise",
+        params={"since": "2024-05-04T00:00:00", "until": "2024-05-02T00:00:00"},
+    )
+    assert response.status_code == 400
+
+
+def test_get_sets_with_invalid_continuation_token_returns_400(
+    logged_in_client, single_exercise
+):
+    response = logged_in_client.get(
+        f"/sets/{single_exercise.id}", params={"continuation_token": "nonsense"}
+    )
+    assert response.status_code == 400
+
+
+def test_exercise_summary_follows_the_change_feed(
+    logged_in_client, exercise_data_access, user, run_async
+):
+    exercise = run_async(
+        exercise_data_access.create_custom_exercise(
+            ExerciseInDB(
+                id=str(uuid.uuid4()),
+                name="Summary Press",
+                body_parts=[],
+                creator=user.id,
+            )
+        )
+    )
+    processor = set_aggregates_processor(owner="integration-tests")
+    response = logged_in_client.post(
+        "/sets/bulk",
+        json={
+            "sets": [
+                {"exerciseId": exercise.id, "weight": 100, "reps": 5},
+                {"exerciseId": exercise.id, "weight": 120, "reps": 1},
+            ]
+        },
+    )
+    created = [result["created"] for result in response.json()]
+
+    assert logged_in_client.get(f"/sets/{exercise.id}/summary").status_code == 404
+    run_async(processor.run_once())
+    summary = logged_in_client.get(f"/sets/{exercise.id}/summary").json()
+    assert summary["setCount"] == 2
+    assert summary["maxWeight"] == 120
+    assert summary["bestEstimatedOneRepMax"] == 120
+    assert summary["totalVolume"] == 620
+    assert summary["lastSessionDate"] == created[0]["dateCreated"][:10]
+
+    # Reading the feed again changes nothing
+    run_async(processor.run_once())
+    assert logged_in_client.get(f"/sets/{exercise.id}/summary").json() == summary
+
+    logged_in_client.delete(f"/sets/{created[1]['id']}")
+    summary = logged_in_client.get(f"/sets/{exercise.id}/summary").json()
+    assert summary["setCount"] == 1
+    assert summary["maxWeight"] == 100
+
+    logged_in_client.delete(f"/sets/{created[0]['id']}")
+    assert logged_in_client.get(f"/sets/{exercise.id}/summary").status_code == 404
+
+
+def test_get_exercise_progress_returns_a_day_per_session(
+    logged_in_client, single_exercise, set_data_access, user, run_async
+):
+    exercise = single_exercise.id
+    for day, weight in (("2024-05-01", 100), ("2024-05-03", 110)):
+        run_async(
+            set_data_access.create_set(
+                SetInDB(
+                    id=f"progress-{day}",
+                    exercise_id=exercise,
+                    user_id=user.id,
+                    weight=weight,
+                    reps=5,
+                    date_created=f"{day}T10:00:00+00:00",
+                )
+            )
+        )
+
+    response = logged_in_client.get(f"/sets/{exercise}/progress")
+
+    assert response.status_code == 200
+    days = {day["date"]: day for day in response.json()["days"]}
+    assert days["2024-05-01"]["topSetWeight"] == 100
+    assert days["2024-05-03"]["volume"] == 550
+    assert days["2024-05-03"]["volumeTrend"] == 525
+    for day in ("2024-05-01", "2024-05-03"):
+        run_async(set_data_access.delete_set(f"progress-{day}", user.id, exercise))
+
+
+def test_get_sets_in_buckets(
+    logged_in_client, single_exercise, set_data_access, user, run_async
+):
+    exercise = single_exercise.id
+    days = ["2021-03-01", "2021-03-03", "2021-03-08"]
+    for i, day in enumerate(days):
+        run_async(
+            set_data_access.create_set(
+                SetInDB(
+                    id=f"bucket-{day}",
+                    exercise_id=exercise,
+                    user_id=user.id,
+                    weight=100 + i,
+                    reps=5,
+                    date_created=f"{day}T10:00:00+00:00",
+                )
+            )
+        )
+
+    response = logged_in_client.get(
+        f"/sets/{exercise}",
+        params={"bucket": "week", "since": "2021-01-01", "until": "2021-04-01"},
+    )
+
+    assert response.status_code == 200
+    assert "ETag" in response.headers
+    assert response.json() == [
+        {"start": "2021-03-01", "setCount": 2, "maxWeight": 101, "volume": 1005},
+        {"start": "2021-03-08", "setCount": 1, "maxWeight": 102, "volume": 510},
+    ]
+    response = logged_in_client.get(
+        f"/sets/{exercise}", params={"bucket": "week", "continuation_token": "x"}
+    )
+    assert response.status_code == 400
+    for day in days:
+        run_async(set_data_access.delete_set(f"bucket-{day}", user.id, exercise))
+
+
+def test_export_set_history_streams_ndjson(
+    logged_in_client, single_exercise, set_data_access, user, run_async
+):
+    exercise = single_exercise.id
+    timestamps = [
+        "2019-02-01T10:00:00+00:00",
+        "2019-02-03T10:00:00+00:00",
+        "2019-02-03T11:00:00+00:00",
+    ]
+    for i, timestamp in enumerate(timestamps):
+        run_async(
+            set_data_access.create_set(
+                SetInDB(
+                    id=f"export-{i}",
+                    exercise_id=exercise,
+                    user_id=user.id,
+                    weight=100,
+                    reps=5,
+                    date_created=timestamp,
+                )
+            )
+        )
+
+    response = logged_in_client.get(f"/sets/{exercise}/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    days = [json.loads(line) for line in response.text.splitlines()]
+    export = [d for d in days if d["dateCreated"].startswith("2019-02")]
+    assert [(d["dateCreated"], [s["id"] for s in d["sets"]]) for d in export] == [
+        ("2019-02-03", ["export-2", "export-1"]),
+        ("2019-02-01", ["export-0"]),
+    ]
+    response = logged_in_client.get(f"/sets/{exercise}/export", params={"lines": "set"})
+    ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+    assert [i for i in ids if i.startswith("export-")] == [
+        "export-2",
+        "export-1",
+        "export-0",
+    ]
+    for i in range(len(timestamps)):
+        run_async(set_data_access.delete_set(f"export-{i}", user.id, exercise))
@@ -26,7 +26,7 @@ def test_update_preferences_with_bad_value(logged_in_client: TestClient):
 
 
 def test_update_preferences(
-    logged_in_client: TestClient, user_data_access: UserDataAccess
+    logged_in_client: TestClient, user_data_access: UserDataAccess, run_async
 ):
     """
     Test that updating preferences with a valid token and request body returns a 204 response.
@@ -34,19 +34,45 @@ def test_update_preferences(
     """
     response = logged_in_client.put("/me/preferences", json={"theme": "dark"})
     assert response.status_code == 204
-    user = user_data_access.get_user_by_email("test@test.com")
+    user = run_async(user_data_access.get_user_by_email("test@test.com"))
     assert user.preferences.theme == "dark"
 
 
+def test_update_preferences_if_match(logged_in_client: TestClient):
+    """
+    Test that an update sent with the preferences' ETag goes through and
+    returns the new ETag, and that one sent with an old ETag is turned down
+    """
+    etag = logged_in_client.get("/me/preferences").headers["ETag"]
+
+    response = logged_in_client.put(
+        "/me/preferences", json={"theme": "dark"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 204
+    new_etag = response.headers["ETag"]
+    assert new_etag == logged_in_client.get("/me/preferences").headers["ETag"]
+
+    response = logged_in_client.put(
+        "/me/preferences", json={"theme": "light"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 412
+    assert logged_in_client.get("/me/preferences").json() == {"theme": "dark"}
+
+    response = logged_in_client.put(
+        "/me/preferences", json={"theme": "light"}, headers={"If-Match": new_etag}
+    )
+    assert response.status_code == 204
+
+
 def test_update_preferences_with_deleted_user_but_valid_token(
-    logged_in_client: TestClient, user_data_access: UserDataAccess
+    logged_in_client: TestClient, user_data_access: UserDataAccess, run_async
 ):
     """
     Test that updating preferences with a valid token and request body returns a 404 response.
     This is an unlikely scenario but nonetheless should be handled.
     """
-    user = user_data_access.get_user_by_email("test@test.com")
-    user_data_access.delete_user(user.id)
+    user = run_async(user_data_access.get_user_by_email("test@test.com"))
+    run_async(user_data_access.delete_user(user.id))
     response = logged_in_client.put("/me/preferences", json={"theme": "dark"})
     assert response.status_code == 404
     assert response.json() == {"detail": "User not found"}
@@ -37,13 +37,18 @@ def list_of_workout_folders(user: UserInDB):
 def setup_module(
     workout_folder_data_access: WorkoutFolderDataAccess,
     list_of_workout_folders: list[WorkoutFolderInDB],
+    run_async,
 ):
     for folder in list_of_workout_folders:
-        workout_folder_data_access.create_workout_folder(folder)
+        run_async(workout_folder_data_access.create_workout_folder(folder))
     yield list_of_workout_folders
     for folder in list_of_workout_folders:
         try:
-            workout_folder_data_access.delete_workout_folder(folder.id)
+            run_async(
+                workout_folder_data_access.delete_workout_folder(
+                    folder.id, folder.user_id
+                )
+            )
         except CosmosResourceNotFoundError:
             pass  # Folder was already deleted
 
@@ -63,6 +68,24 @@ def test_get_users_folders(logged_in_client: TestClient, user: UserInDB):
     ]
 
 
+def test_get_users_folders_is_304_until_folders_change(logged_in_client: TestClient):
+    etag = logged_in_client.get("/workout-folders/").headers["ETag"]
+
+    response = logged_in_client.get(
+        "/workout-folders/", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    logged_in_client.put("/workout-folders/1", json={"name": "Renamed"})
+    response = logged_in_client.get(
+        "/workout-folders/", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
 def test_get_folder_by_id(logged_in_client: TestClient):
     """
     Test that the endpoint returns the correct workout folder for the user
@@ -101,6 +124,7 @@ def test_create_workout_folder(
     user: UserInDB,
     workout_folder_data_access: WorkoutFolderDataAccess,
     setup_module,
+    run_async,
 ):
     """
     Test that the endpoint creates a workout folder
@@ -118,11 +142,15 @@ def test_create_workout_folder(
         "userId": user.id,
     }
     assert (
-        workout_folder_data_access.get_folder_by_id(json_response["id"]).name
+        run_async(
+            workout_folder_data_access.get_folder_by_id(json_response["id"], user.id)
+        ).name
         == "New Folder"
     )
     # Cleanup
-    workout_folder_data_access.delete_workout_folder(json_response["id"])
+    run_async(
+        workout_folder_data_access.delete_workout_folder(json_response["id"], user.id)
+    )
 
 
 @pytest.mark.parametrize(
@@ -217,6 +245,82 @@ def test_update_workout_folder_name_and_exercises(
     }
 
 
+def test_updates_to_different_fields_both_stick(
+    logged_in_client: TestClient, user: UserInDB
+):
+    """
+    Test that updating only the exercises leaves a name set by an earlier
+    update, from another device say, as it is
+    """
+    exercises = [
+        ExerciseInDB(
+            id="1", name="Exercise 1", body_parts=[], creator="system"
+        ).model_dump(by_alias=True)
+    ]
+    logged_in_client.put("/workout-folders/1", json={"name": "Renamed"})
+    response = logged_in_client.put("/workout-folders/1", json={"exercises": exercises})
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": "1",
+        "name": "Renamed",
+        "exercises": exercises,
+        "userId": user.id,
+    }
+
+
+def test_update_workout_folder_if_match(logged_in_client: TestClient):
+    """
+    Test that an update sent with the folder's ETag goes through and returns
+    the new ETag, and that one sent with an old ETag is turned down
+    """
+    etag = logged_in_client.get("/workout-folders/1").headers["ETag"]
+
+    response = logged_in_client.put(
+        "/workout-folders/1", json={"name": "Renamed"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["name"] == "Renamed"
+    new_etag = response.headers["ETag"]
+    assert new_etag == logged_in_client.get("/workout-folders/1").headers["ETag"]
+
+    response = logged_in_client.put(
+        "/workout-folders/1", json={"name": "Stale"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 412
+    assert logged_in_client.get("/workout-folders/1").json()["name"] == "Renamed"
+
+    response = logged_in_client.put(
+        "/workout-folders/1", json={"name": "Again"}, headers={"If-Match": new_etag}
+    )
+    assert response.status_code == 200
+
+
+def test_update_workout_folder_if_match_deleted_after_the_read(
+    logged_in_client: TestClient, monkeypatch
+):
+    """
+    Test that a folder deleted between the read and the conditional patch is
+    answered like any missing folder, not with a server error
+    """
+    etag = logged_in_client.get("/workout-folders/1").headers["ETag"]
+    read = WorkoutFolderDataAccess.get_folder_and_etag
+
+    async def read_then_delete(self, folder_id, user_id):
+        folder_and_etag = await read(self, folder_id, user_id)
+        await self.delete_workout_folder(folder_id, user_id)
+        return folder_and_etag
+
+    monkeypatch.setattr(
+        WorkoutFolderDataAccess, "get_folder_and_etag", read_then_delete
+    )
+
+    response = logged_in_client.put(
+        "/workout-folders/1", json={"name": "Renamed"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Folder with requested id does not exist"}
+
+
 def test_update_workout_folder_no_data(logged_in_client: TestClient, setup_module):
     """
     Test that the endpoint returns 422 if no data is provided
@@ -258,6 +362,7 @@ def test_delete_workout_folder(
     logged_in_client: TestClient,
     workout_folder_data_access: WorkoutFolderDataAccess,
     setup_module,
+    run_async,
 ):
     """
     Test that the endpoint deletes a workout folder
@@ -267,7 +372,7 @@ def test_delete_workout_folder(
 
     # Check that the folder is deleted
     with pytest.raises(CosmosResourceNotFoundError):
-        workout_folder_data_access.get_folder_by_id("1")
+        run_async(workout_folder_data_access.get_folder_by_id("1", "1"))
 
 
 def test_delete_workout_folder_not_found(logged_in_client: TestClient):
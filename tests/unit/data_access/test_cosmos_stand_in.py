@@ -0,0 +1,246 @@
+import pytest
+from azure.core import MatchConditions
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosBatchOperationError,
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+from app.data_access.containers import DATABASE_ID, EXERCISE_SETS, USERS
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def stand_in():
+    return InMemoryCosmosClient()
+
+
+@pytest.fixture
+def sets(stand_in):
+    return stand_in.get_database_client(DATABASE_ID).get_container_client(EXERCISE_SETS)
+
+
+@pytest.fixture
+def users(stand_in):
+    return stand_in.get_database_client(DATABASE_ID).get_container_client(USERS)
+
+
+def make_set(set_id: str, user_id="1", exercise_id="bench", date_created="2024"):
+    return {
+        "id": set_id,
+        "user_id": user_id,
+        "exercise_id": exercise_id,
+        "date_created": date_created,
+    }
+
+
+async def collect(items):
+    return [item async for item in items]
+
+
+async def test_create_and_read_item(users):
+    created = await users.create_item(body={"id": "1", "email": "a@b.com"})
+
+    assert created["_etag"]
+    assert await users.read_item(item="1", partition_key="1") == created
+    with pytest.raises(CosmosResourceExistsError):
+        await users.create_item(body={"id": "1", "email": "a@b.com"})
+    with pytest.raises(CosmosResourceNotFoundError):
+        await users.read_item(item="2", partition_key="2")
+
+
+async def test_read_item_needs_the_items_partition(sets):
+    await sets.create_item(body=make_set("1"))
+
+    with pytest.raises(CosmosResourceNotFoundError):
+        await sets.read_item(item="1", partition_key=["2", "bench"])
+
+
+async def test_query_with_parameters_and_partition_prefix(sets):
+    await sets.create_item(body=make_set("1"))
+    await sets.create_item(body=make_set("2", exercise_id="squat"))
+    await sets.create_item(body=make_set("3", user_id="2"))
+
+    by_exercise = await collect(
+        sets.query_items(
+            query="SELECT * FROM sets s WHERE s.exercise_id = @exercise_id AND s.user_id = @user_id",
+            parameters=[
+                {"name": "@exercise_id", "value": "bench"},
+                {"name": "@user_id", "value": "1"},
+            ],
+            partition_key=["1", "bench"],
+        )
+    )
+    by_user_prefix = await collect(
+        sets.query_items(query="SELECT * FROM sets s", partition_key=["1"])
+    )
+    cross_partition = await collect(
+        sets.query_items(
+            query="SELECT * FROM sets s WHERE s.id = @id",
+            parameters=[{"name": "@id", "value": "3"}],
+        )
+    )
+
+    assert [s["id"] for s in by_exercise] == ["1"]
+    assert sorted(s["id"] for s in by_user_prefix) == ["1", "2"]
+    assert [s["user_id"] for s in cross_partition] == ["2"]
+
+
+async def test_query_range_order_by_and_pages(sets):
+    for i in range(5):
+        await sets.create_item(body=make_set(str(i), date_created=f"2024-0{i + 1}"))
+
+    pages = sets.query_items(
+        query="SELECT * FROM c WHERE c.date_created >= @since ORDER BY c.date_created DESC",
+        parameters=[{"name": "@since", "value": "2024-02"}],
+        max_item_count=3,
+    ).by_page()
+    first = await collect(await pages.__anext__())
+    token = pages.continuation_token
+    rest = await collect(
+        await sets.query_items(
+            query="SELECT * FROM c WHERE c.date_created >= @since ORDER BY c.date_created DESC",
+            parameters=[{"name": "@since", "value": "2024-02"}],
+            max_item_count=3,
+        )
+        .by_page(token)
+        .__anext__()
+    )
+
+    assert [s["id"] for s in first] == ["4", "3", "2"]
+    assert [s["id"] for s in rest] == ["1"]
+
+
+async def test_query_pages_are_copies_made_as_they_are_read(sets):
+    await sets.create_item(body=make_set("1"))
+    pages = sets.query_items(query="SELECT * FROM c").by_page()
+
+    [item] = await collect(await pages.__anext__())
+    item["date_created"] = "changed"
+
+    stored = await sets.read_item(item="1", partition_key=["1", "bench"])
+    assert stored["date_created"] == "2024"
+
+
+async def test_count_query(sets):
+    await sets.create_item(body=make_set("1"))
+    await sets.create_item(body=make_set("2"))
+
+    assert await collect(sets.query_items("SELECT VALUE COUNT(1) FROM c")) == [2]
+
+
+async def test_unsupported_query_raises(sets):
+    with pytest.raises(ValueError):
+        sets.query_items("SELECT s.id FROM sets s JOIN t IN s.tags")
+
+
+async def test_indexes_follow_writes(users):
+    query = "SELECT * FROM users u WHERE u.email = @email"
+    params = [{"name": "@email", "value": "a@b.com"}]
+    await users.create_item(body={"id": "1", "email": "a@b.com"})
+    assert len(await collect(users.query_items(query, parameters=params))) == 1
+
+    await users.upsert_item(body={"id": "1", "email": "c@d.com"})
+    assert await collect(users.query_items(query, parameters=params)) == []
+
+    await users.upsert_item(body={"id": "1", "email": "a@b.com"})
+    await users.delete_item(item="1", partition_key="1")
+    assert await collect(users.query_items(query, parameters=params)) == []
+
+
+async def test_patch_item_with_etag(users):
+    created = await users.create_item(
+        body={"id": "1", "preferences": {"theme": "system"}, "logins": 1}
+    )
+
+    patched = await users.patch_item(
+        item="1",
+        partition_key="1",
+        patch_operations=[
+            {"op": "set", "path": "/preferences/theme", "value": "dark"},
+            {"op": "incr", "path": "/logins", "value": 1},
+        ],
+        etag=created["_etag"],
+        match_condition=MatchConditions.IfNotModified,
+    )
+
+    assert patched["preferences"]["theme"] == "dark"
+    assert patched["logins"] == 2
+    with pytest.raises(CosmosAccessConditionFailedError):
+        await users.upsert_item(
+            body={"id": "1"},
+            etag=created["_etag"],
+            match_condition=MatchConditions.IfNotModified,
+        )
+
+
+async def test_failed_batch_is_rolled_back(sets):
+    await sets.create_item(body=make_set("1"))
+
+    with pytest.raises(CosmosBatchOperationError) as e:
+        await sets.execute_item_batch(
+            batch_operations=[
+                ("create", (make_set("2"),)),
+                ("delete", ("1",)),
+                ("create", (make_set("2"),)),
+            ],
+            partition_key=["1", "bench"],
+        )
+
+    assert e.value.error_index == 2
+    remaining = await collect(sets.query_items("SELECT * FROM c"))
+    assert [s["id"] for s in remaining] == ["1"]
+
+
+async def test_batch_returns_operation_results(sets):
+    results = await sets.execute_item_batch(
+        batch_operations=[("create", (make_set("1"),)), ("read", ("1",))],
+        partition_key=["1", "bench"],
+    )
+
+    assert [r["statusCode"] for r in results] == [201, 200]
+    assert results[1]["resourceBody"]["id"] == "1"
+
+
+async def test_throttling_raises_429():
+    stand_in = InMemoryCosmosClient(throttle_rate=1.0, seed=1)
+    users = stand_in.get_database_client(DATABASE_ID).get_container_client(USERS)
+
+    with pytest.raises(CosmosHttpResponseError) as e:
+        await users.read_item(item="1", partition_key="1")
+
+    assert e.value.status_code == 429
+    assert stand_in.throttled_count == 1
+
+
+async def test_change_feed_reads_latest_versions_in_write_order(sets):
+    await sets.create_item(body=make_set("1"))
+    await sets.create_item(body=make_set("2", exercise_id="squat"))
+    await sets.upsert_item(body={**make_set("1"), "weight": 100})
+    await sets.create_item(body=make_set("3"))
+    await sets.delete_item(item="3", partition_key=["1", "bench"])
+
+    pages = sets.query_items_change_feed(
+        start_time="Beginning", max_item_count=1
+    ).by_page()
+    changes = [await collect(page) async for page in pages]
+
+    assert [[c["id"] for c in page] for page in changes] == [["2"], ["1"]]
+    assert changes[1][0]["weight"] == 100
+    assert changes[0][0]["_lsn"] < changes[1][0]["_lsn"]
+
+    await sets.create_item(body=make_set("4"))
+    resumed = sets.query_items_change_feed(continuation=pages.continuation_token)
+    assert [c["id"] for c in await collect(resumed)] == ["4"]
+
+
+async def test_change_feed_starts_from_now_by_default(sets):
+    await sets.create_item(body=make_set("1"))
+    feed = sets.query_items_change_feed()
+    await sets.create_item(body=make_set("2"))
+
+    assert [c["id"] for c in await collect(feed)] == ["2"]
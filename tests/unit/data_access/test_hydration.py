@@ -0,0 +1,88 @@
+from app.data_access.hydration import hydrate, hydrate_many
+from app.models.exercises_models import ExerciseInDB
+from app.models.set_models import SetInDB, Tempo
+from app.models.user_models import Preferences, UserInDB
+from app.models.workout_folder_models import WorkoutFolderInDB
+
+SYSTEM_PROPERTIES = {"_rid": "abc", "_etag": '"1"', "_ts": 1714560000}
+
+
+def test_hydrate_matches_validation_and_drops_system_properties():
+    document = {
+        "id": "1",
+        "exercise_id": "bench",
+        "weight": 100.0,
+        "reps": 5,
+        "notes": "",
+        "tempo": None,
+        "date_created": "2024-05-01T10:00:00+00:00",
+        "user_id": "1",
+        **SYSTEM_PROPERTIES,
+    }
+
+    hydrated = hydrate(SetInDB, document)
+
+    assert hydrated == SetInDB(**document)
+    assert "_etag" not in hydrated.model_dump()
+
+
+def test_hydrate_builds_nested_models():
+    document = {
+        "id": "1",
+        "name": "Push",
+        "user_id": "1",
+        "exercises": [
+            {"id": "2", "name": "Bench Press", "body_parts": [], "creator": "system"}
+        ],
+        **SYSTEM_PROPERTIES,
+    }
+
+    folder = hydrate(WorkoutFolderInDB, document)
+
+    assert isinstance(folder.exercises[0], ExerciseInDB)
+    assert folder == WorkoutFolderInDB(**document)
+
+
+def test_hydrate_builds_optional_nested_models():
+    document = {
+        "id": "1",
+        "exercise_id": "bench",
+        "weight": 100.0,
+        "reps": 5,
+        "tempo": {"eccentric": 3, "concentric": 1, "pause": 0},
+        "date_created": "2024-05-01T10:00:00+00:00",
+        "user_id": "1",
+    }
+
+    assert hydrate(SetInDB, document).tempo == Tempo(eccentric=3, concentric=1, pause=0)
+
+
+def test_hydrate_fills_defaults():
+    user = hydrate(UserInDB, {"id": "1", "email": "a@b.com"})
+
+    assert user.preferences == Preferences(theme="system")
+    assert user.provider is None
+    assert user.model_fields_set == {"id", "email"}
+
+
+def test_hydrate_many_matches_validation():
+    documents = [
+        {
+            "id": str(i),
+            "exercise_id": "bench",
+            "weight": 100.0,
+            "reps": 5,
+            "date_created": "2024-05-01T10:00:00+00:00",
+            "user_id": "1",
+            **SYSTEM_PROPERTIES,
+        }
+        for i in range(3)
+    ]
+
+    sets = hydrate_many(SetInDB, iter(documents))
+
+    assert sets == [SetInDB(**document) for document in documents]
+
+
+def test_hydrate_many_of_nothing():
+    assert hydrate_many(SetInDB, []) == []
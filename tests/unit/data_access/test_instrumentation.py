@@ -0,0 +1,181 @@
+import pytest
+from azure.core import MatchConditions
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosResourceNotFoundError,
+)
+
+from app.data_access.containers import DATABASE_ID, USERS
+from app.data_access.instrumentation import (
+    DataAccessMetrics,
+    Histogram,
+    InstrumentedContainer,
+    OperationRecord,
+    track_operation,
+)
+from tests.cosmos_stand_in import (
+    LOADED_DOCUMENT_CHARGE,
+    QUERY_CHARGE,
+    READ_CHARGE,
+    WRITE_CHARGE,
+    InMemoryCosmosClient,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def metrics():
+    return DataAccessMetrics(window_seconds=60)
+
+
+@pytest.fixture
+def container(metrics):
+    users = (
+        InMemoryCosmosClient()
+        .get_database_client(DATABASE_ID)
+        .get_container_client(USERS)
+    )
+    return InstrumentedContainer(users, metrics)
+
+
+def make_record(operation="op", timestamp=1000.0, request_charge=1.0, duration_ms=5.0):
+    return OperationRecord(
+        timestamp=timestamp,
+        operation=operation,
+        container=USERS,
+        request_charge=request_charge,
+        item_count=1,
+        duration_ms=duration_ms,
+    )
+
+
+def test_histogram_buckets_observations():
+    histogram = Histogram((1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+
+    assert snapshot.counts == [2, 1, 1]
+    assert snapshot.count == 4
+    assert snapshot.sum == 56.5
+
+
+def test_summary_only_covers_the_window(metrics):
+    metrics.record(make_record(timestamp=900.0, request_charge=100))
+    metrics.record(make_record(timestamp=990.0, request_charge=2))
+    metrics.record(make_record(timestamp=995.0, request_charge=4))
+
+    summary = metrics.summary(now=1000.0)
+
+    assert len(summary.operations) == 1
+    assert summary.operations[0].count == 2
+    assert summary.operations[0].total_request_charge == 6
+    # The histograms are not windowed
+    assert metrics.histograms()["op"].request_charge.count == 3
+
+
+def test_summary_sorts_by_total_request_charge(metrics):
+    metrics.record(make_record(operation="cheap", request_charge=1))
+    metrics.record(make_record(operation="expensive", request_charge=50))
+
+    summary = metrics.summary(now=1000.0)
+
+    assert [o.operation for o in summary.operations] == ["expensive", "cheap"]
+
+
+async def test_point_operations_are_recorded_under_the_tracked_operation(
+    container, metrics
+):
+    @track_operation("UserDataAccess.create_user")
+    async def create_user():
+        return await container.create_item(body={"id": "1", "email": "a@b.com"})
+
+    await create_user()
+    await container.read_item(item="1", partition_key="1")
+
+    histograms = metrics.histograms()
+    assert histograms["UserDataAccess.create_user"].request_charge.sum == WRITE_CHARGE
+    assert histograms["read_item"].request_charge.sum == READ_CHARGE
+
+
+async def test_failed_operations_are_recorded(container, metrics):
+    with pytest.raises(CosmosResourceNotFoundError):
+        await container.read_item(item="1", partition_key="1")
+
+    [summary] = metrics.summary().operations
+    assert summary.failed == 1
+    assert summary.mean_item_count == 0
+
+
+async def test_writes_turned_down_by_their_etag_count_as_conflicts(container, metrics):
+    await container.create_item(body={"id": "1", "email": "a@b.com"})
+
+    with pytest.raises(CosmosAccessConditionFailedError):
+        await container.replace_item(
+            item="1",
+            body={"id": "1", "email": "c@d.com"},
+            etag="stale",
+            match_condition=MatchConditions.IfNotModified,
+        )
+
+    summaries = {o.operation: o for o in metrics.summary().operations}
+    assert summaries["replace_item"].conflicts == 1
+    assert summaries["create_item"].conflicts == 0
+
+
+async def test_queries_record_item_count_and_request_charge(container, metrics):
+    for i in range(3):
+        await container.create_item(body={"id": str(i), "email": "a@b.com"})
+    metrics.reset()
+
+    @track_operation("UserDataAccess.get_user_by_email")
+    async def get_users():
+        return container.query_items(
+            query="SELECT * FROM users u WHERE u.email = @email",
+            parameters=[{"name": "@email", "value": "a@b.com"}],
+        )
+
+    items = [item async for item in await get_users()]
+
+    [summary] = metrics.summary().operations
+    assert len(items) == 3
+    assert summary.operation == "UserDataAccess.get_user_by_email"
+    assert summary.mean_item_count == 3
+    assert summary.total_request_charge == pytest.approx(
+        QUERY_CHARGE + 3 * LOADED_DOCUMENT_CHARGE
+    )
+
+
+async def test_queries_read_by_page_record_each_page(container, metrics):
+    for i in range(3):
+        await container.create_item(body={"id": str(i), "email": "a@b.com"})
+    metrics.reset()
+
+    pages = container.query_items(query="SELECT * FROM c", max_item_count=2).by_page()
+    async for page in pages:
+        [item async for item in page]
+
+    assert metrics.histograms()["query_items"].request_charge.count == 2
+    assert metrics.summary().operations[0].mean_item_count == 1.5
+
+
+async def test_async_generators_record_each_page_under_the_tracked_operation(
+    container, metrics
+):
+    for i in range(3):
+        await container.create_item(body={"id": str(i), "email": "a@b.com"})
+    metrics.reset()
+
+    @track_operation("UserDataAccess.stream_users")
+    async def stream_users():
+        pages = container.query_items(query="SELECT * FROM c", max_item_count=2)
+        async for page in pages.by_page():
+            async for item in page:
+                yield item
+
+    items = [item async for item in stream_users()]
+
+    assert len(items) == 3
+    assert metrics.histograms()["UserDataAccess.stream_users"].request_charge.count == 2
@@ -0,0 +1,232 @@
+import pytest
+
+from app.data_access.change_feed import ChangeFeedProcessor, LeaseDataAccess
+from app.data_access.containers import DATABASE_ID, EXERCISE_SETS, LEASES
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.set import SetDataAccess
+from app.data_access.set_aggregate import (
+    SetAggregateDataAccess,
+    set_aggregates_processor,
+)
+from app.models.set_models import SetInDB
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def stand_in(monkeypatch):
+    stand_in = InMemoryCosmosClient()
+    await CosmosDBClientSingleton.close()
+    monkeypatch.setattr(CosmosDBClientSingleton, "client_factory", lambda: stand_in)
+    yield stand_in
+    await CosmosDBClientSingleton.close()
+
+
+@pytest.fixture
+def aggregates(stand_in):
+    return SetAggregateDataAccess()
+
+
+@pytest.fixture
+def processor(aggregates):
+    return set_aggregates_processor(aggregates, owner="instance-1")
+
+
+async def log(set_id: str, weight: float, reps: int, day="2024-05-01", user="1"):
+    await SetDataAccess().create_set(
+        SetInDB(
+            id=set_id,
+            exercise_id="bench",
+            user_id=user,
+            weight=weight,
+            reps=reps,
+            date_created=f"{day}T10:00:00+00:00",
+        )
+    )
+
+
+async def changes(stand_in) -> list[dict]:
+    sets = stand_in.get_database_client(DATABASE_ID).get_container_client(EXERCISE_SETS)
+    return [c async for c in sets.query_items_change_feed(start_time="Beginning")]
+
+
+async def test_processor_keeps_a_summary_per_user_and_exercise(processor, aggregates):
+    await log("1", 100, 5, day="2024-05-01")
+    await log("2", 120, 1, day="2024-05-03")
+    await log("3", 60, 10, user="2")
+
+    assert await aggregates.get_summary("1", "bench") is None
+    assert await processor.run_once() == 3
+
+    summary = await aggregates.get_summary("1", "bench")
+    assert summary.set_count == 2
+    assert summary.max_weight == 120
+    assert summary.best_estimated_one_rep_max == 120
+    assert summary.total_volume == 620
+    assert summary.last_session_date == "2024-05-03"
+    assert (await aggregates.get_summary("2", "bench")).total_volume == 600
+
+
+async def test_processor_carries_on_from_its_checkpoint(processor, aggregates):
+    await log("1", 100, 5)
+    await processor.run_once()
+    await log("2", 100, 10)
+
+    assert await processor.run_once() == 1
+    assert await processor.run_once() == 0
+    summary = await aggregates.get_summary("1", "bench")
+    assert summary.set_count == 2
+    assert summary.best_estimated_one_rep_max == pytest.approx(100 * (1 + 10 / 30))
+
+
+async def test_replayed_changes_are_not_counted_twice(stand_in, processor, aggregates):
+    await log("1", 100, 5)
+    await log("2", 80, 8)
+    await processor.run_once()
+
+    # As if the processor died after applying a page but before checkpointing
+    await aggregates.apply_changes(await changes(stand_in))
+
+    summary = await aggregates.get_summary("1", "bench")
+    assert summary.set_count == 2
+    assert summary.total_volume == 1140
+
+
+async def test_only_the_lease_holder_reads_the_feed(aggregates):
+    first = set_aggregates_processor(aggregates, owner="instance-1")
+    second = set_aggregates_processor(aggregates, owner="instance-2")
+    await log("1", 100, 5)
+
+    assert await first.run_once() == 1
+    await log("2", 100, 5)
+    assert await second.run_once() == 0
+
+    await first.release()
+    assert await second.run_once() == 1
+    assert (await aggregates.get_summary("1", "bench")).set_count == 2
+
+
+async def test_an_expired_lease_is_taken_over(aggregates):
+    first = ChangeFeedProcessor(
+        "aggregates",
+        EXERCISE_SETS,
+        aggregates.apply_changes,
+        owner="1",
+        lease_seconds=-1,
+    )
+    second = ChangeFeedProcessor(
+        "aggregates", EXERCISE_SETS, aggregates.apply_changes, owner="2"
+    )
+    await log("1", 100, 5)
+    await first.run_once()
+    await log("2", 100, 5)
+
+    assert await second.run_once() == 1
+    assert (await aggregates.get_summary("1", "bench")).set_count == 2
+
+
+async def test_losing_the_lease_stops_before_the_next_page(stand_in, aggregates):
+    leases = LeaseDataAccess()
+    processor = ChangeFeedProcessor(
+        "aggregates",
+        EXERCISE_SETS,
+        aggregates.apply_changes,
+        owner="1",
+        page_size=1,
+        leases=leases,
+    )
+    await log("1", 100, 5)
+    await log("2", 100, 5)
+
+    async def steal_lease(changes: list[dict]) -> None:
+        await aggregates.apply_changes(changes)
+        lease_container = stand_in.get_database_client(
+            DATABASE_ID
+        ).get_container_client(LEASES)
+        lease = await lease_container.read_item(
+            item="aggregates", partition_key="aggregates"
+        )
+        await lease_container.upsert_item(body={**lease, "owner": "2"})
+
+    processor.handler = steal_lease
+    assert await processor.run_once() == 1
+    lease = await leases.container.read_item(
+        item="aggregates", partition_key="aggregates"
+    )
+    assert lease["owner"] == "2"
+    assert lease["continuation"] is None
+
+
+async def test_refresh_rebuilds_the_summary_after_a_delete(processor, aggregates):
+    await log("1", 100, 5)
+    await log("2", 120, 1)
+    await processor.run_once()
+
+    await SetDataAccess().delete_set("2", "1", "bench")
+    await aggregates.refresh("1", "bench")
+    summary = await aggregates.get_summary("1", "bench")
+    assert summary.set_count == 1
+    assert summary.max_weight == 100
+
+    await SetDataAccess().delete_set("1", "1", "bench")
+    await aggregates.refresh("1", "bench")
+    assert await aggregates.get_summary("1", "bench") is None
+
+
+async def test_refresh_counts_sets_the_processor_has_not_read_yet(
+    processor, aggregates
+):
+    await log("1", 100, 5)
+    await aggregates.refresh("1", "bench")
+
+    assert await processor.run_once() == 1
+    assert (await aggregates.get_summary("1", "bench")).set_count == 1
+
+
+async def test_refresh_keeps_a_set_folded_in_while_it_rebuilds(processor, aggregates):
+    await log("1", 100, 5)
+    await log("2", 120, 1)
+    await processor.run_once()
+    query = aggregates.set_data_access.get_set_documents
+    queries = []
+
+    async def query_then_fold(exercise_id: str, user_id: str) -> list[dict]:
+        documents = await query(exercise_id, user_id)
+        if not queries:
+            # A set the query missed is logged and folded in before the
+            # rebuild writes, so the rebuild has to start again
+            await log("3", 80, 8)
+            await processor.run_once()
+        queries.append(documents)
+        return documents
+
+    aggregates.set_data_access.get_set_documents = query_then_fold
+    await SetDataAccess().delete_set("1", "1", "bench")
+    await aggregates.refresh("1", "bench")
+    await processor.run_once()
+
+    assert len(queries) == 2
+    summary = await aggregates.get_summary("1", "bench")
+    assert summary.set_count == 2
+    assert summary.total_volume == 760
+
+
+async def test_refresh_does_not_need_the_lsn_of_the_sets(stand_in, aggregates):
+    await log("1", 100, 5)
+    sets = stand_in.get_database_client(DATABASE_ID).get_container_client(EXERCISE_SETS)
+
+    assert "_lsn" not in await sets.read_item(item="1", partition_key=["1", "bench"])
+    assert "_lsn" in (await changes(stand_in))[0]
+    await aggregates.refresh("1", "bench")
+    assert (await aggregates.get_summary("1", "bench")).set_count == 1
+
+
+async def test_get_summary_is_one_point_read(stand_in, processor, aggregates):
+    for i in range(50):
+        await log(str(i), 100, 5)
+    await processor.run_once()
+    requests = stand_in.request_count
+
+    await aggregates.get_summary("1", "bench")
+    assert stand_in.request_count - requests == 1
@@ -0,0 +1,101 @@
+import pytest
+
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.instrumentation import data_access_metrics
+from app.data_access.set import MAX_BATCH_OPERATIONS, SetDataAccess
+from app.models.set_models import SetInDB
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def data_access(monkeypatch):
+    stand_in = InMemoryCosmosClient()
+    await CosmosDBClientSingleton.close()
+    monkeypatch.setattr(CosmosDBClientSingleton, "client_factory", lambda: stand_in)
+    yield SetDataAccess()
+    await CosmosDBClientSingleton.close()
+
+
+def make_set(set_id: str, exercise_id="bench", user_id="1") -> SetInDB:
+    return SetInDB(
+        id=set_id,
+        exercise_id=exercise_id,
+        weight=100,
+        reps=5,
+        date_created="2024-05-01T10:00:00+00:00",
+        user_id=user_id,
+    )
+
+
+async def test_create_sets_writes_one_batch_per_partition(data_access):
+    sets = [make_set(str(i), exercise_id=("bench", "squat")[i % 2]) for i in range(6)]
+    data_access_metrics.reset()
+
+    statuses = await data_access.create_sets(sets)
+
+    assert statuses == [201] * 6
+    (summary,) = data_access_metrics.summary().operations
+    assert summary.operation == "SetDataAccess.create_sets"
+    assert summary.count == 2
+    stored = await data_access.get_users_sets_by_exercise_id("squat", "1")
+    assert sorted(s.id for s in stored) == ["1", "3", "5"]
+    assert stored[0].date_created == "2024-05-01T10:00:00+00:00"
+
+
+async def test_create_sets_splits_partitions_larger_than_a_batch(data_access):
+    sets = [make_set(str(i)) for i in range(MAX_BATCH_OPERATIONS + 1)]
+    data_access_metrics.reset()
+
+    statuses = await data_access.create_sets(sets)
+
+    assert statuses == [201] * len(sets)
+    (summary,) = data_access_metrics.summary().operations
+    assert summary.count == 2
+
+
+async def test_create_sets_fails_only_the_batch_with_a_conflict(data_access):
+    await data_access.create_set(make_set("taken"))
+
+    statuses = await data_access.create_sets(
+        [
+            make_set("1"),
+            make_set("2", exercise_id="squat"),
+            make_set("taken"),
+        ]
+    )
+
+    assert statuses == [424, 201, 409]
+    assert await data_access.get_set_by_id("1", "1") is None
+    assert await data_access.get_set_by_id("2", "1") is not None
+
+
+async def test_stream_users_sets_reads_a_page_per_request_newest_first(
+    data_access, monkeypatch
+):
+    monkeypatch.setattr("app.data_access.set.STREAM_PAGE_SIZE", 2)
+    sets = [make_set(str(i)) for i in range(5)]
+    for i, set_ in enumerate(sets):
+        set_.date_created = f"2024-05-0{i + 1}T10:00:00+00:00"
+    await data_access.create_sets(sets)
+    data_access_metrics.reset()
+
+    streamed = [s async for s in data_access.stream_users_sets("bench", "1")]
+
+    assert [s.id for s in streamed] == ["4", "3", "2", "1", "0"]
+    (summary,) = data_access_metrics.summary().operations
+    assert summary.operation == "SetDataAccess.stream_users_sets"
+    assert summary.count == 3
+
+
+async def test_sets_page_orders_by_time_not_timestamp_text(data_access):
+    # As text the first sorts after the second, it was logged an hour before
+    earlier, later = make_set("earlier"), make_set("later")
+    earlier.date_created = "2024-05-01T10:30:00+02:00"
+    later.date_created = "2024-05-01T09:30:00+00:00"
+    await data_access.create_sets([earlier, later])
+
+    sets, _ = await data_access.get_users_sets_page("bench", "1", 10)
+
+    assert [s.id for s in sets] == ["later", "earlier"]
@@ -0,0 +1,366 @@
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+from app.data_access.backends import BACKENDS, SQLiteBackend
+from app.data_access.containers import SYSTEM_CREATOR
+from app.data_access.sqlite.base import SQLiteConnectionSingleton
+from app.data_access.sqlite.exercise import SQLiteExerciseDataAccess
+from app.data_access.sqlite.set import SQLiteSetDataAccess
+from app.data_access.sqlite.set_aggregate import SQLiteSetAggregateDataAccess
+from app.data_access.sqlite.user import SQLiteUserDataAccess
+from app.data_access.sqlite.workout_folder import SQLiteWorkoutFolderDataAccess
+from app.models.exercises_models import ExerciseInDB
+from app.models.set_models import SetInDB
+from app.models.user_models import UserInDB
+from app.models.workout_folder_models import WorkoutFolderInDB
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def sqlite_db(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "test.db"))
+    yield
+    SQLiteConnectionSingleton.close()
+
+
+def make_set(set_id: str, user_id="1", exercise_id="bench") -> SetInDB:
+    return SetInDB(
+        id=set_id,
+        exercise_id=exercise_id,
+        weight=100,
+        reps=5,
+        date_created="2024-05-01T10:00:00",
+        user_id=user_id,
+    )
+
+
+def test_sqlite_backend_is_registered():
+    assert BACKENDS["sqlite"] is SQLiteBackend
+
+
+async def test_user_round_trip():
+    data_access = SQLiteUserDataAccess()
+    user = UserInDB(id="1", email="test@example.com", provider="apple")
+    await data_access.create_user(user)
+
+    assert await data_access.get_user_by_id("1") == user
+    assert await data_access.get_user_by_email("test@example.com") == user
+    assert await data_access.get_user_by_email("other@example.com") is None
+
+
+async def test_create_user_twice_raises_exists_error():
+    data_access = SQLiteUserDataAccess()
+    user = UserInDB(id="1", email="test@example.com")
+    await data_access.create_user(user)
+
+    with pytest.raises(CosmosResourceExistsError):
+        await data_access.create_user(user)
+
+
+async def test_update_and_delete_user():
+    data_access = SQLiteUserDataAccess()
+    user = UserInDB(id="1", email="test@example.com")
+    await data_access.create_user(user)
+
+    user.preferences.theme = "dark"
+    await data_access.update_user(user)
+    assert (await data_access.get_user_by_id("1")).preferences.theme == "dark"
+
+    await data_access.delete_user("1")
+    with pytest.raises(CosmosResourceNotFoundError):
+        await data_access.get_user_by_id("1")
+    with pytest.raises(CosmosResourceNotFoundError):
+        await data_access.delete_user("1")
+
+
+async def test_sets_are_scoped_to_user_and_exercise():
+    data_access = SQLiteSetDataAccess()
+    await data_access.create_set(make_set("1"))
+    await data_access.create_set(make_set("2", exercise_id="squat"))
+    await data_access.create_set(make_set("3", user_id="2"))
+
+    sets = await data_access.get_users_sets_by_exercise_id("bench", "1")
+
+    assert [s.id for s in sets] == ["1"]
+    assert await data_access.get_set_by_id("3", "1") is None
+    assert (await data_access.find_set_by_id("3")).user_id == "2"
+
+
+async def test_sets_page_newest_first():
+    data_access = SQLiteSetDataAccess()
+    for i in range(5):
+        set_ = make_set(str(i))
+        set_.date_created = f"2024-05-0{i + 1}T10:00:00"
+        await data_access.create_set(set_)
+
+    first, token = await data_access.get_users_sets_page("bench", "1", 2)
+    second, token = await data_access.get_users_sets_page(
+        "bench", "1", 2, continuation_token=token
+    )
+    before, _ = await data_access.get_users_sets_page(
+        "bench", "1", 10, before_ms=1714608000000  # 2024-05-02T00:00:00Z
+    )
+
+    assert [s.id for s in first] == ["4", "3"]
+    assert [s.id for s in second] == ["2", "1"]
+    assert token is not None
+    assert [s.id for s in before] == ["0"]
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "nonsense",
+        "{}",
+        "[1]",
+        "[1, 2]",
+        '["1", "a"]',
+        '[true, "a"]',
+        '[100000000000000000000000000000, "a"]',
+    ],
+)
+async def test_sets_page_rejects_a_token_it_did_not_return(token):
+    data_access = SQLiteSetDataAccess()
+    await data_access.create_set(make_set("1"))
+
+    with pytest.raises(CosmosHttpResponseError) as error:
+        await data_access.get_users_sets_page("bench", "1", 2, continuation_token=token)
+    assert error.value.status_code == 400
+
+
+async def test_sets_page_orders_by_time_not_timestamp_text():
+    data_access = SQLiteSetDataAccess()
+    # As text the first sorts after the second, it was logged an hour before
+    for set_id, date_created in (
+        ("earlier", "2024-05-01T10:30:00+02:00"),
+        ("later", "2024-05-01T09:30:00+00:00"),
+    ):
+        set_ = make_set(set_id)
+        set_.date_created = date_created
+        await data_access.create_set(set_)
+
+    sets, _ = await data_access.get_users_sets_page("bench", "1", 10)
+
+    assert [s.id for s in sets] == ["later", "earlier"]
+
+
+async def test_sets_created_before_created_at_ms_get_it_on_connect(tmp_path):
+    SQLiteConnectionSingleton.close()
+    connection = sqlite3.connect(tmp_path / "test.db")
+    connection.executescript("""
+        CREATE TABLE exercise_sets (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            exercise_id TEXT NOT NULL,
+            date_created TEXT NOT NULL,
+            doc TEXT NOT NULL
+        );
+        """)
+    set_ = make_set("old")
+    connection.execute(
+        "INSERT INTO exercise_sets VALUES (?, ?, ?, ?, ?)",
+        ("old", "1", "bench", set_.date_created, json.dumps(set_.model_dump())),
+    )
+    connection.commit()
+    connection.close()
+
+    sets, _ = await SQLiteSetDataAccess().get_users_sets_page(
+        "bench",
+        "1",
+        10,
+        since=datetime(2024, 5, 1, tzinfo=timezone.utc),
+    )
+
+    assert [s.id for s in sets] == ["old"]
+
+
+async def test_stream_users_sets_reads_the_history_a_page_at_a_time(monkeypatch):
+    monkeypatch.setattr("app.data_access.sqlite.set.STREAM_PAGE_SIZE", 2)
+    data_access = SQLiteSetDataAccess()
+    for i in range(5):
+        set_ = make_set(str(i))
+        set_.date_created = f"2024-05-0{i + 1}T10:00:00"
+        await data_access.create_set(set_)
+
+    sets = [s async for s in data_access.stream_users_sets("bench", "1")]
+
+    assert [s.id for s in sets] == ["4", "3", "2", "1", "0"]
+
+
+async def test_sets_page_between_since_and_until():
+    data_access = SQLiteSetDataAccess()
+    for i in range(5):
+        set_ = make_set(str(i))
+        set_.date_created = f"2024-05-0{i + 1}T10:00:00+00:00"
+        await data_access.create_set(set_)
+
+    sets, token = await data_access.get_users_sets_page(
+        "bench",
+        "1",
+        10,
+        since=datetime(2024, 5, 2, 10, tzinfo=timezone.utc),
+        until=datetime(2024, 5, 4, 10, tzinfo=timezone.utc),
+    )
+
+    assert [s.id for s in sets] == ["2", "1"]
+    assert token is None
+    in_range = await data_access.get_users_sets_by_exercise_id(
+        "bench", "1", since=datetime(2024, 5, 4, 10, tzinfo=timezone.utc)
+    )
+    assert sorted(s.id for s in in_range) == ["3", "4"]
+
+
+async def test_create_sets_is_all_or_nothing_per_exercise():
+    data_access = SQLiteSetDataAccess()
+    await data_access.create_set(make_set("taken"))
+
+    statuses = await data_access.create_sets(
+        [
+            make_set("1"),
+            make_set("2", exercise_id="squat"),
+            make_set("taken"),
+            make_set("3", exercise_id="squat"),
+        ]
+    )
+
+    assert statuses == [424, 201, 409, 201]
+    assert await data_access.get_set_by_id("1", "1") is None
+    assert [
+        s.id for s in await data_access.get_users_sets_by_exercise_id("squat", "1")
+    ] == [
+        "2",
+        "3",
+    ]
+
+
+async def test_delete_set_checks_partition():
+    data_access = SQLiteSetDataAccess()
+    await data_access.create_set(make_set("1"))
+
+    with pytest.raises(CosmosResourceNotFoundError):
+        await data_access.delete_set("1", user_id="2", exercise_id="bench")
+
+    await data_access.delete_set("1", user_id="1", exercise_id="bench")
+    assert await data_access.find_set_by_id("1") is None
+
+
+async def test_exercise_summary_is_worked_out_from_the_sets():
+    sets = SQLiteSetDataAccess()
+    await sets.create_sets(
+        [
+            make_set("1"),
+            make_set("2").model_copy(
+                update={"weight": 120, "reps": 1, "date_created": "2024-05-03T09:00:00"}
+            ),
+            make_set("3", exercise_id="squat"),
+        ]
+    )
+    aggregates = SQLiteSetAggregateDataAccess()
+
+    summary = await aggregates.get_summary("1", "bench")
+    assert summary.set_count == 2
+    assert summary.max_weight == 120
+    assert summary.best_estimated_one_rep_max == 120
+    assert summary.total_volume == 620
+    assert summary.last_session_date == "2024-05-03"
+    assert await aggregates.get_summary("2", "bench") is None
+
+
+async def test_exercises_include_system_and_own():
+    data_access = SQLiteExerciseDataAccess()
+    system = ExerciseInDB(
+        id="1", name="Bench Press", body_parts=["Chest"], creator=SYSTEM_CREATOR
+    )
+    own = ExerciseInDB(id="2", name="Cable Fly", body_parts=["Chest"], creator="1")
+    other = ExerciseInDB(id="3", name="Pec Deck", body_parts=["Chest"], creator="2")
+    for exercise in (system, own, other):
+        await data_access.create_custom_exercise(exercise)
+
+    exercises = await data_access.get_system_and_user_exercises("1")
+
+    assert sorted(e.id for e in exercises) == ["1", "2"]
+    assert await data_access.get_exercises_by_creator("1") == [own]
+    assert await data_access.get_exercise_by_name("Bench Press", "1") == system
+    assert await data_access.get_exercise_by_name("Pec Deck", "1") is None
+    assert await data_access.get_exercise_by_id("2", "1") == own
+    with pytest.raises(CosmosResourceNotFoundError):
+        await data_access.get_exercise_by_id("3", "1")
+
+
+async def test_workout_folder_round_trip():
+    data_access = SQLiteWorkoutFolderDataAccess()
+    folder = WorkoutFolderInDB(id="1", name="Push", user_id="1")
+    await data_access.create_workout_folder(folder)
+
+    folder.name = "Push Day"
+    await data_access.update_workout_folder(folder)
+
+    assert await data_access.get_folder_by_id("1", "1") == folder
+    assert await data_access.get_users_workout_folders("1") == [folder]
+    with pytest.raises(CosmosResourceNotFoundError):
+        await data_access.get_folder_by_id("1", "2")
+    assert await data_access.find_folder_by_id("1") == folder
+
+    await data_access.delete_workout_folder("1", "1")
+    assert await data_access.find_folder_by_id("1") is None
+
+
+async def test_patch_workout_folder_sets_only_the_changed_fields():
+    data_access = SQLiteWorkoutFolderDataAccess()
+    await data_access.create_workout_folder(
+        WorkoutFolderInDB(id="1", name="Push", user_id="1", exercises=[])
+    )
+
+    patched = await data_access.patch_workout_folder("1", "1", {"/name": "Push Day"})
+
+    assert patched == WorkoutFolderInDB(
+        id="1", name="Push Day", user_id="1", exercises=[]
+    )
+    assert await data_access.get_folder_by_id("1", "1") == patched
+    with pytest.raises(CosmosResourceNotFoundError):
+        await data_access.patch_workout_folder("1", "2", {"/name": "Legs"})
+
+
+async def test_patch_workout_folder_checks_the_etag():
+    data_access = SQLiteWorkoutFolderDataAccess()
+    await data_access.create_workout_folder(
+        WorkoutFolderInDB(id="1", name="Push", user_id="1")
+    )
+    folder, etag = await data_access.get_folder_and_etag("1", "1")
+
+    await data_access.patch_workout_folder("1", "1", {"/name": "Push Day"}, etag=etag)
+
+    assert folder.name == "Push"
+    assert (await data_access.get_folder_by_id("1", "1")).name == "Push Day"
+    with pytest.raises(CosmosAccessConditionFailedError):
+        await data_access.patch_workout_folder("1", "1", {"/name": "Legs"}, etag=etag)
+    with pytest.raises(CosmosResourceNotFoundError):
+        await data_access.get_folder_and_etag("1", "2")
+
+
+async def test_patch_preferences_checks_the_etag():
+    data_access = SQLiteUserDataAccess()
+    await data_access.create_user(UserInDB(id="1", email="test@example.com"))
+    await data_access.patch_preferences("1", {"theme": "dark"})
+    user, etag = await data_access.get_user_and_etag("1")
+
+    patched = await data_access.patch_preferences("1", {"theme": "light"}, etag=etag)
+
+    assert user.preferences.theme == "dark"
+    assert patched.preferences.theme == "light"
+    with pytest.raises(CosmosAccessConditionFailedError):
+        await data_access.patch_preferences("1", {"theme": "dark"}, etag=etag)
+    with pytest.raises(CosmosResourceNotFoundError):
+        await data_access.patch_preferences("2", {"theme": "dark"})
+    with pytest.raises(CosmosResourceNotFoundError):
+        await data_access.get_user_and_etag("2")
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+from app.data_access.containers import DATABASE_ID, USER_EMAILS, USERS
+from app.data_access.cosmos_client_singleton import CosmosDBClientSingleton
+from app.data_access.instrumentation import data_access_metrics
+from app.data_access.user import UserDataAccess, normalize_email
+from app.models.user_models import UserInDB
+from tests.cosmos_stand_in import InMemoryCosmosClient
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def stand_in(monkeypatch):
+    stand_in = InMemoryCosmosClient()
+    await CosmosDBClientSingleton.close()
+    monkeypatch.setattr(CosmosDBClientSingleton, "client_factory", lambda: stand_in)
+    yield stand_in
+    await CosmosDBClientSingleton.close()
+
+
+@pytest.fixture
+def email_index(stand_in):
+    return stand_in.get_database_client(DATABASE_ID).get_container_client(USER_EMAILS)
+
+
+@pytest.fixture
+def data_access(stand_in):
+    return UserDataAccess()
+
+
+def test_normalize_email():
+    assert normalize_email("  Someone@Email.COM ") == "someone@email.com"
+
+
+async def test_get_user_by_email_reads_the_index_instead_of_querying(data_access):
+    user = UserInDB(id="1", email="Someone@Email.com")
+    await data_access.create_user(user)
+    data_access_metrics.reset()
+
+    assert await data_access.get_user_by_email("someone@email.com") == user
+    assert await data_access.get_user_by_email("other@email.com") is None
+    requests = {
+        (o.operation, o.container, o.count)
+        for o in data_access_metrics.summary().operations
+    }
+    # The user is only read for the email that has an entry
+    assert requests == {
+        ("UserEmailIndexDataAccess.get_entry", USER_EMAILS, 2),
+        ("UserDataAccess.get_user_by_id", USERS, 1),
+    }
+
+
+async def test_create_user_with_taken_email_raises(data_access, stand_in):
+    await data_access.create_user(UserInDB(id="1", email="a@b.com"))
+
+    with pytest.raises(CosmosResourceExistsError):
+        await data_access.create_user(UserInDB(id="2", email="A@B.com"))
+    with pytest.raises(CosmosResourceNotFoundError):
+        await data_access.get_user_by_id("2")
+    assert (await data_access.get_user_by_email("a@b.com")).id == "1"
+
+
+async def test_only_one_of_two_concurrent_creates_with_an_email_succeeds(
+    data_access,
+):
+    results = await asyncio.gather(
+        data_access.create_user(UserInDB(id="1", email="a@b.com")),
+        data_access.create_user(UserInDB(id="2", email="a@b.com")),
+        return_exceptions=True,
+    )
+
+    assert sum(isinstance(r, CosmosResourceExistsError) for r in results) == 1
+    created = next(r for r in results if isinstance(r, UserInDB))
+    assert (await data_access.get_user_by_email("a@b.com")).id == created.id
+
+
+async def test_failed_create_gives_the_email_back(data_access):
+    await data_access.create_user(UserInDB(id="1", email="a@b.com"))
+
+    # The user id is taken, so the user can't be created
+    with pytest.raises(CosmosResourceExistsError):
+        await data_access.create_user(UserInDB(id="1", email="c@d.com"))
+
+    assert await data_access.get_user_by_email("c@d.com") is None
+    await data_access.create_user(UserInDB(id="2", email="c@d.com"))
+    assert (await data_access.get_user_by_email("c@d.com")).id == "2"
+
+
+async def test_entry_for_a_user_that_does_not_exist_is_reclaimed(
+    data_access, email_index
+):
+    await email_index.create_item(body={"id": "a@b.com", "user_id": "gone"})
+
+    assert await data_access.get_user_by_email("a@b.com") is None
+    await data_access.create_user(UserInDB(id="1", email="a@b.com"))
+    assert (await data_access.get_user_by_email("a@b.com")).id == "1"
+
+
+async def test_delete_user_removes_the_email_from_the_index(data_access):
+    await data_access.create_user(UserInDB(id="1", email="a@b.com"))
+
+    await data_access.delete_user("1")
+
+    assert await data_access.get_user_by_email("a@b.com") is None
+    await data_access.create_user(UserInDB(id="2", email="a@b.com"))
+
+
+async def test_patch_preferences_is_one_request(data_access, stand_in):
+    await data_access.create_user(UserInDB(id="1", email="a@b.com"))
+    users = stand_in.get_database_client(DATABASE_ID).get_container_client(USERS)
+    etag = (await users.read_item("1", partition_key="1"))["_etag"]
+    data_access_metrics.reset()
+
+    patched = await data_access.patch_preferences("1", {"theme": "dark"}, etag=etag)
+
+    assert patched.preferences.theme == "dark"
+    assert patched.email == "a@b.com"
+    assert [
+        (o.operation, o.count) for o in data_access_metrics.summary().operations
+    ] == [("UserDataAccess.patch_preferences", 1)]
+    with pytest.raises(CosmosAccessConditionFailedError):
+        await data_access.patch_preferences("1", {"theme": "light"}, etag=etag)
+
+
+async def test_get_user_and_etag_returns_the_etag_to_patch_with(data_access):
+    await data_access.create_user(UserInDB(id="1", email="a@b.com"))
+
+    user, etag = await data_access.get_user_and_etag("1")
+    await data_access.patch_preferences("1", {"theme": "dark"}, etag=etag)
+
+    assert user.email == "a@b.com"
+    with pytest.raises(CosmosAccessConditionFailedError):
+        await data_access.patch_preferences("1", {"theme": "light"}, etag=etag)
+    with pytest.raises(CosmosResourceNotFoundError):
+        await data_access.get_user_and_etag("2")
@@ -0,0 +1,48 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from azure.cosmos.exceptions import CosmosAccessConditionFailedError
+
+from app.exceptions import ConcurrentUpdateException
+from app.service.concurrency import conflict_retries, retry_on_conflict
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    conflict_retries.reset()
+    yield
+    conflict_retries.reset()
+
+
+async def test_retries_until_the_write_goes_through():
+    attempt = AsyncMock(
+        side_effect=[CosmosAccessConditionFailedError()] * 2 + ["updated"]
+    )
+
+    assert await retry_on_conflict("op", attempt) == "updated"
+
+    assert attempt.call_count == 3
+    stats = conflict_retries.stats()["op"]
+    assert (stats.calls, stats.conflicts, stats.exhausted) == (1, 2, 0)
+
+
+async def test_gives_up_after_max_attempts():
+    attempt = AsyncMock(side_effect=CosmosAccessConditionFailedError())
+
+    with pytest.raises(ConcurrentUpdateException):
+        await retry_on_conflict("op", attempt, max_attempts=3)
+
+    assert attempt.call_count == 3
+    stats = conflict_retries.stats()["op"]
+    assert (stats.calls, stats.conflicts, stats.exhausted) == (1, 3, 1)
+
+
+async def test_other_errors_are_not_retried():
+    attempt = AsyncMock(side_effect=ValueError())
+
+    with pytest.raises(ValueError):
+        await retry_on_conflict("op", attempt)
+
+    assert attempt.call_count == 1
@@ -1,16 +1,24 @@
-from unittest.mock import MagicMock
+import json
+import time
+from unittest.mock import AsyncMock
 
 import pytest
 from azure.cosmos.exceptions import CosmosResourceNotFoundError
 
 from app.exceptions import EntityAlreadyExistsException
 from app.models.exercises_models import ExerciseInCreate, ExerciseInDB
-from app.service.exercise_service import ExerciseService
+from app.service.exercise_service import (
+    SYSTEM_CATALOG_TTL_SECONDS,
+    ExerciseService,
+    SystemExerciseCatalog,
+)
+
+pytestmark = pytest.mark.anyio
 
 
 @pytest.fixture
 def mock_exercise_data_access():
-    return MagicMock()
+    return AsyncMock()
 
 
 @pytest.fixture
@@ -18,66 +26,159 @@ def exercise_service(mock_exercise_data_access):
     return ExerciseService(mock_exercise_data_access)
 
 
-def test_get_exercise_by_id_returns_none_when_exercise_not_found(
+async def test_get_exercise_by_id_returns_none_when_exercise_not_found(
     exercise_service, mock_exercise_data_access
 ):
-    mock_exercise_data_access.get_exercise_by_id = MagicMock(
+    mock_exercise_data_access.get_exercise_by_id = AsyncMock(
         side_effect=CosmosResourceNotFoundError()
     )
-    result = exercise_service.get_exercise_by_id("123")
+    result = await exercise_service.get_exercise_by_id("123", "1")
     assert result is None
-    mock_exercise_data_access.get_exercise_by_id.assert_called_once_with("123")
+    mock_exercise_data_access.get_exercise_by_id.assert_called_once_with("123", "1")
 
 
-def test_get_exercise_by_id_returns_exercise_when_found(
+async def test_get_exercise_by_id_returns_exercise_when_found(
     exercise_service, mock_exercise_data_access
 ):
-    mock_exercise_data_access.get_exercise_by_id = MagicMock(
+    mock_exercise_data_access.get_exercise_by_id = AsyncMock(
         return_value=ExerciseInDB(
             id="123", name="name", body_parts=[], creator="system"
         )
     )
-    result = exercise_service.get_exercise_by_id("123")
+    result = await exercise_service.get_exercise_by_id("123", "1")
     assert isinstance(result, ExerciseInDB)
-    mock_exercise_data_access.get_exercise_by_id.assert_called_once_with("123")
+    mock_exercise_data_access.get_exercise_by_id.assert_called_once_with("123", "1")
+
+
+async def test_get_system_and_user_exercises(
+    exercise_service, mock_exercise_data_access
+):
+    system = ExerciseInDB(id="1", name="Bench Press", body_parts=[], creator="system")
+    own = ExerciseInDB(id="2", name="Cable Fly", body_parts=[], creator="1")
+    mock_exercise_data_access.get_exercises_by_creator = AsyncMock(
+        side_effect=lambda creator: [system] if creator == "system" else [own]
+    )
+
+    exercises = await exercise_service.get_system_and_user_exercises("1")
+
+    assert exercises == [system, own]
+    mock_exercise_data_access.get_exercises_by_creator.assert_any_call("system")
+    mock_exercise_data_access.get_exercises_by_creator.assert_any_call("1")
+
+
+async def test_system_catalog_is_read_once_until_it_expires(
+    exercise_service, mock_exercise_data_access, monkeypatch
+):
+    system = ExerciseInDB(id="1", name="Bench Press", body_parts=[], creator="system")
+    mock_exercise_data_access.get_exercises_by_creator = AsyncMock(
+        side_effect=lambda creator: [system] if creator == "system" else []
+    )
+
+    await exercise_service.get_system_and_user_exercises("1")
+    await exercise_service.get_system_and_user_exercises("2")
+    calls = mock_exercise_data_access.get_exercises_by_creator.call_args_list
+    assert [c.args[0] for c in calls].count("system") == 1
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + SYSTEM_CATALOG_TTL_SECONDS + 1)
+    await exercise_service.get_system_and_user_exercises("1")
+    calls = mock_exercise_data_access.get_exercises_by_creator.call_args_list
+    assert [c.args[0] for c in calls].count("system") == 2
+
 
+def test_system_catalog_version_changes_with_contents_only():
+    bench = ExerciseInDB(id="1", name="Bench Press", body_parts=[], creator="system")
+    squat = ExerciseInDB(id="2", name="Squat", body_parts=[], creator="system")
+    renamed = ExerciseInDB(id="2", name="Back Squat", body_parts=[], creator="system")
+
+    version = SystemExerciseCatalog.build([bench, squat]).version
+
+    assert SystemExerciseCatalog.build([squat, bench]).version == version
+    assert SystemExerciseCatalog.build([bench, renamed]).version != version
+
+
+def test_system_catalog_is_rendered_with_camel_case_aliases():
+    bench = ExerciseInDB(
+        id="1", name="Bench Press", body_parts=["Chest"], creator="system"
+    )
 
-def test_get_system_and_user_exercises(exercise_service, mock_exercise_data_access):
-    mock_exercise_data_access.get_system_and_user_exercises = MagicMock(return_value=[])
+    catalog = SystemExerciseCatalog.build([bench])
 
-    exercise_service.get_system_and_user_exercises("1")
-    mock_exercise_data_access.get_system_and_user_exercises.assert_called_once_with("1")
+    assert json.loads(catalog.rendered) == [
+        {"id": "1", "name": "Bench Press", "bodyParts": ["Chest"], "creator": "system"}
+    ]
 
 
-def test_create_custom_exercise_raises_exception_when_exercise_exists(
+async def test_create_custom_exercise_raises_exception_when_exercise_exists(
     exercise_service, mock_exercise_data_access
 ):
-    mock_exercise_data_access.get_exercise_by_name = MagicMock(
+    mock_exercise_data_access.get_exercise_by_name = AsyncMock(
         return_value=ExerciseInDB(
             id="1", name="some name", body_parts=[], creator="system"
         )
     )
     with pytest.raises(EntityAlreadyExistsException):
-        exercise_service.create_custom_exercise(
+        await exercise_service.create_custom_exercise(
             ExerciseInCreate(name="some name"), "12"
         )
     assert not mock_exercise_data_access.create_custom_exercise.called
 
 
-def test_create_custom_exercise_creates_exercise_with_same_name_as_pass_in_argument(
+async def test_create_custom_exercise_creates_exercise_with_same_name_as_pass_in_argument(
     exercise_service, mock_exercise_data_access
 ):
     exercise_name = "exercise"
-    mock_exercise_data_access.get_exercise_by_name = MagicMock(return_value=None)
-    mock_exercise_data_access.create_custom_exercise = MagicMock(
+    mock_exercise_data_access.get_exercise_by_name = AsyncMock(return_value=None)
+    mock_exercise_data_access.create_custom_exercise = AsyncMock(
         return_value=ExerciseInDB(
             id="123", name=exercise_name, body_parts=[], creator="1"
         )
     )
     # Discard return type as its mocked. Do assertions on the call args.
-    exercise_service.create_custom_exercise(ExerciseInCreate(name=exercise_name), "1")
+    await exercise_service.create_custom_exercise(
+        ExerciseInCreate(name=exercise_name), "1"
+    )
     mock_exercise_data_access.create_custom_exercise.assert_called_once()
     arg = mock_exercise_data_access.create_custom_exercise.call_args.args[0]
     assert isinstance(arg, ExerciseInDB)
     assert arg.name == exercise_name
     assert arg.creator == "1"
+
+
+async def test_get_exercise_by_id_reads_an_exercise_once(
+    exercise_service, mock_exercise_data_access
+):
+    exercise = ExerciseInDB(id="123", name="name", body_parts=[], creator="system")
+    mock_exercise_data_access.get_exercise_by_id = AsyncMock(return_value=exercise)
+
+    assert await exercise_service.get_exercise_by_id("123", "1") == exercise
+    assert await exercise_service.get_exercise_by_id("123", "2") == exercise
+    mock_exercise_data_access.get_exercise_by_id.assert_called_once_with("123", "1")
+
+
+async def test_get_exercise_by_id_does_not_serve_other_users_exercises(
+    exercise_service, mock_exercise_data_access
+):
+    exercise = ExerciseInDB(id="123", name="name", body_parts=[], creator="1")
+    mock_exercise_data_access.get_exercise_by_id = AsyncMock(return_value=exercise)
+    await exercise_service.get_exercise_by_id("123", "1")
+
+    mock_exercise_data_access.get_exercise_by_id = AsyncMock(
+        side_effect=CosmosResourceNotFoundError()
+    )
+    assert await exercise_service.get_exercise_by_id("123", "2") is None
+
+
+async def test_created_exercises_are_not_read_back(
+    exercise_service, mock_exercise_data_access
+):
+    mock_exercise_data_access.get_exercise_by_name = AsyncMock(return_value=None)
+    mock_exercise_data_access.create_custom_exercise = AsyncMock(
+        side_effect=lambda exercise: exercise
+    )
+    created = await exercise_service.create_custom_exercise(
+        ExerciseInCreate(name="Cable Fly"), "1"
+    )
+
+    assert await exercise_service.get_exercise_by_id(created.id, "1") == created
+    mock_exercise_data_access.get_exercise_by_id.assert_not_called()
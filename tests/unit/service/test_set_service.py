@@ -1,79 +1,243 @@
-from unittest.mock import MagicMock
+from datetime import datetime
+from unittest.mock import AsyncMock
 
 import pytest
 from azure.cosmos.exceptions import CosmosHttpResponseError, CosmosResourceNotFoundError
 
-from app.exceptions import EntityNotFoundException, UnauthorizedAccessException
+from app.exceptions import (
+    EntityNotFoundException,
+    InvalidContinuationTokenException,
+    UnauthorizedAccessException,
+)
 from app.models.exercises_models import ExerciseInDB
-from app.models.set_models import SetInCreate, SetInDB
+from app.models.set_models import ExerciseSummary, SetInCreate, SetInDB
 from app.models.user_models import UserInDB
-from app.service.set_service import SetService
+from app.service.exercise_service import get_exercise_service
+from app.service.set_service import SetService, get_set_service
+from app.service.user_service import get_user_service
+from app.utils.date_utils import iso_to_epoch_ms
+from app.utils.pagination_utils import (
+    decode_continuation_token,
+    encode_continuation_token,
+)
+
+pytestmark = pytest.mark.anyio
 
 
 @pytest.fixture
 def mock_set_data_access():
-    return MagicMock()
+    return AsyncMock()
 
 
 @pytest.fixture
 def mock_user_service():
-    return MagicMock()
+    return AsyncMock()
 
 
 @pytest.fixture
 def mock_exercise_service():
-    return MagicMock()
+    return AsyncMock()
 
 
 @pytest.fixture
-def set_service(mock_set_data_access, mock_user_service, mock_exercise_service):
-    return SetService(mock_set_data_access, mock_user_service, mock_exercise_service)
+def mock_set_aggregate_data_access():
+    return AsyncMock()
+
 
+@pytest.fixture
+def set_service(
+    mock_set_data_access,
+    mock_user_service,
+    mock_exercise_service,
+    mock_set_aggregate_data_access,
+):
+    return SetService(
+        mock_set_data_access,
+        exercise_service=mock_exercise_service,
+        user_service=mock_user_service,
+        set_aggregate_data_access=mock_set_aggregate_data_access,
+    )
 
-def test_get_set_by_id_calls_data_access_class_method(
+
+async def test_get_set_by_id_calls_data_access_class_method(
     set_service, mock_set_data_access
 ):
-    mock_set_data_access.get_set_by_id = MagicMock()
-    set_service.get_set_by_id("1")
+    mock_set_data_access.get_set_by_id = AsyncMock()
+    await set_service.get_set_by_id("1", "2")
 
-    mock_set_data_access.get_set_by_id.assert_called_once_with("1")
+    mock_set_data_access.get_set_by_id.assert_called_once_with("1", "2")
 
 
-def test_get_sed_by_id_returns_none_when_cosmos_resource_not_found_exception(
+async def test_get_sed_by_id_returns_none_when_cosmos_resource_not_found_exception(
     set_service, mock_set_data_access
 ):
-    mock_set_data_access.get_set_by_id = MagicMock(
+    mock_set_data_access.get_set_by_id = AsyncMock(
         side_effect=CosmosResourceNotFoundError()
     )
-    assert set_service.get_set_by_id("1") is None
+    assert await set_service.get_set_by_id("1", "2") is None
 
 
-def test_get_users_sets_by_exercise_id(set_service, mock_set_data_access):
-    mock_set_data_access.get_users_sets_by_exercise_id = MagicMock(return_value=[])
-    set_service.get_users_sets_by_exercise_id("1", "2")
+async def test_get_users_sets_by_exercise_id(set_service, mock_set_data_access):
+    mock_set_data_access.get_users_sets_by_exercise_id = AsyncMock(return_value=[])
+    await set_service.get_users_sets_by_exercise_id("1", "2")
     mock_set_data_access.get_users_sets_by_exercise_id.assert_called_once_with(
-        exercise_id="1", user_id="2"
+        exercise_id="1", user_id="2", since=None, until=None
     )
     mock_set_data_access.get_users_sets_by_exercise_id.assert_called_once()
 
 
-def test_create_set_raises_exception_when_user_doesnt_exist(
+async def test_get_users_sets_by_exercise_id_groups_and_sorts_newest_first(
+    set_service, mock_set_data_access
+):
+    mock_set_data_access.get_users_sets_by_exercise_id = AsyncMock(
+        return_value=[
+            make_set("1", "2024-05-01T10:00:00"),
+            make_set("2", "2024-05-02T09:00:00"),
+            make_set("3", "2024-05-02T11:00:00"),
+        ]
+    )
+
+    history = await set_service.get_users_sets_by_exercise_id("1", "2")
+
+    assert [(g.date_created, [s.id for s in g.sets]) for g in history] == [
+        ("2024-05-02", ["3", "2"]),
+        ("2024-05-01", ["1"]),
+    ]
+
+
+def make_set(set_id: str, date_created: str) -> SetInDB:
+    return SetInDB(
+        id=set_id,
+        exercise_id="1",
+        weight=100,
+        reps=5,
+        date_created=date_created,
+        user_id="2",
+    )
+
+
+async def test_get_users_set_history_page_returns_last_page_without_token(
+    set_service, mock_set_data_access
+):
+    mock_set_data_access.get_users_sets_page = AsyncMock(
+        return_value=([make_set("1", "2024-05-02T10:00:00")], None)
+    )
+
+    history, token = await set_service.get_users_set_history_page("1", "2", 10)
+
+    assert token is None
+    assert [group.date_created for group in history] == ["2024-05-02"]
+    mock_set_data_access.get_users_sets_page.assert_called_once_with(
+        "1", "2", 10, continuation_token=None, before_ms=None, since=None, until=None
+    )
+
+
+async def test_get_users_set_history_page_passes_date_range_to_data_access(
+    set_service, mock_set_data_access
+):
+    mock_set_data_access.get_users_sets_page = AsyncMock(return_value=([], None))
+    since, until = datetime(2024, 5, 1), datetime(2024, 6, 1)
+
+    await set_service.get_users_set_history_page("1", "2", 10, since=since, until=until)
+
+    mock_set_data_access.get_users_sets_page.assert_called_once_with(
+        "1", "2", 10, continuation_token=None, before_ms=None, since=since, until=until
+    )
+
+
+async def test_get_users_set_history_page_holds_back_oldest_day(
+    set_service, mock_set_data_access
+):
+    mock_set_data_access.get_users_sets_page = AsyncMock(
+        return_value=(
+            [
+                make_set("1", "2024-05-02T10:00:00"),
+                make_set("2", "2024-05-01T11:00:00"),
+                make_set("3", "2024-05-01T10:00:00"),
+            ],
+            "storage-token",
+        )
+    )
+
+    history, token = await set_service.get_users_set_history_page("1", "2", 3)
+
+    assert [group.date_created for group in history] == ["2024-05-02"]
+    # The next page re-reads the held back day's sets and everything before them
+    assert decode_continuation_token(token) == {
+        "before": 1714561200001,  # 2024-05-01T11:00:00Z plus a millisecond
+        "token": None,
+    }
+
+
+async def test_get_users_set_history_page_continues_a_day_longer_than_a_page(
+    set_service, mock_set_data_access
+):
+    mock_set_data_access.get_users_sets_page = AsyncMock(
+        return_value=(
+            [
+                make_set("1", "2024-05-01T11:00:00"),
+                make_set("2", "2024-05-01T10:00:00"),
+            ],
+            "storage-token",
+        )
+    )
+    continuation_token = encode_continuation_token(
+        {"before": 1714608000000, "token": None}
+    )
+
+    history, token = await set_service.get_users_set_history_page(
+        "1", "2", 2, continuation_token
+    )
+
+    assert len(history[0].sets) == 2
+    assert decode_continuation_token(token) == {
+        "before": 1714608000000,
+        "token": "storage-token",
+    }
+    mock_set_data_access.get_users_sets_page.assert_called_once_with(
+        "1",
+        "2",
+        2,
+        continuation_token=None,
+        before_ms=1714608000000,
+        since=None,
+        until=None,
+    )
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "not base64!",
+        "WzFd",
+        "eyJ0b2tlbiI6IDF9",
+        # A before too big for storage, and one that isn't a number
+        "eyJiZWZvcmUiOiAxMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwLCAidG9rZW4iOiBudWxsfQ==",
+        "eyJiZWZvcmUiOiAiMSIsICJ0b2tlbiI6IG51bGx9",
+    ],
+)
+async def test_get_users_set_history_page_rejects_invalid_tokens(set_service, token):
+    with pytest.raises(InvalidContinuationTokenException):
+        await set_service.get_users_set_history_page("1", "2", 10, token)
+
+
+async def test_create_set_raises_exception_when_user_doesnt_exist(
     set_service, mock_user_service
 ):
-    mock_user_service.get_user_by_id = MagicMock(return_value=None)
+    mock_user_service.get_user_by_id = AsyncMock(return_value=None)
     set_service.user_service = mock_user_service
     with pytest.raises(EntityNotFoundException):
         set_to_create = SetInCreate(exercise_id="1", reps=10, weight=100)
-        set_service.create_set(set_to_create, "2")
+        await set_service.create_set(set_to_create, "2")
     mock_user_service.get_user_by_id.assert_called_once_with("2")
 
 
-def test_create_set_raises_exception_when_exercise_doesnt_exist(
+async def test_create_set_raises_exception_when_exercise_doesnt_exist(
     set_service, mock_user_service, mock_exercise_service
 ):
     # Just so we don't raise an exception for user not existing
-    mock_user_service.get_user_by_id = MagicMock(return_value="user")
-    mock_exercise_service.get_exercise_by_id = MagicMock(
+    mock_user_service.get_user_by_id = AsyncMock(return_value="user")
+    mock_exercise_service.get_exercise_by_id = AsyncMock(
         side_effect=EntityNotFoundException()
     )
     # We need to set the exercise service to the mock exercise service
@@ -82,24 +246,24 @@ def test_create_set_raises_exception_when_exercise_doesnt_exist(
     set_service.user_service = mock_user_service
     with pytest.raises(EntityNotFoundException):
         set_to_create = SetInCreate(exercise_id="1", reps=10, weight=100)
-        set_service.create_set(set_to_create, "2")
+        await set_service.create_set(set_to_create, "2")
     mock_user_service.get_user_by_id.assert_called_once_with("2")
 
 
-def test_create_set_creates_set(
+async def test_create_set_creates_set(
     set_service, mock_user_service, mock_exercise_service, mock_set_data_access
 ):
-    mock_user_service.get_user_by_id = MagicMock(
+    mock_user_service.get_user_by_id = AsyncMock(
         return_value=UserInDB(id="2", email="something@something.com", provider="apple")
     )
-    mock_exercise_service.get_exercise_by_id = MagicMock(
+    mock_exercise_service.get_exercise_by_id = AsyncMock(
         return_value=ExerciseInDB(
             id="1", name="Bench Press", body_parts=[], creator="system"
         )
     )
     set_service.user_service = mock_user_service
     set_service.exercise_service = mock_exercise_service
-    mock_set_data_access.create_set = MagicMock(
+    mock_set_data_access.create_set = AsyncMock(
         return_value=SetInDB(
             exercise_id="1",
             reps=10,
@@ -110,25 +274,30 @@ def test_create_set_creates_set(
         )
     )
     set_to_create = SetInCreate(exercise_id="1", reps=10, weight=100)
-    set_service.create_set(set_to_create, "2")
+    await set_service.create_set(set_to_create, "2")
     mock_set_data_access.create_set.assert_called_once()
     mock_user_service.get_user_by_id.assert_called_once_with("2")
-    mock_exercise_service.get_exercise_by_id.assert_called_once_with("1")
+    mock_exercise_service.get_exercise_by_id.assert_called_once_with("1", "2")
 
 
-def test_delete_set_raises_exception_when_set_does_not_exist(set_service):
-    set_service.get_set_by_id = MagicMock(return_value=None)
+async def test_delete_set_raises_exception_when_set_does_not_exist(
+    set_service, mock_set_data_access
+):
+    set_service.get_set_by_id = AsyncMock(return_value=None)
+    mock_set_data_access.find_set_by_id = AsyncMock(return_value=None)
 
     with pytest.raises(EntityNotFoundException):
-        set_service.delete_set("1", "1")
+        await set_service.delete_set("1", "1")
 
 
-def test_delete_set_raises_exception_when_set_doesnt_belong_to_user_requesting(
-    set_service,
+async def test_delete_set_raises_exception_when_set_doesnt_belong_to_user_requesting(
+    set_service, mock_set_data_access
 ):
     user_id = "1"
     sets_user_id = "9"
-    set_service.get_set_by_id = MagicMock(
+    # Not in the requesting user's partition, but exists in another
+    set_service.get_set_by_id = AsyncMock(return_value=None)
+    mock_set_data_access.find_set_by_id = AsyncMock(
         return_value=SetInDB(
             id="1",
             exercise_id="1",
@@ -140,13 +309,13 @@ def test_delete_set_raises_exception_when_set_doesnt_belong_to_user_requesting(
     )
 
     with pytest.raises(UnauthorizedAccessException):
-        set_service.delete_set("1", user_id)
+        await set_service.delete_set("1", user_id)
 
 
-def test_delete_set_returns_false_when_cosmos_http_error(
+async def test_delete_set_returns_false_when_cosmos_http_error(
     set_service, mock_set_data_access
 ):
-    mock_set_data_access.get_set_by_id = MagicMock(
+    mock_set_data_access.get_set_by_id = AsyncMock(
         return_value=SetInDB(
             id="1",
             exercise_id="1",
@@ -156,12 +325,14 @@ def test_delete_set_returns_false_when_cosmos_http_error(
             user_id="1",
         )
     )
-    mock_set_data_access.delete_set = MagicMock(side_effect=CosmosHttpResponseError())
-    assert set_service.delete_set("1", "1") is False
+    mock_set_data_access.delete_set = AsyncMock(side_effect=CosmosHttpResponseError())
+    assert await set_service.delete_set("1", "1") is False
 
 
-def test_delete_set_returns_true_when_all_goes_well(set_service, mock_set_data_access):
-    mock_set_data_access.get_set_by_id = MagicMock(
+async def test_delete_set_returns_true_when_all_goes_well(
+    set_service, mock_set_data_access, mock_set_aggregate_data_access
+):
+    mock_set_data_access.get_set_by_id = AsyncMock(
         return_value=SetInDB(
             id="1",
             exercise_id="1",
@@ -171,5 +342,231 @@ def test_delete_set_returns_true_when_all_goes_well(set_service, mock_set_data_a
             user_id="1",
         )
     )
-    mock_set_data_access.delete_set = MagicMock()
-    assert set_service.delete_set("1", "1") is True
+    mock_set_data_access.delete_set = AsyncMock()
+    assert await set_service.delete_set("1", "1") is True
+    mock_set_data_access.delete_set.assert_called_once_with(
+        "1", user_id="1", exercise_id="1"
+    )
+    mock_set_aggregate_data_access.refresh.assert_called_once_with("1", "1")
+
+
+async def test_get_users_set_buckets_aggregates_the_range(
+    set_service, mock_set_data_access
+):
+    def make_set(set_id: str, day: str) -> SetInDB:
+        return SetInDB(
+            id=set_id,
+            exercise_id="1",
+            weight=100,
+            reps=5,
+            date_created=f"{day}T10:00:00+00:00",
+            user_id="2",
+        )
+
+    mock_set_data_access.get_users_sets_by_exercise_id = AsyncMock(
+        return_value=[
+            make_set("1", "2024-05-08"),
+            make_set("2", "2024-05-07"),
+            make_set("3", "2024-05-01"),
+        ]
+    )
+    since = datetime(2024, 1, 1)
+
+    buckets = await set_service.get_users_set_buckets("1", "2", "week", since=since)
+
+    assert [(b.start, b.set_count) for b in buckets] == [
+        ("2024-04-29", 1),
+        ("2024-05-06", 2),
+    ]
+    mock_set_data_access.get_users_sets_by_exercise_id.assert_called_once_with(
+        exercise_id="1", user_id="2", since=since, until=None
+    )
+
+
+def history_stream(*timestamps: str):
+    async def stream_users_sets(exercise_id: str, user_id: str):
+        for i, timestamp in enumerate(timestamps):
+            yield SetInDB(
+                id=str(i),
+                exercise_id=exercise_id,
+                weight=100,
+                reps=5,
+                date_created=timestamp,
+                user_id=user_id,
+            )
+
+    return stream_users_sets
+
+
+async def test_stream_users_set_history_yields_a_group_per_day(
+    set_service, mock_set_data_access
+):
+    mock_set_data_access.stream_users_sets = history_stream(
+        "2024-05-08T11:00:00+00:00",
+        "2024-05-08T10:00:00+00:00",
+        "2024-05-01T10:00:00+00:00",
+    )
+
+    groups = [g async for g in set_service.stream_users_set_history("1", "2")]
+
+    assert [(g.date_created, [s.id for s in g.sets]) for g in groups] == [
+        ("2024-05-08", ["0", "1"]),
+        ("2024-05-01", ["2"]),
+    ]
+
+
+async def test_stream_users_set_history_yields_each_set(
+    set_service, mock_set_data_access
+):
+    mock_set_data_access.stream_users_sets = history_stream(
+        "2024-05-08T10:00:00+00:00", "2024-05-01T10:00:00+00:00"
+    )
+
+    sets = [s async for s in set_service.stream_users_set_history("1", "2", "set")]
+
+    assert [s.id for s in sets] == ["0", "1"]
+
+
+async def test_stream_users_set_history_of_no_sets_is_empty(
+    set_service, mock_set_data_access
+):
+    mock_set_data_access.stream_users_sets = history_stream()
+
+    assert [g async for g in set_service.stream_users_set_history("1", "2")] == []
+
+
+async def test_get_exercise_progress_is_built_from_the_sets(
+    set_service, mock_set_data_access
+):
+    mock_set_data_access.get_users_sets_by_exercise_id = AsyncMock(
+        return_value=[
+            SetInDB(
+                id="1",
+                exercise_id="1",
+                weight=100,
+                reps=5,
+                date_created="2024-05-01T10:00:00+00:00",
+                user_id="2",
+            )
+        ]
+    )
+
+    progress = await set_service.get_exercise_progress("1", "2")
+
+    assert progress.exercise_id == "1"
+    assert [(day.date, day.volume) for day in progress.days] == [("2024-05-01", 500)]
+    mock_set_data_access.get_users_sets_by_exercise_id.assert_called_once_with(
+        exercise_id="1", user_id="2"
+    )
+
+
+async def test_get_exercise_summary_reads_the_summary(
+    set_service, mock_set_aggregate_data_access
+):
+    summary = ExerciseSummary(exercise_id="1", set_count=3)
+    mock_set_aggregate_data_access.get_summary = AsyncMock(return_value=summary)
+
+    assert await set_service.get_exercise_summary("1", "2") is summary
+    mock_set_aggregate_data_access.get_summary.assert_called_once_with("2", "1")
+
+
+def test_get_set_service_is_built_once_and_shares_services():
+    set_service = get_set_service()
+
+    assert get_set_service() is set_service
+    assert set_service.exercise_service is get_exercise_service()
+    assert set_service.user_service is get_user_service()
+
+
+async def test_create_set_trusts_users_from_verified_tokens(
+    set_service, mock_user_service, mock_exercise_service, mock_set_data_access
+):
+    mock_exercise_service.get_exercise_by_id = AsyncMock(
+        return_value=ExerciseInDB(
+            id="1", name="Bench Press", body_parts=[], creator="system"
+        )
+    )
+    set_service.user_service = mock_user_service
+    set_service.exercise_service = mock_exercise_service
+    mock_set_data_access.create_set = AsyncMock(side_effect=lambda set_: set_)
+
+    created = await set_service.create_set(
+        SetInCreate(exercise_id="1", reps=10, weight=100), "2", user_from_token=True
+    )
+
+    assert created.user_id == "2"
+    mock_user_service.get_user_by_id.assert_not_called()
+    mock_exercise_service.get_exercise_by_id.assert_called_once_with("1", "2")
+
+
+async def test_create_sets_checks_each_exercise_once_and_keeps_order(
+    set_service, mock_user_service, mock_exercise_service, mock_set_data_access
+):
+    mock_exercise_service.get_exercise_by_id = AsyncMock(
+        side_effect=lambda exercise_id, user_id: (
+            None
+            if exercise_id == "missing"
+            else ExerciseInDB(
+                id=exercise_id, name="Bench Press", body_parts=[], creator="system"
+            )
+        )
+    )
+    mock_set_data_access.create_sets = AsyncMock(
+        side_effect=lambda sets: [201] * len(sets)
+    )
+    sets = [
+        SetInCreate(exercise_id="bench", reps=5, weight=100),
+        SetInCreate(exercise_id="missing", reps=5, weight=100),
+        SetInCreate(exercise_id="bench", reps=4, weight=100),
+        SetInCreate(exercise_id="squat", reps=5, weight=140),
+    ]
+
+    results = await set_service.create_sets(sets, "2", user_from_token=True)
+
+    assert [r.status for r in results] == [201, 400, 201, 201]
+    assert results[1].created is None
+    assert results[1].detail == "Exercise with ID missing does not exist"
+    created = [r.created for r in results if r.created is not None]
+    assert [(s.exercise_id, s.reps) for s in created] == [
+        ("bench", 5),
+        ("bench", 4),
+        ("squat", 5),
+    ]
+    assert all(s.user_id == "2" for s in created)
+    # Logged in the order given, a millisecond apart so created_at_ms keeps it
+    dates = [iso_to_epoch_ms(s.date_created) for s in created]
+    assert dates == sorted(dates) and len(set(dates)) == 3
+    mock_set_data_access.create_sets.assert_called_once_with(created)
+    assert mock_exercise_service.get_exercise_by_id.call_count == 3
+    mock_user_service.get_user_by_id.assert_not_called()
+
+
+async def test_create_sets_reports_sets_the_storage_did_not_create(
+    set_service, mock_exercise_service, mock_set_data_access
+):
+    mock_exercise_service.get_exercise_by_id = AsyncMock(
+        return_value=ExerciseInDB(
+            id="1", name="Bench Press", body_parts=[], creator="system"
+        )
+    )
+    mock_set_data_access.create_sets = AsyncMock(return_value=[201, 429])
+    sets = [SetInCreate(exercise_id="1", reps=5, weight=100)] * 2
+
+    results = await set_service.create_sets(sets, "2", user_from_token=True)
+
+    assert [r.status for r in results] == [201, 429]
+    assert results[0].created is not None
+    assert results[1].created is None
+    assert results[1].detail is not None
+
+
+async def test_create_sets_raises_exception_when_user_doesnt_exist(
+    set_service, mock_user_service, mock_exercise_service
+):
+    mock_user_service.get_user_by_id = AsyncMock(return_value=None)
+    mock_exercise_service.get_exercise_by_id = AsyncMock()
+
+    with pytest.raises(EntityNotFoundException):
+        await set_service.create_sets(
+            [SetInCreate(exercise_id="1", reps=5, weight=100)], "2"
+        )
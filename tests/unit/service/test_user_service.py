@@ -1,7 +1,11 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from azure.cosmos.exceptions import CosmosResourceNotFoundError
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
 
 from app.auth.passwords import get_password_hash
 from app.data_access.user import UserDataAccess
@@ -9,6 +13,7 @@ from app.exceptions import (
     AuthenticationException,
     EntityAlreadyExistsException,
     EntityNotFoundException,
+    PreconditionFailedException,
 )
 from app.models.auth_models import AuthRequest
 from app.models.user_models import (
@@ -19,8 +24,11 @@ from app.models.user_models import (
     UserInResponse,
     UserOAuth,
 )
+from app.responses import json_etag
 from app.service.user_service import UserService
 
+pytestmark = pytest.mark.anyio
+
 
 @pytest.fixture
 def mock_user_data_access():
@@ -37,33 +45,35 @@ def mock_decode_and_verify_token():
     return MagicMock()
 
 
-def test_get_user_by_id_returns_user_when_found(user_service, mock_user_data_access):
-    mock_user_data_access.get_user_by_id = MagicMock(
+async def test_get_user_by_id_returns_user_when_found(
+    user_service, mock_user_data_access
+):
+    mock_user_data_access.get_user_by_id = AsyncMock(
         return_value=UserInDB(id="123", email="someting@email.com", provider="apple")
     )
-    result = user_service.get_user_by_id("123")
+    result = await user_service.get_user_by_id("123")
     assert isinstance(result, UserInDB)
     mock_user_data_access.get_user_by_id.assert_called_once_with("123")
 
 
-def test_get_user_by_id_returns_none_when_user_not_found(
+async def test_get_user_by_id_returns_none_when_user_not_found(
     user_service, mock_user_data_access
 ):
-    mock_user_data_access.get_user_by_id = MagicMock(
+    mock_user_data_access.get_user_by_id = AsyncMock(
         side_effect=CosmosResourceNotFoundError()
     )
-    result = user_service.get_user_by_id("123")
+    result = await user_service.get_user_by_id("123")
     assert result is None
     mock_user_data_access.get_user_by_id.assert_called_once_with("123")
 
 
-def test_create_user(user_service, mock_user_data_access):
-    mock_user_data_access.create_user = MagicMock(
+async def test_create_user(user_service, mock_user_data_access):
+    mock_user_data_access.create_user = AsyncMock(
         return_value=UserInDB(id="123", email="example@email.com", provider="apple")
     )
     user_for_creation = UserOAuth(email="example@email.com", provider="apple")
     # Call the service method
-    result = user_service.create_user(user_for_creation)
+    result = await user_service.create_user(user_for_creation)
     assert isinstance(result, UserInDB)
 
     # Assert `create_user` was called correctly, focus on `email` and `provider`
@@ -73,18 +83,18 @@ def test_create_user(user_service, mock_user_data_access):
     assert mock_user_data_access.create_user.called_once
 
 
-def test_authenticate_oauth_raises_exception_when_given_invalid_provider(
+async def test_authenticate_oauth_raises_exception_when_given_invalid_provider(
     user_service, mock_user_data_access
 ):
-    mock_user_data_access.get_user_by_email = MagicMock(return_value=None)
+    mock_user_data_access.get_user_by_email = AsyncMock(return_value=None)
     with pytest.raises(AuthenticationException, match="oAuth provider not supported"):
-        user_service.authenticate_oauth(
+        await user_service.authenticate_oauth(
             AuthRequest(token="token", provider="invalid_provider")
         )
     assert not mock_user_data_access.get_user_by_email.called
 
 
-def test_authenticate_oauth_raises_exception_when_given_invalid_token(
+async def test_authenticate_oauth_raises_exception_when_given_invalid_token(
     user_service, mock_user_data_access, monkeypatch, mock_decode_and_verify_token
 ):
     mock_decode_and_verify_token.side_effect = ValueError("Invalid token")
@@ -93,26 +103,30 @@ def test_authenticate_oauth_raises_exception_when_given_invalid_token(
     )
 
     with pytest.raises(AuthenticationException, match="Unable to decode token"):
-        user_service.authenticate_oauth(AuthRequest(token="token", provider="apple"))
+        await user_service.authenticate_oauth(
+            AuthRequest(token="token", provider="apple")
+        )
     assert not mock_user_data_access.get_user_by_email.called
 
 
-def test_authenticate_oauth_raises_exception_when_token_data_doesnt_contain_email_field(
+async def test_authenticate_oauth_raises_exception_when_token_data_doesnt_contain_email_field(
     monkeypatch, user_service, mock_user_data_access, mock_decode_and_verify_token
 ):
-    mock_user_data_access.get_user_by_email = MagicMock()
+    mock_user_data_access.get_user_by_email = AsyncMock()
     mock_decode_and_verify_token.return_value = {"not an email field": 42}
     monkeypatch.setattr(
         "app.service.user_service.decode_and_verify_token", mock_decode_and_verify_token
     )
 
     with pytest.raises(AuthenticationException, match="Invalid token data"):
-        user_service.authenticate_oauth(AuthRequest(token="token", provider="apple"))
+        await user_service.authenticate_oauth(
+            AuthRequest(token="token", provider="apple")
+        )
 
     assert not mock_user_data_access.get_user_by_email.called
 
 
-def test_authenticate_oauth_calls_create_user_when_user_for_auth_doesnt_exist(
+async def test_authenticate_oauth_calls_create_user_when_user_for_auth_doesnt_exist(
     mock_user_data_access, user_service, monkeypatch, mock_decode_and_verify_token
 ):
     mock_decode_and_verify_token.return_value = {"email": "some_email@example.com"}
@@ -120,20 +134,20 @@ def test_authenticate_oauth_calls_create_user_when_user_for_auth_doesnt_exist(
         "app.service.user_service.decode_and_verify_token", mock_decode_and_verify_token
     )
     # User doesnt exist
-    mock_user_data_access.get_user_by_email = MagicMock(return_value=None)
-    mock_user_data_access.create_user = MagicMock(
+    mock_user_data_access.get_user_by_email = AsyncMock(return_value=None)
+    mock_user_data_access.create_user = AsyncMock(
         return_value=UserInDB(
             id="132", email="some_email@example.com", provider="apple"
         )
     )
     auth_request = AuthRequest(token="token", provider="apple")
 
-    user_service.authenticate_oauth(auth_request)
+    await user_service.authenticate_oauth(auth_request)
 
     assert mock_user_data_access.create_user.called_once
 
 
-def test_authenticate_oauth_returns_model_with_id__token_and_preferences_fields(
+async def test_authenticate_oauth_returns_model_with_id__token_and_preferences_fields(
     mock_user_data_access, user_service, monkeypatch, mock_decode_and_verify_token
 ):
     mock_decode_and_verify_token.return_value = {"email": "some_email@example.com"}
@@ -141,14 +155,14 @@ def test_authenticate_oauth_returns_model_with_id__token_and_preferences_fields(
         "app.service.user_service.decode_and_verify_token", mock_decode_and_verify_token
     )
     # User doesnt exist
-    mock_user_data_access.get_user_by_email = MagicMock(
+    mock_user_data_access.get_user_by_email = AsyncMock(
         return_value=UserInDB(
             id="132", email="some_email@example.com", provider="apple"
         )
     )
     auth_request = AuthRequest(token="token", provider="apple")
 
-    result = user_service.authenticate_oauth(auth_request)
+    result = await user_service.authenticate_oauth(auth_request)
     assert isinstance(result, UserInResponse)
     dumped_model = result.model_dump()
     assert dumped_model.get("id") is not None
@@ -157,108 +171,164 @@ def test_authenticate_oauth_returns_model_with_id__token_and_preferences_fields(
     assert mock_user_data_access.get_user_by_email.called_once
 
 
-def test_update_preferences_calls_get_user_by_id_in_service_class(user_service):
-    user_service.get_user_by_id = MagicMock(
-        return_value=UserInDB(
-            id="132", email="some_email@example.com", provider="apple"
-        )
+async def test_update_preferences_patches_only_the_preferences(
+    user_service, mock_user_data_access
+):
+    mock_user_data_access.patch_preferences = AsyncMock()
+    user_service.get_user_by_id = AsyncMock()
+
+    await user_service.update_user_preferences(Preferences(theme="light"), "132")
+
+    mock_user_data_access.patch_preferences.assert_called_once_with(
+        "132", {"theme": "light"}
+    )
+    # A single write, the user isn't read first
+    assert not user_service.get_user_by_id.called
+
+
+async def test_update_preferences_if_match_makes_the_patch_conditional(
+    user_service, mock_user_data_access
+):
+    user = UserInDB(id="132", email="a@b.com")
+    mock_user_data_access.get_user_and_etag = AsyncMock(
+        return_value=(user, "cosmos-etag")
+    )
+    mock_user_data_access.patch_preferences = AsyncMock(
+        return_value=user.model_copy(update={"preferences": Preferences(theme="dark")})
     )
-    preferences_for_update = Preferences(theme="system")
-    user_id = "1"
 
-    user_service.update_user_preferences(preferences_for_update, user_id)
-    user_service.get_user_by_id.assert_called_once_with(user_id)
+    preferences = await user_service.update_user_preferences(
+        Preferences(theme="dark"), "132", if_match=json_etag(user.preferences)
+    )
 
+    assert preferences == Preferences(theme="dark")
+    mock_user_data_access.patch_preferences.assert_called_once_with(
+        "132", {"theme": "dark"}, etag="cosmos-etag"
+    )
 
-def test_update_preferences_raises_exception_when_user_not_found(user_service):
-    user_service.get_user_by_id = MagicMock(return_value=None)
-    preferences_for_update = Preferences(theme="system")
-    user_id = "1"
 
-    with pytest.raises(EntityNotFoundException):
-        user_service.update_user_preferences(preferences_for_update, user_id)
+async def test_update_preferences_raises_when_if_match_is_stale(
+    user_service, mock_user_data_access
+):
+    user = UserInDB(id="132", email="a@b.com")
+    mock_user_data_access.get_user_and_etag = AsyncMock(
+        return_value=(
+            user.model_copy(update={"preferences": Preferences(theme="light")}),
+            "cosmos-etag",
+        )
+    )
+    mock_user_data_access.patch_preferences = AsyncMock()
+
+    with pytest.raises(PreconditionFailedException):
+        await user_service.update_user_preferences(
+            Preferences(theme="dark"), "132", if_match=json_etag(user.preferences)
+        )
+    assert not mock_user_data_access.patch_preferences.called
 
 
-def test_update_preferences_calls_data_access_method_with_updated_preferences(
+async def test_update_preferences_retries_from_the_read_after_a_conflict(
     user_service, mock_user_data_access
 ):
-    user_to_update = UserInDB(
-        id="132",
-        email="some_email@example.com",
-        provider="apple",
-        preferences=Preferences(theme="system"),
+    user = UserInDB(id="132", email="a@b.com")
+    mock_user_data_access.get_user_and_etag = AsyncMock(
+        side_effect=[(user, "first"), (user, "second")]
+    )
+    mock_user_data_access.patch_preferences = AsyncMock(
+        side_effect=[CosmosAccessConditionFailedError(), user]
     )
-    user_service.get_user_by_id = MagicMock(return_value=user_to_update)
-    mock_user_data_access.update_user = MagicMock()
-    preferences_for_update = Preferences(theme="light")
-    user_id = "132"
 
-    user_service.update_user_preferences(preferences_for_update, user_id)
-    user_after_updating_preferences = UserInDB(
-        id="132",
-        email="some_email@example.com",
-        provider="apple",
-        preferences=preferences_for_update,
+    await user_service.update_user_preferences(
+        Preferences(theme="dark"), "132", if_match="*"
+    )
+
+    assert [
+        call.kwargs["etag"]
+        for call in mock_user_data_access.patch_preferences.call_args_list
+    ] == ["first", "second"]
+
+
+async def test_update_preferences_if_match_raises_when_user_deleted_after_the_read(
+    user_service, mock_user_data_access
+):
+    user = UserInDB(id="132", email="a@b.com")
+    mock_user_data_access.get_user_and_etag = AsyncMock(return_value=(user, "e"))
+    mock_user_data_access.patch_preferences = AsyncMock(
+        side_effect=CosmosResourceNotFoundError()
     )
-    mock_user_data_access.update_user.assert_called_once_with(
-        user_after_updating_preferences
+
+    with pytest.raises(EntityNotFoundException):
+        await user_service.update_user_preferences(
+            Preferences(theme="dark"), "132", if_match="*"
+        )
+
+
+async def test_update_preferences_raises_exception_when_user_not_found(
+    user_service, mock_user_data_access
+):
+    mock_user_data_access.patch_preferences = AsyncMock(
+        side_effect=CosmosResourceNotFoundError()
     )
 
+    with pytest.raises(EntityNotFoundException):
+        await user_service.update_user_preferences(Preferences(theme="system"), "1")
+
 
-def test_sign_up_user_raises_exception_when_account_exists_with_requested_email(
+async def test_sign_up_user_raises_exception_when_account_exists_with_requested_email(
     user_service, mock_user_data_access
 ):
-    mock_user_data_access.get_user_by_email = MagicMock(
+    mock_user_data_access.get_user_by_email = AsyncMock(
         return_value=UserInDB(email="something@email.com", id="1")
     )
     with pytest.raises(EntityAlreadyExistsException):
-        user_service.sign_up_user(
+        await user_service.sign_up_user(
             UserEmailAuthInSignUpAndIn(
                 email="something@email.com", password="badpassword"
             )
         )
 
 
-def test_sign_up_user_hashes_plain_text_password(user_service, mock_user_data_access):
-    mock_user_data_access.get_user_by_email = MagicMock(return_value=None)
+async def test_sign_up_user_hashes_plain_text_password(
+    user_service, mock_user_data_access
+):
+    mock_user_data_access.get_user_by_email = AsyncMock(return_value=None)
     user_for_sign_up = UserEmailAuthInSignUpAndIn(
         email="something@email.com", password="badpassword"
     )
-    user_service.create_user = MagicMock(
+    user_service.create_user = AsyncMock(
         return_value=UserInDB(email="doesntmatter@email.com", id="1")
     )
     with patch("app.service.user_service.get_password_hash") as mocked_pwrd_hash:
         mocked_pwrd_hash.return_value = "hashed"
-        user_service.sign_up_user(user_for_sign_up)
+        await user_service.sign_up_user(user_for_sign_up)
         mocked_pwrd_hash.assert_called_once_with(user_for_sign_up.password)
 
 
-def test_sign_up_user_calls_create_user_with_hashed_password(
+async def test_sign_up_user_calls_create_user_with_hashed_password(
     user_service, mock_user_data_access
 ):
-    mock_user_data_access.get_user_by_email = MagicMock(return_value=None)
-    user_service.create_user = MagicMock(
+    mock_user_data_access.get_user_by_email = AsyncMock(return_value=None)
+    user_service.create_user = AsyncMock(
         return_value=UserInDB(email="doesntmatter@email.com", id="1")
     )
     user_for_sign_up = UserEmailAuthInSignUpAndIn(
         email="something@email.com", password="badpassword"
     )
     with patch("app.service.user_service.get_password_hash", return_value="hashed"):
-        user_service.sign_up_user(user_for_sign_up)
+        await user_service.sign_up_user(user_for_sign_up)
         args = user_service.create_user.call_args
         user_that_was_created = args[0][0]
         assert isinstance(user_that_was_created, UserEmailAuth)
         assert user_that_was_created.password_hash == "hashed"
 
 
-def test_sign_up_user_returns_user_in_response_object(
+async def test_sign_up_user_returns_user_in_response_object(
     user_service, mock_user_data_access
 ):
-    mock_user_data_access.get_user_by_email = MagicMock(return_value=None)
-    user_service.create_user = MagicMock(
+    mock_user_data_access.get_user_by_email = AsyncMock(return_value=None)
+    user_service.create_user = AsyncMock(
         return_value=UserInDB(email="doesntmatter@email.com", id="1")
     )
-    user_in_response = user_service.sign_up_user(
+    user_in_response = await user_service.sign_up_user(
         UserEmailAuthInSignUpAndIn(
             email="doesntmatter@email.com", password="badpassword"
         )
@@ -266,21 +336,21 @@ def test_sign_up_user_returns_user_in_response_object(
     assert isinstance(user_in_response, UserInResponse)
 
 
-def test_authenticate_email_password_raises_exception_when_user_not_found(
+async def test_authenticate_email_password_raises_exception_when_user_not_found(
     user_service, mock_user_data_access
 ):
-    mock_user_data_access.get_user_by_email = MagicMock(return_value=None)
+    mock_user_data_access.get_user_by_email = AsyncMock(return_value=None)
     user = UserEmailAuthInSignUpAndIn(
         email="something@email.com", password="badpassword"
     )
     with pytest.raises(AuthenticationException):
-        user_service.authenticate_email_password_auth(user)
+        await user_service.authenticate_email_password_auth(user)
 
 
-def test_authenticate_email_password_raises_exception_when_user_sign_up_with_oauth(
+async def test_authenticate_email_password_raises_exception_when_user_sign_up_with_oauth(
     user_service, mock_user_data_access
 ):
-    mock_user_data_access.get_user_by_email = MagicMock(
+    mock_user_data_access.get_user_by_email = AsyncMock(
         return_value=UserInDB(
             email="something@email.com", id="1", password_hash=None, provider="apple"
         )
@@ -289,14 +359,14 @@ def test_authenticate_email_password_raises_exception_when_user_sign_up_with_oau
         email="something@email.com", password="badpassword"
     )
     with pytest.raises(AuthenticationException):
-        user_service.authenticate_email_password_auth(user)
+        await user_service.authenticate_email_password_auth(user)
 
 
-def test_authenticate_email_password_raises_exception_when_password_incorrect(
+async def test_authenticate_email_password_raises_exception_when_password_incorrect(
     user_service, mock_user_data_access
 ):
     password_hash = get_password_hash("it wont match")
-    mock_user_data_access.get_user_by_email = MagicMock(
+    mock_user_data_access.get_user_by_email = AsyncMock(
         return_value=UserInDB(
             email="something@email.com", id="1", password_hash=password_hash
         )
@@ -305,14 +375,14 @@ def test_authenticate_email_password_raises_exception_when_password_incorrect(
         email="something@email.com", password="badpassword"
     )
     with pytest.raises(AuthenticationException):
-        user_service.authenticate_email_password_auth(user)
+        await user_service.authenticate_email_password_auth(user)
 
 
-def test_authenticate_email_password_returns_user_in_response_when_success(
+async def test_authenticate_email_password_returns_user_in_response_when_success(
     user_service, mock_user_data_access
 ):
     password_hash = get_password_hash("it will match")
-    mock_user_data_access.get_user_by_email = MagicMock(
+    mock_user_data_access.get_user_by_email = AsyncMock(
         return_value=UserInDB(
             email="something@email.com", id="1", password_hash=password_hash
         )
@@ -321,5 +391,50 @@ def test_authenticate_email_password_returns_user_in_response_when_success(
         email="something@email.com", password="it will match"
     )
 
-    result = user_service.authenticate_email_password_auth(user)
+    result = await user_service.authenticate_email_password_auth(user)
     assert isinstance(result, UserInResponse)
+
+
+async def test_create_user_raises_entity_already_exists_when_email_is_taken(
+    user_service, mock_user_data_access
+):
+    mock_user_data_access.create_user = AsyncMock(
+        side_effect=CosmosResourceExistsError()
+    )
+    with pytest.raises(EntityAlreadyExistsException):
+        await user_service.create_user(UserOAuth(email="a@b.com", provider="apple"))
+
+
+async def test_sign_up_user_raises_when_email_taken_while_hashing(
+    user_service, mock_user_data_access
+):
+    # Both sign ups find no user, only one of them gets to create it
+    mock_user_data_access.get_user_by_email = AsyncMock(return_value=None)
+    mock_user_data_access.create_user = AsyncMock(
+        side_effect=CosmosResourceExistsError()
+    )
+    with patch("app.service.user_service.get_password_hash", return_value="hashed"):
+        with pytest.raises(EntityAlreadyExistsException):
+            await user_service.sign_up_user(
+                UserEmailAuthInSignUpAndIn(email="a@b.com", password="badpassword")
+            )
+
+
+async def test_authenticate_oauth_signs_in_user_created_by_concurrent_sign_in(
+    mock_user_data_access, user_service, monkeypatch, mock_decode_and_verify_token
+):
+    mock_decode_and_verify_token.return_value = {"email": "a@b.com"}
+    monkeypatch.setattr(
+        "app.service.user_service.decode_and_verify_token", mock_decode_and_verify_token
+    )
+    existing = UserInDB(id="132", email="a@b.com", provider="apple")
+    mock_user_data_access.get_user_by_email = AsyncMock(side_effect=[None, existing])
+    mock_user_data_access.create_user = AsyncMock(
+        side_effect=CosmosResourceExistsError()
+    )
+
+    result = await user_service.authenticate_oauth(
+        AuthRequest(token="token", provider="apple")
+    )
+
+    assert result.id == "132"
@@ -1,21 +1,32 @@
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock
 
 import pytest
-from azure.cosmos.exceptions import CosmosHttpResponseError, CosmosResourceNotFoundError
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosHttpResponseError,
+    CosmosResourceNotFoundError,
+)
 
-from app.exceptions import UnauthorizedAccessException
+from app.exceptions import (
+    ConcurrentUpdateException,
+    PreconditionFailedException,
+    UnauthorizedAccessException,
+)
 from app.models.exercises_models import ExerciseInDB
 from app.models.workout_folder_models import (
     WorkoutFolderInDB,
     WorkoutFolderInRequest,
     WorkoutFolderInUpdate,
 )
+from app.responses import json_etag
 from app.service.workout_folder_service import WorkoutFolderService
 
+pytestmark = pytest.mark.anyio
+
 
 @pytest.fixture
 def mock_workout_folder_data_access():
-    return MagicMock()
+    return AsyncMock()
 
 
 @pytest.fixture
@@ -25,51 +36,58 @@ def workout_folder_service(mock_workout_folder_data_access):
     )
 
 
-def test_get_workout_folder_by_id(
+async def test_get_workout_folder_by_id(
     mock_workout_folder_data_access, workout_folder_service
 ):
-    mock_workout_folder_data_access.get_folder_by_id = MagicMock(
+    mock_workout_folder_data_access.get_folder_by_id = AsyncMock(
         return_value=WorkoutFolderInDB(
             id="123", user_id="123", name="test folder", exercises=[]
         )
     )
-    folder = workout_folder_service.get_folder_by_id("123", "123")
+    folder = await workout_folder_service.get_folder_by_id("123", "123")
     assert folder.id == "123"
     assert folder.user_id == "123"
     assert folder.name == "test folder"
     assert folder.exercises == []
-    mock_workout_folder_data_access.get_folder_by_id.assert_called_once_with("123")
+    mock_workout_folder_data_access.get_folder_by_id.assert_called_once_with(
+        "123", "123"
+    )
 
 
-def test_get_workout_folder_by_id_returns_none_when_folder_not_found(
+async def test_get_workout_folder_by_id_returns_none_when_folder_not_found(
     mock_workout_folder_data_access, workout_folder_service
 ):
-    mock_workout_folder_data_access.get_folder_by_id = MagicMock(
+    mock_workout_folder_data_access.get_folder_by_id = AsyncMock(
         side_effect=CosmosResourceNotFoundError()
     )
-    folder = workout_folder_service.get_folder_by_id("123", "123")
+    mock_workout_folder_data_access.find_folder_by_id = AsyncMock(return_value=None)
+    folder = await workout_folder_service.get_folder_by_id("123", "123")
     assert folder is None
 
 
-def test_get_workout_folder_by_id_raises_unauthorized_exception(
+async def test_get_workout_folder_by_id_raises_unauthorized_exception(
     mock_workout_folder_data_access, workout_folder_service
 ):
-    mock_workout_folder_data_access.get_folder_by_id.return_value = WorkoutFolderInDB(
+    # Not in the requesting user's partition, but exists in another
+    mock_workout_folder_data_access.get_folder_by_id = AsyncMock(
+        side_effect=CosmosResourceNotFoundError()
+    )
+    mock_workout_folder_data_access.find_folder_by_id.return_value = WorkoutFolderInDB(
         id="123", user_id="123", name="test folder", exercises=[]
     )
     with pytest.raises(UnauthorizedAccessException):
-        workout_folder_service.get_folder_by_id("123", "456")
+        await workout_folder_service.get_folder_by_id("123", "456")
 
 
-def test_get_users_workout_folders(
+async def test_get_users_workout_folders(
     mock_workout_folder_data_access, workout_folder_service
 ):
-    mock_workout_folder_data_access.get_users_workout_folders = MagicMock(
+    mock_workout_folder_data_access.get_users_workout_folders = AsyncMock(
         return_value=[
             WorkoutFolderInDB(id="123", user_id="123", name="test folder", exercises=[])
         ]
     )
-    folders = workout_folder_service.get_users_workout_folders("123")
+    folders = await workout_folder_service.get_users_workout_folders("123")
     assert len(folders) == 1
     assert folders[0].id == "123"
     assert folders[0].user_id == "123"
@@ -77,13 +95,13 @@ def test_get_users_workout_folders(
     assert folders[0].exercises == []
 
 
-def test_create_workout_folder_adds_empty_list_when_exercises_field_is_none(
+async def test_create_workout_folder_adds_empty_list_when_exercises_field_is_none(
     mock_workout_folder_data_access, workout_folder_service
 ):
-    mock_workout_folder_data_access.create_workout_folder = MagicMock(
+    mock_workout_folder_data_access.create_workout_folder = AsyncMock(
         return_value=WorkoutFolderInDB(id="1", name="name", user_id="1", exercises=[])
     )
-    workout_folder_service.create_workout_folder(
+    await workout_folder_service.create_workout_folder(
         WorkoutFolderInRequest(name="name", exercises=None), "1"
     )
     created_folder = (
@@ -94,78 +112,177 @@ def test_create_workout_folder_adds_empty_list_when_exercises_field_is_none(
     assert len(created_folder.exercises) == 0
 
 
-def test_update_workout_folder(mock_workout_folder_data_access, workout_folder_service):
-    mock_workout_folder_data_access.get_folder_by_id.return_value = WorkoutFolderInDB(
-        id="123", user_id="123", name="test folder", exercises=[]
+async def test_update_workout_folder(
+    mock_workout_folder_data_access, workout_folder_service
+):
+    exercises = [ExerciseInDB(id="1", name="test name", body_parts=[], creator="123")]
+    updated_folder = WorkoutFolderInDB(
+        id="123", user_id="123", name="updated folder", exercises=exercises
     )
-    mock_workout_folder_data_access.update_workout_folder = MagicMock(
-        return_value=(
-            WorkoutFolderInDB(
-                id="123",
-                user_id="123",
-                name="updated folder",
-                exercises=[
-                    ExerciseInDB(id="1", name="test name", body_parts=[], creator="123")
-                ],
-            )
+    mock_workout_folder_data_access.patch_workout_folder = AsyncMock(
+        return_value=updated_folder
+    )
+
+    assert (
+        await workout_folder_service.update_workout_folder(
+            "123",
+            WorkoutFolderInUpdate(name="updated folder", exercises=exercises),
+            "123",
         )
+        == updated_folder
     )
-    workout_folder_service.update_workout_folder(
+    mock_workout_folder_data_access.patch_workout_folder.assert_called_once_with(
         "123",
-        WorkoutFolderInUpdate(
-            name="updated folder",
-            exercises=[
-                ExerciseInDB(id="1", name="test name", body_parts=[], creator="123")
-            ],
-        ),
         "123",
+        {
+            "/name": "updated folder",
+            "/exercises": [exercise.model_dump() for exercise in exercises],
+        },
     )
-    mock_workout_folder_data_access.update_workout_folder.assert_called_with(
-        WorkoutFolderInDB(
-            id="123",
-            user_id="123",
-            name="updated folder",
-            exercises=[
-                ExerciseInDB(id="1", name="test name", body_parts=[], creator="123")
-            ],
+    # A single write, the folder isn't read first
+    assert not mock_workout_folder_data_access.get_folder_by_id.called
+
+
+async def test_update_workout_folder_only_patches_the_fields_provided(
+    mock_workout_folder_data_access, workout_folder_service
+):
+    await workout_folder_service.update_workout_folder(
+        "123", WorkoutFolderInUpdate(exercises=[]), "123"
+    )
+    mock_workout_folder_data_access.patch_workout_folder.assert_called_once_with(
+        "123", "123", {"/exercises": []}
+    )
+
+
+async def test_update_workout_folder_if_match_makes_the_patch_conditional(
+    mock_workout_folder_data_access, workout_folder_service
+):
+    folder = WorkoutFolderInDB(id="123", user_id="123", name="Push", exercises=[])
+    mock_workout_folder_data_access.get_folder_and_etag.return_value = (
+        folder,
+        "cosmos-etag",
+    )
+
+    await workout_folder_service.update_workout_folder(
+        "123", WorkoutFolderInUpdate(name="Pull"), "123", if_match=json_etag(folder)
+    )
+
+    mock_workout_folder_data_access.patch_workout_folder.assert_called_once_with(
+        "123", "123", {"/name": "Pull"}, etag="cosmos-etag"
+    )
+
+
+async def test_update_workout_folder_raises_when_if_match_is_stale(
+    mock_workout_folder_data_access, workout_folder_service
+):
+    folder = WorkoutFolderInDB(id="123", user_id="123", name="Push", exercises=[])
+    mock_workout_folder_data_access.get_folder_and_etag.return_value = (
+        folder.model_copy(update={"name": "Legs"}),
+        "cosmos-etag",
+    )
+
+    with pytest.raises(PreconditionFailedException):
+        await workout_folder_service.update_workout_folder(
+            "123", WorkoutFolderInUpdate(name="Pull"), "123", if_match=json_etag(folder)
         )
+    assert not mock_workout_folder_data_access.patch_workout_folder.called
+
+
+async def test_update_workout_folder_retries_from_the_read_after_a_conflict(
+    mock_workout_folder_data_access, workout_folder_service
+):
+    folder = WorkoutFolderInDB(id="123", user_id="123", name="Push", exercises=[])
+    mock_workout_folder_data_access.get_folder_and_etag.side_effect = [
+        (folder, "first"),
+        (folder, "second"),
+    ]
+    mock_workout_folder_data_access.patch_workout_folder.side_effect = [
+        CosmosAccessConditionFailedError(),
+        folder,
+    ]
+
+    assert (
+        await workout_folder_service.update_workout_folder(
+            "123", WorkoutFolderInUpdate(name="Pull"), "123", if_match="*"
+        )
+        == folder
+    )
+    assert [
+        call.kwargs["etag"]
+        for call in mock_workout_folder_data_access.patch_workout_folder.call_args_list
+    ] == ["first", "second"]
+
+
+async def test_update_workout_folder_gives_up_when_every_attempt_conflicts(
+    mock_workout_folder_data_access, workout_folder_service
+):
+    folder = WorkoutFolderInDB(id="123", user_id="123", name="Push", exercises=[])
+    mock_workout_folder_data_access.get_folder_and_etag.return_value = (folder, "e")
+    mock_workout_folder_data_access.patch_workout_folder.side_effect = (
+        CosmosAccessConditionFailedError()
     )
 
+    with pytest.raises(ConcurrentUpdateException):
+        await workout_folder_service.update_workout_folder(
+            "123", WorkoutFolderInUpdate(name="Pull"), "123", if_match="*"
+        )
 
-def test_update_folder_raises_value_error_when_name_and_exercises_are_none(
+
+async def test_update_workout_folder_returns_none_when_deleted_after_the_read(
+    mock_workout_folder_data_access, workout_folder_service
+):
+    folder = WorkoutFolderInDB(id="123", user_id="123", name="Push", exercises=[])
+    mock_workout_folder_data_access.get_folder_and_etag.return_value = (folder, "e")
+    mock_workout_folder_data_access.patch_workout_folder.side_effect = (
+        CosmosResourceNotFoundError()
+    )
+
+    assert (
+        await workout_folder_service.update_workout_folder(
+            "123", WorkoutFolderInUpdate(name="Pull"), "123", if_match="*"
+        )
+        is None
+    )
+    assert mock_workout_folder_data_access.patch_workout_folder.call_count == 1
+
+
+async def test_update_folder_raises_value_error_when_name_and_exercises_are_none(
     workout_folder_service,
 ):
     data_to_update = WorkoutFolderInUpdate(name=None, exercises=None)
     with pytest.raises(ValueError):
-        workout_folder_service.update_workout_folder("1", data_to_update, "123")
+        await workout_folder_service.update_workout_folder("1", data_to_update, "123")
 
 
-def test_update_workout_folder_raises_unauthorized_exception(
+async def test_update_workout_folder_raises_unauthorized_exception(
     mock_workout_folder_data_access, workout_folder_service
 ):
-    mock_workout_folder_data_access.get_folder_by_id = MagicMock(
+    mock_workout_folder_data_access.patch_workout_folder = AsyncMock(
+        side_effect=CosmosResourceNotFoundError()
+    )
+    mock_workout_folder_data_access.find_folder_by_id = AsyncMock(
         return_value=WorkoutFolderInDB(
             id="123", user_id="123", name="test folder", exercises=[]
         )
     )
     with pytest.raises(UnauthorizedAccessException):
-        workout_folder_service.update_workout_folder(
+        await workout_folder_service.update_workout_folder(
             "123",
             WorkoutFolderInUpdate(name="updated folder", exercises=[]),
             "456",
         )
-    assert not mock_workout_folder_data_access.update_workout_folder.called
 
 
-def test_update_workout_folder_returns_none_when_resource_doesnt_exist(
+async def test_update_workout_folder_returns_none_when_resource_doesnt_exist(
     mock_workout_folder_data_access, workout_folder_service
 ):
-    mock_workout_folder_data_access.get_folder_by_id = MagicMock(
+    mock_workout_folder_data_access.patch_workout_folder = AsyncMock(
         side_effect=CosmosResourceNotFoundError()
     )
+    mock_workout_folder_data_access.find_folder_by_id = AsyncMock(return_value=None)
 
     assert (
-        workout_folder_service.update_workout_folder(
+        await workout_folder_service.update_workout_folder(
             "123",
             WorkoutFolderInUpdate(
                 name="updated folder",
@@ -177,51 +294,56 @@ def test_update_workout_folder_returns_none_when_resource_doesnt_exist(
         )
         is None
     )
-    assert not mock_workout_folder_data_access.update_workout_folder.called
 
 
-def test_delete_folder_returns_true_when_folder_exists(
+async def test_delete_folder_returns_true_when_folder_exists(
     workout_folder_service, mock_workout_folder_data_access
 ):
-    mock_workout_folder_data_access.get_folder_by_id = MagicMock(
+    mock_workout_folder_data_access.get_folder_by_id = AsyncMock(
         return_value=WorkoutFolderInDB(id="1", user_id="1", name="folder", exercises=[])
     )
-    result = workout_folder_service.delete_workout_folder("1", "1")
+    result = await workout_folder_service.delete_workout_folder("1", "1")
     assert result is True
-    mock_workout_folder_data_access.get_folder_by_id.assert_called_with("1")
+    mock_workout_folder_data_access.get_folder_by_id.assert_called_with("1", "1")
 
 
-def test_delete_folder_raises_value_error_when_folder_doesnt_exist(
+async def test_delete_folder_raises_value_error_when_folder_doesnt_exist(
     workout_folder_service, mock_workout_folder_data_access
 ):
-    mock_workout_folder_data_access.get_folder_by_id = MagicMock(
+    mock_workout_folder_data_access.get_folder_by_id = AsyncMock(
         side_effect=(CosmosResourceNotFoundError())
     )
+    mock_workout_folder_data_access.find_folder_by_id = AsyncMock(return_value=None)
     with pytest.raises(ValueError):
-        workout_folder_service.delete_workout_folder("1", "1")
+        await workout_folder_service.delete_workout_folder("1", "1")
     assert not mock_workout_folder_data_access.delete_workout_folder.called
 
 
-def test_delete_folder_returns_false_when_cosmos_errors(
+async def test_delete_folder_returns_false_when_cosmos_errors(
     workout_folder_service, mock_workout_folder_data_access
 ):
-    mock_workout_folder_data_access.get_folder_by_id = MagicMock(
+    mock_workout_folder_data_access.get_folder_by_id = AsyncMock(
         return_value=WorkoutFolderInDB(id="1", user_id="1", name="folder", exercises=[])
     )
     mock_workout_folder_data_access.delete_workout_folder.side_effect = (
         CosmosHttpResponseError()
     )
 
-    assert workout_folder_service.delete_workout_folder("1", "1") is False
-    mock_workout_folder_data_access.delete_workout_folder.assert_called_once_with("1")
+    assert await workout_folder_service.delete_workout_folder("1", "1") is False
+    mock_workout_folder_data_access.delete_workout_folder.assert_called_once_with(
+        "1", "1"
+    )
 
 
-def test_delete_folder_raises_unauthorized_access_exception_when_folder_does_not_belong_to_user(
+async def test_delete_folder_raises_unauthorized_access_exception_when_folder_does_not_belong_to_user(
     workout_folder_service, mock_workout_folder_data_access
 ):
-    mock_workout_folder_data_access.get_folder_by_id = MagicMock(
+    mock_workout_folder_data_access.get_folder_by_id = AsyncMock(
+        side_effect=CosmosResourceNotFoundError()
+    )
+    mock_workout_folder_data_access.find_folder_by_id = AsyncMock(
         return_value=WorkoutFolderInDB(id="1", user_id="2", name="folder", exercises=[])
     )
 
     with pytest.raises(UnauthorizedAccessException):
-        workout_folder_service.delete_workout_folder("1", "1")
+        await workout_folder_service.delete_workout_folder("1", "1")
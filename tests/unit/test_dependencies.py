@@ -4,9 +4,17 @@ import pytest
 from fastapi import HTTPException, Request, status
 from jwt.exceptions import ExpiredSignatureError, PyJWTError
 
+from app.auth.token_cache import VerifiedTokenCache, verified_tokens
 from app.dependencies import extract_token, get_current_user
 
 
+@pytest.fixture(autouse=True)
+def clear_verified_tokens():
+    verified_tokens.clear()
+    yield
+    verified_tokens.clear()
+
+
 @pytest.fixture
 def mock_request():
     def _mock_request(headers=None):
@@ -72,3 +80,53 @@ def test_get_current_user_returns_payload_when_valid_token():
         mock_decode_jwt.return_value = payload
         user = get_current_user(token="token")
         assert user == payload
+
+
+def test_get_current_user_verifies_a_token_once():
+    payload = {"id": 1, "email": "some_email@notanemail.com"}
+    with patch("jwt.decode") as mock_decode_jwt:
+        mock_decode_jwt.return_value = payload
+        get_current_user(token="token")
+        user = get_current_user(token="token")
+
+    assert user == payload
+    mock_decode_jwt.assert_called_once()
+    assert verified_tokens.stats().hits == 1
+
+
+def test_get_current_user_does_not_cache_invalid_payloads():
+    with patch("jwt.decode") as mock_decode_jwt:
+        mock_decode_jwt.return_value = {"id": 1}
+        for _ in range(2):
+            with pytest.raises(HTTPException, match="Invalid token payload"):
+                get_current_user(token="token")
+
+    assert mock_decode_jwt.call_count == 2
+
+
+def test_verified_token_cache_expires_entries_at_exp():
+    now = [1000.0]
+    cache = VerifiedTokenCache(clock=lambda: now[0])
+    cache.put("token", {"id": 1, "exp": 1010})
+
+    assert cache.get("token") == {"id": 1, "exp": 1010}
+    now[0] = 1010
+    assert cache.get("token") is None
+    assert cache.stats().size == 0
+
+
+def test_verified_token_cache_caps_ttl_and_size():
+    now = [1000.0]
+    cache = VerifiedTokenCache(max_size=2, max_ttl_seconds=60, clock=lambda: now[0])
+    for token in ("a", "b"):
+        cache.put(token, {"exp": 10_000})
+    cache.get("a")
+    cache.put("c", {"exp": 10_000})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    now[0] += 60
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.evictions) == (2, 2, 1)
+    assert stats.hit_rate == 0.5
@@ -0,0 +1,151 @@
+import json
+
+import pytest
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+
+from app.models.set_models import SetGroup, SetInDB, Tempo
+from app.responses import (
+    PydanticJSONResponse,
+    concat_json_arrays,
+    conditional_json_response,
+    conditional_response,
+    etag_matches,
+    make_etag,
+)
+
+
+def make_group() -> SetGroup:
+    return SetGroup(
+        date_created="2024-05-01",
+        sets=[
+            SetInDB(
+                id="1",
+                exercise_id="bench",
+                weight=100,
+                reps=5,
+                notes="Felt strong 💪",
+                tempo=Tempo(eccentric=3, concentric=1, pause=0),
+                date_created="2024-05-01T10:00:00",
+                user_id="1",
+            )
+        ],
+    )
+
+
+def test_renders_models_with_camel_case_aliases():
+    response = PydanticJSONResponse([make_group()])
+
+    body = json.loads(response.body)
+
+    assert body == jsonable_encoder([make_group()])
+    assert body[0]["dateCreated"] == "2024-05-01"
+    assert body[0]["sets"][0]["exerciseId"] == "bench"
+
+
+def test_renders_plain_content_like_json_response():
+    content = [{"dateCreated": "2024-05-01", "notes": "Felt strong 💪"}, None, 1.5]
+
+    response = PydanticJSONResponse(content, status_code=201)
+
+    assert json.loads(response.body) == content
+    assert response.status_code == 201
+    assert response.headers["content-type"] == "application/json"
+
+
+def make_request(if_none_match=None) -> Request:
+    headers = []
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def test_conditional_response_sends_body_with_strong_etag():
+    response = conditional_json_response(make_request(), [make_group()])
+
+    assert response.status_code == 200
+    assert json.loads(response.body) == jsonable_encoder([make_group()])
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["etag"] == make_etag(response.body)
+    assert not response.headers["etag"].startswith("W/")
+
+
+def test_conditional_response_is_304_when_etag_matches():
+    etag = conditional_json_response(make_request(), [make_group()]).headers["etag"]
+
+    response = conditional_json_response(make_request(etag), [make_group()])
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == etag
+
+
+def test_conditional_response_keeps_headers_on_304():
+    headers = {"X-Continuation-Token": "next"}
+    etag = conditional_json_response(make_request(), [], headers).headers["etag"]
+
+    response = conditional_json_response(make_request(etag), [], headers)
+
+    assert response.status_code == 304
+    assert response.headers["x-continuation-token"] == "next"
+
+
+def test_etag_changes_with_headers():
+    def etag(token):
+        response = conditional_json_response(
+            make_request(), [], {"X-Continuation-Token": token}
+        )
+        return response.headers["etag"]
+
+    assert etag("a") != etag("b")
+
+
+def test_etag_depends_on_how_parts_split():
+    assert make_etag(b"ab", b"c") != make_etag(b"a", b"bc")
+
+
+def test_conditional_response_does_not_render_for_304():
+    def render():
+        raise AssertionError("rendered for a 304")
+
+    response = conditional_response(make_request('"abc"'), '"abc"', render)
+
+    assert response.status_code == 304
+
+
+@pytest.mark.parametrize(
+    "arrays, joined",
+    [
+        ((b"[]", b"[]"), []),
+        ((b'[{"a":1}]', b"[]"), [{"a": 1}]),
+        ((b"[]", b"[2,3]"), [2, 3]),
+        ((b'[{"a":1}]', b"[2,3]"), [{"a": 1}, 2, 3]),
+    ],
+)
+def test_concat_json_arrays(arrays, joined):
+    assert json.loads(concat_json_arrays(*arrays)) == joined
+
+
+def test_conditional_response_sends_body_when_content_changed():
+    etag = conditional_json_response(make_request(), []).headers["etag"]
+
+    response = conditional_json_response(make_request(etag), [make_group()])
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.parametrize(
+    "if_none_match, matches",
+    [
+        (None, False),
+        ("", False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"other", "abc"', True),
+        ('"other"', False),
+        ("*", True),
+    ],
+)
+def test_etag_matches(if_none_match, matches):
+    assert etag_matches(if_none_match, '"abc"') is matches
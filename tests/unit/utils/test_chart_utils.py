@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from app.models.set_models import SetBucket, SetInDB
+from app.utils.chart_utils import (
+    bucket_sets,
+    downsample_buckets,
+    largest_triangle_three_buckets,
+)
+
+
+def make_set(weight: float, reps: int, day: str) -> SetInDB:
+    return SetInDB(
+        id=day,
+        exercise_id="1",
+        user_id="1",
+        weight=weight,
+        reps=reps,
+        date_created=f"{day}T10:00:00+00:00",
+    )
+
+
+SETS = [
+    make_set(100, 5, "2024-05-01"),  # Wednesday
+    make_set(110, 3, "2024-05-05"),  # Sunday, same week
+    make_set(120, 1, "2024-05-06"),  # Monday
+    make_set(90, 10, "2024-06-03"),
+]
+
+
+def test_bucket_sets_without_sets():
+    assert bucket_sets([], "week") == []
+
+
+@pytest.mark.parametrize(
+    "bucket, expected",
+    [
+        (
+            "day",
+            [
+                ("2024-05-01", 1, 100, 500),
+                ("2024-05-05", 1, 110, 330),
+                ("2024-05-06", 1, 120, 120),
+                ("2024-06-03", 1, 90, 900),
+            ],
+        ),
+        (
+            "week",
+            [
+                ("2024-04-29", 2, 110, 830),
+                ("2024-05-06", 1, 120, 120),
+                ("2024-06-03", 1, 90, 900),
+            ],
+        ),
+        ("month", [("2024-05-01", 3, 120, 950), ("2024-06-01", 1, 90, 900)]),
+    ],
+)
+def test_bucket_sets(bucket, expected):
+    buckets = bucket_sets(list(reversed(SETS)), bucket)
+
+    assert [(b.start, b.set_count, b.max_weight, b.volume) for b in buckets] == expected
+
+
+def test_lttb_keeps_the_ends_and_the_peaks():
+    x = np.arange(100, dtype=np.float64)
+    y = np.zeros(100)
+    y[37], y[71] = 50, -50
+
+    kept = largest_triangle_three_buckets(x, y, 10)
+
+    assert len(kept) == 10
+    assert kept[0] == 0 and kept[-1] == 99
+    assert list(kept) == sorted(kept)
+    assert 37 in kept and 71 in kept
+
+
+def test_lttb_keeps_short_series_whole():
+    assert list(largest_triangle_three_buckets(np.arange(3.0), np.ones(3), 5)) == [
+        0,
+        1,
+        2,
+    ]
+
+
+def test_downsample_buckets_to_the_point_budget():
+    buckets = [
+        SetBucket(
+            start=str(np.datetime64("2020-01-01") + i),
+            set_count=1,
+            max_weight=i % 7,
+            volume=1,
+        )
+        for i in range(1000)
+    ]
+
+    downsampled = downsample_buckets(buckets, 50)
+
+    assert len(downsampled) == 50
+    assert downsampled[0] is buckets[0] and downsampled[-1] is buckets[-1]
+    assert downsample_buckets(buckets[:20], 50) == buckets[:20]
@@ -0,0 +1,142 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+from app.auth.jwks import JWKSCache
+
+
+def make_jwk(kid: str) -> dict:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return {**json.loads(RSAAlgorithm.to_jwk(private_key.public_key())), "kid": kid}
+
+
+FIRST_KEY = make_jwk("first")
+ROTATED_KEY = make_jwk("rotated")
+
+
+def make_response(*jwks: dict, cache_control: str = "") -> MagicMock:
+    response = MagicMock()
+    response.json.return_value = {"keys": list(jwks)}
+    response.headers = {"Cache-Control": cache_control} if cache_control else {}
+    return response
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def mock_get():
+    with patch("app.auth.jwks.requests.get") as mock_get:
+        mock_get.return_value = make_response(FIRST_KEY, cache_control="max-age=600")
+        yield mock_get
+
+
+@pytest.fixture
+def cache(clock, mock_get):
+    return JWKSCache("https://keys", clock=clock)
+
+
+def test_keys_are_parsed_once_and_reused(cache, mock_get):
+    key = cache.get_key("first")
+
+    assert cache.get_key("first") is key
+    assert key.public_numbers() == RSAAlgorithm.from_jwk(FIRST_KEY).public_numbers()
+    mock_get.assert_called_once_with("https://keys", timeout=5)
+
+
+def test_keys_are_refetched_once_max_age_has_passed(cache, clock, mock_get):
+    cache.get_key("first")
+    clock.now += 601
+
+    cache.get_key("first")
+
+    assert mock_get.call_count == 2
+
+
+def test_default_max_age_without_cache_headers(clock, mock_get):
+    mock_get.return_value = make_response(FIRST_KEY)
+    cache = JWKSCache("https://keys", default_max_age=60, clock=clock)
+    cache.get_key("first")
+
+    clock.now += 40
+    cache.get_key("first")
+    assert mock_get.call_count == 1
+
+    clock.now += 21
+    cache.get_key("first")
+    assert mock_get.call_count == 2
+
+
+def test_unknown_kid_refetches_to_pick_up_rotated_keys(cache, clock, mock_get):
+    cache.get_key("first")
+    clock.now += 61
+    mock_get.return_value = make_response(FIRST_KEY, ROTATED_KEY)
+
+    assert cache.get_key("rotated") is not None
+    assert mock_get.call_count == 2
+
+
+def test_unknown_kid_refetches_are_rate_limited(cache, clock, mock_get):
+    cache.get_key("first")
+    clock.now += 10
+
+    with pytest.raises(ValueError, match="Matching public key not found"):
+        cache.get_key("made-up")
+    assert mock_get.call_count == 1
+
+
+def test_keys_are_refreshed_in_the_background(cache, clock, mock_get):
+    cache.get_key("first")
+    clock.now += 500
+    mock_get.return_value = make_response(
+        FIRST_KEY, ROTATED_KEY, cache_control="max-age=600"
+    )
+
+    assert cache.get_key("first") is not None
+    # The refresh holds the lock until it has finished
+    assert cache._background_refresh.acquire(timeout=5)
+    cache._background_refresh.release()
+
+    assert mock_get.call_count == 2
+    assert cache.get_key("rotated") is not None
+    assert mock_get.call_count == 2
+
+
+def test_concurrent_refreshes_are_coalesced(cache, mock_get):
+    def slow_get(*args, **kwargs):
+        time.sleep(0.05)
+        return make_response(FIRST_KEY, cache_control="max-age=600")
+
+    mock_get.side_effect = slow_get
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        keys = list(pool.map(lambda _: cache.get_key("first"), range(8)))
+
+    assert mock_get.call_count == 1
+    assert all(key is keys[0] for key in keys)
+
+
+def test_expired_keys_are_used_while_the_provider_is_down(cache, clock, mock_get):
+    key = cache.get_key("first")
+    clock.now += 601
+    mock_get.side_effect = requests.ConnectionError()
+
+    assert cache.get_key("first") is key
+    with pytest.raises(requests.ConnectionError):
+        cache.get_key("rotated")
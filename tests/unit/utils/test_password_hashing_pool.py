@@ -0,0 +1,56 @@
+import threading
+
+import anyio
+import pytest
+
+from app.auth.passwords import PasswordHashingPool, check_password, get_password_hash
+from app.exceptions import PasswordHashingBusyException
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def pool():
+    pool = PasswordHashingPool(max_workers=1, max_queued=1)
+    yield pool
+    pool.shutdown()
+
+
+async def test_runs_bcrypt_on_the_pool(pool):
+    hashed = await pool.run(get_password_hash, "password")
+
+    assert await pool.run(check_password, "password", hashed)
+    assert not await pool.run(check_password, "wrong", hashed)
+    assert pool.stats().completed == 3
+
+
+async def test_turns_work_away_once_the_queue_is_full(pool):
+    release = threading.Event()
+    results = []
+
+    async def run_blocked():
+        results.append(await pool.run(release.wait, 5))
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(run_blocked)
+        tg.start_soon(run_blocked)
+        await anyio.sleep(0.05)
+
+        stats = pool.stats()
+        assert (stats.running, stats.queued) == (1, 1)
+        with pytest.raises(PasswordHashingBusyException):
+            await pool.run(release.wait, 5)
+        release.set()
+
+    stats = pool.stats()
+    assert results == [True, True]
+    assert (stats.running, stats.queued, stats.peak_queued) == (0, 0, 1)
+    assert (stats.completed, stats.rejected) == (2, 1)
+    assert stats.max_wait_ms > 0
+
+
+async def test_starts_new_threads_after_shutdown(pool):
+    await pool.run(len, "a")
+    pool.shutdown()
+
+    assert await pool.run(len, "ab") == 2
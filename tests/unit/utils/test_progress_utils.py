@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+from random import Random
+
+import pytest
+
+from app.models.set_models import SetInDB
+from app.utils.progress_utils import build_progress
+
+
+def make_set(weight: float, reps: int, day: str, set_id="1") -> SetInDB:
+    return SetInDB(
+        id=set_id,
+        exercise_id="1",
+        user_id="1",
+        weight=weight,
+        reps=reps,
+        date_created=f"{day}T10:00:00+00:00",
+    )
+
+
+def test_build_progress_without_sets():
+    assert build_progress([]) == []
+
+
+def test_build_progress_per_day_oldest_first():
+    progress = build_progress(
+        [
+            make_set(100, 8, "2024-05-03"),
+            make_set(100, 5, "2024-05-01"),
+            make_set(110, 3, "2024-05-01"),
+            make_set(110, 2, "2024-05-01"),
+        ]
+    )
+
+    assert [day.date for day in progress] == ["2024-05-01", "2024-05-03"]
+    first = progress[0]
+    assert first.set_count == 3
+    assert (first.top_set_weight, first.top_set_reps) == (110, 3)
+    assert first.volume == 500 + 330 + 220
+    assert first.estimated_one_rep_max == pytest.approx(110 * (1 + 3 / 30))
+    assert first.brzycki_one_rep_max == pytest.approx(110 * 36 / 34)
+    assert first.one_rep_max_trend == first.estimated_one_rep_max
+    assert progress[1].volume_trend == pytest.approx((1050 + 800) / 2)
+
+
+def test_build_progress_without_a_brzycki_estimate():
+    progress = build_progress([make_set(20, 40, "2024-05-01")])
+
+    assert progress[0].brzycki_one_rep_max is None
+    assert progress[0].estimated_one_rep_max == pytest.approx(20 * (1 + 40 / 30))
+
+
+def test_build_progress_trend_covers_four_weeks():
+    progress = build_progress(
+        [
+            make_set(100, 1, "2024-05-01"),
+            make_set(200, 1, "2024-05-28"),
+            make_set(300, 1, "2024-05-29"),
+        ]
+    )
+
+    assert [day.one_rep_max_trend for day in progress] == [100, 150, 250]
+
+
+def test_build_progress_matches_a_set_by_set_calculation():
+    random = Random(7)
+    start = date(2024, 1, 1)
+    sets = [
+        make_set(
+            random.randint(20, 200),
+            random.randint(1, 15),
+            (start + timedelta(days=random.randint(0, 120))).isoformat(),
+            set_id=str(i),
+        )
+        for i in range(500)
+    ]
+
+    by_day: dict[str, list[SetInDB]] = {}
+    for set_ in sets:
+        by_day.setdefault(set_.date_created[:10], []).append(set_)
+    expected = {}
+    for day, day_sets in by_day.items():
+        top = max(day_sets, key=lambda s: (s.weight, s.reps))
+        expected[day] = (
+            (top.weight, top.reps),
+            sum(s.weight * s.reps for s in day_sets),
+            max(
+                s.weight * (1 + s.reps / 30) if s.reps > 1 else s.weight
+                for s in day_sets
+            ),
+        )
+
+    progress = build_progress(sets)
+    assert [day.date for day in progress] == sorted(expected)
+    for day in progress:
+        top_set, volume, one_rep_max = expected[day.date]
+        assert (day.top_set_weight, day.top_set_reps) == top_set
+        assert day.volume == pytest.approx(volume)
+        assert day.estimated_one_rep_max == pytest.approx(one_rep_max)
+        window = [
+            expected[d][2]
+            for d in expected
+            if 0 <= (date.fromisoformat(day.date) - date.fromisoformat(d)).days < 28
+        ]
+        assert day.one_rep_max_trend == pytest.approx(sum(window) / len(window))
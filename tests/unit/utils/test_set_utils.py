@@ -1,7 +1,15 @@
+from random import Random
+
 import pytest
 
-from app.models.set_models import SetGroup, SetInDB
-from app.utils.set_utils import group_sets_by_date, sorted_set_history
+from app.models.set_models import ExerciseSummary, SetGroup, SetInDB
+from app.utils.set_utils import (
+    add_set_to_summary,
+    build_set_history,
+    estimated_one_rep_max,
+    group_sets_by_date,
+    sorted_set_history,
+)
 
 # This looks crazy long, but its just how black formats it
 group_sets_test_data = [
@@ -254,3 +262,67 @@ data = [
 @pytest.mark.parametrize("set_history, expected", data)
 def test_sorted_set_history(set_history, expected):
     assert sorted_set_history(set_history) == expected
+
+
+def make_set(set_id: str, date_created: str) -> SetInDB:
+    return SetInDB(
+        id=set_id,
+        date_created=date_created,
+        user_id="1",
+        exercise_id="1",
+        reps=1,
+        weight=2,
+    )
+
+
+def test_build_set_history_groups_and_sorts_newest_first():
+    sets = [
+        make_set("1", "2023-05-11T09:15:00+00:00"),
+        make_set("2", "2023-05-12T10:30:00+00:00"),
+        make_set("3", "2023-05-11T14:30:00+00:00"),
+        make_set("4", "2023-05-12T11:00:00+00:00"),
+    ]
+
+    history = build_set_history(sets)
+
+    assert [group.date_created for group in history] == ["2023-05-12", "2023-05-11"]
+    assert [[s.id for s in group.sets] for group in history] == [["4", "2"], ["3", "1"]]
+    # The sets are the ones passed in, not copies
+    assert history[0].sets[0] is sets[3]
+
+
+def test_build_set_history_matches_group_then_sort():
+    random = Random(7)
+    sets = [
+        make_set(
+            str(i),
+            f"2023-0{random.randint(1, 9)}-{random.randint(10, 28)}"
+            f"T{random.randint(10, 23)}:{random.randint(10, 59)}:00+00:00",
+        )
+        for i in range(500)
+    ]
+
+    assert build_set_history(sets) == sorted_set_history(group_sets_by_date(sets))
+
+
+def test_build_set_history_of_nothing():
+    assert build_set_history([]) == []
+
+
+@pytest.mark.parametrize(
+    "weight, reps, expected", [(100, 1, 100), (100, 3, 110), (90, 10, 120)]
+)
+def test_estimated_one_rep_max(weight, reps, expected):
+    assert estimated_one_rep_max(weight, reps) == pytest.approx(expected)
+
+
+def test_add_set_to_summary_in_any_order():
+    summary = ExerciseSummary(exercise_id="1")
+    add_set_to_summary(summary, 100, 5, "2024-05-03T10:00:00")
+    add_set_to_summary(summary, 90, 10, "2024-05-01T10:00:00")
+
+    assert summary.set_count == 2
+    assert summary.max_weight == 100
+    assert summary.best_estimated_one_rep_max == pytest.approx(120)
+    assert summary.total_volume == 1400
+    assert summary.last_session_date == "2024-05-03"
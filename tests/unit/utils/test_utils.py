@@ -2,7 +2,7 @@ import datetime
 
 import pytest
 
-from app.utils.date_utils import add_days_to_date
+from app.utils.date_utils import add_days_to_date, as_utc, to_epoch_ms
 from app.utils.string_utils import strip_and_lower
 
 
@@ -30,3 +30,20 @@ def test_add_days_to_date(test_input, days, expected):
 )
 def test_strip_and_lower(test_input, expected):
     assert strip_and_lower(test_input) == expected
+
+
+def test_as_utc_takes_naive_dates_to_be_utc():
+    naive = datetime.datetime(2024, 5, 1, 10)
+    utc = datetime.datetime(2024, 5, 1, 10, tzinfo=datetime.timezone.utc)
+    dublin_summer = datetime.timezone(datetime.timedelta(hours=1))
+
+    assert as_utc(naive) == utc
+    assert as_utc(datetime.datetime(2024, 5, 1, 11, tzinfo=dublin_summer)) == utc
+    assert as_utc(utc).tzinfo == datetime.timezone.utc
+
+
+def test_to_epoch_ms():
+    assert to_epoch_ms(datetime.datetime(1970, 1, 1, 0, 0, 1)) == 1000
+    assert to_epoch_ms(
+        datetime.datetime(2024, 5, 1, tzinfo=datetime.timezone.utc)
+    ) == to_epoch_ms(datetime.datetime(2024, 5, 1))